@@ -0,0 +1,5 @@
+# Benchmarks del proyecto. No forman parte de la suite de tests: cada módulo se
+# ejecuta a mano desde la carpeta del proyecto, por ejemplo:
+#     python -m benchmarks.bench_solapamiento --turnos 1000000
+# `benchmarks.suite` corre los casos principales y guarda el resultado en JSON
+# para compararlo entre commits (`benchmarks.comparar`).
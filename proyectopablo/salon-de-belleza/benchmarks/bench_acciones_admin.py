@@ -0,0 +1,94 @@
+"""
+benchmarks.bench_acciones_admin
+-------------------------------
+Compara las acciones "confirmar" y "cancelar" del admin de `Turno`:
+
+- por fila: el camino original, `Turno.save()` por cada turno;
+- en bloque: `core.reservas.confirmar_turnos` / `cancelar_turnos`.
+
+Ambos sólo encolan eventos; la sincronización de `Reserva` la hace después la
+bandeja de salida (fuera del tiempo medido, ver `bench_outbox`).
+
+Uso:
+    python -m benchmarks.bench_acciones_admin --turnos 10000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from benchmarks.entorno import preparar_django
+
+
+def sembrar(n_turnos):
+    from core.models import Servicio, Turno
+
+    servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+    base = datetime(2030, 1, 1, 9, tzinfo=dt_timezone.utc)
+    Turno.objects.bulk_create(
+        [
+            Turno(
+                servicio=servicio,
+                cliente_nombre=f'Cliente {n}',
+                cliente_telefono='1234',
+                fecha_hora_inicio=base + timedelta(hours=n),
+                fecha_hora_fin=base + timedelta(hours=n + 1),
+            )
+            for n in range(n_turnos)
+        ],
+        batch_size=1000,
+    )
+
+
+def por_fila(confirmar):
+    from core.models import Turno
+
+    for turno in Turno.objects.all():
+        if turno.confirmado != confirmar:
+            turno.confirmado = confirmar
+            turno.save()
+
+
+def en_bloque(confirmar):
+    from core import reservas
+    from core.models import Turno
+
+    if confirmar:
+        reservas.confirmar_turnos(Turno.objects.all())
+    else:
+        reservas.cancelar_turnos(Turno.objects.all())
+
+
+def medir(nombre, funcion):
+    from core.eventos import procesar_pendientes
+    from core.models import Reserva
+
+    t0 = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - t0
+    while procesar_pendientes():
+        pass
+    print(f"{nombre:<24} {segundos:8.3f}s  (reservas: {Reserva.objects.count()})")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=10_000)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    sembrar(args.turnos)
+    print(f"{args.turnos} turnos")
+
+    fila = medir('confirmar por fila', lambda: por_fila(True))
+    medir('cancelar por fila', lambda: por_fila(False))
+    bloque = medir('confirmar en bloque', lambda: en_bloque(True))
+    medir('cancelar en bloque', lambda: en_bloque(False))
+    print(f"confirmar: {fila / bloque:.0f}x más rápido en bloque")
+
+
+if __name__ == '__main__':
+    main()
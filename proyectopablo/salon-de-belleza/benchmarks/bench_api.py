@@ -0,0 +1,113 @@
+"""
+benchmarks.bench_api
+--------------------
+Rendimiento de la creación de turnos por la API (`core.api`) con el cliente de
+pruebas de Django (pila completa de middleware, sin red), en turnos por
+segundo:
+
+- "formulario": `POST /reservar/` de a un turno, lo que hacían las
+  integraciones antes de la API;
+- "api": `POST /api/turnos/` de a un turno;
+- "lote N": `POST /api/turnos/lote/` con N turnos por petición.
+
+Cada caso reserva `--turnos` horarios distintos (sin conflictos) sobre
+`--servicios` servicios.
+
+Uso:
+    python -m benchmarks.bench_api --turnos 2000 --servicios 10
+"""
+
+import argparse
+import json
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.entorno import preparar_django
+
+TOKEN = 'bench'
+
+
+def horarios(servicios, dia_inicial, cantidad):
+    """`cantidad` pares (servicio, inicio) distintos, de 9 a 17 h."""
+    resultado = []
+    dia = dia_inicial
+    while len(resultado) < cantidad:
+        for hora in range(9, 18):
+            for servicio in servicios:
+                resultado.append((servicio, datetime.combine(dia, datetime.min.time()) + timedelta(hours=hora)))
+        dia += timedelta(days=1)
+    return resultado[:cantidad], dia
+
+
+def pedido(servicio, inicio, n):
+    return {
+        'servicio': servicio.pk,
+        'inicio': inicio.isoformat(),
+        'cliente_nombre': f'Cliente {n}',
+        'cliente_telefono': '1234',
+    }
+
+
+def por_segundo(funcion, turnos):
+    t0 = time.perf_counter()
+    funcion()
+    return turnos / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=2000)
+    parser.add_argument('--servicios', type=int, default=10)
+    parser.add_argument('--lotes', type=int, nargs='+', default=[10, 50, 100])
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.test import Client
+
+    from core.models import Servicio, Turno
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.API_TOKENS = [TOKEN]
+    settings.API_MAX_BATCH_SIZE = max(args.lotes)
+    servicios = [Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=60) for n in range(args.servicios)]
+    cliente = Client()
+    cabeceras = {'HTTP_AUTHORIZATION': f'Bearer {TOKEN}'}
+    dia = date(2031, 1, 1)
+
+    def formulario(pares):
+        for n, (servicio, inicio) in enumerate(pares):
+            respuesta = cliente.post('/reservar/', {
+                'servicio': servicio.pk, 'fecha': inicio.date().isoformat(), 'hora': inicio.strftime('%H:%M'),
+                'nombre_cliente': f'Cliente {n}', 'cliente_telefono': '1234',
+            })
+            assert respuesta.status_code == 302, respuesta.status_code
+
+    def api(pares):
+        for n, (servicio, inicio) in enumerate(pares):
+            respuesta = cliente.post('/api/turnos/', json.dumps(pedido(servicio, inicio, n)),
+                                     content_type='application/json', **cabeceras)
+            assert respuesta.status_code == 201, respuesta.content
+
+    def lote(pares, tamano):
+        for desde in range(0, len(pares), tamano):
+            cuerpo = {'turnos': [pedido(s, i, n) for n, (s, i) in enumerate(pares[desde:desde + tamano])]}
+            respuesta = cliente.post('/api/turnos/lote/', json.dumps(cuerpo),
+                                     content_type='application/json', **cabeceras)
+            assert respuesta.status_code == 201, respuesta.content
+
+    casos = [('formulario', formulario), ('api', api)]
+    casos += [(f'lote {n}', lambda pares, n=n: lote(pares, n)) for n in args.lotes]
+
+    print(f"{args.turnos} turnos por caso, {args.servicios} servicios")
+    base = None
+    for nombre, funcion in casos:
+        pares, dia = horarios(servicios, dia, args.turnos)
+        velocidad = por_segundo(lambda: funcion(pares), args.turnos)
+        base = base or velocidad
+        print(f"{nombre:<12} {velocidad:9.0f} turnos/s  ({velocidad / base:.1f}x)")
+    print(f"turnos en la base: {Turno.objects.count()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,243 @@
+"""
+benchmarks.bench_asgi
+---------------------
+Prueba de carga con cientos de conexiones simultáneas contra un servidor real:
+
+- WSGI: gunicorn con un worker `gthread` (`--hilos` hilos), que atiende cada
+  petición en un hilo;
+- ASGI: uvicorn con un worker y `salon_de_belleza.asgi.application`, donde
+  `reservar_turno_view`, `servicios_view` y `contacto_view` corren en el bucle
+  de eventos.
+
+Ambos usan el perfil `prod` y una copia de la misma base SQLite (30 servicios).
+El generador de carga es un cliente HTTP/1.1 con keep-alive escrito con
+`asyncio`; cada conexión repite su petición hasta que termina la ronda. Los
+POST de reserva usan el token CSRF que cada conexión obtiene al empezar.
+
+Necesita `gunicorn` y `uvicorn` (`pip install gunicorn uvicorn`), que no son
+dependencias de la aplicación.
+
+Uso:
+    python -m benchmarks.bench_asgi --conexiones 500 --segundos 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.entorno import RAIZ, preparar_django
+
+ESCENARIOS = {
+    'GET /servicios/': ('GET', '/servicios/'),
+    'GET /reservar/': ('GET', '/reservar/'),
+    'GET /contacto/': ('GET', '/contacto/'),
+    'POST /reservar/': ('POST', '/reservar/'),
+}
+
+
+# --- Servidores (se ejecutan en un proceso hijo) ---
+
+def servir(tipo, puerto, ruta_db, hilos):
+    preparar_django(ruta_db)
+    from django.db import connections
+    connections.close_all()
+
+    if tipo == 'asgi':
+        import uvicorn
+
+        from salon_de_belleza.asgi import application
+        uvicorn.run(application, host='127.0.0.1', port=puerto, workers=1, backlog=4096,
+                    log_level='warning', access_log=False)
+        return
+
+    from gunicorn.app.base import BaseApplication
+
+    from salon_de_belleza.wsgi import application
+
+    class Servidor(BaseApplication):
+        def load_config(self):
+            opciones = {
+                'bind': f'127.0.0.1:{puerto}', 'workers': 1, 'worker_class': 'gthread',
+                'threads': hilos, 'worker_connections': 4096, 'backlog': 4096,
+                'keepalive': 30, 'loglevel': 'warning', 'preload_app': True,
+            }
+            for clave, valor in opciones.items():
+                self.cfg.set(clave, valor)
+
+        def load(self):
+            return application
+
+    Servidor().run()
+
+
+# --- Generador de carga ---
+
+async def _leer_respuesta(lector):
+    cabecera = await lector.readuntil(b'\r\n\r\n')
+    lineas = cabecera.decode('latin-1').split('\r\n')
+    estado = int(lineas[0].split()[1])
+    cabeceras = {}
+    cookies = []
+    for linea in lineas[1:]:
+        if ':' in linea:
+            nombre, valor = linea.split(':', 1)
+            nombre = nombre.strip().lower()
+            if nombre == 'set-cookie':
+                cookies.append(valor.strip())
+            cabeceras[nombre] = valor.strip()
+    cuerpo = await lector.readexactly(int(cabeceras.get('content-length', 0)))
+    return estado, cabeceras, cookies, cuerpo
+
+
+def _peticion(metodo, ruta, puerto, cookie='', cuerpo=b''):
+    lineas = [f'{metodo} {ruta} HTTP/1.1', f'Host: 127.0.0.1:{puerto}', 'Connection: keep-alive']
+    if cookie:
+        lineas.append(f'Cookie: {cookie}')
+    if metodo == 'POST':
+        lineas += ['Content-Type: application/x-www-form-urlencoded', f'Content-Length: {len(cuerpo)}']
+    return ('\r\n'.join(lineas) + '\r\n\r\n').encode('latin-1') + cuerpo
+
+
+async def _conexion(puerto, metodo, ruta, fin, servicios, resultado):
+    lector = escritor = None
+    cookie = token = ''
+    while time.perf_counter() < fin:
+        try:
+            if escritor is None:
+                lector, escritor = await asyncio.open_connection('127.0.0.1', puerto, limit=1 << 20)
+                if metodo == 'POST' and not token:
+                    escritor.write(_peticion('GET', '/reservar/', puerto))
+                    _, _, cookies, html = await _leer_respuesta(lector)
+                    cookie = '; '.join(c.split(';', 1)[0] for c in cookies)
+                    token = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', html).group(1).decode()
+            cuerpo = b''
+            if metodo == 'POST':
+                dia = date(2031, 1, 1) + timedelta(days=random.randrange(365))
+                cuerpo = (
+                    f'csrfmiddlewaretoken={token}&servicio={random.choice(servicios)}&fecha={dia.isoformat()}'
+                    f'&hora={random.randrange(9, 17):02d}:00&nombre_cliente=Carga&cliente_telefono=1234'
+                ).encode()
+            t0 = time.perf_counter()
+            escritor.write(_peticion(metodo, ruta, puerto, cookie, cuerpo))
+            estado, cabeceras, _, _ = await _leer_respuesta(lector)
+            resultado['latencias'].append(time.perf_counter() - t0)
+            resultado['codigos'][estado] = resultado['codigos'].get(estado, 0) + 1
+            if cabeceras.get('connection', '').lower() == 'close':
+                escritor.close()
+                escritor = None
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            resultado['errores'] += 1
+            if escritor is not None:
+                escritor.close()
+            escritor = None
+            await asyncio.sleep(0.01)
+    if escritor is not None:
+        escritor.close()
+
+
+async def cargar(puerto, escenario, conexiones, segundos, servicios):
+    metodo, ruta = ESCENARIOS[escenario]
+    resultado = {'latencias': [], 'codigos': {}, 'errores': 0}
+    fin = time.perf_counter() + segundos
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_conexion(puerto, metodo, ruta, fin, servicios, resultado) for _ in range(conexiones)))
+    resultado['duracion'] = time.perf_counter() - t0
+    return resultado
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _esperar(puerto, proceso):
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError('El servidor terminó al arrancar.')
+        try:
+            with socket.create_connection(('127.0.0.1', puerto), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('El servidor no arrancó a tiempo.')
+
+
+def _resumen(r):
+    latencias = sorted(r['latencias']) or [0]
+    p50 = latencias[len(latencias) // 2] * 1000
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+    codigos = ' '.join(f'{c}:{n}' for c, n in sorted(r['codigos'].items()))
+    return f"{len(r['latencias']) / r['duracion']:>7.0f} req/s  p50={p50:>7.1f}ms  p99={p99:>7.1f}ms  errores={r['errores']}  [{codigos}]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conexiones', type=int, default=500)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--hilos', type=int, default=32, help='Hilos del worker gthread de gunicorn.')
+    parser.add_argument('--escenarios', nargs='*', default=list(ESCENARIOS), choices=list(ESCENARIOS))
+    parser.add_argument('--servir', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    parser.add_argument('--puerto', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    entorno = dict(
+        os.environ,
+        DJANGO_ENV='prod',
+        DJANGO_SECRET_KEY='benchmark-' + 'x' * 50,
+        DJANGO_ALLOWED_HOSTS='127.0.0.1,localhost',
+        DJANGO_STATIC_ROOT=os.environ.get('DJANGO_STATIC_ROOT') or tempfile.mkdtemp(prefix='salon-bench-static-'),
+    )
+    if args.servir:
+        servir(args.servir, args.puerto, args.db, args.hilos)
+        return
+
+    # Base de partida: migrada, con 30 servicios y los estáticos recogidos.
+    os.environ.update(entorno)
+    base = preparar_django()
+    from django.core.management import call_command
+    from django.db import connections
+
+    from core.models import Servicio
+    for n in range(30):
+        Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=30 + 15 * (n % 4), precio=1000 + n)
+    servicios = list(Servicio.objects.values_list('pk', flat=True))
+    call_command('collectstatic', interactive=False, verbosity=0)
+    connections.close_all()
+
+    print(f"{args.conexiones} conexiones simultáneas, {args.segundos:.0f} s por escenario, perfil prod")
+    for tipo in ('wsgi', 'asgi'):
+        etiqueta = f'gunicorn gthread x{args.hilos}' if tipo == 'wsgi' else 'uvicorn'
+        print(f'\n{tipo.upper()} ({etiqueta})')
+        for escenario in args.escenarios:
+            copia = os.path.join(tempfile.mkdtemp(prefix='salon-bench-'), 'bench.sqlite3')
+            shutil.copy(base, copia)
+            puerto = _puerto_libre()
+            servidor = subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.bench_asgi', '--servir', tipo, '--puerto', str(puerto),
+                 '--db', copia, '--hilos', str(args.hilos)],
+                cwd=RAIZ, env=entorno,
+            )
+            try:
+                _esperar(puerto, servidor)
+                asyncio.run(cargar(puerto, escenario, 20, 1, servicios))  # calentamiento
+                resultado = asyncio.run(cargar(puerto, escenario, args.conexiones, args.segundos, servicios))
+                print(f'  {escenario:<18} {_resumen(resultado)}')
+            finally:
+                servidor.terminate()
+                servidor.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+benchmarks.bench_busqueda
+-------------------------
+Cuadro de búsqueda del admin de turnos sobre `--turnos` turnos, antes y
+después del índice de texto completo (`core.busqueda`):
+
+- "antes": los `search_fields` de `TurnoAdmin`, un `icontains` sobre nombre,
+  servicio, teléfono y email (recorre la tabla entera); distingue acentos,
+  así que "perez" no encuentra "Pérez";
+- "después": lo que hace `BusquedaDeTextoMixin`, los turnos (o servicios)
+  del índice FTS5 con todas las palabras.
+
+Cada búsqueda trae la primera página del listado (100 turnos en el orden del
+admin). Se busca, sin acentos, un nombre completo (pocas filas), un apellido
+(muchas) y un servicio. También cronometra la siembra con los triggers
+activos (el costo de mantener el índice) y la reconstrucción completa del
+índice de turnos (`'rebuild'`, lo que hace la migración 0013 con los turnos
+existentes).
+
+Uso:
+    python -m benchmarks.bench_busqueda --turnos 1000000
+"""
+
+import argparse
+import random
+import time
+import unicodedata
+from datetime import datetime, timedelta
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+SERVICIOS = ('Uñas', 'Corte de Pelo', 'Tintura', 'Peinado', 'Depilación', 'Masajes')
+NOMBRES = ('Ana', 'Beto', 'Carla', 'Darío', 'Elena', 'Fabián', 'Gisela', 'Héctor', 'Inés', 'Julián')
+APELLIDOS = ('Pérez', 'Gómez', 'Fernández', 'López', 'Martínez', 'Rodríguez', 'Sánchez', 'Díaz', 'Álvarez', 'Romero')
+
+
+def sembrar(turnos):
+    """`turnos` turnos con INSERTs de a 50.000 filas (los triggers indexan cada una)."""
+    from django.db import connection, transaction
+
+    from core.models import Servicio, Turno
+
+    servicios = [Servicio.objects.create(nombre=nombre, duracion_minutos=60).pk for nombre in SERVICIOS]
+    base = datetime(2020, 1, 1, 9)
+    columnas = 'servicio_id, cliente_nombre, cliente_telefono, cliente_email, fecha_hora_inicio, fecha_hora_fin, confirmado'
+    sql = f'INSERT INTO {Turno._meta.db_table} ({columnas}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    azar = random.Random(1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        for desde in range(0, turnos, 50_000):
+            filas = []
+            for n in range(desde, min(desde + 50_000, turnos)):
+                nombre, apellido = azar.choice(NOMBRES), azar.choice(APELLIDOS)
+                # Un sufijo para que "nombre apellido N" sea casi único.
+                cliente = f'{nombre} {apellido} {n % 5000}'
+                inicio = base + timedelta(hours=n // len(servicios))
+                filas.append((
+                    servicios[n % len(servicios)], cliente, f'11 {n:08d}', f'cliente{n}@example.com',
+                    f'{inicio:%Y-%m-%d %H:%M:%S}', f'{inicio + timedelta(hours=1):%Y-%m-%d %H:%M:%S}', n % 2,
+                ))
+            cursor.executemany(sql, filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=1_000_000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.db import connection
+    from django.db.models import Q
+
+    from core import busqueda
+    from core.models import Servicio, Turno
+
+    t0 = time.perf_counter()
+    sembrar(args.turnos)
+    print(f"{args.turnos} turnos sembrados (con triggers) en {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO core_turno_fts (core_turno_fts) VALUES ('rebuild')")
+    print(f"reconstrucción del índice de turnos: {time.perf_counter() - t0:.1f}s")
+
+    orden = ('fecha_hora_inicio', 'pk')
+
+    def antes(termino):
+        condicion = Q()
+        for palabra in termino.split():
+            condicion &= (
+                Q(cliente_nombre__icontains=palabra) | Q(servicio__nombre__icontains=palabra)
+                | Q(cliente_telefono__icontains=palabra) | Q(cliente_email__icontains=palabra)
+            )
+        return len(list(Turno.objects.filter(condicion).order_by(*orden)[:100]))
+
+    def despues(termino):
+        condicion = (
+            Q(pk__in=busqueda.coincidencias(Turno, termino))
+            | Q(servicio__in=busqueda.coincidencias(Servicio, termino))
+        )
+        return len(list(Turno.objects.filter(condicion).order_by(*orden)[:100]))
+
+    # El nombre completo de un turno, escrito sin acentos (sufijo 1234: ningún
+    # teléfono tiene una palabra que empiece así).
+    escrito = Turno.objects.order_by('pk').values_list('cliente_nombre', flat=True)[args.turnos // 2 + 1234]
+    completo = unicodedata.normalize('NFKD', escrito).encode('ascii', 'ignore').decode().lower()
+    for termino in (completo, 'perez', 'unas'):
+        for nombre, buscar in (('antes', antes), ('después', despues)):
+            encontrados = []
+            tiempos = cronometrar(lambda: encontrados.append(buscar(termino)), args.repeticiones)
+            print(f"{termino!r:<22} {nombre:<8} {resumen(tiempos)}  {encontrados[0]} turnos en la primera página")
+
+
+if __name__ == '__main__':
+    main()
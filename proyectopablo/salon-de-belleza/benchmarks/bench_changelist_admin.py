@@ -0,0 +1,59 @@
+"""
+benchmarks.bench_changelist_admin
+---------------------------------
+Mide el listado del admin de `Turno` sobre una tabla grande: tiempo de
+respuesta y número de consultas de varias URLs típicas (sin filtros, filtrado
+por estado, navegación "desde" por fecha y una página alejada con OFFSET).
+
+Uso:
+    python -m benchmarks.bench_changelist_admin --turnos 1000000
+"""
+
+import argparse
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+URLS = [
+    '/admin/core/turno/',
+    '/admin/core/turno/?confirmado__exact=1',
+    '/admin/core/turno/?desde=2001-06-01',
+    '/admin/core/turno/?servicio__id__exact=2&desde=2001-06-01',
+    '/admin/core/turno/?p=50',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=1_000_000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+
+    from benchmarks.bench_solapamiento import sembrar
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    sembrar(args.turnos, 5)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f"{args.turnos} turnos")
+
+    cliente = Client()
+    cliente.force_login(User.objects.create_superuser('bench', 'bench@example.com', 'bench'))
+    for url in URLS:
+        # `CaptureQueriesContext` no sirve aquí: cada petición vacía
+        # `connection.queries` al empezar.
+        consultas = []
+        with connection.execute_wrapper(lambda execute, sql, *a: consultas.append(sql) or execute(sql, *a)):
+            respuesta = cliente.get(url)
+        assert respuesta.status_code == 200, (url, respuesta.status_code)
+        tiempos = cronometrar(lambda: cliente.get(url), args.repeticiones)
+        print(f"{url:<60} {len(consultas):3d} consultas  {resumen(tiempos)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+benchmarks.bench_clientes
+-------------------------
+Búsqueda del historial de un cliente sobre `--turnos` turnos, antes y después
+de `Cliente`:
+
+- "antes": lo que hacía el cuadro de búsqueda del admin de turnos, un
+  `icontains` sobre nombre, servicio, teléfono y email (recorre la tabla
+  entera) ordenado por fecha; sólo encuentra los turnos en los que el
+  teléfono se escribió igual;
+- "después": `core.clientes.buscar` (índice único de `Cliente.telefono`) y los
+  100 turnos más recientes de `historial` (índice (cliente, inicio)), con el
+  teléfono escrito de cualquier forma.
+
+También cronometra el enlace de los turnos existentes con sus clientes
+(`core.migraciones_de_datos.enlazar_clientes`, lo que hace la migración 0012).
+Los turnos se reparten entre `--clientes` clientes, con el teléfono escrito
+de tres formas distintas.
+
+Uso:
+    python -m benchmarks.bench_clientes --turnos 1000000 --clientes 200000
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+SERVICIOS = 20
+FORMATOS = ('011 {0}-{1}', '+54 11 {0} {1}', '(11) {0}{1}')
+
+
+def telefono(cliente, forma):
+    numero = f'{cliente:08d}'
+    return FORMATOS[forma % len(FORMATOS)].format(numero[:4], numero[4:])
+
+
+def sembrar(turnos, clientes):
+    """`turnos` turnos sin cliente enlazado, con INSERTs de a 50.000 filas."""
+    from django.db import connection, transaction
+
+    from core.models import Servicio, Turno
+
+    servicios = [Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=60).pk for n in range(SERVICIOS)]
+    base = datetime(2020, 1, 1, 9)
+    columnas = 'servicio_id, cliente_nombre, cliente_telefono, cliente_email, fecha_hora_inicio, fecha_hora_fin, confirmado'
+    sql = f'INSERT INTO {Turno._meta.db_table} ({columnas}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    with transaction.atomic(), connection.cursor() as cursor:
+        for desde in range(0, turnos, 50_000):
+            filas = []
+            for n in range(desde, min(desde + 50_000, turnos)):
+                cliente = n % clientes
+                inicio = base + timedelta(hours=n // SERVICIOS)
+                filas.append((
+                    servicios[n % SERVICIOS], f'Cliente {cliente}', telefono(cliente, n // clientes), '',
+                    f'{inicio:%Y-%m-%d %H:%M:%S}', f'{inicio + timedelta(hours=1):%Y-%m-%d %H:%M:%S}', n % 2,
+                ))
+            cursor.executemany(sql, filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=1_000_000)
+    parser.add_argument('--clientes', type=int, default=200_000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.db.models import Q
+
+    from core import clientes
+    from core.migraciones_de_datos import enlazar_clientes
+    from core.models import Cliente, Turno
+
+    t0 = time.perf_counter()
+    sembrar(args.turnos, args.clientes)
+    print(f"{args.turnos} turnos de {args.clientes} clientes sembrados en {time.perf_counter() - t0:.1f}s")
+
+    azar = random.Random(1)
+    buscados = [azar.randrange(args.clientes) for _ in range(args.repeticiones)]
+    encontrados = {'antes': [], 'después': []}
+
+    def antes():
+        termino = telefono(buscados[len(encontrados['antes']) % len(buscados)], 0)
+        filas = Turno.objects.filter(
+            Q(cliente_nombre__icontains=termino) | Q(servicio__nombre__icontains=termino)
+            | Q(cliente_telefono__icontains=termino) | Q(cliente_email__icontains=termino)
+        ).order_by('-fecha_hora_inicio')[:100]
+        encontrados['antes'].append(len(list(filas)))
+
+    def despues():
+        cliente = clientes.buscar(telefono(buscados[len(encontrados['después']) % len(buscados)], 0))
+        encontrados['después'].append(len(list(clientes.historial(cliente)[:100])))
+
+    tiempos_antes = cronometrar(antes, args.repeticiones)
+
+    t0 = time.perf_counter()
+    enlazados = enlazar_clientes(Turno.objects.all(), Cliente, informar=None)
+    print(f"enlazar_clientes: {enlazados} turnos, {Cliente.objects.count()} clientes en {time.perf_counter() - t0:.1f}s")
+
+    tiempos_despues = cronometrar(despues, args.repeticiones)
+    for nombre, tiempos in (('antes', tiempos_antes), ('después', tiempos_despues)):
+        promedio = sum(encontrados[nombre]) / len(encontrados[nombre])
+        print(f"{nombre:<8} {resumen(tiempos)}  {promedio:.1f} turnos encontrados por búsqueda")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+benchmarks.bench_exportar
+-------------------------
+Memoria de la exportación de turnos (`core.exportar`) según la cantidad de
+filas: para cada tamaño de `--filas` exporta la tabla completa a CSV en un
+proceso aparte y mide su pico de memoria (RSS máximo) y las filas por
+segundo.
+
+- "streaming": `manage.py export_core turnos` (`values_list` + `iterator`);
+- "en memoria": lo ingenuo, `list()` de los turnos con su servicio y el CSV
+  armado en un string, para comparar.
+
+La base se llena una sola vez, de menor a mayor tamaño.
+
+Uso:
+    python -m benchmarks.bench_exportar --filas 10000 100000 1000000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from benchmarks.entorno import RAIZ, preparar_django
+
+
+def sembrar_hasta(total):
+    from core.models import Servicio, Turno
+
+    servicios = list(Servicio.objects.all()) or [
+        Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=60) for n in range(10)
+    ]
+    actuales = Turno.objects.count()
+    base = datetime(2030, 1, 1, 9, tzinfo=dt_timezone.utc)
+    for desde in range(actuales, total, 10_000):
+        Turno.objects.bulk_create(
+            [
+                Turno(
+                    servicio=servicios[n % len(servicios)],
+                    cliente_nombre=f'Cliente {n}',
+                    cliente_telefono='1234',
+                    cliente_email=f'cliente{n}@example.com',
+                    fecha_hora_inicio=base + timedelta(hours=n),
+                    fecha_hora_fin=base + timedelta(hours=n + 1),
+                )
+                for n in range(desde, min(desde + 10_000, total))
+            ],
+            batch_size=1000,
+        )
+
+
+def rss_maximo_kb():
+    """Pico de memoria residente de este proceso, en kB.
+
+    En Linux se lee `VmHWM`: `ru_maxrss` se conserva a través de `fork`/`exec`
+    y arrastraría el pico del proceso padre (que llenó la base).
+    """
+    try:
+        with open('/proc/self/status') as estado:
+            for linea in estado:
+                if linea.startswith('VmHWM:'):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def hijo(ruta_db, modo):
+    """Exporta en este proceso e imprime `<segundos> <RSS máximo en kB>`."""
+    preparar_django(ruta_db)
+    t0 = time.perf_counter()
+    with open(os.devnull, 'w') as nulo:
+        if modo == 'streaming':
+            from django.core.management import call_command
+            call_command('export_core', 'turnos', stdout=nulo)
+        else:
+            import csv
+            import io
+
+            from core.models import Turno
+            salida = io.StringIO()
+            escritor = csv.writer(salida)
+            for turno in list(Turno.objects.select_related('servicio', 'recurso')):
+                escritor.writerow([
+                    turno.pk, turno.servicio.nombre, turno.recurso and turno.recurso.nombre,
+                    turno.cliente_nombre, turno.cliente_telefono, turno.cliente_email,
+                    turno.fecha_hora_inicio.isoformat(), turno.fecha_hora_fin.isoformat(), turno.confirmado,
+                ])
+            nulo.write(salida.getvalue())
+    segundos = time.perf_counter() - t0
+    print(f'{segundos} {rss_maximo_kb()}')
+
+
+def medir(ruta_db, modo):
+    salida = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_exportar', '--hijo', modo, '--db', ruta_db],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(salida[0]), int(salida[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[10_000, 100_000, 500_000])
+    parser.add_argument('--hijo', choices=['streaming', 'memoria'], help=argparse.SUPPRESS)
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        hijo(args.db, args.hijo)
+        return
+
+    ruta_db = os.path.join(tempfile.mkdtemp(prefix='salon-bench-'), 'bench.sqlite3')
+    preparar_django(ruta_db)
+    print(f"{'filas':>10} {'streaming':>22} {'en memoria':>22}")
+    for total in sorted(args.filas):
+        sembrar_hasta(total)
+        columnas = []
+        for modo in ('streaming', 'memoria'):
+            segundos, rss = medir(ruta_db, modo)
+            columnas.append(f'{rss / 1024:6.0f} MB {total / segundos:8.0f} f/s')
+        print(f'{total:>10} {columnas[0]:>22} {columnas[1]:>22}')
+
+
+if __name__ == '__main__':
+    main()
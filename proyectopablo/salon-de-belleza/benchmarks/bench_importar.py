@@ -0,0 +1,98 @@
+"""
+benchmarks.bench_importar
+-------------------------
+Velocidad de la importación de turnos históricos, en filas por segundo:
+
+- "save()": un `Turno(...).save()` por fila (lo que hacía un script de
+  importación con el ORM), con sus validaciones, consultas y eventos;
+- "import_turnos": `manage.py import_turnos` sobre un CSV con las mismas
+  filas, con `--bloque` filas por transacción.
+
+Las filas son `--filas` turnos de una hora, la mitad confirmados, repartidos
+en `--servicios` servicios (con los nombres antiguos 'Unas', 'Corte_Pelo',
+...); el caso "save()" se limita a `--filas-save` filas porque tarda mucho
+más.
+
+Uso:
+    python -m benchmarks.bench_importar --filas 100000 --bloque 5000
+"""
+
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.entorno import preparar_django
+
+NOMBRES = ['Unas', 'Corte_Pelo', 'Tintura', 'Peinado', 'Maquillaje']
+
+
+def filas(cantidad, servicios, desde):
+    """Filas de CSV sin solapamientos: cada servicio tiene un turno por hora."""
+    for n in range(cantidad):
+        inicio = desde + timedelta(hours=n // servicios)
+        yield {
+            'servicio': NOMBRES[n % servicios] if n % servicios < len(NOMBRES) else f'Servicio {n % servicios}',
+            'inicio': inicio.isoformat(),
+            'cliente_nombre': f'Cliente {n}',
+            'cliente_telefono': '1234',
+            'cliente_email': f'cliente{n}@example.com',
+            'confirmado': '1' if n % 2 else '0',
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=100_000)
+    parser.add_argument('--filas-save', type=int, default=2000)
+    parser.add_argument('--servicios', type=int, default=5)
+    parser.add_argument('--bloque', type=int, default=5000)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from core.importar import nombre_de_servicio
+    from core.models import Servicio, Turno
+
+    servicios = {}
+    for fila in filas(args.servicios, args.servicios, datetime(2000, 1, 1)):
+        nombre = nombre_de_servicio(fila['servicio'])
+        servicios[nombre] = Servicio.objects.create(nombre=nombre, duracion_minutos=60)
+
+    t0 = time.perf_counter()
+    for fila in filas(args.filas_save, args.servicios, datetime(2010, 1, 1)):
+        inicio = timezone.make_aware(datetime.fromisoformat(fila['inicio']))
+        Turno(
+            servicio=servicios[nombre_de_servicio(fila['servicio'])],
+            cliente_nombre=fila['cliente_nombre'],
+            cliente_telefono=fila['cliente_telefono'],
+            cliente_email=fila['cliente_email'],
+            fecha_hora_inicio=inicio,
+            fecha_hora_fin=inicio + timedelta(hours=1),
+            confirmado=fila['confirmado'] == '1',
+        ).save()
+    por_save = args.filas_save / (time.perf_counter() - t0)
+
+    ruta = os.path.join(tempfile.mkdtemp(prefix='salon-bench-'), 'historico.csv')
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.DictWriter(archivo, list(next(filas(1, 1, datetime(2000, 1, 1)))))
+        escritor.writeheader()
+        escritor.writerows(filas(args.filas, args.servicios, datetime(2020, 1, 1)))
+    antes = Turno.objects.count()
+    t0 = time.perf_counter()
+    call_command('import_turnos', ruta, '--bloque', str(args.bloque), stdout=io.StringIO())
+    por_import = args.filas / (time.perf_counter() - t0)
+    assert Turno.objects.count() - antes == args.filas
+
+    print(f"{'save()':<14} {por_save:9.0f} filas/s  ({args.filas_save} filas)")
+    print(f"{'import_turnos':<14} {por_import:9.0f} filas/s  ({args.filas} filas, bloques de {args.bloque})"
+          f"  {por_import / por_save:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
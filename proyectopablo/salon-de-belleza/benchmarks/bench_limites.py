@@ -0,0 +1,89 @@
+"""
+benchmarks.bench_limites
+------------------------
+Costo por petición de los límites de envío de los formularios
+(`core.limites`), con la caché por defecto (locmem):
+
+- "aceptada": `permitir()` de un POST de reserva (contadores por IP y por
+  teléfono) que entra en el límite; cada petición trae otra IP y otro
+  teléfono, así que también crea los contadores (y locmem, con más de 300
+  claves, descarta un tercio de vez en cuando);
+- "repetida": la misma IP y teléfono, con un límite alto (sólo `incr`);
+- "rechazada": una IP que ya superó el límite (sólo `get_many`).
+
+Después, la petición completa (cliente de pruebas, pila de middleware) de un
+POST de contacto aceptado y uno rechazado con 429, con sus consultas.
+
+Uso:
+    python -m benchmarks.bench_limites --peticiones 20000
+"""
+
+import argparse
+import logging
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peticiones', type=int, default=20_000)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test import Client, RequestFactory
+    from django.test.utils import CaptureQueriesContext
+
+    from core.limites import permitir
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    fabrica = RequestFactory()
+
+    def post(n):
+        request = fabrica.post('/reservar/', {'cliente_telefono': f'11 {n:08d}'}, REMOTE_ADDR=f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}')
+        # La vista lee el formulario igual: no es parte del costo del límite.
+        request.POST
+        return request
+
+    distintas = iter([post(n) for n in range(3, args.peticiones + 4)])
+
+    def aceptada():
+        assert permitir('reservar', next(distintas)) is None
+
+    repetida_request = post(1)
+
+    def repetida():
+        assert permitir('reservar', repetida_request) is None
+
+    rechazada_request = post(2)
+
+    def rechazada():
+        assert permitir('reservar', rechazada_request).status_code == 429
+
+    for nombre, funcion, limites in (
+        ('aceptada', aceptada, {'ip': (10, 600), 'telefono': (5, 3600)}),
+        ('repetida', repetida, {'ip': (10 ** 9, 600), 'telefono': (10 ** 9, 3600)}),
+        ('rechazada', rechazada, {'ip': (1, 600), 'telefono': (1, 3600)}),
+    ):
+        settings.RATE_LIMITS = {'reservar': limites}
+        cache.clear()
+        permitir('reservar', rechazada_request)
+        funcion()
+        print(f"{nombre:<22} {resumen(cronometrar(funcion, args.peticiones))}")
+
+    # Django registra cada 429 en `django.request`.
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    cliente = Client()
+    datos = iter({'nombre': 'Ana', 'email': f'ana{n}@example.com', 'mensaje': 'Hola'} for n in range(10 ** 9))
+    for nombre, limites in (('contacto aceptado', (10 ** 9, 600)), ('contacto rechazado', (0, 600))):
+        settings.RATE_LIMITS = {'contacto': {'ip': limites}}
+        codigos = set()
+        with CaptureQueriesContext(connection) as capturadas:
+            tiempos = cronometrar(lambda: codigos.add(cliente.post('/contacto/', next(datos)).status_code), 200)
+        print(f"{nombre:<22} {resumen(tiempos)}  {len(capturadas) / 200:.0f} consultas, {sorted(codigos)}")
+
+
+if __name__ == '__main__':
+    main()
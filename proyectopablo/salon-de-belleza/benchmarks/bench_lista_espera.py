@@ -0,0 +1,115 @@
+"""
+benchmarks.bench_lista_espera
+-----------------------------
+Ráfaga de `--huecos` turnos borrados con `--inscripciones` personas en la
+lista de espera (huecos e inscripciones repartidos en los próximos `--dias`
+días y seis servicios; la mitad de las inscripciones ya con oferta):
+
+- "antes": un hueco por vez, como lo haría una señal por turno borrado: una
+  consulta por hueco por el primero que espera ese servicio ese día con la
+  hora dentro de su ventana, y un UPDATE por oferta;
+- "después": `core.lista_espera.ofrecer` con la ráfaga en lotes de
+  `OUTBOX_BATCH_SIZE`, lo que hace el worker de la bandeja de salida con los
+  eventos `espera`: por lote, una consulta de los huecos que se volvieron a
+  ocupar, otra por el índice parcial y un UPDATE en bloque.
+
+Cada repetición corre en una transacción que se deshace, así que todas ven
+la misma lista. Informa tiempo, consultas y ofertas por ráfaga.
+
+Uso:
+    python -m benchmarks.bench_lista_espera --inscripciones 200000 --huecos 300 --dias 60
+"""
+
+import argparse
+import random
+from datetime import datetime, time, timedelta
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+SERVICIOS = ('Uñas', 'Corte de Pelo', 'Tintura', 'Peinado', 'Depilación', 'Masajes')
+
+
+def sembrar(inscripciones, servicios, dia, dias):
+    """`inscripciones` inscripciones con ventanas de 2 horas entre las 9 y las 19, en `dias` días desde `dia`."""
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from core.models import ListaEspera
+
+    azar = random.Random(1)
+    creado = timezone.now() - timedelta(days=30)
+    columnas = 'servicio_id, fecha, desde, hasta, cliente_nombre, cliente_telefono, cliente_email, creado_en, ofrecido_en'
+    sql = f'INSERT INTO {ListaEspera._meta.db_table} ({columnas}) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)'
+    with transaction.atomic(), connection.cursor() as cursor:
+        filas = []
+        for n in range(inscripciones):
+            hora = azar.randrange(9, 18)
+            alta = creado + timedelta(seconds=n)
+            filas.append((
+                azar.choice(servicios), (dia + timedelta(days=azar.randrange(dias))).isoformat(),
+                f'{hora:02d}:00:00', f'{hora + 2:02d}:00:00', f'Cliente {n}', '', f'cliente{n}@example.com',
+                f'{alta:%Y-%m-%d %H:%M:%S}', f'{alta:%Y-%m-%d %H:%M:%S}' if n % 2 else None,
+            ))
+        cursor.executemany(sql, filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--inscripciones', type=int, default=200_000)
+    parser.add_argument('--huecos', type=int, default=300)
+    parser.add_argument('--dias', type=int, default=60)
+    parser.add_argument('--repeticiones', type=int, default=10)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+
+    from core.lista_espera import ofrecer
+    from core.models import ListaEspera, Servicio
+
+    servicios = [Servicio.objects.create(nombre=nombre, duracion_minutos=60).pk for nombre in SERVICIOS]
+    dia = timezone.localdate() + timedelta(days=1)
+    sembrar(args.inscripciones, servicios, dia, args.dias)
+    print(f"{ListaEspera.objects.count()} inscripciones sembradas")
+
+    azar = random.Random(2)
+    huecos = []
+    for _ in range(args.huecos):
+        inicio = timezone.make_aware(datetime.combine(dia + timedelta(days=azar.randrange(args.dias)), time(azar.randrange(9, 19))))
+        huecos.append((azar.choice(servicios), inicio, inicio + timedelta(hours=1)))
+    resultados = {}
+
+    def antes():
+        ahora = timezone.now()
+        ofertas = 0
+        for servicio_id, inicio, _ in sorted(huecos, key=lambda hueco: hueco[1]):
+            local = timezone.localtime(inicio)
+            espera = ListaEspera.objects.filter(
+                servicio_id=servicio_id, fecha=local.date(), ofrecido_en__isnull=True,
+                desde__lte=local.time(), hasta__gte=local.time(),
+            ).order_by('creado_en', 'pk').first()
+            if espera is not None:
+                ListaEspera.objects.filter(pk=espera.pk).update(ofrecido_en=ahora, inicio_ofrecido=inicio)
+                ofertas += 1
+        return ofertas
+
+    def despues():
+        lote = settings.OUTBOX_BATCH_SIZE
+        return sum(len(ofrecer(huecos[desde:desde + lote])) for desde in range(0, len(huecos), lote))
+
+    for nombre, funcion in (('antes', antes), ('después', despues)):
+        def rafaga():
+            with CaptureQueriesContext(connection) as capturadas, transaction.atomic():
+                resultados[nombre] = (funcion(), len(capturadas))
+                transaction.set_rollback(True)
+
+        tiempos = cronometrar(rafaga, args.repeticiones)
+        ofertas, consultas = resultados[nombre]
+        print(f"{nombre:<8} {resumen(tiempos)}  {consultas} consultas, {ofertas} ofertas por ráfaga de {args.huecos} huecos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+benchmarks.bench_metricas
+-------------------------
+Costo de la medición de peticiones (`core.metricas`) con el cliente de
+pruebas de Django (pila completa de middleware, sin red), sobre páginas que
+consultan la base y renderizan plantillas (sin la caché de páginas):
+
+- "sin medir": sin `MedicionMiddleware` (el `execute_wrapper` y el backend
+  de plantillas quedan instalados, pero fuera de una petición sólo leen una
+  `ContextVar`);
+- "muestreo 0.1": la configuración por defecto (`PERF_SAMPLE_RATE = 0.1`);
+- "todas": `PERF_SAMPLE_RATE = 1`, cada petición medida.
+
+Las variantes se alternan en `--rondas` rondas de `--peticiones` peticiones
+para que el ruido de la máquina afecte a todas por igual; informa la mediana
+por petición de cada variante y su diferencia con "sin medir".
+
+Uso:
+    python -m benchmarks.bench_metricas --servicios 30 --peticiones 200 --rondas 15
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks.entorno import preparar_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servicios', type=int, default=30)
+    parser.add_argument('--peticiones', type=int, default=200)
+    parser.add_argument('--rondas', type=int, default=15)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.test import Client
+
+    from core.models import Servicio
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.PUBLIC_PAGE_CACHE_SECONDS = 0
+    for n in range(args.servicios):
+        Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=30 + 15 * (n % 4), precio=1000 + n, descripcion='Descripción ' * 10)
+    manana = date.today() + timedelta(days=1)
+    urls = ['/servicios/', f'/reservar/disponibilidad/?servicio=1&desde={manana.isoformat()}']
+
+    con_medicion = list(settings.MIDDLEWARE)
+    sin_medicion = [m for m in con_medicion if m != 'core.metricas.MedicionMiddleware']
+
+    def cliente(medir):
+        # Cada cliente carga el middleware con su primera petición.
+        settings.MIDDLEWARE = con_medicion if medir else sin_medicion
+        nuevo = Client()
+        for url in urls:
+            nuevo.get(url)
+        return nuevo
+
+    variantes = [('sin medir', cliente(False), 0.1), ('muestreo 0.1', cliente(True), 0.1), ('todas', cliente(True), 1)]
+    tiempos = {nombre: {url: [] for url in urls} for nombre, _, _ in variantes}
+    for _ in range(args.rondas):
+        for nombre, cliente_de_variante, tasa in variantes:
+            settings.PERF_SAMPLE_RATE = tasa
+            for url in urls:
+                t0 = time.perf_counter()
+                for _ in range(args.peticiones):
+                    cliente_de_variante.get(url)
+                tiempos[nombre][url].append((time.perf_counter() - t0) * 1000 / args.peticiones)
+
+    for url in urls:
+        base = statistics.median(tiempos['sin medir'][url])
+        print(url)
+        for nombre, _, _ in variantes:
+            mediana = statistics.median(tiempos[nombre][url])
+            print(f"  {nombre:<14} {mediana:.3f} ms/petición  {(mediana - base) / base:+.2%}")
+
+    # La diferencia de arriba queda dentro del ruido; el costo de medir
+    # también se cronometra aparte: empezar y terminar una petición (medida o
+    # no), y una consulta fuera de una petición, en una no medida (sólo se
+    # toma su tiempo, por las consultas lentas) y en una medida.
+    from django.db import connection
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+    from django.urls import resolve
+
+    from core import metricas
+
+    request, response = RequestFactory().get('/'), HttpResponse()
+    n = 20_000
+    por_peticion = {}
+    for tasa in (0, 1):
+        settings.PERF_SAMPLE_RATE = tasa
+        t0 = time.perf_counter()
+        for _ in range(n):
+            metricas._terminar(metricas._empezar(request), response)
+        por_peticion[tasa] = (time.perf_counter() - t0) * 1e6 / n
+
+    def consultar():
+        with connection.cursor() as cursor:
+            t0 = time.perf_counter()
+            for _ in range(n):
+                cursor.execute('SELECT 1')
+            return (time.perf_counter() - t0) * 1e6 / n
+
+    # Lo mejor de 5 de cada una, alternadas.
+    por_consulta = {None: [], 0: [], 1: []}
+    for _ in range(5):
+        por_consulta[None].append(consultar())
+        for tasa in (0, 1):
+            settings.PERF_SAMPLE_RATE = tasa
+            tokens = metricas._empezar(request)
+            por_consulta[tasa].append(consultar())
+            metricas._olvidar(tokens)
+    sin_peticion = min(por_consulta.pop(None))
+    por_consulta = {tasa: max(min(tiempos) - sin_peticion, 0) for tasa, tiempos in por_consulta.items()}
+    print(
+        f"por petición: {por_peticion[1]:.1f} µs medida, {por_peticion[0]:.1f} µs no medida; "
+        f"por consulta: {por_consulta[1]:.2f} µs medida, {por_consulta[0]:.2f} µs no medida "
+        f"(SELECT 1: {sin_peticion:.2f} µs)"
+    )
+    for url in urls:
+        consultas = metricas.REGISTRO.series[resolve(url.partition('?')[0]).view_name].consultas
+        promedio = consultas.suma / consultas.total
+        costo = {tasa: por_peticion[tasa] + promedio * por_consulta[tasa] for tasa in (0, 1)}
+        muestreo = 0.1 * costo[1] + 0.9 * costo[0]
+        base = statistics.median(tiempos['sin medir'][url]) * 1000
+        print(f"  {url}: {promedio:.0f} consultas, {costo[1]:.0f} µs medida ({costo[1] / base:.2%}), "
+              f"{muestreo / base:.3%} con muestreo 0.1")
+
+if __name__ == '__main__':
+    main()
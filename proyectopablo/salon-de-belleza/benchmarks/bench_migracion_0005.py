@@ -0,0 +1,100 @@
+"""
+benchmarks.bench_migracion_0005
+-------------------------------
+Duración de la migración de datos 0005 (`Reserva.servicio` de texto a FK) con
+`--filas` reservas, cada caso en una base nueva migrada hasta 0004:
+
+- "por conjuntos": `migrate core 0005` (con su copia de
+  `core.migraciones_de_datos`);
+- "fila por fila": la versión anterior de `forwards` (una búsqueda
+  `nombre__iexact` y un `save()` por reserva), con `--filas-fila` reservas
+  porque tarda mucho más.
+
+Las reservas se insertan con un solo INSERT (CTE recursiva), rotando entre
+'Unas', 'Corte_Pelo', 'Tintura' y vacío.
+
+Uso:
+    python -m benchmarks.bench_migracion_0005 --filas 500000 --filas-fila 20000
+"""
+
+import argparse
+import importlib
+import os
+import tempfile
+import time
+
+from benchmarks.entorno import preparar_django
+
+
+def forwards_fila_por_fila(apps, schema_editor):
+    """`forwards` de la migración 0005 antes de reescribirla."""
+    Reserva = apps.get_model('core', 'Reserva')
+    Servicio = apps.get_model('core', 'Servicio')
+    db_alias = schema_editor.connection.alias
+    mapping = {'Unas': 'Uñas', 'Corte_Pelo': 'Corte de Pelo', 'Tintura': 'Tintura'}
+    for reserva in Reserva.objects.using(db_alias).all():
+        old = getattr(reserva, 'servicio', None)
+        if not old:
+            continue
+        label = mapping.get(old, old)
+        servicio_obj = Servicio.objects.using(db_alias).filter(nombre__iexact=label).first()
+        if not servicio_obj:
+            servicio_obj = Servicio.objects.using(db_alias).create(nombre=label)
+        reserva.servicio_fk = servicio_obj
+        reserva.save()
+
+
+def medir(filas, fila_por_fila):
+    """Segundos de `migrate core 0005` sobre `filas` reservas en una base nueva."""
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    connection.close()
+    settings.DATABASES['default']['NAME'] = os.path.join(tempfile.mkdtemp(prefix='salon-bench-'), 'bench.sqlite3')
+    call_command('migrate', 'core', '0004', verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+            INSERT INTO core_reserva (servicio, nombre_cliente, fecha_hora)
+            SELECT CASE i %% 4 WHEN 0 THEN 'Unas' WHEN 1 THEN 'Corte_Pelo' WHEN 2 THEN 'Tintura' ELSE '' END,
+                   'Cliente', '2020-01-01 10:00:00'
+            FROM n''',
+            [filas - 1],
+        )
+
+    operacion = importlib.import_module('core.migrations.0005_convert_reserva_servicio_to_fk').Migration.operations[1]
+    codigo = operacion.code
+    if fila_por_fila:
+        operacion.code = forwards_fila_por_fila
+    try:
+        t0 = time.perf_counter()
+        call_command('migrate', 'core', '0005', verbosity=0)
+        return time.perf_counter() - t0
+    finally:
+        operacion.code = codigo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=500_000)
+    parser.add_argument('--filas-fila', type=int, default=20_000)
+    args = parser.parse_args()
+
+    preparar_django()
+    resultados = [
+        (nombre, filas, medir(filas, fila_por_fila))
+        for nombre, filas, fila_por_fila in (
+            ('fila por fila', args.filas_fila, True),
+            ('por conjuntos', args.filas_fila, False),
+            ('por conjuntos', args.filas, False),
+        )
+    ]
+    # Debajo del avance que escribe la migración.
+    print()
+    for nombre, filas, segundos in resultados:
+        print(f"{nombre:<14} {filas:>9} reservas {segundos:8.2f}s ({filas / segundos:9.0f} reservas/s)")
+
+
+if __name__ == '__main__':
+    main()
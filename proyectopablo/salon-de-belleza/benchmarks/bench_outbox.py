@@ -0,0 +1,103 @@
+"""
+benchmarks.bench_outbox
+-----------------------
+Mide la bandeja de salida (`core.eventos`):
+
+- el camino de la petición: `Turno.save()` de un turno confirmado (antes
+  sincronizaba la `Reserva` en la misma petición, ahora sólo encola) y el POST
+  de contacto;
+- el worker: eventos por segundo de `procesar_pendientes()` con
+  `--turnos` turnos confirmados en bloque (sincronización de reservas y un
+  correo de confirmación por turno, con el backend de correo en memoria).
+
+Uso:
+    python -m benchmarks.bench_outbox --turnos 5000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+
+def sembrar(n_turnos):
+    from core.models import Servicio, Turno
+
+    servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+    base = datetime(2030, 1, 1, 9, tzinfo=dt_timezone.utc)
+    Turno.objects.bulk_create(
+        [
+            Turno(
+                servicio=servicio,
+                cliente_nombre=f'Cliente {n}',
+                cliente_email=f'cliente{n}@example.com',
+                fecha_hora_inicio=base + timedelta(hours=n),
+                fecha_hora_fin=base + timedelta(hours=n + 1),
+            )
+            for n in range(n_turnos)
+        ],
+        batch_size=1000,
+    )
+    return servicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=5000)
+    parser.add_argument('--repeticiones', type=int, default=500)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    settings.ALLOWED_HOSTS = ['*']
+
+    from django.core import mail
+    from django.test import Client
+    from django.urls import reverse
+
+    from core import reservas
+    from core.eventos import procesar_pendientes
+    from core.models import Evento, Turno
+
+    mail.outbox = []
+    servicio = sembrar(args.turnos)
+    base = datetime(2031, 1, 1, 9, tzinfo=dt_timezone.utc)
+    contador = iter(range(10 ** 9))
+
+    def guardar_confirmado():
+        n = next(contador)
+        Turno(
+            servicio=servicio,
+            cliente_nombre='Ana',
+            cliente_telefono='1234',
+            cliente_email='ana@example.com',
+            fecha_hora_inicio=base + timedelta(hours=n),
+            fecha_hora_fin=base + timedelta(hours=n + 1),
+            confirmado=True,
+        ).save()
+
+    cliente = Client()
+
+    def contacto():
+        cliente.post(reverse('contacto'), {
+            'nombre': 'Ana', 'email': 'ana@example.com', 'mensaje': f'Hola {next(contador)}',
+        })
+
+    print(f"Turno.save() confirmado  {resumen(cronometrar(guardar_confirmado, args.repeticiones))}")
+    print(f"POST /contacto/          {resumen(cronometrar(contacto, args.repeticiones))}")
+    Evento.objects.all().delete()
+
+    reservas.confirmar_turnos(Turno.objects.filter(confirmado=False))
+    t0 = time.perf_counter()
+    total = 0
+    while (procesados := procesar_pendientes()):
+        total += procesados
+    segundos = time.perf_counter() - t0
+    print(f"worker: {total} eventos en {segundos:.2f}s ({total / segundos:.0f} eventos/s, "
+          f"{len(mail.outbox)} correos)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+benchmarks.bench_paginas
+------------------------
+Prueba de carga de las páginas públicas con el cliente de pruebas de Django
+(pila completa de middleware, sin red): peticiones por segundo de cada página
+
+- "antes": sin caché (`PUBLIC_PAGE_CACHE_SECONDS = 0`), renderizando y
+  consultando `Servicio` en cada petición;
+- "después": con la caché de páginas (`core.cache_publico`);
+- "304": un navegador que vuelve y manda `If-None-Match`.
+
+Uso:
+    python -m benchmarks.bench_paginas --servicios 30 --peticiones 500
+"""
+
+import argparse
+import time
+
+from benchmarks.entorno import preparar_django
+
+URLS = ['/', '/servicios/', '/reservar/', '/reserva-exitosa/']
+
+
+def por_segundo(cliente, url, peticiones, **cabeceras):
+    codigos = set()
+    t0 = time.perf_counter()
+    for _ in range(peticiones):
+        codigos.add(cliente.get(url, **cabeceras).status_code)
+    return peticiones / (time.perf_counter() - t0), codigos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servicios', type=int, default=30)
+    parser.add_argument('--peticiones', type=int, default=500)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client
+
+    from core.models import Servicio
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    for n in range(args.servicios):
+        Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=30 + 15 * (n % 4), precio=1000 + n, descripcion='Descripción ' * 10)
+
+    print(f"{args.servicios} servicios, {args.peticiones} peticiones por caso (req/s)")
+    print(f"{'página':<20} {'antes':>9} {'después':>9} {'304':>9}")
+    for url in URLS:
+        cliente = Client()
+        cliente.get(url)  # cookie CSRF del formulario de reserva
+
+        settings.PUBLIC_PAGE_CACHE_SECONDS = 0
+        antes, _ = por_segundo(cliente, url, args.peticiones)
+
+        settings.PUBLIC_PAGE_CACHE_SECONDS = 600
+        cache.clear()
+        etag = cliente.get(url)['ETag']
+        despues, _ = por_segundo(cliente, url, args.peticiones)
+        revalidado, codigos = por_segundo(cliente, url, args.peticiones, HTTP_IF_NONE_MATCH=etag)
+        assert codigos == {304}, (url, codigos)
+        print(f"{url:<20} {antes:>9.0f} {despues:>9.0f} {revalidado:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
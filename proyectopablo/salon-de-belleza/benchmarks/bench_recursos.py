@@ -0,0 +1,113 @@
+"""
+benchmarks.bench_recursos
+-------------------------
+Simula un día de reservas con varios recursos (personal/sillones):
+
+- en memoria: un flujo de `--solicitudes` clientes con duraciones y horas
+  preferidas al azar; cada uno toma el primer inicio libre de la grilla desde
+  su hora preferida con `MapaDeRecursos.primer_libre()`. Muestra la latencia
+  por solicitud, los atendidos y la ocupación de los recursos.
+- con base de datos: siembra un día con esos turnos y mide
+  `core.reservas.crear_turno()` (bloqueo, búsqueda del recurso e INSERT) para
+  nuevas reservas.
+
+Uso:
+    python -m benchmarks.bench_recursos --recursos 48 --solicitudes 3000
+"""
+
+import argparse
+import random
+from datetime import date, datetime, time, timedelta
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+DURACIONES = (30, 45, 60, 90)
+DIA = date(2030, 1, 7)
+
+
+def flujo(n, semilla=1):
+    """Solicitudes (minuto preferido desde la apertura, duración en minutos)."""
+    rnd = random.Random(semilla)
+    return [(rnd.randrange(0, 9 * 60, 15), rnd.choice(DURACIONES)) for _ in range(n)]
+
+
+def simular(recursos, solicitudes):
+    from django.utils import timezone
+
+    from core.disponibilidad import MapaDeRecursos, margen_entre_turnos, paso_de_grilla
+
+    mapa = MapaDeRecursos(DIA, recursos, margen_entre_turnos())
+    apertura = timezone.make_aware(datetime.combine(DIA, time(9)))
+    cierre = timezone.make_aware(datetime.combine(DIA, time(18)))
+    paso = paso_de_grilla()
+    asignados = []
+
+    def atender(preferido, minutos):
+        duracion = timedelta(minutes=minutos)
+        inicio = apertura + timedelta(minutes=preferido)
+        while inicio + duracion <= cierre:
+            recurso = mapa.primer_libre(inicio, inicio + duracion)
+            if recurso is not None:
+                mapa.ocupar(recurso.pk, inicio, inicio + duracion)
+                asignados.append((recurso, inicio, inicio + duracion))
+                return
+            inicio += paso
+
+    pendientes = iter(solicitudes)
+    tiempos = cronometrar(lambda: atender(*next(pendientes)), len(solicitudes))
+    return asignados, tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recursos', type=int, default=48)
+    parser.add_argument('--solicitudes', type=int, default=3000)
+    parser.add_argument('--reservas', type=int, default=200, help='llamadas a crear_turno() a medir')
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.db import transaction
+
+    from core.models import Recurso, Servicio, Turno
+    from core.reservas import HorarioNoDisponible, crear_turno
+
+    servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+    recursos = Recurso.objects.bulk_create([Recurso(nombre=f'Recurso {n:03d}') for n in range(args.recursos)])
+    servicio.recursos.set(recursos)
+    recursos = list(Recurso.objects.all())
+
+    asignados, tiempos = simular(recursos, flujo(args.solicitudes))
+    minutos = sum((fin - inicio).total_seconds() / 60 for _, inicio, fin in asignados)
+    print(f"{args.recursos} recursos, {args.solicitudes} solicitudes en el día")
+    print(f"en memoria: {len(asignados)} atendidos, ocupación {minutos / (args.recursos * 9 * 60):.1%}, {resumen(tiempos)}")
+
+    # Se guardan los turnos asignados que terminan antes de las 17:00 (esa
+    # última hora queda libre para las reservas medidas) y se mide `crear_turno()`.
+    ultima_hora = asignados[0][1].replace(hour=17, minute=0)
+    with transaction.atomic():
+        Turno.objects.bulk_create(
+            [
+                Turno(servicio=servicio, recurso=recurso, cliente_nombre='Cliente', cliente_telefono='1234',
+                      fecha_hora_inicio=inicio, fecha_hora_fin=fin)
+                for recurso, inicio, fin in asignados
+                if fin <= ultima_hora
+            ],
+            batch_size=1000,
+        )
+    print(f"turnos en la base: {Turno.objects.count()}")
+
+    resultados = []
+
+    def reservar():
+        try:
+            crear_turno(servicio, ultima_hora, ultima_hora + timedelta(minutes=30), cliente_nombre='Nuevo', cliente_telefono='1234')
+            resultados.append('ok')
+        except HorarioNoDisponible:
+            resultados.append('ocupado')
+
+    tiempos = cronometrar(reservar, args.reservas)
+    print(f"crear_turno(): {resultados.count('ok')} asignados, {resultados.count('ocupado')} sin recurso, {resumen(tiempos)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+benchmarks.bench_series
+-----------------------
+Reserva de una serie de `--semanas` semanas de un combo corte + tintura, con
+`--turnos` turnos ya reservados en la agenda:
+
+- "antes": un `crear_turno` por turno (lo que hacía un cliente reservando
+  cada semana con el formulario), cada uno con su transacción, su consulta
+  de solapamientos y su `Turno.save()`;
+- "después": `core.reservas.crear_serie`, una transacción con una consulta de
+  solapamientos y los INSERT en bloque.
+
+Informa tiempo y consultas por serie. Cada repetición reserva la serie en
+otro horario (hasta 7 * 8 series), así que nunca choca con las anteriores.
+
+Uso:
+    python -m benchmarks.bench_series --turnos 100000 --semanas 52
+"""
+
+import argparse
+from datetime import datetime, time, timedelta
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+
+def sembrar(turnos, servicios):
+    """`turnos` turnos de `servicios`, de 8 a 9 de la mañana, hacia el futuro."""
+    from django.db import connection, transaction
+
+    from core.models import Turno
+
+    base = datetime.combine(datetime.now().date() + timedelta(days=1), time(8))
+    columnas = 'servicio_id, cliente_nombre, cliente_telefono, cliente_email, fecha_hora_inicio, fecha_hora_fin, confirmado'
+    sql = f'INSERT INTO {Turno._meta.db_table} ({columnas}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    with transaction.atomic(), connection.cursor() as cursor:
+        filas = []
+        for n in range(turnos):
+            inicio = base + timedelta(days=n // len(servicios))
+            filas.append((
+                servicios[n % len(servicios)], f'Cliente {n}', '1', '',
+                f'{inicio:%Y-%m-%d %H:%M:%S}', f'{inicio + timedelta(hours=1):%Y-%m-%d %H:%M:%S}', 0,
+            ))
+        cursor.executemany(sql, filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=100_000)
+    parser.add_argument('--semanas', type=int, default=52)
+    parser.add_argument('--repeticiones', type=int, default=8, help='series por variante (máximo 28)')
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+
+    from core.models import Servicio, Turno
+    from core.reservas import Recurrencia, crear_serie, crear_turno, turnos_de_serie
+
+    corte = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=45)
+    tintura = Servicio.objects.create(nombre='Tintura', duracion_minutos=60)
+    sembrar(args.turnos, [corte.pk, tintura.pk])
+    print(f"{Turno.objects.count()} turnos sembrados")
+
+    dia = timezone.localdate() + timedelta(days=1)
+    series = iter(range(7 * 8))
+    datos = {'cliente_nombre': 'Ana', 'cliente_telefono': '11 2233 4455'}
+    recurrencia = Recurrencia('semanal', args.semanas)
+    consultas = {}
+
+    def siguiente_inicio():
+        # Ocho series por día desde las 9, cada una 1 h 45 min (lo que dura el
+        # combo) después de la anterior; las siguientes, al otro día.
+        n = next(series)
+        return timezone.make_aware(datetime.combine(dia + timedelta(days=n // 8), time(9))) + timedelta(minutes=105 * (n % 8))
+
+    def antes():
+        with CaptureQueriesContext(connection) as capturadas:
+            for turno in turnos_de_serie([corte, tintura], siguiente_inicio(), recurrencia, **datos):
+                crear_turno(turno.servicio, turno.fecha_hora_inicio, turno.fecha_hora_fin, **datos)
+        consultas['antes'] = len(capturadas)
+
+    def despues():
+        with CaptureQueriesContext(connection) as capturadas:
+            crear_serie([corte, tintura], siguiente_inicio(), recurrencia, **datos)
+        consultas['después'] = len(capturadas)
+
+    for nombre, funcion in (('antes', antes), ('después', despues)):
+        tiempos = cronometrar(funcion, args.repeticiones)
+        print(f"{nombre:<8} {resumen(tiempos)}  {consultas[nombre]} consultas por serie de {2 * args.semanas} turnos")
+
+
+if __name__ == '__main__':
+    main()
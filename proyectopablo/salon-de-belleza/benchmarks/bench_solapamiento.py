@@ -0,0 +1,119 @@
+"""
+benchmarks.bench_solapamiento
+-----------------------------
+Compara la consulta de solapamiento de `Turno` antes y después de los índices
+compuestos y de `Turno.objects.overlapping()`.
+
+- "antes": sin los índices `turno_serv_ini_fin_idx`/`turno_conf_ini_idx` y con
+  el filtro original de `reservar_turno_view` (sin cota inferior de inicio).
+- "después": con los índices y `Turno.objects.overlapping()`.
+
+Para cada caso muestra el plan de consulta de SQLite y la latencia de
+`--consultas` búsquedas en horarios aleatorios.
+
+Uso:
+    python -m benchmarks.bench_solapamiento --turnos 1000000
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+HORAS_POR_DIA = range(9, 18)
+
+
+def sembrar(n_turnos, n_servicios):
+    """Inserta `n_turnos` turnos de 1 hora repartidos entre `n_servicios` servicios."""
+    from django.db import connection, transaction
+    from core.models import Servicio
+
+    servicios = Servicio.objects.bulk_create(
+        [Servicio(nombre=f'Servicio {i}', duracion_minutos=60) for i in range(n_servicios)]
+    )
+    base = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+    por_servicio = n_turnos // n_servicios
+    formato = '%Y-%m-%d %H:%M:%S'
+
+    def filas(servicio_id):
+        for n in range(por_servicio):
+            dia, hora = divmod(n, len(HORAS_POR_DIA))
+            inicio = base + timedelta(days=dia, hours=HORAS_POR_DIA[hora])
+            fin = inicio + timedelta(hours=1)
+            yield (servicio_id, 'Cliente', '1234', '', inicio.strftime(formato), fin.strftime(formato), n % 2)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for servicio in servicios:
+            cursor.executemany(
+                'INSERT INTO core_turno (servicio_id, cliente_nombre, cliente_telefono, cliente_email,'
+                ' fecha_hora_inicio, fecha_hora_fin, confirmado) VALUES (%s, %s, %s, %s, %s, %s, %s)',
+                filas(servicio.id),
+            )
+    dias = por_servicio // len(HORAS_POR_DIA)
+    return servicios, base, base + timedelta(days=dias)
+
+
+def medir(nombre, construir_qs, servicios, desde, hasta, consultas):
+    rnd = random.Random(42)
+    segundos = int((hasta - desde).total_seconds())
+    sondas = []
+    for _ in range(consultas):
+        inicio = desde + timedelta(seconds=rnd.randrange(segundos))
+        sondas.append((rnd.choice(servicios), inicio, inicio + timedelta(hours=1)))
+
+    print(f"\n== {nombre}")
+    servicio, inicio, fin = sondas[0]
+    print(construir_qs(servicio, inicio, fin).values('pk')[:1].explain())
+
+    iterador = iter(sondas)
+
+    def una_consulta():
+        servicio, inicio, fin = next(iterador)
+        construir_qs(servicio, inicio, fin).exists()
+
+    print(resumen(cronometrar(una_consulta, consultas)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turnos', type=int, default=1_000_000)
+    parser.add_argument('--servicios', type=int, default=5)
+    parser.add_argument('--consultas', type=int, default=200)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.db import connection
+    from core.models import Turno
+
+    print(f"Sembrando {args.turnos} turnos...")
+    servicios, desde, hasta = sembrar(args.turnos, args.servicios)
+
+    indices = [i for i in Turno._meta.indexes]
+    with connection.schema_editor() as editor:
+        for indice in indices:
+            editor.remove_index(Turno, indice)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    medir(
+        'antes: filtro original sin índices compuestos',
+        lambda s, i, f: Turno.objects.filter(servicio=s, fecha_hora_inicio__lt=f, fecha_hora_fin__gt=i),
+        servicios, desde, hasta, args.consultas,
+    )
+
+    with connection.schema_editor() as editor:
+        for indice in indices:
+            editor.add_index(Turno, indice)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    medir(
+        'después: Turno.objects.overlapping() con índices compuestos',
+        lambda s, i, f: Turno.objects.overlapping(s, i, f),
+        servicios, desde, hasta, args.consultas,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+benchmarks.bench_tablero
+------------------------
+Tiempo de respuesta del tablero del admin (`ResumenDiarioAdmin`) para un año
+de datos, contra calcular lo mismo al vuelo desde `Turno` y `Servicio.precio`
+(lo que habría que hacer sin `ResumenDiario`).
+
+Se siembran `--turnos-por-dia` turnos por día y servicio durante 365 días
+sobre `--servicios` servicios, se reconstruye el resumen
+(`manage.py rebuild_resumenes`, también cronometrado) y se mide:
+
+- "tablero": `GET` del tablero por el cliente de pruebas (sesión, usuario y
+  las dos consultas agregadas, más el render de la plantilla);
+- "al vuelo": las mismas agregaciones (por servicio y por mes) sobre `Turno`.
+
+Uso:
+    python -m benchmarks.bench_tablero --servicios 10 --turnos-por-dia 8
+"""
+
+import argparse
+import io
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.entorno import cronometrar, preparar_django, resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servicios', type=int, default=10)
+    parser.add_argument('--turnos-por-dia', type=int, default=8)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db.models import Case, Count, DecimalField, F, Sum, When
+    from django.db.models.functions import TruncMonth
+    from django.test import Client
+    from django.utils import timezone
+
+    from core.models import Servicio, Turno
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    servicios = [
+        Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=60, precio=1000 + n)
+        for n in range(args.servicios)
+    ]
+    desde = date(2030, 1, 1)
+    hasta = desde + timedelta(days=364)
+    for dia in range(365):
+        base = timezone.make_aware(datetime.combine(desde + timedelta(days=dia), datetime.min.time()))
+        Turno.objects.bulk_create([
+            Turno(
+                servicio=servicio, cliente_nombre='Cliente', cliente_telefono='1',
+                fecha_hora_inicio=base + timedelta(hours=9 + h), fecha_hora_fin=base + timedelta(hours=10 + h),
+                confirmado=h % 2 == 0,
+            )
+            for servicio in servicios for h in range(args.turnos_por_dia)
+        ])
+    total = Turno.objects.count()
+
+    t0 = time.perf_counter()
+    call_command('rebuild_resumenes', stdout=io.StringIO())
+    reconstruccion = time.perf_counter() - t0
+
+    User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+    cliente = Client()
+    cliente.login(username='admin', password='clave')
+    url = f'/admin/core/resumendiario/?desde={desde.isoformat()}&hasta={hasta.isoformat()}'
+
+    def tablero():
+        respuesta = cliente.get(url)
+        assert respuesta.status_code == 200, respuesta.status_code
+
+    def al_vuelo():
+        turnos = Turno.objects.filter(fecha_hora_inicio__date__gte=desde, fecha_hora_inicio__date__lte=hasta)
+        totales = {
+            'turnos': Count('pk'),
+            'confirmados': Count('pk', filter=F('confirmado')),
+            'ingresos': Sum(Case(When(confirmado=True, then=F('servicio__precio')), output_field=DecimalField())),
+            'minutos': Sum(F('fecha_hora_fin') - F('fecha_hora_inicio')),
+        }
+        list(turnos.values('servicio__nombre').annotate(**totales).order_by('servicio__nombre'))
+        list(turnos.annotate(mes=TruncMonth('fecha_hora_inicio')).values('mes').annotate(**totales).order_by('mes'))
+
+    print(f"{total} turnos, {args.servicios} servicios, 365 días; rebuild_resumenes {reconstruccion:.2f}s")
+    for nombre, funcion in (('tablero', tablero), ('al vuelo', al_vuelo)):
+        funcion()
+        print(f"{nombre:<10} {resumen(cronometrar(funcion, args.repeticiones))}")
+
+
+if __name__ == '__main__':
+    main()
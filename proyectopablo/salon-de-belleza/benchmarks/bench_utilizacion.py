@@ -0,0 +1,109 @@
+"""
+benchmarks.bench_utilizacion
+----------------------------
+Simula la demanda de varios días y compara la ocupación del puesto (minutos de
+servicio realmente prestados / minutos de atención) con dos formas de asignar
+turnos:
+
+- "antes": inicios cada 60 minutos y turnos de 1 hora fija, como hacía
+  `reservar_turno_view` sin mirar `Servicio.duracion_minutos`. Un servicio de
+  30 minutos bloquea una hora entera y uno de 120 minutos se pisa con el turno
+  siguiente (se cuentan como "dobles reservas").
+- "después": los inicios que ofrece el formulario (`Agenda.inicios_libres()`
+  con la duración real del servicio y la grilla fina de
+  `RESERVATION_SLOT_DURATION_MINUTES`); el cliente toma el primero desde su
+  hora, sin mirar la marca.
+- "marcada": los mismos inicios, pero el cliente toma el primero que el
+  formulario marca con ★ (`franjas_libres()`: no fragmenta su hueco, ver
+  `Agenda.desperdicio()`), o el primero libre si no hay ninguno marcado.
+
+Cada cliente llega con una hora preferida al azar y elige desde esa hora; si
+no hay ningún inicio libre ese día, se pierde. "después" es lo mínimo que da
+la aplicación; "marcada", lo que da si los clientes siguen la marca.
+
+Uso:
+    python -m benchmarks.bench_utilizacion --dias 200 --clientes 14
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from benchmarks.entorno import preparar_django
+
+DURACIONES = (30, 45, 60, 90, 120)
+APERTURA, CIERRE = 9, 18
+
+
+def simular(duracion, dias, clientes, paso, duracion_ocupada, semilla, marcada=False):
+    """Devuelve (clientes atendidos, minutos prestados, dobles reservas)."""
+    from core.disponibilidad import Agenda, Franja
+
+    rnd = random.Random(semilla)
+    atendidos = prestados = dobles = 0
+    base = datetime(2030, 1, 1, tzinfo=dt_timezone.utc)
+    for dia in range(dias):
+        apertura = base + timedelta(days=dia, hours=APERTURA)
+        ventana = Franja(apertura, base + timedelta(days=dia, hours=CIERRE))
+        agenda = Agenda()
+        reales = []
+        for _ in range(clientes):
+            preferida = apertura + timedelta(minutes=rnd.randrange((CIERRE - APERTURA) * 60))
+            libres = [i for i in agenda.inicios_libres(ventana, duracion_ocupada, paso) if i >= preferida]
+            if not libres:
+                continue
+            inicio = libres[0]
+            if marcada:
+                inicio = next((i for i in libres if not agenda.desperdicio(ventana, i, duracion_ocupada)), inicio)
+            agenda.agregar(inicio, inicio + duracion_ocupada)
+            reales.append(Franja(inicio, min(inicio + duracion, ventana.fin)))
+            atendidos += 1
+        reales.sort()
+        fin_anterior = None
+        for franja in reales:
+            if fin_anterior and franja.inicio < fin_anterior:
+                dobles += 1
+            # Minutos que el puesto puede prestar de verdad: sin contar dos veces
+            # los que se pisan.
+            desde = max(franja.inicio, fin_anterior) if fin_anterior else franja.inicio
+            prestados += max((franja.fin - desde).total_seconds() / 60, 0)
+            fin_anterior = max(fin_anterior, franja.fin) if fin_anterior else franja.fin
+    return atendidos, prestados, dobles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dias', type=int, default=200)
+    parser.add_argument('--clientes', type=int, default=14, help='clientes por día y servicio')
+    args = parser.parse_args()
+
+    preparar_django()
+    from core.disponibilidad import paso_de_grilla
+
+    abiertos = args.dias * (CIERRE - APERTURA) * 60
+    print(f"{args.dias} días, {args.clientes} clientes/día, grilla de {paso_de_grilla()}")
+    print(f"{'duración':>9} {'modo':<8} {'atendidos':>9} {'ocupación':>9} {'dobles':>7}")
+    total = {'antes': 0, 'después': 0, 'marcada': 0}
+    t0 = time.perf_counter()
+    for minutos in DURACIONES:
+        duracion = timedelta(minutes=minutos)
+        modos = {
+            'antes': (timedelta(hours=1), timedelta(hours=1), False),
+            'después': (paso_de_grilla(), duracion, False),
+            'marcada': (paso_de_grilla(), duracion, True),
+        }
+        for modo, (paso, ocupada, marcada) in modos.items():
+            atendidos, prestados, dobles = simular(duracion, args.dias, args.clientes, paso, ocupada, minutos, marcada)
+            total[modo] += prestados
+            print(f"{minutos:>7} m {modo:<8} {atendidos:>9} {prestados / abiertos:>9.1%} {dobles:>7}")
+    print(
+        f"ocupación media: antes {total['antes'] / (abiertos * len(DURACIONES)):.1%}, "
+        f"después {total['después'] / (abiertos * len(DURACIONES)):.1%}, "
+        f"marcada {total['marcada'] / (abiertos * len(DURACIONES)):.1%}"
+        f" ({time.perf_counter() - t0:.2f}s)"
+    )
+
+
+if __name__ == '__main__':
+    main()
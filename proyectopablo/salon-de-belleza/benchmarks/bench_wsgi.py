@@ -0,0 +1,110 @@
+"""
+benchmarks.bench_wsgi
+---------------------
+Rendimiento de la aplicación WSGI (`salon_de_belleza.wsgi.application`) con
+los perfiles `dev` ("antes") y `prod` ("después"). Cada perfil corre en su
+propio proceso, llamando a la aplicación WSGI directamente (sin servidor ni
+red), primero sin y luego con `Accept-Encoding: gzip`.
+
+Por defecto se desactiva la caché de páginas (`PUBLIC_PAGE_CACHE_SECONDS = 0`)
+para medir sólo el efecto de la configuración; `--con-cache-de-paginas` la deja
+activa.
+
+Uso:
+    python -m benchmarks.bench_wsgi --peticiones 1000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.entorno import RAIZ, preparar_django
+
+URLS = ['/', '/servicios/', '/reservar/', '/reservar/disponibilidad/?servicio=1&desde=2030-01-07&hasta=2030-01-13']
+
+
+def medir_perfil(peticiones, con_cache_de_paginas):
+    """Se ejecuta dentro del proceso hijo; devuelve {modo: {url: (req/s, bytes)}}."""
+    preparar_django()
+    from django.conf import settings
+    from django.core.management import call_command
+
+    from core.models import Servicio
+
+    if not con_cache_de_paginas:
+        settings.PUBLIC_PAGE_CACHE_SECONDS = 0
+    # En producción `{% static %}` necesita el manifiesto de `collectstatic`.
+    call_command('collectstatic', interactive=False, verbosity=0)
+    for n in range(30):
+        Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=30 + 15 * (n % 4), precio=1000 + n)
+
+    from salon_de_belleza.wsgi import application
+
+    def pedir(url, codificacion):
+        ruta, _, consulta = url.partition('?')
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': ruta, 'QUERY_STRING': consulta,
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+            'HTTP_ACCEPT_ENCODING': codificacion, 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr, 'wsgi.version': (1, 0), 'wsgi.multithread': False,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False,
+        }
+        estado = []
+        cuerpo = b''.join(application(environ, lambda status, headers, exc_info=None: estado.append(status)))
+        assert estado[0].startswith('200'), (url, estado[0])
+        return len(cuerpo)
+
+    resultado = {}
+    for modo, codificacion in (('identity', 'identity'), ('gzip', 'gzip')):
+        resultado[modo] = {}
+        for url in URLS:
+            pedir(url, codificacion)
+            t0 = time.perf_counter()
+            for _ in range(peticiones):
+                tamano = pedir(url, codificacion)
+            resultado[modo][url] = (peticiones / (time.perf_counter() - t0), tamano)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--peticiones', type=int, default=1000)
+    parser.add_argument('--con-cache-de-paginas', action='store_true')
+    parser.add_argument('--perfil', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.perfil:
+        print(json.dumps(medir_perfil(args.peticiones, args.con_cache_de_paginas)))
+        return
+
+    resultados = {}
+    for perfil in ('dev', 'prod'):
+        entorno = dict(
+            os.environ,
+            DJANGO_ENV=perfil,
+            DJANGO_SECRET_KEY='benchmark-' + 'x' * 50,
+            DJANGO_ALLOWED_HOSTS='localhost',
+            DJANGO_STATIC_ROOT=tempfile.mkdtemp(prefix='salon-bench-static-'),
+        )
+        comando = [sys.executable, '-m', 'benchmarks.bench_wsgi', '--perfil', perfil, '--peticiones', str(args.peticiones)]
+        if args.con_cache_de_paginas:
+            comando.append('--con-cache-de-paginas')
+        salida = subprocess.run(comando, cwd=RAIZ, env=entorno, check=True, capture_output=True, text=True).stdout
+        resultados[perfil] = json.loads(salida.strip().splitlines()[-1])
+
+    print(f"{args.peticiones} peticiones por página (req/s y bytes de la respuesta)")
+    for modo in ('identity', 'gzip'):
+        print(f"\nAccept-Encoding: {modo}")
+        print(f"{'página':<40} {'dev':>8} {'prod':>8} {'mejora':>7} {'bytes dev':>10} {'bytes prod':>10}")
+        for url in URLS:
+            (antes, b_antes), (despues, b_despues) = resultados['dev'][modo][url], resultados['prod'][modo][url]
+            print(f"{url[:40]:<40} {antes:>8.0f} {despues:>8.0f} {despues / antes:>6.1f}x {b_antes:>10} {b_despues:>10}")
+
+
+if __name__ == '__main__':
+    main()
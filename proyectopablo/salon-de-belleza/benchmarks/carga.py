@@ -0,0 +1,248 @@
+"""
+benchmarks.carga
+----------------
+Generador de carga del flujo de reserva: `--hilos` clientes a la vez, cada
+uno con `--peticiones` peticiones de esta mezcla:
+
+- 15 % la página de inicio y 15 % la de servicios;
+- 35 % la disponibilidad de un servicio en un día (lo que hace el formulario
+  al elegir fecha);
+- 35 % una reserva (`POST /reservar/`) en un horario de la grilla. Algunas
+  chocan con turnos existentes o con las de otros hilos, como en la realidad;
+  la vista responde igual con una redirección.
+
+Los servicios y los días se eligen con los pesos de `benchmarks.datos`.
+
+Sin `--url`, cada hilo usa el cliente de pruebas de Django contra la
+aplicación WSGI en el mismo proceso, sobre una base temporal sembrada con
+`--servicios` y `--turnos`. Con `--url` (por ejemplo
+`http://127.0.0.1:8000`), pega contra un servidor ya levantado, con su base;
+ahí los límites de envío (`RATE_LIMITS`) de ese servidor también cuentan.
+
+Informa peticiones por segundo, latencias por tipo y códigos de respuesta;
+con `--json`, también en JSON.
+
+Uso:
+    python -m benchmarks.carga --hilos 8 --peticiones 200
+    python -m benchmarks.carga --url http://127.0.0.1:8000 --hilos 8
+"""
+
+import argparse
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import timedelta
+
+from benchmarks.datos import DIAS_DE_LA_SEMANA, zipf
+from benchmarks.entorno import estadisticas, preparar_django
+
+MEZCLA = (('inicio', 0.15), ('servicios', 0.15), ('disponibilidad', 0.35), ('reservar', 0.35))
+
+
+class ClienteDjango:
+    """El cliente de pruebas de Django: `(código, ms)` por petición."""
+
+    def __init__(self):
+        from django.test import Client
+
+        self.cliente = Client()
+
+    def get(self, ruta):
+        t0 = time.perf_counter()
+        codigo = self.cliente.get(ruta).status_code
+        return codigo, (time.perf_counter() - t0) * 1000
+
+    def post(self, ruta, datos):
+        t0 = time.perf_counter()
+        codigo = self.cliente.post(ruta, datos).status_code
+        return codigo, (time.perf_counter() - t0) * 1000
+
+    def cerrar(self):
+        from django.db import connections
+
+        connections.close_all()
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class ClienteHttp:
+    """Un navegador mínimo contra `url`, con cookies (la de CSRF) y sin seguir redirecciones."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.abridor = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _SinRedirecciones())
+
+    def _pedir(self, pedido):
+        t0 = time.perf_counter()
+        try:
+            with self.abridor.open(pedido, timeout=30) as respuesta:
+                respuesta.read()
+                codigo = respuesta.status
+        except urllib.error.HTTPError as error:
+            codigo = error.code
+        except OSError:
+            codigo = 0
+        return codigo, (time.perf_counter() - t0) * 1000
+
+    def get(self, ruta):
+        return self._pedir(urllib.request.Request(self.url + ruta))
+
+    def post(self, ruta, datos):
+        token = next((c.value for c in self.cookies if c.name == 'csrftoken'), None)
+        if token is None:
+            # La cookie de CSRF la pone el formulario.
+            self.get('/reservar/')
+            token = next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+        return self._pedir(urllib.request.Request(
+            self.url + ruta, data=urllib.parse.urlencode(datos).encode(),
+            headers={'X-CSRFToken': token, 'Referer': self.url + ruta},
+        ))
+
+    def cerrar(self):
+        pass
+
+
+def _dias_abiertos(desde, cantidad):
+    dias = []
+    dia = desde
+    while len(dias) < cantidad:
+        if DIAS_DE_LA_SEMANA[dia.weekday()]:
+            dias.append(dia)
+        dia += timedelta(days=1)
+    return dias
+
+
+def conducir(nuevo_cliente, servicios, desde, hilos=8, peticiones=200, dias=28, semilla=1):
+    """Corre la carga y devuelve los resultados (`dict`, listo para JSON).
+
+    `nuevo_cliente()` crea el cliente de cada hilo; `servicios` son los ids
+    del más al menos pedido y las reservas caen en los `dias` días abiertos
+    desde `desde`.
+    """
+    from django.conf import settings
+
+    apertura = getattr(settings, 'RESERVATION_START_HOUR', 9)
+    cierre = getattr(settings, 'RESERVATION_END_HOUR', 18)
+    paso = getattr(settings, 'RESERVATION_SLOT_DURATION_MINUTES', 30)
+    horas = [f'{m // 60:02d}:{m % 60:02d}' for m in range(apertura * 60, cierre * 60, paso)]
+    abiertos = _dias_abiertos(desde, dias)
+    popularidad = zipf(len(servicios))
+    tipos, pesos = zip(*MEZCLA)
+
+    tiempos = {tipo: [] for tipo in tipos}
+    codigos = {tipo: Counter() for tipo in tipos}
+    lock = threading.Lock()
+    salida = threading.Barrier(hilos + 1)
+
+    def trabajar(numero):
+        azar = random.Random(semilla * 1000 + numero)
+        cliente = nuevo_cliente()
+        propios = {tipo: [] for tipo in tipos}
+        vistos = {tipo: Counter() for tipo in tipos}
+        try:
+            salida.wait()
+            for n in range(peticiones):
+                tipo = azar.choices(tipos, weights=pesos)[0]
+                servicio = azar.choices(servicios, weights=popularidad)[0]
+                dia = azar.choice(abiertos)
+                if tipo == 'inicio':
+                    codigo, ms = cliente.get('/')
+                elif tipo == 'servicios':
+                    codigo, ms = cliente.get('/servicios/')
+                elif tipo == 'disponibilidad':
+                    codigo, ms = cliente.get(f'/reservar/disponibilidad/?servicio={servicio}&desde={dia.isoformat()}')
+                else:
+                    codigo, ms = cliente.post('/reservar/', {
+                        'servicio': servicio, 'fecha': dia.isoformat(), 'hora': azar.choice(horas),
+                        'nombre_cliente': f'Carga {numero}-{n}', 'cliente_telefono': f'11 5{numero:03d}{n:04d}',
+                    })
+                propios[tipo].append(ms)
+                vistos[tipo][codigo] += 1
+        finally:
+            cliente.cerrar()
+            with lock:
+                for tipo in tipos:
+                    tiempos[tipo] += propios[tipo]
+                    codigos[tipo] += vistos[tipo]
+
+    trabajadores = [threading.Thread(target=trabajar, args=(numero,)) for numero in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    salida.wait()
+    t0 = time.perf_counter()
+    for trabajador in trabajadores:
+        trabajador.join()
+    segundos = time.perf_counter() - t0
+
+    total = sum(len(lista) for lista in tiempos.values())
+    errores = sum(cuenta for tipo in tipos for codigo, cuenta in codigos[tipo].items() if codigo == 0 or codigo >= 500)
+    return {
+        'hilos': hilos,
+        'peticiones': total,
+        'segundos': round(segundos, 3),
+        'req_s': round(total / segundos, 1),
+        'errores': errores,
+        'por_tipo': {
+            tipo: {**estadisticas(tiempos[tipo]), 'codigos': {str(c): n for c, n in sorted(codigos[tipo].items())}}
+            for tipo in tipos if tiempos[tipo]
+        },
+    }
+
+
+def imprimir(resultado):
+    print(f"{resultado['hilos']} hilos: {resultado['peticiones']} peticiones en {resultado['segundos']} s, "
+          f"{resultado['req_s']} req/s, {resultado['errores']} errores")
+    for tipo, datos in resultado['por_tipo'].items():
+        print(f"  {tipo:<15} p50={datos['p50_ms']:.2f}ms p95={datos['p95_ms']:.2f}ms  {datos['codigos']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url')
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--peticiones', type=int, default=200, help='por hilo')
+    parser.add_argument('--servicios', type=int, default=12)
+    parser.add_argument('--turnos', type=int, default=50_000)
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    preparar_django()
+    from django.conf import settings
+    from django.utils import timezone
+
+    if args.url:
+        # Los ids y pesos de los servicios, del servidor; la base local no se usa.
+        with urllib.request.urlopen(args.url.rstrip('/') + '/api/servicios/', timeout=30) as respuesta:
+            servicios = [s['id'] for s in json.load(respuesta)['servicios']]
+
+        def nuevo_cliente():
+            return ClienteHttp(args.url)
+    else:
+        from benchmarks.datos import sembrar
+
+        settings.ALLOWED_HOSTS = ['testserver']
+        settings.DEBUG = False
+        # Todas las peticiones salen de la misma IP.
+        settings.RATE_LIMITS = {}
+        servicios = sembrar(args.servicios, args.turnos)['servicios']
+        nuevo_cliente = ClienteDjango
+
+    resultado = conducir(nuevo_cliente, servicios, timezone.localdate() + timedelta(days=1), args.hilos, args.peticiones)
+    imprimir(resultado)
+    if args.json:
+        with open(args.json, 'w') as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
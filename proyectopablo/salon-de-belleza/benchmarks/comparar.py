@@ -0,0 +1,83 @@
+"""
+benchmarks.comparar
+-------------------
+Compara dos corridas de `benchmarks.suite` (sus JSON) caso por caso. Un caso
+empeoró si:
+
+- su mediana (`p50_ms`) creció más de `--umbral` (0.25 = 25 %);
+- hace más consultas por operación que antes (sin tolerancia: la cantidad
+  no depende de la máquina);
+- en `carga`, las peticiones por segundo bajaron más de `--umbral` o hay
+  errores que antes no había.
+
+Los casos que están en una sola de las corridas se listan pero no cuentan.
+Termina con código 1 si hubo alguna regresión, para usarlo antes de un push.
+
+Uso:
+    python -m benchmarks.comparar base.json nuevo.json --umbral 0.25
+"""
+
+import argparse
+import json
+import sys
+
+
+def comparar(base, nuevo, umbral=0.25):
+    """Regresiones de `nuevo` respecto de `base`: lista de `(caso, descripción)`."""
+    regresiones = []
+    for caso, actual in nuevo['resultados'].items():
+        anterior = base['resultados'].get(caso)
+        if anterior is None:
+            continue
+        if 'p50_ms' in actual and 'p50_ms' in anterior and actual['p50_ms'] > anterior['p50_ms'] * (1 + umbral):
+            regresiones.append((caso, f"p50 {anterior['p50_ms']:.3f} → {actual['p50_ms']:.3f} ms"))
+        if 'consultas' in actual and 'consultas' in anterior and actual['consultas'] > anterior['consultas']:
+            regresiones.append((caso, f"consultas {anterior['consultas']:g} → {actual['consultas']:g}"))
+        if 'req_s' in actual and 'req_s' in anterior and actual['req_s'] < anterior['req_s'] * (1 - umbral):
+            regresiones.append((caso, f"{anterior['req_s']} → {actual['req_s']} req/s"))
+        if actual.get('errores', 0) > anterior.get('errores', 0):
+            regresiones.append((caso, f"errores {anterior.get('errores', 0)} → {actual['errores']}"))
+    return regresiones
+
+
+def _valor(resultado):
+    if resultado is None:
+        return '-'
+    if 'req_s' in resultado:
+        return f"{resultado['req_s']} req/s"
+    return f"{resultado['p50_ms']:.3f} ms"
+
+
+def imprimir_comparacion(base, nuevo, regresiones):
+    print(f"\n{base.get('commit') or '?'} → {nuevo.get('commit') or '?'}")
+    if base.get('parametros') != nuevo.get('parametros'):
+        print(f"  Atención: parámetros distintos ({base.get('parametros')} / {nuevo.get('parametros')})")
+    empeorados = {caso for caso, _ in regresiones}
+    for caso in sorted(set(base['resultados']) | set(nuevo['resultados'])):
+        marca = '!!' if caso in empeorados else '  '
+        print(f"{marca}{caso:<22} {_valor(base['resultados'].get(caso)):>14} → {_valor(nuevo['resultados'].get(caso)):>14}")
+    for caso, descripcion in regresiones:
+        print(f"Regresión en {caso}: {descripcion}")
+    if not regresiones:
+        print('Sin regresiones.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--umbral', type=float, default=0.25)
+    args = parser.parse_args()
+
+    with open(args.base) as archivo:
+        base = json.load(archivo)
+    with open(args.nuevo) as archivo:
+        nuevo = json.load(archivo)
+    regresiones = comparar(base, nuevo, args.umbral)
+    imprimir_comparacion(base, nuevo, regresiones)
+    if regresiones:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
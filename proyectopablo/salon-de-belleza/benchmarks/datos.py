@@ -0,0 +1,159 @@
+"""
+benchmarks.datos
+----------------
+Datos de prueba con distribuciones parecidas a las de un salón real, para la
+suite (`benchmarks.suite`) y el generador de carga (`benchmarks.carga`).
+
+`sembrar(servicios, turnos)`:
+
+- Servicios de un catálogo típico (uñas, corte, tintura, ...) con su
+  duración y precio; si se piden más, variantes numeradas. La demanda sigue
+  una ley de Zipf: unos pocos servicios se llevan la mayoría de los turnos.
+- Los turnos ocupan los horarios de cada servicio uno tras otro (duración
+  más `RESERVATION_BUFFER_MINUTES`) entre `RESERVATION_START_HOUR` y
+  `RESERVATION_END_HOUR`, sin solaparse. Domingo cerrado, sábado con más
+  demanda, y picos a media mañana y a la salida del trabajo. Se eligen
+  `turnos` horarios al azar con esos pesos, así que la agenda queda llena
+  en los horarios buscados y con huecos en los demás.
+- Alrededor del 85 % queda en el pasado y el resto en las próximas semanas
+  (la agenda abierta). Confirmados: 90 % de los pasados, 60 % de los
+  futuros.
+- Clientes que vuelven: cada turno es de uno de `turnos / 4` clientes,
+  también con pesos de Zipf; el 60 % tiene email.
+
+Los turnos se insertan con SQL en bloques (sin `Turno.save()`, sin eventos
+ni `Cliente`), como los demás benchmarks. Con una semilla fija, los mismos
+parámetros dan los mismos datos.
+"""
+
+import argparse
+import heapq
+import math
+import random
+from datetime import datetime, time, timedelta
+
+CATALOGO = (
+    ('Corte de Pelo', 45, 9000), ('Uñas', 60, 7000), ('Tintura', 90, 18000), ('Peinado', 45, 8000),
+    ('Depilación', 30, 6000), ('Masajes', 60, 15000), ('Manicura', 30, 5000), ('Pedicura', 45, 6500),
+    ('Alisado', 120, 30000), ('Mechas', 120, 25000), ('Limpieza Facial', 60, 12000), ('Cejas', 15, 3000),
+)
+NOMBRES = ('Ana', 'Beto', 'Carla', 'Darío', 'Elena', 'Fabián', 'Gisela', 'Héctor', 'Inés', 'Julián', 'Karina', 'Lucía')
+APELLIDOS = ('Pérez', 'Gómez', 'Fernández', 'López', 'Martínez', 'Rodríguez', 'Sánchez', 'Díaz', 'Álvarez', 'Romero')
+
+# Demanda relativa por día de la semana (lunes = 0; domingo cerrado) y por hora.
+DIAS_DE_LA_SEMANA = (0.8, 0.9, 1.0, 1.0, 1.2, 1.5, 0)
+HORAS = {9: 0.5, 10: 0.9, 11: 1.2, 12: 1.0, 13: 0.6, 14: 0.7, 15: 0.9, 16: 1.2, 17: 1.4, 18: 1.3, 19: 1.0}
+
+# Parte de los horarios de la agenda que se ocupa (si alcanzan los días).
+OCUPACION = 0.6
+FUTURO = 0.15
+
+
+def zipf(n, s=1.1):
+    """Pesos de Zipf para `n` elementos ordenados por popularidad."""
+    return [1 / (rango ** s) for rango in range(1, n + 1)]
+
+
+def horarios_del_dia(duracion, separacion, apertura, cierre):
+    """Inicios (minutos desde medianoche) de los turnos seguidos de un servicio en un día."""
+    paso = duracion + separacion
+    return list(range(apertura * 60, cierre * 60 - duracion + 1, paso))
+
+
+def sembrar(servicios=12, turnos=100_000, semilla=1, hoy=None):
+    """Crea `servicios` servicios y `turnos` turnos; devuelve un resumen (`dict`).
+
+    El resumen trae los ids de los servicios (del más al menos pedido), las
+    fechas del primer y último día sembrados y cuántos turnos se insertaron.
+    """
+    from django.conf import settings
+    from django.db import connection, transaction
+    from django.utils import timezone
+
+    from core.models import Servicio, Turno
+
+    azar = random.Random(semilla)
+    hoy = hoy or timezone.localdate()
+    apertura = getattr(settings, 'RESERVATION_START_HOUR', 9)
+    cierre = getattr(settings, 'RESERVATION_END_HOUR', 18)
+    separacion = getattr(settings, 'RESERVATION_BUFFER_MINUTES', 0)
+
+    catalogo = []
+    for n in range(servicios):
+        nombre, duracion, precio = CATALOGO[n % len(CATALOGO)]
+        if n >= len(CATALOGO):
+            nombre = f'{nombre} {n // len(CATALOGO) + 1}'
+        catalogo.append(Servicio(nombre=nombre, duracion_minutos=duracion, precio=precio, descripcion=f'{nombre}.'))
+    catalogo = Servicio.objects.bulk_create(catalogo)
+    popularidad = zipf(servicios)
+
+    # Días abiertos necesarios para que los turnos ocupen ~`OCUPACION` de la agenda.
+    por_dia = sum(len(horarios_del_dia(s.duracion_minutos, separacion, apertura, cierre)) for s in catalogo)
+    semana = sum(1 for peso in DIAS_DE_LA_SEMANA if peso)
+    dias = max(7, math.ceil(turnos / (OCUPACION * por_dia) * 7 / semana))
+    primero = hoy - timedelta(days=round(dias * (1 - FUTURO)))
+
+    # Muestreo ponderado sin reemplazo (Efraimidis-Spirakis): clave u^(1/peso).
+    def candidatos():
+        for numero in range(dias):
+            dia = primero + timedelta(days=numero)
+            peso_del_dia = DIAS_DE_LA_SEMANA[dia.weekday()]
+            if not peso_del_dia:
+                continue
+            for servicio, peso_del_servicio in zip(catalogo, popularidad):
+                for inicio in horarios_del_dia(servicio.duracion_minutos, separacion, apertura, cierre):
+                    peso = peso_del_dia * peso_del_servicio * HORAS.get(inicio // 60, 0.5)
+                    yield azar.random() ** (1 / peso), servicio, dia, inicio
+
+    elegidos = heapq.nlargest(turnos, candidatos(), key=lambda candidato: candidato[0])
+    elegidos.sort(key=lambda candidato: (candidato[2], candidato[3], candidato[1].pk))
+
+    clientes = max(1, turnos // 4)
+    pesos_de_clientes = zipf(clientes, s=0.8)
+    cliente_de = azar.choices(range(clientes), weights=pesos_de_clientes, k=len(elegidos))
+
+    columnas = 'servicio_id, cliente_nombre, cliente_telefono, cliente_email, fecha_hora_inicio, fecha_hora_fin, confirmado'
+    sql = f'INSERT INTO {Turno._meta.db_table} ({columnas}) VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    with transaction.atomic(), connection.cursor() as cursor:
+        filas = []
+        for (_, servicio, dia, minutos), cliente in zip(elegidos, cliente_de):
+            inicio = timezone.make_aware(datetime.combine(dia, time(minutos // 60, minutos % 60)))
+            fin = inicio + timedelta(minutes=servicio.duracion_minutos)
+            nombre = f'{NOMBRES[cliente % len(NOMBRES)]} {APELLIDOS[cliente // len(NOMBRES) % len(APELLIDOS)]} {cliente}'
+            email = f'cliente{cliente}@example.com' if cliente % 5 < 3 else ''
+            confirmado = azar.random() < (0.9 if dia < hoy else 0.6)
+            filas.append((
+                servicio.pk, nombre, f'11 4{cliente:07d}', email,
+                connection.ops.adapt_datetimefield_value(inicio), connection.ops.adapt_datetimefield_value(fin), confirmado,
+            ))
+            if len(filas) == 50_000:
+                cursor.executemany(sql, filas)
+                filas = []
+        cursor.executemany(sql, filas)
+
+    return {
+        'servicios': [servicio.pk for servicio in catalogo],
+        'desde': primero,
+        'hasta': primero + timedelta(days=dias - 1),
+        'turnos': len(elegidos),
+    }
+
+
+def main():
+    from benchmarks.entorno import preparar_django
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servicios', type=int, default=12)
+    parser.add_argument('--turnos', type=int, default=100_000)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--db', help='archivo SQLite a crear (por defecto, uno temporal)')
+    args = parser.parse_args()
+
+    ruta = preparar_django(args.db)
+    resumen = sembrar(args.servicios, args.turnos, args.semilla)
+    print(f"{resumen['turnos']} turnos de {len(resumen['servicios'])} servicios, "
+          f"del {resumen['desde']:%d/%m/%Y} al {resumen['hasta']:%d/%m/%Y}, en {ruta}")
+
+
+if __name__ == '__main__':
+    main()
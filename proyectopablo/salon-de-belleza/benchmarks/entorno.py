@@ -0,0 +1,60 @@
+"""
+benchmarks.entorno
+------------------
+Utilidades comunes de los benchmarks: configura Django contra una base SQLite
+temporal (nunca contra `db.sqlite3`) y aplica las migraciones.
+"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def preparar_django(ruta_db=None):
+    """Inicializa Django usando `ruta_db` (o un archivo temporal) como base por defecto."""
+    if str(RAIZ) not in sys.path:
+        sys.path.insert(0, str(RAIZ))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'salon_de_belleza.settings')
+
+    from django.conf import settings
+    ruta = ruta_db or os.path.join(tempfile.mkdtemp(prefix='salon-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = ruta
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return ruta
+
+
+def cronometrar(funcion, repeticiones):
+    """Ejecuta `funcion` `repeticiones` veces y devuelve los tiempos en milisegundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos
+
+
+def resumen(tiempos):
+    """Mediana y percentil 95 de una lista de tiempos (ms), como texto."""
+    ordenados = sorted(tiempos)
+    p50 = ordenados[len(ordenados) // 2]
+    p95 = ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))]
+    return f"p50={p50:.3f}ms p95={p95:.3f}ms"
+
+
+def estadisticas(tiempos):
+    """Mediana, percentil 95 y cantidad de una lista de tiempos (ms), para guardar en JSON."""
+    ordenados = sorted(tiempos)
+    return {
+        'n': len(ordenados),
+        'p50_ms': round(ordenados[len(ordenados) // 2], 4),
+        'p95_ms': round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))], 4),
+    }
@@ -0,0 +1,276 @@
+"""
+benchmarks.suite
+----------------
+Los caminos calientes del salón, medidos siempre igual para comparar entre
+commits. Siembra una base temporal con `benchmarks.datos` (`--servicios`,
+`--turnos`) y mide:
+
+- `solapamiento`: `Turno.objects.overlapping(...).exists()` en horarios al
+  azar de la agenda sembrada;
+- `turno_crear`, `turno_confirmar`, `turno_desconfirmar`: `Turno.save()`,
+  cada uno en una transacción que se deshace (la base no cambia);
+- `admin_confirmar`, `admin_cancelar`: las acciones del admin de `Turno`
+  sobre `--seleccion` turnos futuros, como un POST del changelist (si la
+  siembra no deja suficientes, se agregan después de la agenda);
+- `pagina_*`: las páginas públicas (sin su caché) y el changelist del admin;
+- `carga`: `benchmarks.carga` con `--hilos` hilos en el mismo proceso.
+
+Cada caso informa mediana y percentil 95 (ms) y las consultas por operación;
+`carga`, además, peticiones por segundo. Con `DEBUG = False` y sin límites de
+envío (todas las peticiones salen de la misma IP).
+
+`--salida` guarda el resultado en JSON, con el commit y los parámetros; con
+`--comparar-con` lo compara con otro JSON (ver `benchmarks.comparar`) y
+termina con código 1 si algún caso empeoró más de `--umbral`. Los números
+sólo son comparables en la misma máquina y con los mismos parámetros.
+
+Uso:
+    python -m benchmarks.suite --salida base.json
+    python -m benchmarks.suite --comparar-con base.json --umbral 0.25
+    python -m benchmarks.suite --casos solapamiento,turno_crear --repeticiones 500
+"""
+
+import argparse
+import json
+import random
+import subprocess
+import sys
+from datetime import datetime, time, timedelta
+
+from benchmarks.carga import ClienteDjango, conducir
+from benchmarks.comparar import comparar, imprimir_comparacion
+from benchmarks.datos import zipf
+from benchmarks.entorno import RAIZ, cronometrar, estadisticas, preparar_django
+
+VERSION = 1
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(funcion, repeticiones):
+    """Tiempos y consultas por llamada de `funcion` (después de una llamada de calentamiento)."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    funcion()
+    with CaptureQueriesContext(connection) as capturadas:
+        tiempos = cronometrar(funcion, repeticiones)
+    return {**estadisticas(tiempos), 'consultas': round(len(capturadas) / repeticiones, 2)}
+
+
+def casos(sembrado, args):
+    """Los casos de la suite: `{nombre: función sin argumentos que devuelve su resultado}`."""
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from django.test import Client
+    from django.urls import reverse
+    from django.utils import timezone
+
+    from core.models import Servicio, Turno
+
+    azar = random.Random(1)
+    servicios = list(Servicio.objects.in_bulk(sembrado['servicios']).values())
+    popularidad = zipf(len(servicios))
+    hoy = timezone.localdate()
+    manana = hoy + timedelta(days=1)
+
+    def horario():
+        servicio = azar.choices(servicios, weights=popularidad)[0]
+        dia = sembrado['desde'] + timedelta(days=azar.randrange((sembrado['hasta'] - sembrado['desde']).days + 1))
+        inicio = timezone.make_aware(datetime.combine(dia, time(azar.randrange(9, 18), azar.choice((0, 30)))))
+        return servicio, inicio, inicio + timedelta(minutes=servicio.duracion_minutos)
+
+    def solapamiento():
+        servicio, inicio, fin = horario()
+        Turno.objects.overlapping(servicio, inicio, fin).exists()
+
+    # Un día libre, después de la agenda sembrada.
+    libre = timezone.make_aware(datetime.combine(sembrado['hasta'] + timedelta(days=7), time(10)))
+
+    def turno_crear():
+        with transaction.atomic():
+            Turno(servicio=servicios[0], cliente_nombre='Ana Suite', cliente_telefono='11 40000000',
+                  fecha_hora_inicio=libre).save()
+            transaction.set_rollback(True)
+
+    futuros = Turno.objects.vigentes().filter(fecha_hora_inicio__gte=timezone.now())
+    # Con pocos `--turnos` la agenda sembrada puede no tener futuros (o
+    # ninguno confirmado): se completan después del día de `turno_crear`.
+    _completar_futuros(futuros, servicios[0], libre.date() + timedelta(days=1), max(args.seleccion, 2))
+    sin_confirmar = futuros.filter(confirmado=False).order_by('fecha_hora_inicio').first()
+    confirmado = futuros.filter(confirmado=True).order_by('fecha_hora_inicio').first()
+
+    def cambiar_confirmacion(pk, valor):
+        def cambiar():
+            with transaction.atomic():
+                turno = Turno.objects.get(pk=pk)
+                turno.confirmado = valor
+                turno.save()
+                transaction.set_rollback(True)
+        return cambiar
+
+    usuario = get_user_model().objects.create_superuser('suite', 'suite@example.com', 'suite')
+    admin = Client()
+    admin.force_login(usuario)
+    changelist = reverse('admin:core_turno_changelist')
+    seleccion = list(futuros.order_by('fecha_hora_inicio').values_list('pk', flat=True)[:args.seleccion])
+
+    def accion(nombre):
+        def ejecutar():
+            respuesta = admin.post(changelist, {'action': nombre, '_selected_action': seleccion})
+            assert respuesta.status_code == 302, respuesta.status_code
+        return ejecutar
+
+    publico = Client()
+
+    def pagina(cliente, url):
+        def pedir():
+            respuesta = cliente.get(url)
+            assert respuesta.status_code == 200, (url, respuesta.status_code)
+        return pedir
+
+    def dejar_seleccion(confirmados):
+        # Un turno cancelado no se vuelve a confirmar con la acción: se
+        # restablece con un UPDATE, así cada repetición cambia todos.
+        def dejar():
+            Turno.objects.filter(pk__in=seleccion).update(confirmado=confirmados, cancelado_en=None)
+        return dejar
+
+    n = args.repeticiones
+    return {
+        'solapamiento': lambda: medir(solapamiento, n * 10),
+        'turno_crear': lambda: medir(turno_crear, n),
+        'turno_confirmar': lambda: medir(cambiar_confirmacion(sin_confirmar.pk, True), n),
+        'turno_desconfirmar': lambda: medir(cambiar_confirmacion(confirmado.pk, False), n),
+        'admin_confirmar': lambda: _alternando(accion('confirmar_turnos'), dejar_seleccion(False), max(n // 10, 5)),
+        'admin_cancelar': lambda: _alternando(accion('cancelar_turnos'), dejar_seleccion(True), max(n // 10, 5)),
+        'pagina_inicio': lambda: medir(pagina(publico, '/'), n),
+        'pagina_servicios': lambda: medir(pagina(publico, '/servicios/'), n),
+        'pagina_disponibilidad': lambda: medir(pagina(
+            publico, f'/reservar/disponibilidad/?servicio={servicios[0].pk}&desde={manana.isoformat()}'), n),
+        'pagina_admin_turnos': lambda: medir(pagina(admin, changelist), max(n // 5, 5)),
+        'carga': lambda: conducir(ClienteDjango, sembrado['servicios'], manana, args.hilos, args.peticiones),
+    }
+
+
+def _completar_futuros(futuros, servicio, desde, cantidad):
+    """Agrega turnos de `servicio` desde el día `desde` hasta que `futuros` tenga `cantidad`, confirmados y sin confirmar."""
+    from django.conf import settings
+    from django.utils import timezone
+
+    from benchmarks.datos import horarios_del_dia
+    from core.models import Turno
+
+    faltan = cantidad - futuros.count()
+    if faltan <= 0 and futuros.filter(confirmado=True).exists() and futuros.filter(confirmado=False).exists():
+        return
+    # Alternados: con dos o más hay de los dos.
+    faltan = max(faltan, 2)
+    horarios = horarios_del_dia(
+        servicio.duracion_minutos, getattr(settings, 'RESERVATION_BUFFER_MINUTES', 0),
+        getattr(settings, 'RESERVATION_START_HOUR', 9), getattr(settings, 'RESERVATION_END_HOUR', 18),
+    )
+    nuevos = []
+    for numero in range(faltan):
+        dia = desde + timedelta(days=numero // len(horarios))
+        minutos = horarios[numero % len(horarios)]
+        inicio = timezone.make_aware(datetime.combine(dia, time(minutos // 60, minutos % 60)))
+        nuevos.append(Turno(
+            servicio=servicio, cliente_nombre=f'Suite {numero}', cliente_telefono=f'11 5{numero:07d}',
+            fecha_hora_inicio=inicio, fecha_hora_fin=inicio + timedelta(minutes=servicio.duracion_minutos),
+            confirmado=numero % 2 == 0,
+        ))
+    Turno.objects.bulk_create(nuevos)
+
+
+def _alternando(medida, contraria, repeticiones):
+    """Mide `medida` deshaciendo su efecto con `contraria` (sin medir) entre una y otra."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    contraria()
+    tiempos = []
+    consultas = 0
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as capturadas:
+            tiempos += cronometrar(medida, 1)
+        consultas += len(capturadas)
+        contraria()
+    return {**estadisticas(tiempos), 'consultas': round(consultas / repeticiones, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--servicios', type=int, default=12)
+    parser.add_argument('--turnos', type=int, default=100_000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--seleccion', type=int, default=100, help='turnos por acción del admin')
+    parser.add_argument('--hilos', type=int, default=8)
+    parser.add_argument('--peticiones', type=int, default=100, help='por hilo, en `carga`')
+    parser.add_argument('--casos', help='sólo estos casos, separados por comas')
+    parser.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--comparar-con', help='JSON de una corrida anterior')
+    parser.add_argument('--umbral', type=float, default=0.25)
+    args = parser.parse_args()
+
+    preparar_django()
+    import logging
+
+    from django.conf import settings
+
+    from benchmarks.datos import sembrar
+
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.DEBUG = False
+    settings.RATE_LIMITS = {}
+    settings.PUBLIC_PAGE_CACHE_SECONDS = 0
+    # Las consultas lentas de la siembra y la carga no son parte del resultado.
+    logging.getLogger('core.metricas').setLevel(logging.ERROR)
+
+    sembrado = sembrar(args.servicios, args.turnos)
+    todos = casos(sembrado, args)
+    elegidos = args.casos.split(',') if args.casos else list(todos)
+    desconocidos = set(elegidos) - set(todos)
+    if desconocidos:
+        parser.error(f"casos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    resultados = {}
+    for nombre in elegidos:
+        resultados[nombre] = todos[nombre]()
+        resultado = resultados[nombre]
+        if 'req_s' in resultado:
+            print(f"{nombre:<22} {resultado['req_s']} req/s, {resultado['errores']} errores")
+        else:
+            print(f"{nombre:<22} p50={resultado['p50_ms']:.3f}ms p95={resultado['p95_ms']:.3f}ms  "
+                  f"{resultado['consultas']:g} consultas")
+
+    corrida = {
+        'version': VERSION,
+        'commit': _commit(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'parametros': {clave: valor for clave, valor in vars(args).items()
+                       if clave in ('servicios', 'turnos', 'repeticiones', 'seleccion', 'hilos', 'peticiones')},
+        'resultados': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            json.dump(corrida, archivo, indent=2)
+
+    if args.comparar_con:
+        with open(args.comparar_con) as archivo:
+            base = json.load(archivo)
+        regresiones = comparar(base, corrida, args.umbral)
+        imprimir_comparacion(base, corrida, regresiones)
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,22 +7,85 @@ Cambios realizados:
 - `ServicioAdmin`: añadido `precio` y `descripcion` en la vista de edición.
 - `TurnoAdmin`: muestra `cliente_telefono` y `cliente_email` en la lista; se
     añadieron acciones de admin para confirmar/cancelar turnos en masa. Estas
-    acciones aprovechan la lógica de `Turno.save()` para crear/eliminar `Reserva`.
+    acciones usan las versiones en bloque de `core.reservas` (un UPDATE y un
+    INSERT de eventos por acción, en una transacción; las `Reserva` las
+    sincroniza el worker de la bandeja de salida).
+    El formulario (`TurnoAdminForm`) valida solapamientos con
+    `Turno.objects.overlapping()`.
 - `ReservaAdmin`: administración básica de reservas.
 - `Contacto`: registrado para poder revisar mensajes enviados desde la web.
+- `RecursoAdmin`: personal/sillones, su horario y los servicios que realizan.
+- `ListaEsperaAdmin`: inscripciones en la lista de espera y el horario que
+    se le ofreció a cada una (ver `core.lista_espera`).
+- `EventoAdmin`: estado de la bandeja de salida (`core.eventos`) y acción para
+    reintentar los eventos fallidos.
+- `Turno`, `Reserva` y `Contacto`: acciones "Exportar CSV/JSONL" que
+    descargan las filas elegidas (o todas las del filtro, con "seleccionar
+    todo") en streaming (ver `core.exportar`).
+- `ResumenDiarioAdmin`: tablero de ocupación e ingresos por servicio y por
+    mes para un rango de fechas (por defecto, el último año). Sólo lee los
+    agregados de `ResumenDiario` (ver `core.analitica`); no se edita.
+- `ClienteAdmin`: clientes (ver `core.clientes`) con el historial de sus
+    turnos en la ficha. En `Cliente` y en `Turno`, un teléfono o un email en
+    el cuadro de búsqueda se normaliza y se busca por los índices únicos de
+    `Cliente` (y el índice (cliente, inicio) de `Turno`), no con `icontains`
+    sobre toda la tabla.
+- `Servicio`, `Turno` y `Contacto`: el cuadro de búsqueda usa el índice de
+    texto completo (`core.busqueda`), sin distinguir acentos ("unas"
+    encuentra "Uñas"); sin él, los `search_fields` de siempre.
+- Listados preparados para tablas grandes: `list_select_related` para no hacer
+    una consulta por fila, `ConteoEstimadoPaginator` en lugar de `COUNT(*)` y,
+    en `Turno`, navegación por clave ("desde") sobre `fecha_hora_inicio`.
 """
 
-from django.contrib import admin
-from .models import Servicio, Reserva, Turno, Contacto
+from datetime import datetime, timedelta
+
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied
+from django.contrib.admin.views.main import ORDER_VAR, PAGE_VAR
+from django.db.models import Q
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.html import format_html, format_html_join
+
+from . import analitica, busqueda, clientes, exportar, reservas
+from .forms import TurnoAdminForm
+from .models import Servicio, Recurso, Reserva, Turno, Contacto, Evento, ResumenDiario, Cliente, ListaEspera
+from .paginacion import ConteoEstimadoPaginator
+
+
+class BusquedaDeTextoMixin:
+    """El cuadro de búsqueda va por el índice de texto completo (`core.busqueda`).
+
+    Todas las palabras tienen que estar en la fila o, con
+    `relaciones_buscadas`, en la fila relacionada (`{campo: modelo}`, por
+    ejemplo el servicio de un turno). Sin índice en la base, los
+    `search_fields` de siempre.
+    """
+    relaciones_buscadas = {}
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        propias = busqueda.coincidencias(self.model, search_term, queryset.db)
+        if propias is None:
+            return super().get_search_results(request, queryset, search_term)
+        condicion = Q(pk__in=propias)
+        for campo, modelo in self.relaciones_buscadas.items():
+            condicion |= Q(**{f'{campo}__in': busqueda.coincidencias(modelo, search_term, queryset.db)})
+        return queryset.filter(condicion), False
 
 
 # Registro del modelo Servicio en el admin
 # Esto permite a cualquier superusuario crear, editar y eliminar instancias
 # de `Servicio` desde la interfaz de administración de Django.
-class ServicioAdmin(admin.ModelAdmin):
+class ServicioAdmin(BusquedaDeTextoMixin, admin.ModelAdmin):
     # Campos mostrados en la lista de objetos del admin
     list_display = ('nombre', 'duracion_minutos', 'precio')
-    # Habilita búsqueda por nombre
+    # Habilita búsqueda por nombre (si la base no tiene índice de texto completo)
     search_fields = ('nombre', 'descripcion')
     # Orden por defecto en la lista
     ordering = ('nombre',)
@@ -30,52 +93,271 @@ class ServicioAdmin(admin.ModelAdmin):
     fields = ('nombre', 'descripcion', 'duracion_minutos', 'precio')
 
 
+class ExportarMixin:
+    """Acciones que descargan las filas elegidas en CSV o JSONL (`core.exportar`).
+
+    Con "seleccionar todo", el queryset es el del listado con sus filtros, así
+    que el filtrado lo hace la base; las filas se escriben a medida que se
+    leen.
+    """
+
+    def _exportar(self, queryset, formato):
+        return exportar.respuesta_de_exportacion(
+            exportar.exportacion_de(self.model), queryset, formato, self.model._meta.model_name,
+        )
+
+    def exportar_csv(self, request, queryset):
+        return self._exportar(queryset, 'csv')
+    exportar_csv.short_description = 'Exportar a CSV'
+
+    def exportar_jsonl(self, request, queryset):
+        return self._exportar(queryset, 'jsonl')
+    exportar_jsonl.short_description = 'Exportar a JSONL'
+
+
 # Registro del modelo Reserva en el admin con algunas utilidades
-class ReservaAdmin(admin.ModelAdmin):
+class ReservaAdmin(ExportarMixin, admin.ModelAdmin):
     list_display = ('servicio', 'nombre_cliente', 'fecha_hora')
     list_filter = ('servicio', 'fecha_hora')
-    search_fields = ('nombre_cliente', 'servicio')
+    # `servicio` es una ForeignKey: se busca por su nombre.
+    search_fields = ('nombre_cliente', 'servicio__nombre')
+    # Trae el servicio en la misma consulta (lo usan la columna y `__str__`).
+    list_select_related = ('servicio',)
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+    actions = ['exportar_csv', 'exportar_jsonl']
+
+
+class BusquedaDeClienteMixin:
+    """Un teléfono o email en el cuadro de búsqueda va exacto por los índices de `Cliente`.
+
+    `prefijo_de_cliente` es el camino hasta el cliente; otro texto se busca
+    con los `search_fields` de siempre.
+    """
+    prefijo_de_cliente = ''
+
+    def get_search_results(self, request, queryset, search_term):
+        condicion = clientes.condicion_de_busqueda(search_term, self.prefijo_de_cliente)
+        if condicion is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(condicion), False
+
+
+class DesdeFechaFilter(admin.SimpleListFilter):
+    """Navegación por clave ("keyset") sobre `fecha_hora_inicio`.
+
+    El valor es una fecha (`2025-11-20`) o la clave del último turno mostrado
+    (`<fecha-hora ISO>,<id>`). En lugar de saltar páginas con OFFSET, el
+    listado empieza en esa posición del índice (`turno_inicio_id_idx`).
+    """
+    title = 'desde'
+    parameter_name = 'desde'
+
+    def lookups(self, request, model_admin):
+        hoy = timezone.localdate()
+        return [
+            (hoy.isoformat(), 'Hoy'),
+            ((hoy + timedelta(days=7)).isoformat(), 'Dentro de una semana'),
+            ((hoy + timedelta(days=30)).isoformat(), 'Dentro de un mes'),
+        ]
+
+    def queryset(self, request, queryset):
+        valor = self.value()
+        if not valor:
+            return queryset
+        fecha, _, pk = valor.partition(',')
+        try:
+            inicio = datetime.fromisoformat(fecha)
+            pk = int(pk) if pk else None
+        except ValueError as exc:
+            raise IncorrectLookupParameters(exc)
+        if timezone.is_naive(inicio):
+            inicio = timezone.make_aware(inicio)
+        queryset = queryset.filter(fecha_hora_inicio__gte=inicio)
+        if pk is not None:
+            queryset = queryset.exclude(fecha_hora_inicio=inicio, pk__lte=pk)
+        return queryset
 
 
 # Registro del modelo Turno para que el admin también pueda gestionar turnos
 # directamente desde la interfaz (crear, editar, borrar).
-class TurnoAdmin(admin.ModelAdmin):
-    list_display = ('cliente_nombre', 'cliente_telefono', 'cliente_email', 'servicio', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado')
-    list_filter = ('servicio', 'confirmado')
+class TurnoAdmin(BusquedaDeClienteMixin, BusquedaDeTextoMixin, ExportarMixin, admin.ModelAdmin):
+    form = TurnoAdminForm
+    list_display = ('cliente_nombre', 'cliente_telefono', 'cliente_email', 'servicio', 'recurso', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado')
+    list_filter = ('servicio', 'recurso', 'confirmado', DesdeFechaFilter)
     search_fields = ('cliente_nombre', 'servicio__nombre', 'cliente_telefono', 'cliente_email')
+    prefijo_de_cliente = 'cliente__'
+    relaciones_buscadas = {'servicio': Servicio}
+    list_select_related = ('servicio', 'recurso')
+    # Orden total por (inicio, id) para que la navegación "desde" sea estable.
+    ordering = ('fecha_hora_inicio', 'pk')
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
     # Mostrar campos en el formulario de edición de Turno
-    fields = ('servicio', 'cliente_nombre', 'cliente_telefono', 'cliente_email', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado')
+    fields = ('servicio', 'recurso', 'cliente_nombre', 'cliente_telefono', 'cliente_email', 'cliente', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado', 'cancelado_en')
+    # `fecha_hora_fin` no es editable: se calcula a partir del servicio. El
+    # `cliente` se enlaza solo a partir del teléfono y el email, y
+    # `cancelado_en` lo pone la cancelación.
+    readonly_fields = ('fecha_hora_fin', 'cliente', 'cancelado_en')
+
+    actions = ['confirmar_turnos', 'cancelar_turnos', 'exportar_csv', 'exportar_jsonl']
 
-    actions = ['confirmar_turnos', 'cancelar_turnos']
+    def changelist_view(self, request, extra_context=None):
+        """Añade el enlace "Siguientes turnos" de la navegación por clave."""
+        response = super().changelist_view(request, extra_context)
+        cl = getattr(response, 'context_data', {}).get('cl')
+        # Sólo con el orden por defecto y una página completa.
+        if cl is not None and ORDER_VAR not in request.GET:
+            resultados = list(cl.result_list)
+            if len(resultados) == cl.list_per_page:
+                ultimo = resultados[-1]
+                response.context_data['keyset_siguiente'] = cl.get_query_string(
+                    {DesdeFechaFilter.parameter_name: f'{ultimo.fecha_hora_inicio.isoformat()},{ultimo.pk}'},
+                    [PAGE_VAR],
+                )
+        return response
 
     def confirmar_turnos(self, request, queryset):
         """Acción de admin: marcar turnos como confirmados y crear Reserva asociada."""
-        updated = 0
-        for turno in queryset:
-            if not turno.confirmado:
-                turno.confirmado = True
-                turno.save()
-                updated += 1
-        self.message_user(request, f"{updated} turno(s) confirmados y convertidos a reservas.")
+        updated = reservas.confirmar_turnos(queryset)
+        self.message_user(request, f"{updated} turno(s) confirmados; sus reservas se crearán en segundo plano.")
+        # `confirmar_turnos` los salta: su horario puede estar tomado.
+        cancelados = queryset.filter(cancelado_en__isnull=False).count()
+        if cancelados:
+            self.message_user(
+                request,
+                f"{cancelados} turno(s) cancelados no se reconfirman en bloque: "
+                "confírmalos uno por uno, que comprueba que su horario siga libre.",
+                messages.WARNING,
+            )
     confirmar_turnos.short_description = 'Confirmar turnos y convertir a reservas'
 
     def cancelar_turnos(self, request, queryset):
-        """Acción de admin: marcar turnos como no confirmados y eliminar Reserva asociada."""
-        updated = 0
-        for turno in queryset:
-            if turno.confirmado:
-                turno.confirmado = False
-                turno.save()
-                updated += 1
-        self.message_user(request, f"{updated} turno(s) cancelados y reservas eliminadas si existían.")
-    cancelar_turnos.short_description = 'Cancelar turnos y eliminar reservas'
+        """Acción de admin: cancelar turnos confirmados, eliminar su Reserva y ofrecer su horario a la lista de espera."""
+        updated = reservas.cancelar_turnos(queryset)
+        self.message_user(request, f"{updated} turno(s) cancelados; sus reservas se eliminarán en segundo plano.")
+    cancelar_turnos.short_description = 'Cancelar turnos, eliminar reservas y liberar sus horarios'
+
+
+class RecursoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'hora_inicio', 'hora_fin', 'activo')
+    list_filter = ('activo', 'servicios')
+    search_fields = ('nombre',)
+    filter_horizontal = ('servicios',)
+
+
+class ClienteAdmin(BusquedaDeClienteMixin, admin.ModelAdmin):
+    list_display = ('nombre', 'telefono', 'email', 'creado_en')
+    search_fields = ('nombre',)
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+    fields = ('nombre', 'telefono', 'email', 'historial')
+    readonly_fields = ('historial',)
+    # Turnos que se muestran en la ficha; el resto, desde el enlace al listado.
+    turnos_en_historial = 50
+
+    def historial(self, obj):
+        """Los últimos turnos del cliente, por el índice (cliente, inicio)."""
+        if obj is None or obj.pk is None:
+            return '-'
+        turnos = clientes.historial(obj).select_related('servicio')[:self.turnos_en_historial]
+        lineas = format_html_join(
+            '', '<li><a href="{}">{}</a> {}{}</li>',
+            (
+                (
+                    reverse('admin:core_turno_change', args=[t.pk]),
+                    timezone.localtime(t.fecha_hora_inicio).strftime('%Y-%m-%d %H:%M'),
+                    t.servicio.nombre,
+                    ' (cancelado)' if t.cancelado_en else ' (confirmado)' if t.confirmado else '',
+                )
+                for t in turnos
+            ),
+        )
+        todos = f"{reverse('admin:core_turno_changelist')}?cliente__id__exact={obj.pk}"
+        return format_html('<ul>{}</ul><a href="{}">Ver todos sus turnos</a>', lineas, todos)
+    historial.short_description = 'Historial'
+
+
+class ContactoAdmin(BusquedaDeTextoMixin, ExportarMixin, admin.ModelAdmin):
+    list_display = ('nombre', 'email', 'creado_en')
+    search_fields = ('nombre', 'email', 'mensaje')
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+    actions = ['exportar_csv', 'exportar_jsonl']
+
+
+class ListaEsperaAdmin(admin.ModelAdmin):
+    list_display = ('cliente_nombre', 'cliente_email', 'servicio', 'fecha', 'desde', 'hasta', 'creado_en', 'inicio_ofrecido')
+    list_filter = ('servicio', 'fecha')
+    search_fields = ('cliente_nombre', 'cliente_email', 'cliente_telefono')
+    list_select_related = ('servicio',)
+    readonly_fields = ('ofrecido_en', 'inicio_ofrecido')
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+
+
+class EventoAdmin(admin.ModelAdmin):
+    list_display = ('clave', 'tipo', 'estado', 'intentos', 'disponible_en', 'procesado_en')
+    list_filter = ('estado', 'tipo')
+    search_fields = ('clave',)
+    readonly_fields = ('tipo', 'clave', 'datos', 'intentos', 'creado_en', 'procesado_en', 'ultimo_error')
+    ordering = ('-pk',)
+    paginator = ConteoEstimadoPaginator
+    show_full_result_count = False
+    actions = ['reintentar']
+
+    def reintentar(self, request, queryset):
+        """Acción de admin: vuelve a dejar pendientes (desde ya) los eventos elegidos."""
+        cantidad = queryset.exclude(estado=Evento.HECHO).update(
+            estado=Evento.PENDIENTE, intentos=0, disponible_en=timezone.now(),
+        )
+        self.message_user(request, f"{cantidad} evento(s) pendientes otra vez.")
+    reintentar.short_description = 'Reintentar ahora'
+
+
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    """El listado es el tablero: totales del rango `?desde=&hasta=` por servicio y por mes."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        desde, hasta = analitica.rango_por_defecto()
+        try:
+            desde = parse_date(request.GET.get('desde', '')) or desde
+            hasta = parse_date(request.GET.get('hasta', '')) or hasta
+        except ValueError:
+            pass
+        if hasta < desde:
+            desde, hasta = hasta, desde
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Ocupación e ingresos',
+            'tablero': analitica.tablero(desde, hasta),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/core/resumendiario/tablero.html', context)
 
 
 # Finalmente registramos los modelos con sus clases Admin
 admin.site.register(Servicio, ServicioAdmin)
 admin.site.register(Reserva, ReservaAdmin)
 admin.site.register(Turno, TurnoAdmin)
-admin.site.register(Contacto)
+admin.site.register(Recurso, RecursoAdmin)
+admin.site.register(Cliente, ClienteAdmin)
+admin.site.register(Contacto, ContactoAdmin)
+admin.site.register(ListaEspera, ListaEsperaAdmin)
+admin.site.register(Evento, EventoAdmin)
+admin.site.register(ResumenDiario, ResumenDiarioAdmin)
 
 # NOTAS (comentadas para tu referencia):
 # - Una vez registrado `Servicio` con `ServicioAdmin`, entra a /admin/ con tu
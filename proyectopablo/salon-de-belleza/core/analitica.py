@@ -0,0 +1,227 @@
+"""
+core.analitica
+--------------
+Resumen diario de ocupación e ingresos (`ResumenDiario`) para el tablero del
+admin.
+
+Cada fila es una "celda" (servicio, día en hora local) con la cantidad de
+turnos, los confirmados, los minutos reservados, los minutos disponibles (el
+horario `RESERVATION_START_HOUR`-`RESERVATION_END_HOUR` por la cantidad de
+recursos activos del servicio, como mínimo uno) y los ingresos
+(`Servicio.precio` por turno confirmado). El tablero sólo lee estas filas.
+
+Actualización incremental: al guardar o borrar un `Turno` (señales
+`post_save`/`post_delete`) se encola en la bandeja de salida un evento
+`resumen` por cada celda afectada (la de antes y la de ahora, si el turno se
+movió); `crear_turnos`, las acciones en bloque del admin y `import_turnos`
+encolan las de sus turnos en la misma sentencia que sus otros eventos. El
+worker (`manage.py run_outbox`) recalcula cada celda pendiente desde los
+turnos con `recalcular`: es idempotente, así que un reintento o dos cambios
+seguidos en el mismo día no descuadran los totales, y una ráfaga de reservas
+en un día se recalcula una sola vez.
+
+`manage.py rebuild_resumenes` (`reconstruir`) recalcula la tabla entera: tras
+migrar, después de cambiar precios o recursos (que no reabren las celdas
+pasadas) o tras modificar turnos con `QuerySet.update()` por fuera de estos
+caminos.
+"""
+
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .lista_espera import eventos_de_hueco
+from .models import Evento, ResumenDiario, Servicio, Turno
+
+# Celdas que se recalculan por consulta y filas por INSERT al reconstruir.
+TAMANO_BLOQUE = 500
+
+# Campos de `Turno.CAMPOS_SEGUIDOS` que cambian el resumen.
+CAMPOS_DEL_RESUMEN = {'servicio_id', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado'}
+
+
+def celda_de(servicio_id, inicio):
+    """La celda `(servicio_id, fecha local)` de un turno de `servicio_id` que empieza en `inicio`."""
+    return servicio_id, timezone.localdate(inicio)
+
+
+def eventos_de_resumen(celdas):
+    """Un `Evento` `resumen` (sin guardar) por cada celda distinta de `celdas`."""
+    return [Evento.de_resumen(servicio_id, fecha) for servicio_id, fecha in sorted(set(celdas))]
+
+
+def minutos_de_atencion():
+    """Minutos que el salón atiende por día (`RESERVATION_START_HOUR` a `RESERVATION_END_HOUR`)."""
+    start = getattr(settings, 'RESERVATION_START_HOUR', 9)
+    end = getattr(settings, 'RESERVATION_END_HOUR', 18)
+    return max(end - start, 0) * 60
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _datos_de_servicios(servicio_ids, using):
+    """`{pk: (precio, minutos disponibles por día)}` de los servicios, en una consulta."""
+    por_dia = minutos_de_atencion()
+    filas = Servicio.objects.using(using).filter(pk__in=servicio_ids).annotate(
+        recursos_activos=Count('recursos', filter=Q(recursos__activo=True)),
+    ).values_list('pk', 'precio', 'recursos_activos')
+    return {pk: (precio, por_dia * max(recursos, 1)) for pk, precio, recursos in filas}
+
+
+def _acumular(filas, servicios):
+    """`{celda: ResumenDiario}` (sin guardar) de las filas `(servicio_id, inicio, fin, confirmado)`."""
+    resumenes = {}
+    for servicio_id, inicio, fin, confirmado in filas:
+        celda = celda_de(servicio_id, inicio)
+        precio, disponibles = servicios.get(servicio_id, (Decimal(0), 0))
+        resumen = resumenes.get(celda)
+        if resumen is None:
+            resumen = resumenes[celda] = ResumenDiario(
+                servicio_id=servicio_id, fecha=celda[1], minutos_disponibles=disponibles, ingresos=Decimal(0),
+            )
+        resumen.turnos += 1
+        resumen.minutos_reservados += int((fin - inicio).total_seconds()) // 60
+        if confirmado:
+            resumen.confirmados += 1
+            resumen.ingresos += precio
+    return resumenes
+
+
+def _guardar(resumenes, using):
+    ResumenDiario.objects.using(using).bulk_create(
+        resumenes,
+        batch_size=TAMANO_BLOQUE,
+        update_conflicts=True,
+        unique_fields=['fecha', 'servicio'],
+        update_fields=['turnos', 'confirmados', 'minutos_reservados', 'minutos_disponibles', 'ingresos'],
+    )
+
+
+def recalcular(celdas, using=None):
+    """Recalcula desde los turnos el `ResumenDiario` de cada celda `(servicio_id, fecha)`.
+
+    Por cada bloque de `TAMANO_BLOQUE` celdas: una consulta de sus turnos (un
+    rango del índice (servicio, inicio, fin) por celda), una de los servicios,
+    un upsert y un DELETE de las celdas que quedaron sin turnos.
+    """
+    using = using or router.db_for_write(ResumenDiario)
+    celdas = sorted(set(celdas))
+    for desde in range(0, len(celdas), TAMANO_BLOQUE):
+        bloque = celdas[desde:desde + TAMANO_BLOQUE]
+        condicion = Q()
+        for servicio_id, fecha in bloque:
+            condicion |= Q(
+                servicio_id=servicio_id,
+                fecha_hora_inicio__gte=_inicio_del_dia(fecha),
+                fecha_hora_inicio__lt=_inicio_del_dia(fecha + timedelta(days=1)),
+            )
+        filas = Turno.objects.using(using).vigentes().filter(condicion).order_by().values_list(
+            'servicio_id', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado',
+        )
+        servicios = _datos_de_servicios({s for s, _ in bloque}, using)
+        with transaction.atomic(using=using):
+            resumenes = _acumular(filas, servicios)
+            _guardar(list(resumenes.values()), using)
+            vacias = Q()
+            for servicio_id, fecha in bloque:
+                if (servicio_id, fecha) not in resumenes:
+                    vacias |= Q(servicio_id=servicio_id, fecha=fecha)
+            if vacias:
+                ResumenDiario.objects.using(using).filter(vacias).delete()
+
+
+def reconstruir(using=None, tamano_bloque=2000):
+    """Vuelve a calcular toda la tabla desde los turnos; devuelve las celdas escritas.
+
+    Los turnos se leen de a bloques (`values_list` + `iterator`) y se acumulan
+    por celda en memoria: el tamaño depende de los días con turnos, no de los
+    turnos. El borrado y los INSERT van en una transacción.
+    """
+    using = using or router.db_for_write(ResumenDiario)
+    servicios = _datos_de_servicios(Servicio.objects.using(using).values('pk'), using)
+    filas = Turno.objects.using(using).vigentes().order_by().values_list(
+        'servicio_id', 'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado',
+    ).iterator(chunk_size=tamano_bloque)
+    resumenes = _acumular(filas, servicios)
+    with transaction.atomic(using=using):
+        ResumenDiario.objects.using(using).all().delete()
+        ResumenDiario.objects.using(using).bulk_create(resumenes.values(), batch_size=TAMANO_BLOQUE)
+    return len(resumenes)
+
+
+# --- Señales ---
+
+@receiver(post_save, sender=Turno)
+def _turno_guardado(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw or not (created or instance.campos_modificados() & CAMPOS_DEL_RESUMEN):
+        return
+    # `post_save` llega antes de que `Turno.save()` recuerde el estado nuevo:
+    # `_estado_guardado` todavía es el de antes (la celda vieja, si se movió).
+    celdas = [celda_de(instance.servicio_id, instance.fecha_hora_inicio)]
+    previo = instance._estado_guardado
+    if 'servicio_id' in previo and 'fecha_hora_inicio' in previo:
+        celdas.append(celda_de(previo['servicio_id'], previo['fecha_hora_inicio']))
+    pendientes = getattr(instance, '_eventos_pendientes', None)
+    if pendientes is not None:
+        # Dentro de `Turno.save()`: va en el mismo INSERT que la sincronización.
+        pendientes.extend(eventos_de_resumen(celdas))
+    else:
+        Evento.objects.using(using).encolar(eventos_de_resumen(celdas), reiniciar=True)
+
+
+@receiver(post_delete, sender=Turno)
+def _turno_borrado(sender, instance, using=None, **kwargs):
+    # En el mismo INSERT, el hueco que deja para la lista de espera. Uno
+    # cancelado ya no ocupaba nada: su hueco se ofreció al cancelarlo.
+    huecos = eventos_de_hueco(instance) if instance.cancelado_en is None else []
+    Evento.objects.using(using).encolar(
+        eventos_de_resumen([celda_de(instance.servicio_id, instance.fecha_hora_inicio)]) + huecos,
+        reiniciar=True,
+    )
+
+
+# --- Tablero ---
+
+def tablero(desde, hasta, using=None):
+    """Totales de [desde, hasta] por servicio y por mes, leídos sólo de `ResumenDiario`.
+
+    Dos consultas agregadas sobre el índice (fecha, servicio). Cada fila es un
+    dict con `turnos`, `confirmados`, `minutos_reservados`,
+    `minutos_disponibles`, `ingresos` y `utilizacion` (0 a 1, o None).
+    """
+    resumenes = ResumenDiario.objects.using(using or router.db_for_read(ResumenDiario)).filter(
+        fecha__gte=desde, fecha__lte=hasta,
+    )
+    totales = {
+        'turnos': Sum('turnos'),
+        'confirmados': Sum('confirmados'),
+        'minutos_reservados': Sum('minutos_reservados'),
+        'minutos_disponibles': Sum('minutos_disponibles'),
+        'ingresos': Sum('ingresos'),
+    }
+    por_servicio = list(
+        resumenes.values('servicio_id', 'servicio__nombre').annotate(**totales).order_by('servicio__nombre')
+    )
+    por_mes = list(resumenes.annotate(mes=TruncMonth('fecha')).values('mes').annotate(**totales).order_by('mes'))
+    total = {campo: sum(fila[campo] for fila in por_mes) for campo in totales}
+    for fila in [*por_servicio, *por_mes, total]:
+        fila['utilizacion'] = (
+            fila['minutos_reservados'] / fila['minutos_disponibles'] if fila['minutos_disponibles'] else None
+        )
+    return {'desde': desde, 'hasta': hasta, 'por_servicio': por_servicio, 'por_mes': por_mes, 'total': total}
+
+
+def rango_por_defecto(hoy=None):
+    """Los últimos 365 días hasta `hoy` (incluido)."""
+    hoy = hoy or timezone.localdate()
+    return hoy - timedelta(days=364), hoy
+
@@ -0,0 +1,291 @@
+"""
+core.api
+--------
+API JSON para integraciones (socios, app móvil), bajo `/api/`:
+
+- `GET  /api/servicios/`: el catálogo, con un `ETag` por versión del catálogo
+  (ver `core.cache_publico`); un cliente que revalida recibe 304.
+- `GET  /api/disponibilidad/?servicio=&desde=&hasta=`: franjas libres, con los
+  mismos parámetros que `disponibilidad_view`.
+- `POST /api/turnos/`: crea un turno.
+- `POST /api/turnos/lote/`: crea hasta `API_MAX_BATCH_SIZE` turnos en una
+  transacción, todos o ninguno (`core.reservas.crear_turnos`).
+- `GET  /api/turnos/?desde=&hasta=&servicio=&limite=&cursor=`: turnos por
+  rango de fechas, paginados por clave (`fecha_hora_inicio`, `id`): cada
+  página es un rango del índice `turno_inicio_id_idx`, sin OFFSET ni COUNT, y
+  `siguiente` es el cursor de la página siguiente.
+- `GET  /api/clientes/?telefono=|email=&limite=`: el cliente de un teléfono o
+  email (escritos de cualquier forma; se normalizan como al guardarlos) y
+  sus últimos turnos: una consulta por un índice único de `Cliente` y otra
+  por el índice (cliente, inicio) de `Turno` (ver `core.clientes`).
+
+Los endpoints de turnos exigen `Authorization: Bearer <token>` con alguno de
+`API_TOKENS` (sin cookies, así que no usan CSRF). Los listados se arman con
+`.values()`, sin instanciar modelos.
+
+Un turno se describe como en el formulario de reserva:
+`{"servicio": id, "inicio": "2030-01-15T10:00", "cliente_nombre": ...,
+"cliente_telefono": ..., "cliente_email": ...}`; `inicio` sin zona horaria es
+hora local.
+"""
+
+import base64
+import hmac
+import json
+from datetime import datetime, time, timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET, require_http_methods, require_POST
+
+from . import clientes
+from .cache_publico import catalogo, segundos_en_cache, servicios_de_la_primaria, version_catalogo
+from .disponibilidad import duracion_de, franjas_libres
+from .models import Turno
+from .reservas import HorarioNoDisponible, crear_turnos
+from .views import consulta_de_disponibilidad
+
+# Campos de un turno en las respuestas. Un turno con `cancelado_en` ya no
+# ocupa la agenda (ver `Turno.cancelado_en`).
+CAMPOS_DE_TURNO = (
+    'id', 'servicio_id', 'recurso_id', 'cliente_id', 'cliente_nombre', 'cliente_telefono', 'cliente_email',
+    'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado', 'cancelado_en',
+)
+CAMPOS_DE_SERVICIO = ('id', 'nombre', 'descripcion', 'duracion_minutos', 'precio')
+CAMPOS_DE_CLIENTE = ('id', 'nombre', 'telefono', 'email')
+
+
+def _error(mensaje, status=400, **extra):
+    return JsonResponse({'error': mensaje, **extra}, status=status)
+
+
+def con_token(vista):
+    """Decorador: exige un token de `API_TOKENS` en `Authorization: Bearer`."""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        esquema, _, token = request.headers.get('Authorization', '').partition(' ')
+        if esquema.lower() != 'bearer' or not any(
+            hmac.compare_digest(token.encode(), valido.encode()) for valido in getattr(settings, 'API_TOKENS', [])
+        ):
+            respuesta = _error('Token no válido.', status=401)
+            respuesta['WWW-Authenticate'] = 'Bearer'
+            return respuesta
+        return vista(request, *args, **kwargs)
+    return csrf_exempt(envoltura)
+
+
+def _leer_json(request):
+    try:
+        return json.loads(request.body)
+    except (UnicodeDecodeError, ValueError):
+        raise ValueError('El cuerpo no es JSON válido.')
+
+
+# --- Servicios ---
+
+def _etag_servicios(request):
+    return f'servicios-{version_catalogo()}'
+
+
+@require_GET
+@condition(etag_func=_etag_servicios)
+def servicios(request):
+    clave = f'api:servicios:{version_catalogo()}'
+    filas = cache.get(clave)
+    if filas is None:
+        filas = list(servicios_de_la_primaria().order_by('pk').values(*CAMPOS_DE_SERVICIO))
+        cache.set(clave, filas, segundos_en_cache())
+    respuesta = JsonResponse({'servicios': filas})
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+# --- Disponibilidad ---
+
+@require_GET
+def disponibilidad(request):
+    try:
+        servicio, desde, hasta = consulta_de_disponibilidad(request.GET)
+    except ValueError as exc:
+        return _error(str(exc))
+    return JsonResponse({
+        'servicio': servicio.pk,
+        'dias': [
+            {'fecha': dia, 'franjas': [{'inicio': f.inicio, 'fin': f.fin, 'recomendada': f.recomendada} for f in franjas]}
+            for dia, franjas in franjas_libres(servicio, desde, hasta).items()
+        ],
+    })
+
+
+# --- Turnos ---
+
+def _turno_de(datos, servicios):
+    """`Turno` sin guardar a partir del JSON `datos`; lanza `ValidationError`."""
+    if not isinstance(datos, dict):
+        raise ValidationError('Cada turno debe ser un objeto.')
+    valor = datos.get('servicio')
+    # Una lista o un objeto no se pueden buscar en el diccionario (`TypeError`).
+    servicio = servicios.get(valor) if isinstance(valor, int) and not isinstance(valor, bool) else None
+    if servicio is None:
+        raise ValidationError('Servicio no válido.')
+    try:
+        inicio = parse_datetime(str(datos.get('inicio', '')))
+    except ValueError:
+        inicio = None
+    if inicio is None:
+        raise ValidationError('Formato de fecha/hora no válido.')
+    if timezone.is_naive(inicio):
+        inicio = timezone.make_aware(inicio)
+    turno = Turno(
+        servicio=servicio,
+        cliente_nombre=str(datos.get('cliente_nombre', '')).strip(),
+        cliente_telefono=str(datos.get('cliente_telefono', '')).strip(),
+        cliente_email=str(datos.get('cliente_email', '')).strip(),
+        fecha_hora_inicio=inicio,
+        fecha_hora_fin=inicio + duracion_de(servicio),
+        confirmado=False,
+    )
+    # Lo mismo que valida `Turno.save()`; el servicio ya se comprobó.
+    turno.full_clean(exclude=['servicio', 'recurso'], validate_unique=False, validate_constraints=False)
+    return turno
+
+
+def _como_dict(turno):
+    return {campo: getattr(turno, campo) for campo in CAMPOS_DE_TURNO}
+
+
+@require_http_methods(['GET', 'POST'])
+@con_token
+def turnos(request):
+    if request.method == 'GET':
+        return _listar_turnos(request)
+    try:
+        turno = _turno_de(_leer_json(request), {s.pk: s for s in catalogo()})
+    except ValueError as exc:
+        return _error(str(exc))
+    except ValidationError as exc:
+        return _error('Turno no válido.', errores=exc.messages)
+    try:
+        turno, = crear_turnos([turno])
+    except HorarioNoDisponible:
+        return _error('El horario se solapa con otra reserva.', status=409)
+    return JsonResponse(_como_dict(turno), status=201)
+
+
+@require_POST
+@con_token
+def turnos_en_lote(request):
+    """Crea todos los turnos de `{"turnos": [...]}` o ninguno.
+
+    Responde 400 con `errores` (`{posición: [mensajes]}`) si alguno no es
+    válido y 409 con `conflictos` (posiciones) si alguno no cabe.
+    """
+    try:
+        pedidos = _leer_json(request)
+    except ValueError as exc:
+        return _error(str(exc))
+    pedidos = pedidos.get('turnos') if isinstance(pedidos, dict) else None
+    maximo = getattr(settings, 'API_MAX_BATCH_SIZE', 100)
+    if not isinstance(pedidos, list) or not 1 <= len(pedidos) <= maximo:
+        return _error(f'Se esperaba "turnos" con entre 1 y {maximo} turnos.')
+
+    servicios = {s.pk: s for s in catalogo()}
+    nuevos, errores = [], {}
+    for posicion, datos in enumerate(pedidos):
+        try:
+            nuevos.append(_turno_de(datos, servicios))
+        except ValidationError as exc:
+            errores[posicion] = exc.messages
+    if errores:
+        return _error('Hay turnos no válidos.', errores=errores)
+
+    try:
+        creados = crear_turnos(nuevos)
+    except HorarioNoDisponible as exc:
+        return _error('Hay turnos que se solapan con otras reservas.', status=409, conflictos=exc.conflictos)
+    return JsonResponse({'turnos': [_como_dict(t) for t in creados]}, status=201)
+
+
+def _codificar_cursor(inicio, pk):
+    return base64.urlsafe_b64encode(f'{inicio.isoformat()}|{pk}'.encode()).decode().rstrip('=')
+
+
+def _decodificar_cursor(cursor):
+    try:
+        inicio, _, pk = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().partition('|')
+        return datetime.fromisoformat(inicio), int(pk)
+    except ValueError:
+        raise ValueError('Cursor no válido.')
+
+
+def _listar_turnos(request):
+    params = request.GET
+    try:
+        desde = parse_date(params.get('desde', '') or '')
+        hasta = parse_date(params['hasta']) if params.get('hasta') else desde
+    except ValueError:
+        # Con el formato bien pero un día que no existe (2025-02-30).
+        desde = hasta = None
+    if desde is None or hasta is None or hasta < desde:
+        return _error('Rango de fechas no válido.')
+    try:
+        limite = int(params.get('limite', 100))
+        servicio = int(params['servicio']) if params.get('servicio') else None
+    except ValueError:
+        return _error('Parámetros no válidos.')
+    maximo = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+    if not 1 <= limite <= maximo:
+        return _error(f'`limite` debe estar entre 1 y {maximo}.')
+    try:
+        cursor = _decodificar_cursor(params['cursor']) if params.get('cursor') else None
+    except ValueError as exc:
+        return _error(str(exc))
+
+    filas = Turno.objects.filter(
+        fecha_hora_inicio__gte=timezone.make_aware(datetime.combine(desde, time.min)),
+        fecha_hora_inicio__lt=timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min)),
+    )
+    if servicio is not None:
+        filas = filas.filter(servicio=servicio)
+    if cursor is not None:
+        inicio, pk = cursor
+        filas = filas.filter(Q(fecha_hora_inicio__gt=inicio) | Q(fecha_hora_inicio=inicio, pk__gt=pk))
+    # Una fila de más para saber si hay otra página.
+    pagina = list(filas.order_by('fecha_hora_inicio', 'pk').values(*CAMPOS_DE_TURNO)[:limite + 1])
+    siguiente = None
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        siguiente = _codificar_cursor(pagina[-1]['fecha_hora_inicio'], pagina[-1]['id'])
+    return JsonResponse({'turnos': pagina, 'siguiente': siguiente})
+
+
+# --- Clientes ---
+
+@require_GET
+@con_token
+def cliente(request):
+    """El cliente de `?telefono=` o `?email=` y sus `limite` turnos más recientes."""
+    try:
+        limite = int(request.GET.get('limite', 100))
+    except ValueError:
+        return _error('Parámetros no válidos.')
+    maximo = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+    if not 1 <= limite <= maximo:
+        return _error(f'`limite` debe estar entre 1 y {maximo}.')
+    telefono, email = request.GET.get('telefono', ''), request.GET.get('email', '')
+    if not any(clientes.clave_de(telefono, email)):
+        return _error('Se esperaba un `telefono` o un `email` válido.')
+    encontrado = clientes.buscar(telefono, email)
+    if encontrado is None:
+        return _error('Cliente no encontrado.', status=404)
+    return JsonResponse({
+        'cliente': {campo: getattr(encontrado, campo) for campo in CAMPOS_DE_CLIENTE},
+        'turnos': list(clientes.historial(encontrado).values(*CAMPOS_DE_TURNO)[:limite]),
+    })
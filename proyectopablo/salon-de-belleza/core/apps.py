@@ -7,3 +7,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Registra las señales que invalidan la caché de páginas públicas, las
+        # que mantienen el resumen diario (y ofrecen los turnos borrados a la
+        # lista de espera), la que repara los triggers de búsqueda tras
+        # `migrate` y la que mide las consultas de cada conexión nueva (antes
+        # de que se abra la primera).
+        from . import analitica, busqueda, cache_publico, metricas  # noqa: F401
@@ -0,0 +1,235 @@
+"""
+core.busqueda
+-------------
+Búsqueda de texto completo en `Servicio`, `Turno` y `Contacto`, sin
+distinguir mayúsculas ni acentos ("unas" encuentra "Uñas").
+
+Un `LIKE '%...%'` (`icontains`, lo que hacen los `search_fields` del admin)
+recorre la tabla entera y compara cada columna. Aquí cada modelo tiene un
+índice de sus columnas de texto (`INDICES`) y `filtrar()` busca ahí:
+
+- SQLite: una tabla virtual FTS5 por modelo (`<tabla>_fts`, tokenizador
+  `unicode61 remove_diacritics 2`) con el contenido externo en la tabla del
+  modelo. La mantienen triggers `AFTER INSERT/UPDATE/DELETE`, así que
+  también ven `bulk_create`, `QuerySet.update()` y el SQL a mano.
+- PostgreSQL: un índice GIN sobre `to_tsvector` de las columnas con la
+  configuración `core_busqueda` (`simple` más `unaccent`); no hay nada que
+  mantener.
+
+Cada palabra del texto buscado es un prefijo ("pel" encuentra "Peluquería") y
+tienen que estar todas en la misma fila. Sin búsqueda de texto completo (otra
+base, o SQLite sin FTS5) `filtrar()` devuelve None y el admin vuelve a los
+`search_fields`.
+
+La migración 0013 crea los índices (con su propia copia de este SQL). En
+SQLite, una migración posterior que rehaga la tabla de un modelo
+(`AlterField`, por ejemplo) borra sus triggers: al terminar `migrate`
+(`post_migrate`) se vuelven a crear los que falten y se reconstruye ese
+índice.
+"""
+
+import re
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_migrate
+from django.dispatch import receiver
+
+# Configuración de búsqueda de texto de PostgreSQL.
+CONFIGURACION = 'core_busqueda'
+
+# Palabras que se toman del texto buscado.
+MAXIMO_DE_TERMINOS = 8
+
+# alias -> si la base tiene los índices (se consulta una vez por proceso).
+_DISPONIBLE = {}
+
+
+class Indice(NamedTuple):
+    tabla: str
+    columnas: tuple
+
+    @property
+    def fts(self):
+        return f'{self.tabla}_fts'
+
+
+INDICES = (
+    Indice('core_servicio', ('nombre', 'descripcion')),
+    Indice('core_turno', ('cliente_nombre', 'cliente_telefono', 'cliente_email')),
+    Indice('core_contacto', ('nombre', 'email', 'mensaje')),
+)
+
+
+def indice_de(modelo):
+    """El `Indice` de la clase `modelo`, o None si no tiene."""
+    return next((i for i in INDICES if i.tabla == modelo._meta.db_table), None)
+
+
+def terminos(texto):
+    """Las palabras (letras y dígitos) de `texto`, en minúsculas."""
+    return re.findall(r'[^\W_]+', (texto or '').lower())[:MAXIMO_DE_TERMINOS]
+
+
+# --- SQL por base ---
+
+def _sql_sqlite(indice, connection):
+    qn = connection.ops.quote_name
+    fts, tabla = qn(indice.fts), qn(indice.tabla)
+    columnas = ', '.join(qn(c) for c in indice.columnas)
+    nuevos = ', '.join(f'new.{qn(c)}' for c in indice.columnas)
+    viejos = ', '.join(f'old.{qn(c)}' for c in indice.columnas)
+    insertar = f'INSERT INTO {fts} (rowid, {columnas}) VALUES (new.id, {nuevos});'
+    borrar = f"INSERT INTO {fts} ({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejos});"
+    tabla_virtual = (
+        f'CREATE VIRTUAL TABLE {fts} USING fts5({columnas}, content={tabla}, content_rowid=id, '
+        f"tokenize='unicode61 remove_diacritics 2')"
+    )
+    triggers = {
+        f'{indice.fts}_ai': f'AFTER INSERT ON {tabla} BEGIN {insertar} END',
+        f'{indice.fts}_ad': f'AFTER DELETE ON {tabla} BEGIN {borrar} END',
+        f'{indice.fts}_au': f'AFTER UPDATE OF id, {columnas} ON {tabla} BEGIN {borrar} {insertar} END',
+    }
+    return tabla_virtual, {nombre: f'CREATE TRIGGER {qn(nombre)} {cuerpo}' for nombre, cuerpo in triggers.items()}
+
+
+def _documento_postgresql(indice, connection):
+    qn = connection.ops.quote_name
+    texto = " || ' ' || ".join(f"coalesce({qn(c)}, '')" for c in indice.columnas)
+    return f"to_tsvector('{CONFIGURACION}', {texto})"
+
+
+def _fts5_disponible(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'")
+        return cursor.fetchone() is not None
+
+
+def instalar(connection, crear=True):
+    """Crea los índices que falten en la base de `connection`; devuelve los reconstruidos.
+
+    En SQLite, con `crear=False` sólo repara: vuelve a crear los triggers que
+    falten de las tablas FTS5 que ya existen y reconstruye esas tablas.
+    """
+    _DISPONIBLE.pop(connection.alias, None)
+    if connection.vendor == 'postgresql':
+        if crear:
+            with connection.cursor() as cursor:
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+                cursor.execute(f'''
+                    DO $$ BEGIN
+                        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{CONFIGURACION}') THEN
+                            CREATE TEXT SEARCH CONFIGURATION {CONFIGURACION} (COPY = simple);
+                            ALTER TEXT SEARCH CONFIGURATION {CONFIGURACION}
+                                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+                        END IF;
+                    END $$
+                ''')
+                for indice in INDICES:
+                    cursor.execute(
+                        f'CREATE INDEX IF NOT EXISTS {indice.tabla}_busqueda_idx '
+                        f'ON {connection.ops.quote_name(indice.tabla)} USING GIN ({_documento_postgresql(indice, connection)})'
+                    )
+        return []
+    if connection.vendor != 'sqlite' or not _fts5_disponible(connection):
+        return []
+
+    reconstruidos = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = {fila[0] for fila in cursor.fetchall()}
+        for indice in INDICES:
+            if indice.fts not in existentes and not crear:
+                continue
+            tabla_virtual, triggers = _sql_sqlite(indice, connection)
+            faltan = [sql for nombre, sql in triggers.items() if nombre not in existentes]
+            if indice.fts not in existentes:
+                cursor.execute(tabla_virtual)
+            elif not faltan:
+                continue
+            for sql in faltan:
+                cursor.execute(sql)
+            fts = connection.ops.quote_name(indice.fts)
+            cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            reconstruidos.append(indice.tabla)
+    return reconstruidos
+
+
+def desinstalar(connection):
+    """Borra los índices (y sus triggers) de la base de `connection`."""
+    _DISPONIBLE.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        for indice in INDICES:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {indice.tabla}_busqueda_idx')
+            elif connection.vendor == 'sqlite':
+                for sufijo in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {connection.ops.quote_name(f"{indice.fts}_{sufijo}")}')
+                cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(indice.fts)}')
+
+
+@receiver(post_migrate)
+def _reparar_triggers(sender, using='default', **kwargs):
+    if sender.name == 'core':
+        instalar(connections[using], crear=False)
+
+
+# --- Consultas ---
+
+
+def disponible(using):
+    """Si la base `using` tiene los índices de búsqueda."""
+    if using not in _DISPONIBLE:
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [f'{INDICES[0].tabla}_busqueda_idx'])
+                _DISPONIBLE[using] = cursor.fetchone() is not None
+        elif connection.vendor == 'sqlite':
+            _DISPONIBLE[using] = INDICES[0].fts in connection.introspection.table_names()
+        else:
+            _DISPONIBLE[using] = False
+    return _DISPONIBLE[using]
+
+
+def coincidencias(modelo, texto, using=None):
+    """`RawSQL` con los pks de `modelo` cuyo índice tiene todas las palabras de `texto`, o None.
+
+    None si la base no tiene búsqueda de texto completo; un texto sin
+    palabras no coincide con nada.
+    """
+    using = using or router.db_for_read(modelo)
+    indice = indice_de(modelo)
+    if indice is None or not disponible(using):
+        return None
+    palabras = terminos(texto)
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    if not palabras:
+        return RawSQL(f'SELECT {qn("id")} FROM {qn(indice.tabla)} WHERE 1 = 0', [])
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            f'SELECT {qn("id")} FROM {qn(indice.tabla)} '
+            f"WHERE {_documento_postgresql(indice, connection)} @@ to_tsquery('{CONFIGURACION}', %s)",
+            [' & '.join(f'{p}:*' for p in palabras)],
+        )
+    return RawSQL(
+        f'SELECT rowid FROM {qn(indice.fts)} WHERE {qn(indice.fts)} MATCH %s',
+        [' '.join(f'"{p}"*' for p in palabras)],
+    )
+
+
+def filtrar(queryset, texto):
+    """`queryset` con sólo las filas que tienen todas las palabras de `texto`, o None si no hay índice."""
+    sql = coincidencias(queryset.model, texto, queryset.db)
+    return None if sql is None else queryset.filter(pk__in=sql)
+
+
+async def afiltrar(queryset, texto):
+    """Versión asíncrona de `filtrar()`."""
+    if queryset.db not in _DISPONIBLE:
+        # Sólo la primera vez por base: la comprobación usa una consulta síncrona.
+        await sync_to_async(disponible)(queryset.db)
+    return filtrar(queryset, texto)
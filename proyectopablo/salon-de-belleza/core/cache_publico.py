@@ -0,0 +1,287 @@
+"""
+core.cache_publico
+------------------
+Caché de las páginas públicas (inicio, servicios, reserva exitosa y el
+formulario de reserva).
+
+- El catálogo de servicios tiene una versión guardada en la caché
+  (`version_catalogo()`); las señales `post_save`/`post_delete` de `Servicio`
+  la renuevan, así que las entradas de la versión anterior dejan de usarse.
+- `pagina_en_cache`: guarda el HTML completo de la vista por ruta (y por
+  versión del catálogo si la página lo muestra) y responde con `ETag` y
+  `Last-Modified`, de modo que un navegador que vuelve recibe un 304.
+- `condicional_por_catalogo`: para páginas que no se pueden compartir entre
+  usuarios (el formulario de reserva lleva el token CSRF). Sólo hace el GET
+  condicional con `ETag`, que incluye la cookie CSRF del navegador.
+- `catalogo()`: la lista de servicios, leída de la caché mientras no cambie.
+- `servicios_de_la_primaria()`: lo que se guarda con una versión del
+  catálogo se lee de la primaria, no de una réplica (ver
+  `salon_de_belleza.routers`): una réplica atrasada dejaría el catálogo
+  anterior guardado con la versión nueva hasta que vuelva a cambiar.
+
+Los dos decoradores aceptan vistas síncronas y asíncronas; con una vista
+`async def` usan la API asíncrona de la caché (`aget`/`aset`, salvo con locmem,
+que no hace E/S y se consulta sin salir del bucle) y `acatalogo()` lee el
+catálogo con el ORM asíncrono.
+
+Las páginas con mensajes pendientes (`django.contrib.messages`) nunca se
+sirven ni se guardan en caché: son distintas para cada visitante.
+
+El backend es el de `CACHES['default']`. Con una caché por proceso (locmem,
+la opción por defecto) cada proceso invalida sólo su copia; con varios
+procesos conviene una caché compartida (archivo o Redis).
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import Servicio
+
+CLAVE_VERSION = 'catalogo:version'
+
+
+def segundos_en_cache():
+    """Vigencia de las páginas en caché (`PUBLIC_PAGE_CACHE_SECONDS`; 0 la desactiva)."""
+    return getattr(settings, 'PUBLIC_PAGE_CACHE_SECONDS', 600)
+
+
+def version_catalogo():
+    """Versión actual del catálogo: microsegundos desde epoch de su último cambio."""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Caché vacía (arranque o expulsión): se empieza una versión nueva.
+        cache.add(CLAVE_VERSION, time.time_ns() // 1000, timeout=None)
+        version = cache.get(CLAVE_VERSION, time.time_ns() // 1000)
+    return version
+
+
+def _en_memoria():
+    return isinstance(caches['default'], LocMemCache)
+
+
+async def _aget(clave, default=None):
+    # `cache.aget` pasa por un hilo; locmem no hace E/S y se lee directamente.
+    return cache.get(clave, default) if _en_memoria() else await cache.aget(clave, default)
+
+
+async def _aset(clave, valor, timeout):
+    if _en_memoria():
+        cache.set(clave, valor, timeout)
+    else:
+        await cache.aset(clave, valor, timeout)
+
+
+async def aversion_catalogo():
+    """Versión asíncrona de `version_catalogo()`."""
+    version = await _aget(CLAVE_VERSION)
+    if version is None:
+        await cache.aadd(CLAVE_VERSION, time.time_ns() // 1000, timeout=None)
+        version = await _aget(CLAVE_VERSION, time.time_ns() // 1000)
+    return version
+
+
+def _fecha_de_version(version):
+    return datetime.fromtimestamp(version // 1_000_000, tz=dt_timezone.utc)
+
+
+@receiver([post_save, post_delete], sender=Servicio, dispatch_uid='cache_publico_invalidar_catalogo')
+def invalidar_catalogo(**kwargs):
+    """Renueva la versión del catálogo; las páginas guardadas con la anterior caducan."""
+    anterior = cache.get(CLAVE_VERSION, 0)
+    cache.set(CLAVE_VERSION, max(time.time_ns() // 1000, anterior + 1), timeout=None)
+
+
+def servicios_de_la_primaria():
+    """`Servicio.objects` en la base primaria, para lo que se guarda con la versión del catálogo."""
+    return Servicio.objects.using(router.db_for_write(Servicio))
+
+
+def catalogo():
+    """Lista de `Servicio`, desde la caché mientras el catálogo no cambie."""
+    clave = f'catalogo:servicios:{version_catalogo()}'
+    servicios = cache.get(clave)
+    if servicios is None:
+        servicios = list(servicios_de_la_primaria())
+        cache.set(clave, servicios, segundos_en_cache())
+    return servicios
+
+
+async def acatalogo():
+    """Versión asíncrona de `catalogo()`."""
+    clave = f'catalogo:servicios:{await aversion_catalogo()}'
+    servicios = await _aget(clave)
+    if servicios is None:
+        servicios = [servicio async for servicio in servicios_de_la_primaria()]
+        await _aset(clave, servicios, segundos_en_cache())
+    return servicios
+
+
+async def acargar_sesion(request):
+    """Carga la sesión con su API asíncrona.
+
+    Los mensajes que no entran en la cookie se guardan en la sesión; leerlos
+    desde una vista asíncrona consultaría la base con el ORM síncrono
+    (`SynchronousOnlyOperation`). Sin cookie de sesión no hay consulta.
+    """
+    if hasattr(request, 'session'):
+        await request.session.aget(SessionStorage.session_key)
+
+
+def _hay_mensajes(request):
+    return len(messages.get_messages(request)) > 0
+
+
+def _se_puede_cachear(request):
+    return request.method in ('GET', 'HEAD') and segundos_en_cache() > 0 and not _hay_mensajes(request)
+
+
+async def _ase_puede_cachear(request):
+    if request.method not in ('GET', 'HEAD') or segundos_en_cache() <= 0:
+        return False
+    await acargar_sesion(request)
+    return not _hay_mensajes(request)
+
+
+def _revalidar(response):
+    # El navegador puede guardar la página pero debe revalidarla (304) antes de usarla.
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _clave_de_pagina(vista, version, request):
+    return f'pagina:{vista.__name__}:{version}:{request.get_full_path()}'
+
+
+def _entrada_de(response, version, muestra_catalogo):
+    """Lo que se guarda en la caché de una respuesta, o None si no se puede guardar."""
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return None
+    return {
+        'contenido': response.content,
+        'tipo': response['Content-Type'],
+        'etag': quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest()),
+        'modificado': _fecha_de_version(version) if muestra_catalogo else datetime.now(dt_timezone.utc),
+    }
+
+
+def _responder_desde(request, entrada):
+    modificado = entrada['modificado'].timestamp()
+    response = get_conditional_response(request, etag=entrada['etag'], last_modified=modificado)
+    if response is None:
+        response = HttpResponse(entrada['contenido'], content_type=entrada['tipo'])
+    response.headers.setdefault('ETag', entrada['etag'])
+    response.headers.setdefault('Last-Modified', http_date(modificado))
+    return _revalidar(response)
+
+
+def pagina_en_cache(muestra_catalogo=False):
+    """Decorador: caché de página completa con `ETag`/`Last-Modified`.
+
+    `muestra_catalogo` indica que la página lista servicios, así que su clave
+    (y su `Last-Modified`) dependen de la versión del catálogo.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                if not await _ase_puede_cachear(request):
+                    return await vista(request, *args, **kwargs)
+
+                version = await aversion_catalogo() if muestra_catalogo else 0
+                clave = _clave_de_pagina(vista, version, request)
+                entrada = await _aget(clave)
+                if entrada is None:
+                    response = await vista(request, *args, **kwargs)
+                    entrada = _entrada_de(response, version, muestra_catalogo)
+                    if entrada is None:
+                        return response
+                    await _aset(clave, entrada, segundos_en_cache())
+                return _responder_desde(request, entrada)
+            return envoltura_asincrona
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if not _se_puede_cachear(request):
+                return vista(request, *args, **kwargs)
+
+            version = version_catalogo() if muestra_catalogo else 0
+            clave = _clave_de_pagina(vista, version, request)
+            entrada = cache.get(clave)
+            if entrada is None:
+                response = vista(request, *args, **kwargs)
+                entrada = _entrada_de(response, version, muestra_catalogo)
+                if entrada is None:
+                    return response
+                cache.set(clave, entrada, segundos_en_cache())
+            return _responder_desde(request, entrada)
+        return envoltura
+    return decorador
+
+
+def _etag_por_catalogo(vista, version, request, secreto):
+    # Sólo ETag: `If-Modified-Since` no distingue entre cookies CSRF.
+    return quote_etag(hashlib.md5(
+        f'{vista.__name__}:{version}:{request.get_full_path()}:{secreto}'.encode(),
+        usedforsecurity=False,
+    ).hexdigest())
+
+
+def condicional_por_catalogo(vista):
+    """Decorador: GET condicional para páginas que dependen del catálogo y del usuario.
+
+    No guarda el HTML (lleva el token CSRF), pero responde 304 si el navegador
+    ya tiene la página para la misma versión del catálogo, la misma ruta y la
+    misma cookie CSRF: cualquier token generado con esa cookie sigue siendo
+    válido.
+    """
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura_asincrona(request, *args, **kwargs):
+            secreto = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+            if not secreto or not await _ase_puede_cachear(request):
+                return await vista(request, *args, **kwargs)
+
+            etag = _etag_por_catalogo(vista, await aversion_catalogo(), request, secreto)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await vista(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response.headers.setdefault('ETag', etag)
+            return _revalidar(response)
+        return envoltura_asincrona
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not _se_puede_cachear(request):
+            return vista(request, *args, **kwargs)
+
+        secreto = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+        if not secreto:
+            # Primera visita: la respuesta crea la cookie; todavía no hay ETag.
+            return vista(request, *args, **kwargs)
+
+        etag = _etag_por_catalogo(vista, version_catalogo(), request, secreto)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = vista(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.headers.setdefault('ETag', etag)
+        return _revalidar(response)
+    return envoltura
@@ -0,0 +1,114 @@
+"""
+core.clientes
+-------------
+`Cliente` de cada turno, a partir de sus datos de contacto.
+
+Un turno guarda el nombre, el teléfono y el email tal como se escribieron.
+Aquí se normalizan (teléfono en E.164, email en minúsculas, ver
+`core.contactos`) y se busca su `Cliente`: primero por
+teléfono y, si no hay ninguno con ese teléfono, por email. Si no existe, se
+crea con el nombre del turno. Un turno sin teléfono válido ni email queda sin
+cliente.
+
+- `clientes_de` (y `clientes_por_clave`, con los datos ya normalizados):
+  resuelve una lista de contactos con una consulta por los índices únicos de
+  `Cliente` (más un `bulk_create` y otra consulta si hay clientes nuevos),
+  sin una consulta por turno.
+- `enlazar_turnos`: pone `Turno.cliente` en los turnos dados. Lo llama el
+  worker de la bandeja de salida (eventos `cliente`, que encolan
+  `Turno.save()` y `core.reservas.crear_turnos` en el mismo INSERT que sus
+  otros eventos); `import_turnos` enlaza cada bloque al insertarlo y la
+  migración 0012 los turnos que ya había
+  (`core.migraciones_de_datos.enlazar_clientes`).
+- `buscar` e `historial`: el cliente de un teléfono o email y sus turnos, por
+  el índice (cliente, inicio); los usan la API (`/api/clientes/`) y el admin.
+  `condicion_de_busqueda` es la búsqueda exacta por esos índices del cuadro
+  de búsqueda del admin.
+"""
+
+from django.db import router
+from django.db.models import Q
+
+from . import contactos
+from .contactos import clave_de, normalizar_email, normalizar_telefono
+from .models import Cliente, Turno
+
+
+def clientes_de(contactos, using=None, modelo=Cliente):
+    """`{clave_de(teléfono, email): pk del cliente}` de los contactos `(nombre, teléfono, email)`.
+
+    Ver `clientes_por_clave`.
+    """
+    nombres = {}
+    for nombre, telefono, email in contactos:
+        nombres.setdefault(clave_de(telefono, email), nombre)
+    return clientes_por_clave(nombres, using, modelo)
+
+
+def clientes_por_clave(nombres, using=None, modelo=Cliente):
+    """`{clave: pk del cliente}` de `nombres` (`{clave_de(teléfono, email): nombre}`).
+
+    Ver `core.contactos.clientes_por_clave`; `using` es, si no se da, la base
+    de escritura de `modelo`.
+    """
+    return contactos.clientes_por_clave(nombres, modelo, using or router.db_for_write(modelo))
+
+
+def enlazar_turnos(turno_ids, using=None):
+    """Pone en cada turno de `turno_ids` el cliente de sus datos actuales; devuelve los cambiados.
+
+    Una consulta de los turnos, las de `clientes_de` y un UPDATE por cliente
+    que cambia. Un turno cuyos datos ya no identifican a nadie queda sin
+    cliente; uno borrado se ignora.
+    """
+    using = using or router.db_for_write(Turno)
+    filas = list(Turno.objects.using(using).filter(pk__in=turno_ids).values_list(
+        'pk', 'cliente_id', 'cliente_nombre', 'cliente_telefono', 'cliente_email',
+    ))
+    clientes = clientes_de([fila[2:] for fila in filas], using)
+    cambios = {}
+    for pk, actual, _, telefono, email in filas:
+        cliente = clientes.get(clave_de(telefono, email))
+        if cliente != actual:
+            cambios.setdefault(cliente, []).append(pk)
+    for cliente, pks in cambios.items():
+        Turno.objects.using(using).filter(pk__in=pks).update(cliente=cliente)
+    return sum(len(pks) for pks in cambios.values())
+
+
+def buscar(telefono='', email='', using=None):
+    """El `Cliente` de `telefono` o, si no hay, de `email` (como los escriba el usuario), o None.
+
+    Una consulta por los índices únicos.
+    """
+    telefono, email = clave_de(telefono, email)
+    condicion = Q()
+    if telefono:
+        condicion |= Q(telefono=telefono)
+    if email:
+        condicion |= Q(email=email)
+    if not condicion:
+        return None
+    encontrados = list(Cliente.objects.using(using or router.db_for_read(Cliente)).filter(condicion).order_by())
+    return next((c for c in encontrados if telefono and c.telefono == telefono), None) or next(iter(encontrados), None)
+
+
+def condicion_de_busqueda(termino, prefijo=''):
+    """`Q` exacta por teléfono o email si `termino` es uno (normalizado), o None.
+
+    `prefijo` es el camino hasta el cliente (`'cliente__'` desde `Turno`).
+    """
+    termino = termino.strip()
+    if '@' in termino:
+        return Q(**{f'{prefijo}email': normalizar_email(termino)})
+    telefono = normalizar_telefono(termino)
+    if telefono and not any(c.isalpha() for c in termino):
+        return Q(**{f'{prefijo}telefono': telefono})
+    return None
+
+
+def historial(cliente, using=None):
+    """Turnos de `cliente`, del más reciente al más antiguo (rango del índice `turno_cliente_inicio_idx`)."""
+    return Turno.objects.using(using or router.db_for_read(Turno)).filter(cliente=cliente).order_by(
+        '-fecha_hora_inicio', '-pk',
+    )
@@ -0,0 +1,110 @@
+"""
+core.contactos
+--------------
+Datos de contacto de los clientes, sin importar los modelos de `core`: lo
+usan los modelos, `core.clientes` y `core.migraciones_de_datos` (que trabaja
+con los modelos históricos de `apps.get_model`). La migración 0012 tiene su
+propia copia.
+
+- `normalizar_telefono` y `normalizar_email`: la forma en que se guardan y
+  se comparan (teléfono en E.164, email en minúsculas).
+- `clave_de`: la clave `(teléfono, email)` de un contacto.
+- `clientes_por_clave`: los clientes de un conjunto de claves, creando los
+  que falten, con el modelo `Cliente` que se le pase.
+"""
+
+import re
+
+from django.conf import settings
+from django.db.models import Q
+
+# Valores por consulta `IN` y filas por INSERT.
+TAMANO_LOTE = 500
+
+NO_DIGITOS = re.compile(r'[^0-9]')
+
+
+def normalizar_telefono(texto):
+    """El teléfono `texto` en formato E.164 (`+5491122334455`), o '' si no parece uno.
+
+    Se descarta todo lo que no sea un dígito. Un número que empieza con `+` o
+    `00` ya trae su código de país; a los demás se les quita el `0` de
+    discado nacional y se les antepone `CLIENT_PHONE_COUNTRY_CODE`. Un
+    resultado de menos de 8 o más de 15 dígitos no se considera un teléfono.
+    No se reescriben los prefijos de móviles (el `15` local o el `9`
+    internacional de Argentina): el mismo móvil escrito de las dos formas da
+    dos números distintos.
+    """
+    texto = (texto or '').strip()
+    digitos = NO_DIGITOS.sub('', texto)
+    if texto.startswith('+'):
+        numero = digitos
+    elif digitos.startswith('00'):
+        numero = digitos[2:]
+    else:
+        numero = getattr(settings, 'CLIENT_PHONE_COUNTRY_CODE', '54') + digitos.lstrip('0')
+    return f'+{numero}' if 8 <= len(numero) <= 15 else ''
+
+
+def normalizar_email(texto):
+    """El email `texto` sin espacios alrededor y en minúsculas."""
+    return (texto or '').strip().lower()
+
+
+def clave_de(telefono, email):
+    """`(teléfono E.164, email en minúsculas)`; '' en los que no hay."""
+    return normalizar_telefono(telefono), normalizar_email(email)
+
+
+def _existentes(modelo, telefonos, emails, using):
+    """`({teléfono: pk}, {email: pk})` de los clientes con alguno de esos datos."""
+    telefonos, emails = sorted(telefonos), sorted(emails)
+    por_telefono, por_email = {}, {}
+    for desde in range(0, max(len(telefonos), len(emails)), TAMANO_LOTE):
+        condicion = Q(telefono__in=telefonos[desde:desde + TAMANO_LOTE]) | Q(email__in=emails[desde:desde + TAMANO_LOTE])
+        for pk, telefono, email in modelo.objects.using(using).filter(condicion).order_by().values_list('pk', 'telefono', 'email'):
+            if telefono:
+                por_telefono[telefono] = pk
+            if email:
+                por_email[email] = pk
+    return por_telefono, por_email
+
+
+def _resolver(clave, por_telefono, por_email):
+    telefono, email = clave
+    return (telefono and por_telefono.get(telefono)) or (email and por_email.get(email)) or None
+
+
+def clientes_por_clave(nombres, modelo, using):
+    """`{clave: pk del cliente}` de `nombres` (`{clave_de(teléfono, email): nombre}`).
+
+    `modelo` es el `Cliente` (el de `core.models` o el de una migración).
+    Los clientes que faltan se crean con el nombre de su clave. Un teléfono
+    sin cliente con el email de otro es de ese otro (el teléfono no se le
+    agrega). Los creados a la vez por otro proceso (conflicto en el índice
+    único) se ignoran y se vuelven a leer.
+    """
+    nombres = {clave: nombre for clave, nombre in nombres.items() if any(clave)}
+    if not nombres:
+        return {}
+    por_telefono, por_email = _existentes(
+        modelo, {t for t, _ in nombres if t}, {e for _, e in nombres if e}, using,
+    )
+
+    # Teléfonos y emails ya usados por un cliente.
+    nuevos, telefonos, emails = [], set(), set(por_email)
+    for clave, nombre in nombres.items():
+        telefono, email = clave
+        if _resolver(clave, por_telefono, por_email) is not None or telefono in telefonos:
+            continue
+        if email in emails:
+            continue
+        nuevos.append(modelo(nombre=nombre[:100], telefono=telefono or None, email=email or None))
+        telefonos.update([telefono] if telefono else [])
+        emails.update([email] if email else [])
+    if nuevos:
+        modelo.objects.using(using).bulk_create(nuevos, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+        creados = _existentes(modelo, {c.telefono for c in nuevos if c.telefono}, {c.email for c in nuevos if c.email}, using)
+        por_telefono.update(creados[0])
+        por_email.update(creados[1])
+    return {clave: pk for clave in nombres if (pk := _resolver(clave, por_telefono, por_email)) is not None}
@@ -0,0 +1,366 @@
+"""
+core.disponibilidad
+-------------------
+Motor de disponibilidad de turnos.
+
+Para un `Servicio` y un rango de fechas obtiene, en una única consulta, todos
+los `Turno` que se solapan con el horario de atención y devuelve las franjas
+libres de cada día ordenadas por hora de inicio.
+
+La idea es que el formulario de reserva sólo ofrezca horarios realmente
+disponibles, en lugar de listar todas las horas y rechazar el POST cuando el
+horario ya está tomado.
+
+Cada turno dura lo que dura su servicio (`Servicio.duracion_minutos`) más un
+margen opcional entre turnos (`RESERVATION_BUFFER_MINUTES`). Los inicios se
+buscan en una grilla fina (`RESERVATION_SLOT_DURATION_MINUTES`, 15 minutos por
+defecto) recorriendo los huecos entre turnos de la `Agenda`; se ofrecen todos
+los que caben, y `Agenda.desperdicio()` indica cuáles empaquetan el hueco sin
+dejar restos inservibles. `horario_ocupado()` es la comprobación de
+solapamiento que usan la vista pública, `core.reservas.crear_turno` y el
+formulario del admin: acepta exactamente los inicios que se ofrecen.
+
+Si el servicio tiene recursos (personal o sillones, ver `Recurso`), el límite no
+es un turno a la vez por servicio sino un turno a la vez por recurso, dentro
+de su horario de trabajo. `MapaDeRecursos` lleva la ocupación de cada recurso
+como un mapa de bits por minuto y `buscar_recurso()` devuelve el primero libre.
+"""
+
+from bisect import bisect_right
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Recurso, Turno
+
+# Bits del mapa de un día (25 horas, para cubrir los cambios de horario).
+MINUTOS_MAPA = 25 * 60
+MINUTO = timedelta(minutes=1)
+
+
+class Franja(NamedTuple):
+    """Intervalo semiabierto [inicio, fin)."""
+    inicio: datetime
+    fin: datetime
+
+
+class FranjaLibre(NamedTuple):
+    """Un horario libre [inicio, fin) y si lo recomendamos (ver `franjas_libres`)."""
+    inicio: datetime
+    fin: datetime
+    recomendada: bool
+
+
+def paso_de_grilla():
+    """Separación entre inicios posibles (`RESERVATION_SLOT_DURATION_MINUTES`)."""
+    return timedelta(minutes=getattr(settings, 'RESERVATION_SLOT_DURATION_MINUTES', 15))
+
+
+def margen_entre_turnos():
+    """Tiempo libre que debe quedar entre dos turnos (`RESERVATION_BUFFER_MINUTES`)."""
+    return timedelta(minutes=getattr(settings, 'RESERVATION_BUFFER_MINUTES', 0))
+
+
+def duracion_de(servicio):
+    """Duración de un turno de `servicio`."""
+    return timedelta(minutes=servicio.duracion_minutos)
+
+
+def minutos_de_inicio():
+    """Minutos desde la medianoche en los que puede empezar un turno.
+
+    Usa `RESERVATION_START_HOUR`, `RESERVATION_END_HOUR` (exclusivo) y el paso
+    de la grilla.
+    """
+    start = getattr(settings, 'RESERVATION_START_HOUR', 9)
+    end = getattr(settings, 'RESERVATION_END_HOUR', 18)
+    return range(start * 60, end * 60, int(paso_de_grilla().total_seconds()) // 60)
+
+
+def formatear_hora(minutos):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def _ventana_de_atencion(fecha):
+    """Devuelve la `Franja` en la que el salón atiende el día `fecha`."""
+    base = _inicio_del_dia(fecha)
+    start = getattr(settings, 'RESERVATION_START_HOUR', 9)
+    end = getattr(settings, 'RESERVATION_END_HOUR', 18)
+    return Franja(base + timedelta(hours=start), base + timedelta(hours=end))
+
+
+class Agenda:
+    """Intervalos ocupados de un servicio, ordenados por inicio y disjuntos.
+
+    Cada intervalo incluye el margen posterior al turno, así que un turno nuevo
+    [inicio, fin) cabe si [inicio, fin + margen) no pisa ningún intervalo. Las
+    búsquedas son binarias sobre la lista de inicios.
+    """
+
+    def __init__(self, intervalos=(), margen=timedelta(0)):
+        self.margen = margen
+        self.ocupados = []
+        self._inicios = []
+        for inicio, fin in sorted(intervalos):
+            self._fusionar_al_final(inicio, fin + margen)
+
+    def _fusionar_al_final(self, inicio, fin):
+        if self.ocupados and inicio <= self.ocupados[-1].fin:
+            if fin > self.ocupados[-1].fin:
+                self.ocupados[-1] = Franja(self.ocupados[-1].inicio, fin)
+        else:
+            self.ocupados.append(Franja(inicio, fin))
+            self._inicios.append(inicio)
+
+    def esta_libre(self, inicio, fin):
+        """Indica si cabe un turno [inicio, fin) (más el margen)."""
+        fin = fin + self.margen
+        idx = bisect_right(self._inicios, inicio) - 1
+        if idx >= 0 and self.ocupados[idx].fin > inicio:
+            return False
+        siguiente = idx + 1
+        return not (siguiente < len(self.ocupados) and self.ocupados[siguiente].inicio < fin)
+
+    def huecos(self, desde, hasta):
+        """Intervalos libres dentro de [desde, hasta), en orden."""
+        idx = max(bisect_right(self._inicios, desde) - 1, 0)
+        cursor = desde
+        for ocupado in self.ocupados[idx:]:
+            if ocupado.inicio >= hasta:
+                break
+            if ocupado.inicio > cursor:
+                yield Franja(cursor, ocupado.inicio)
+            cursor = max(cursor, ocupado.fin)
+        if cursor < hasta:
+            yield Franja(cursor, hasta)
+
+    def agregar(self, inicio, fin):
+        """Marca [inicio, fin) (más el margen) como ocupado."""
+        fin = fin + self.margen
+        idx = bisect_right(self._inicios, inicio)
+        # Absorber los intervalos que se tocan o se pisan con el nuevo.
+        desde = idx
+        if desde > 0 and self.ocupados[desde - 1].fin >= inicio:
+            desde -= 1
+        hasta = idx
+        while hasta < len(self.ocupados) and self.ocupados[hasta].inicio <= fin:
+            hasta += 1
+        if desde < hasta:
+            inicio = min(inicio, self.ocupados[desde].inicio)
+            fin = max(fin, self.ocupados[hasta - 1].fin)
+        self.ocupados[desde:hasta] = [Franja(inicio, fin)]
+        self._inicios[desde:hasta] = [inicio]
+
+    def quitar(self, inicio, fin):
+        """Libera [inicio, fin) (más el margen), agregado antes con `agregar()` donde estaba libre."""
+        fin = fin + self.margen
+        idx = bisect_right(self._inicios, inicio) - 1
+        if idx < 0 or self.ocupados[idx].fin < fin:
+            return
+        ocupado = self.ocupados[idx]
+        partes = [f for f in (Franja(ocupado.inicio, inicio), Franja(fin, ocupado.fin)) if f.inicio < f.fin]
+        self.ocupados[idx:idx + 1] = partes
+        self._inicios[idx:idx + 1] = [f.inicio for f in partes]
+
+    def inicios_libres(self, ventana, duracion, paso):
+        """Inicios en `ventana` donde cabe un turno de `duracion`.
+
+        Recorre los huecos de la agenda: ofrece el comienzo de cada hueco y los
+        puntos siguientes de la grilla (alineada con `ventana.inicio`) mientras
+        el turno y su margen quepan antes del próximo turno, y el turno termine
+        antes del cierre. Son los mismos que acepta `horario_ocupado()`;
+        `franjas_libres()` marca con `desperdicio()` los que no dejan restos.
+        """
+        for hueco in self.huecos(ventana.inicio, ventana.fin + self.margen):
+            limite = min(hueco.fin - self.margen, ventana.fin)
+            inicio = hueco.inicio
+            while inicio + duracion <= limite:
+                yield inicio
+                # Siguiente punto de la grilla estrictamente posterior.
+                inicio = ventana.inicio + ((inicio - ventana.inicio) // paso + 1) * paso
+
+    def desperdicio(self, ventana, inicio, duracion):
+        """Cuánto fragmenta su hueco un turno [inicio, inicio + duracion).
+
+        Es el menor de los restos que quedan antes y después del turno al
+        contar múltiplos exactos de `duracion` + margen desde cada extremo del
+        hueco: cero si el turno lo empaqueta desde alguno (lo que sobra queda
+        todo junto del otro lado, donde todavía puede caber otro turno). Con
+        cero, `franjas_libres()` recomienda el inicio sin dejar de ofrecer los
+        demás.
+        """
+        bloque = duracion + self.margen
+        idx = bisect_right(self._inicios, inicio) - 1
+        desde = max(ventana.inicio, self.ocupados[idx].fin) if idx >= 0 else ventana.inicio
+        hasta = ventana.fin
+        if idx + 1 < len(self.ocupados):
+            hasta = min(hasta, self.ocupados[idx + 1].inicio - self.margen)
+        return min((inicio - desde) % bloque, (hasta - inicio - duracion) % bloque)
+
+
+class MapaDeRecursos:
+    """Ocupación minuto a minuto de varios recursos durante un día.
+
+    Cada recurso tiene un entero que se usa como mapa de bits (el bit n es el
+    minuto n desde la medianoche local): saber si un intervalo está libre es un
+    AND entre enteros, sin recorrer turnos, así que revisar decenas de recursos
+    con miles de turnos por día cuesta microsegundos. Como en `Agenda`, lo
+    ocupado incluye el margen posterior a cada turno.
+    """
+
+    def __init__(self, fecha, recursos, margen=timedelta(0)):
+        self.base = _inicio_del_dia(fecha)
+        self.margen = margen
+        self.recursos = list(recursos)
+        self.ocupado = {r.pk: 0 for r in self.recursos}
+        # Los recursos suelen compartir horario: una máscara por horario distinto.
+        mascaras = {}
+        for horario in {(r.hora_inicio, r.hora_fin) for r in self.recursos}:
+            mascaras[horario] = self._bits(*(timezone.make_aware(datetime.combine(fecha, h)) for h in horario))
+        self.horario = {r.pk: mascaras[r.hora_inicio, r.hora_fin] for r in self.recursos}
+
+    def _bits(self, inicio, fin):
+        """Máscara de los minutos de [inicio, fin) que caen dentro del día."""
+        desde = max((inicio - self.base) // MINUTO, 0)
+        hasta = min(-((self.base - fin) // MINUTO), MINUTOS_MAPA)
+        return ((1 << (hasta - desde)) - 1) << desde if hasta > desde else 0
+
+    def ocupar(self, recurso_id, inicio, fin):
+        """Marca [inicio, fin) (más el margen) como ocupado para el recurso."""
+        self.ocupado[recurso_id] |= self._bits(inicio, fin + self.margen)
+
+    def primer_libre(self, inicio, fin, recursos=None):
+        """Primer recurso (de `recursos`, por defecto todos) que puede atender [inicio, fin), o None."""
+        trabajo = self._bits(inicio, fin)
+        con_margen = self._bits(inicio, fin + self.margen)
+        for recurso in self.recursos if recursos is None else recursos:
+            if self.horario[recurso.pk] & trabajo == trabajo and not self.ocupado[recurso.pk] & con_margen:
+                return recurso
+        return None
+
+    def inicios_libres(self, ventana, duracion, paso):
+        """Inicios de la grilla en `ventana` en los que algún recurso está libre."""
+        inicio = ventana.inicio
+        while inicio + duracion <= ventana.fin:
+            if self.primer_libre(inicio, inicio + duracion) is not None:
+                yield inicio
+            inicio += paso
+
+
+def recursos_de(servicio, using=None):
+    """Recursos activos que realizan `servicio`, en orden de asignación."""
+    recursos = Recurso.objects.filter(servicios=servicio, activo=True)
+    if using:
+        recursos = recursos.using(using)
+    return list(recursos)
+
+
+def mapas_de_recursos(recursos, fechas, desde, hasta, excluir=None, using=None):
+    """Un `MapaDeRecursos` por fecha con los turnos de `recursos` en [desde, hasta).
+
+    Se resuelve en una consulta. `excluir` es la pk de un turno a ignorar.
+    """
+    margen = margen_entre_turnos()
+    mapas = {fecha: MapaDeRecursos(fecha, recursos, margen) for fecha in fechas}
+    filas = Turno.objects.overlapping_recursos([r.pk for r in recursos], desde - margen, hasta)
+    if using:
+        filas = filas.using(using)
+    if excluir is not None:
+        filas = filas.exclude(pk=excluir)
+    for recurso_id, inicio, fin in filas.values_list('recurso_id', 'fecha_hora_inicio', 'fecha_hora_fin'):
+        for fecha in {timezone.localdate(inicio), timezone.localdate(fin + margen)}:
+            if fecha in mapas:
+                mapas[fecha].ocupar(recurso_id, inicio, fin)
+    return mapas
+
+
+def buscar_recurso(recursos, inicio, fin, excluir=None, using=None):
+    """Primer recurso de `recursos` libre para el turno [inicio, fin), o None.
+
+    Sólo lee los turnos de esos recursos que rodean al intervalo (una
+    consulta sobre el índice por recurso).
+    """
+    if not recursos:
+        return None
+    margen = margen_entre_turnos()
+    fecha = timezone.localdate(inicio)
+    mapa = mapas_de_recursos(recursos, [fecha], inicio - margen, fin + margen, excluir, using)[fecha]
+    return mapa.primer_libre(inicio, fin)
+
+
+def intervalos_ocupados(servicio, desde, hasta, using=None):
+    """`Agenda` con los turnos del `servicio` que se solapan con [desde, hasta).
+
+    Se resuelve en una consulta.
+    """
+    margen = margen_entre_turnos()
+    filas = Turno.objects.overlapping(servicio, desde - margen, hasta)
+    if using:
+        filas = filas.using(using)
+    return Agenda(filas.values_list('fecha_hora_inicio', 'fecha_hora_fin'), margen)
+
+
+def horario_ocupado(servicio, inicio, fin, excluir=None, using=None):
+    """Indica si un turno [inicio, fin) de `servicio` choca con otro (margen incluido).
+
+    Es una sola consulta `EXISTS` sobre `Turno.objects.overlapping()`, con el
+    intervalo ensanchado por el margen entre turnos. `excluir` es la pk de un
+    turno a ignorar (el que se está editando).
+    """
+    margen = margen_entre_turnos()
+    solapados = Turno.objects.overlapping(servicio, inicio - margen, fin + margen)
+    if using:
+        solapados = solapados.using(using)
+    if excluir is not None:
+        solapados = solapados.exclude(pk=excluir)
+    return solapados.exists()
+
+
+def franjas_libres(servicio, fecha_desde, fecha_hasta=None, duracion=None):
+    """Franjas libres del `servicio` entre `fecha_desde` y `fecha_hasta` (inclusive).
+
+    Devuelve un diccionario `{fecha: [FranjaLibre, ...]}` con una entrada por
+    día (aunque no queden horarios libres), con las franjas ordenadas.
+    `duracion` es por defecto la del servicio. Se descartan los horarios que
+    ya empezaron. Todo el rango se resuelve con dos consultas a la base de
+    datos: los recursos del servicio y los turnos que ocupan la agenda.
+
+    Se ofrecen todos los inicios que acepta una reserva; `recomendada` marca
+    los que no dejan restos inútiles en su hueco (`Agenda.desperdicio()`),
+    para que el formulario los destaque. Con recursos no hay una agenda
+    única que empaquetar y todos cuentan como recomendados.
+    """
+    fecha_hasta = fecha_hasta or fecha_desde
+    duracion = duracion or duracion_de(servicio)
+    dias = [fecha_desde + timedelta(days=n) for n in range((fecha_hasta - fecha_desde).days + 1)]
+    if not dias:
+        return {}
+
+    desde = _ventana_de_atencion(dias[0]).inicio
+    hasta = _ventana_de_atencion(dias[-1]).fin + margen_entre_turnos()
+    recursos = recursos_de(servicio)
+    if recursos:
+        # Un turno a la vez por recurso.
+        mapas = mapas_de_recursos(recursos, dias, desde, hasta)
+    else:
+        # Sin recursos: un turno a la vez por servicio.
+        agenda = intervalos_ocupados(servicio, desde, hasta)
+    ahora = timezone.now()
+    paso = paso_de_grilla()
+
+    resultado = {}
+    for dia in dias:
+        ventana = _ventana_de_atencion(dia)
+        libres = mapas[dia] if recursos else agenda
+        resultado[dia] = [
+            FranjaLibre(inicio, inicio + duracion, bool(recursos) or not agenda.desperdicio(ventana, inicio, duracion))
+            for inicio in libres.inicios_libres(ventana, duracion, paso)
+            if inicio > ahora
+        ]
+    return resultado
@@ -0,0 +1,247 @@
+"""
+core.eventos
+------------
+Bandeja de salida ("transactional outbox") de los efectos secundarios.
+
+Las peticiones no hacen trabajo extra: insertan un `Evento` en la misma
+transacción que el cambio que lo origina (`Turno.save()`, las acciones en
+bloque del admin, el formulario de contacto) y `python manage.py run_outbox`
+los procesa por lotes con `procesar_pendientes()`:
+
+- `turno`: deja la `Reserva` del turno de acuerdo con su estado actual
+  (`core.reservas.sincronizar_reservas`) y, si está confirmado y tiene email,
+  encola el correo de confirmación.
+- `contacto`: guarda el `Contacto` y encola el aviso a
+  `CONTACT_NOTIFICATION_EMAILS`.
+- `correo`: envía un correo ya armado.
+- `resumen`: recalcula el `ResumenDiario` de un servicio en un día
+  (`core.analitica.recalcular`).
+- `cliente`: enlaza un turno con el `Cliente` de sus datos de contacto,
+  creándolo si no existe (`core.clientes.enlazar_turnos`).
+- `espera`: ofrece un horario liberado al primero de la lista de espera
+  que le sirva y encola su correo (`core.lista_espera.ofrecer`).
+
+Idempotencia: `Evento.clave` es única. Un evento `turno` se calcula desde el
+estado actual del turno, así que volver a encolarlo sólo lo deja pendiente
+otra vez; cada correo tiene su propia clave (`confirmacion:<turno>:<inicio>`,
+`aviso-contacto:<clave del contacto>`, `oferta-espera:<inscripción>`) y no se
+encola dos veces. Los efectos en la base se aplican en la misma transacción
+que marca el evento como hecho. Un envío de correo no puede ser parte de esa
+transacción: si el worker se cae entre el envío y la marca, el correo se
+reintenta con el mismo `Message-ID`.
+
+Reintentos: el worker toma cada lote con un plazo (`PLAZO_DE_RECLAMO`); si
+falla, el evento vuelve a estar disponible tras `OUTBOX_RETRY_SECONDS`,
+duplicando la espera en cada intento hasta `OUTBOX_MAX_RETRY_SECONDS`, y tras
+`OUTBOX_MAX_ATTEMPTS` intentos queda `fallido` (se reintenta desde el admin).
+Un evento reiniciado mientras estaba tomado (el turno cambió otra vez) no se
+marca como hecho: el worker lo vuelve a procesar con el estado nuevo.
+"""
+
+import hashlib
+import logging
+from datetime import date, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, router, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .analitica import recalcular
+from .clientes import enlazar_turnos
+from .lista_espera import hueco_de_evento, ofrecer
+from .models import Contacto, Evento
+from .reservas import sincronizar_reservas
+
+logger = logging.getLogger(__name__)
+
+# Tiempo que un worker tiene un lote tomado; si no termina (se cayó), los
+# eventos vuelven a estar disponibles para otro.
+PLAZO_DE_RECLAMO = timedelta(minutes=5)
+
+# tipo -> (función, transaccional)
+MANEJADORES = {}
+
+
+def manejador(tipo, transaccional=True):
+    """Registra la función que procesa los eventos de `tipo`.
+
+    Recibe la lista de eventos y el alias de la base y devuelve, opcionalmente,
+    `{pk: error}` de los que fallaron. Si es `transaccional`, sus escrituras y
+    la marca de hechos se confirman juntas.
+    """
+    def registrar(funcion):
+        MANEJADORES[tipo] = (funcion, transaccional)
+        return funcion
+    return registrar
+
+
+def espera_de_reintento(intentos):
+    """Espera antes del siguiente intento tras `intentos` fallidos."""
+    segundos = getattr(settings, 'OUTBOX_RETRY_SECONDS', 30) * 2 ** (intentos - 1)
+    return timedelta(seconds=min(segundos, getattr(settings, 'OUTBOX_MAX_RETRY_SECONDS', 3600)))
+
+
+def _reclamar(limite, using):
+    """Toma hasta `limite` eventos vencidos; devuelve `(eventos, plazo)`."""
+    ahora = timezone.now()
+    plazo = ahora + PLAZO_DE_RECLAMO
+    with transaction.atomic(using=using):
+        pendientes = Evento.objects.using(using).filter(
+            estado=Evento.PENDIENTE, disponible_en__lte=ahora,
+        ).order_by('disponible_en', 'pk')
+        if connections[using].features.has_select_for_update_skip_locked:
+            # Varios workers en PostgreSQL: cada uno toma filas distintas. En
+            # SQLite la transacción ya es exclusiva.
+            pendientes = pendientes.select_for_update(skip_locked=True)
+        eventos = list(pendientes[:limite])
+        if eventos:
+            Evento.objects.using(using).filter(pk__in=[e.pk for e in eventos]).update(
+                intentos=F('intentos') + 1, disponible_en=plazo,
+            )
+        for evento in eventos:
+            evento.intentos += 1
+    return eventos, plazo
+
+
+def _marcar_hechos(eventos, plazo, using):
+    # Con `disponible_en=plazo`: si el evento se reinició mientras estaba
+    # tomado, sigue pendiente.
+    Evento.objects.using(using).filter(pk__in=[e.pk for e in eventos], disponible_en=plazo).update(
+        estado=Evento.HECHO, procesado_en=timezone.now(), ultimo_error='',
+    )
+
+
+def _reprogramar(evento, error, plazo, using):
+    agotado = evento.intentos >= getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    Evento.objects.using(using).filter(pk=evento.pk, disponible_en=plazo).update(
+        estado=Evento.FALLIDO if agotado else Evento.PENDIENTE,
+        disponible_en=timezone.now() + espera_de_reintento(evento.intentos),
+        ultimo_error=error,
+    )
+
+
+def procesar_pendientes(limite=None, using=None):
+    """Procesa un lote de eventos vencidos. Devuelve cuántos se intentaron."""
+    using = using or router.db_for_write(Evento)
+    eventos, plazo = _reclamar(limite or getattr(settings, 'OUTBOX_BATCH_SIZE', 100), using)
+    eventos.sort(key=lambda e: e.tipo)
+    for tipo, grupo in groupby(eventos, key=lambda e: e.tipo):
+        grupo = list(grupo)
+        try:
+            funcion, transaccional = MANEJADORES[tipo]
+            if transaccional:
+                with transaction.atomic(using=using):
+                    errores = funcion(grupo, using) or {}
+                    _marcar_hechos([e for e in grupo if e.pk not in errores], plazo, using)
+            else:
+                errores = funcion(grupo, using) or {}
+                _marcar_hechos([e for e in grupo if e.pk not in errores], plazo, using)
+        except Exception as exc:
+            logger.exception('Fallaron %d eventos de tipo %r', len(grupo), tipo)
+            errores = {e.pk: f'{type(exc).__name__}: {exc}' for e in grupo}
+        for evento in grupo:
+            if evento.pk in errores:
+                _reprogramar(evento, errores[evento.pk], plazo, using)
+    return len(eventos)
+
+
+def _correo(clave, para, plantilla, contexto):
+    return Evento(
+        tipo=Evento.CORREO,
+        clave=clave,
+        datos={
+            'para': para,
+            'asunto': contexto.pop('asunto'),
+            'cuerpo': render_to_string(plantilla, contexto),
+        },
+    )
+
+
+@manejador(Evento.TURNO)
+def _sincronizar_turnos(eventos, using):
+    confirmados = sincronizar_reservas([e.datos['turno'] for e in eventos], using)
+    Evento.objects.using(using).encolar([
+        _correo(
+            f'confirmacion:{pk}:{inicio:%Y%m%dT%H%M}',
+            [email],
+            'core/correos/confirmacion.txt',
+            {'asunto': 'Tu turno está confirmado', 'nombre': nombre, 'servicio': servicio, 'inicio': inicio},
+        )
+        for pk, nombre, email, servicio, inicio in confirmados
+        if email
+    ])
+
+
+@manejador(Evento.CONTACTO)
+def _guardar_contactos(eventos, using):
+    Contacto.objects.using(using).bulk_create([
+        Contacto(nombre=e.datos['nombre'], email=e.datos['email'], mensaje=e.datos['mensaje'])
+        for e in eventos
+    ])
+    destinatarios = getattr(settings, 'CONTACT_NOTIFICATION_EMAILS', [])
+    if destinatarios:
+        Evento.objects.using(using).encolar([
+            _correo(
+                f'aviso-contacto:{e.clave}',
+                list(destinatarios),
+                'core/correos/aviso_contacto.txt',
+                # Sin saltos de línea: el nombre va en una cabecera.
+                {'asunto': f"Mensaje de contacto de {' '.join(e.datos['nombre'].split())}", **e.datos},
+            )
+            for e in eventos
+        ])
+
+
+@manejador(Evento.RESUMEN)
+def _recalcular_resumenes(eventos, using):
+    recalcular([(e.datos['servicio'], date.fromisoformat(e.datos['fecha'])) for e in eventos], using)
+
+
+@manejador(Evento.CLIENTE)
+def _enlazar_clientes(eventos, using):
+    enlazar_turnos([e.datos['turno'] for e in eventos], using)
+
+
+@manejador(Evento.ESPERA)
+def _ofrecer_huecos(eventos, using):
+    Evento.objects.using(using).encolar([
+        _correo(
+            f'oferta-espera:{espera.pk}',
+            [espera.cliente_email],
+            'core/correos/oferta_espera.txt',
+            {'asunto': 'Se liberó un turno', 'nombre': espera.cliente_nombre, 'servicio': espera.servicio.nombre,
+             'inicio': inicio},
+        )
+        for espera, inicio in ofrecer([hueco_de_evento(e) for e in eventos], using)
+    ])
+
+
+def _message_id(clave):
+    # Fijo por evento: un reintento tras un envío ya hecho lleva el mismo
+    # `Message-ID` y el servidor de correo puede descartarlo.
+    dominio = settings.DEFAULT_FROM_EMAIL.rpartition('@')[2] or 'localhost'
+    return f'<{hashlib.sha1(clave.encode()).hexdigest()}@{dominio}>'
+
+
+@manejador(Evento.CORREO, transaccional=False)
+def _enviar_correos(eventos, using):
+    errores = {}
+    # Una sola conexión (SMTP) para todo el lote.
+    with get_connection() as conexion:
+        for evento in eventos:
+            mensaje = EmailMessage(
+                evento.datos['asunto'],
+                evento.datos['cuerpo'],
+                to=evento.datos['para'],
+                headers={'Message-ID': _message_id(evento.clave)},
+                connection=conexion,
+            )
+            try:
+                mensaje.send()
+            except Exception as exc:
+                errores[evento.pk] = f'{type(exc).__name__}: {exc}'
+    return errores
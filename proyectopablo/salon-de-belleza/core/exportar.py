@@ -0,0 +1,169 @@
+"""
+core.exportar
+-------------
+Exportación completa de `Turno`, `Reserva` y `Contacto` a CSV o JSONL, para
+`python manage.py export_core` y las acciones "Exportar" del admin.
+
+Las filas se leen con `.values_list()` (sin instanciar modelos) y
+`.iterator(chunk_size=...)` (el cursor de la base entrega de a un bloque), y
+se escriben a medida que llegan: la memoria no depende de la cantidad de
+filas. Los filtros por fecha y servicio se aplican en la consulta.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+from typing import NamedTuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Contacto, Reserva, Turno
+
+# Filas que trae la base por vuelta del cursor.
+TAMANO_BLOQUE = 2000
+# Caracteres que se acumulan antes de entregar un trozo de la salida.
+TAMANO_TROZO = 64 * 1024
+
+FORMATOS = ('csv', 'jsonl')
+TIPOS_DE_CONTENIDO = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson; charset=utf-8'}
+
+
+class Exportacion(NamedTuple):
+    modelo: type
+    # (nombre de la columna, campo para `values_list`)
+    columnas: tuple
+    # Campo por el que se filtra el rango de fechas.
+    campo_fecha: str
+    # Campo por el que se filtra el servicio (None si no aplica).
+    campo_servicio: str = None
+
+
+EXPORTACIONES = {
+    'turnos': Exportacion(
+        Turno,
+        (
+            ('id', 'id'),
+            ('servicio', 'servicio__nombre'),
+            ('recurso', 'recurso__nombre'),
+            ('cliente_nombre', 'cliente_nombre'),
+            ('cliente_telefono', 'cliente_telefono'),
+            ('cliente_email', 'cliente_email'),
+            ('inicio', 'fecha_hora_inicio'),
+            ('fin', 'fecha_hora_fin'),
+            ('confirmado', 'confirmado'),
+            ('cancelado_en', 'cancelado_en'),
+        ),
+        'fecha_hora_inicio',
+        'servicio',
+    ),
+    'reservas': Exportacion(
+        Reserva,
+        (
+            ('id', 'id'),
+            ('turno', 'turno_id'),
+            ('servicio', 'servicio__nombre'),
+            ('nombre_cliente', 'nombre_cliente'),
+            ('fecha_hora', 'fecha_hora'),
+        ),
+        'fecha_hora',
+        'servicio',
+    ),
+    'contactos': Exportacion(
+        Contacto,
+        (
+            ('id', 'id'),
+            ('nombre', 'nombre'),
+            ('email', 'email'),
+            ('mensaje', 'mensaje'),
+            ('creado_en', 'creado_en'),
+        ),
+        'creado_en',
+    ),
+}
+
+
+def exportacion_de(modelo):
+    """La `Exportacion` de la clase `modelo`."""
+    return next(e for e in EXPORTACIONES.values() if e.modelo is modelo)
+
+
+def filtrar(exportacion, queryset=None, desde=None, hasta=None, servicio=None):
+    """`queryset` (por defecto todas las filas) acotado a las fechas [desde, hasta] y al servicio (id)."""
+    if queryset is None:
+        queryset = exportacion.modelo.objects.all()
+    if desde is not None:
+        queryset = queryset.filter(**{
+            f'{exportacion.campo_fecha}__gte': timezone.make_aware(datetime.combine(desde, time.min)),
+        })
+    if hasta is not None:
+        queryset = queryset.filter(**{
+            f'{exportacion.campo_fecha}__lt': timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min)),
+        })
+    if servicio is not None:
+        if exportacion.campo_servicio is None:
+            raise ValueError(f'{exportacion.modelo._meta.verbose_name_plural} no se filtra por servicio.')
+        queryset = queryset.filter(**{exportacion.campo_servicio: servicio})
+    return queryset
+
+
+def filas(exportacion, queryset, tamano_bloque=TAMANO_BLOQUE):
+    """Tuplas de las columnas de `exportacion`, por orden de id, leídas de a bloques."""
+    campos = [campo for _, campo in exportacion.columnas]
+    return queryset.order_by('pk').values_list(*campos).iterator(chunk_size=tamano_bloque)
+
+
+def _valor(valor):
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    return valor
+
+
+def _en_trozos(lineas):
+    """Agrupa las líneas en trozos de unos `TAMANO_TROZO` caracteres."""
+    buffer, tamano = [], 0
+    for linea in lineas:
+        buffer.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_TROZO:
+            yield ''.join(buffer)
+            buffer, tamano = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _lineas_csv(columnas, filas):
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(columnas)
+    for fila in filas:
+        escritor.writerow([_valor(v) for v in fila])
+        # Se vacía en cada fila: el buffer nunca tiene más de una.
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+    yield salida.getvalue()
+
+
+def _lineas_jsonl(columnas, filas):
+    codificar = DjangoJSONEncoder(ensure_ascii=False).encode
+    for fila in filas:
+        yield codificar(dict(zip(columnas, map(_valor, fila)))) + '\n'
+
+
+def serializar(exportacion, queryset, formato, tamano_bloque=TAMANO_BLOQUE):
+    """Texto de la exportación en `formato` (`csv` o `jsonl`), en trozos."""
+    columnas = [nombre for nombre, _ in exportacion.columnas]
+    lineas = _lineas_csv if formato == 'csv' else _lineas_jsonl
+    return _en_trozos(lineas(columnas, filas(exportacion, queryset, tamano_bloque)))
+
+
+def respuesta_de_exportacion(exportacion, queryset, formato, nombre):
+    """`StreamingHttpResponse` que descarga la exportación como `<nombre>.<formato>`."""
+    respuesta = StreamingHttpResponse(
+        serializar(exportacion, queryset, formato), content_type=TIPOS_DE_CONTENIDO[formato],
+    )
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return respuesta
@@ -1,5 +1,8 @@
 from django import forms
 
+from .disponibilidad import buscar_recurso, duracion_de, horario_ocupado, recursos_de
+from .models import Turno
+
 
 class ContactForm(forms.Form):
     """
@@ -22,3 +25,50 @@ class ContactForm(forms.Form):
         label='Mensaje',
         widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Escribe tu consulta aquí...'})
     )
+
+
+class TurnoAdminForm(forms.ModelForm):
+    """
+    Formulario de `Turno` para el admin.
+
+    Calcula `fecha_hora_fin` a partir de la duración del servicio cuando el
+    turno es nuevo o cambian su servicio u hora de inicio, y rechaza los turnos
+    que se solapan con otro del mismo servicio usando
+    `core.disponibilidad.horario_ocupado()` (la misma comprobación que la vista
+    pública). Si el servicio tiene recursos, comprueba el recurso elegido o,
+    si se deja vacío, asigna el primero libre.
+    """
+
+    class Meta:
+        model = Turno
+        fields = ('servicio', 'recurso', 'cliente_nombre', 'cliente_telefono', 'cliente_email', 'fecha_hora_inicio', 'confirmado')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        servicio = cleaned_data.get('servicio')
+        inicio = cleaned_data.get('fecha_hora_inicio')
+        if not (servicio and inicio):
+            return cleaned_data
+
+        if self.instance._state.adding or {'servicio', 'fecha_hora_inicio'} & set(self.changed_data):
+            self.instance.fecha_hora_fin = inicio + duracion_de(servicio)
+
+        if self.instance.cancelado_en and not cleaned_data.get('confirmado'):
+            # Un turno cancelado no ocupa la agenda; se comprueba al volver a confirmarlo.
+            return cleaned_data
+
+        fin = self.instance.fecha_hora_fin
+        recurso = cleaned_data.get('recurso')
+        recursos = recursos_de(servicio)
+        if recurso:
+            if recursos and recurso not in recursos:
+                raise forms.ValidationError(f'{recurso} no realiza el servicio {servicio}.')
+            if buscar_recurso([recurso], inicio, fin, excluir=self.instance.pk) is None:
+                raise forms.ValidationError(f'{recurso} no está disponible en ese horario.')
+        elif recursos:
+            cleaned_data['recurso'] = buscar_recurso(recursos, inicio, fin, excluir=self.instance.pk)
+            if cleaned_data['recurso'] is None:
+                raise forms.ValidationError('No hay recursos libres para ese servicio en ese horario.')
+        elif horario_ocupado(servicio, inicio, fin, excluir=self.instance.pk):
+            raise forms.ValidationError('El turno se solapa con otro turno del mismo servicio.')
+        return cleaned_data
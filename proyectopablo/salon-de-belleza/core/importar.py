@@ -0,0 +1,294 @@
+"""
+core.importar
+-------------
+Importación masiva de turnos históricos (`python manage.py import_turnos`).
+
+Guardar fila por fila con `Turno.save()` valida con `full_clean`, consulta y
+encola la sincronización de cada turno; para cientos de miles de filas eso son
+horas. Aquí el archivo (CSV o JSONL) se lee por bloques y, por cada bloque:
+
+- los servicios se resuelven en un diccionario en memoria, con la
+  normalización de nombres que usaba `Turno.save()` (`nombre_de_servicio`:
+  'Unas' -> 'Uñas', 'Corte_Pelo' -> 'Corte de Pelo', "tint..." -> 'Tintura');
+  los que no existen se crean. La migración 0005 sólo traduce los valores
+  exactos de los antiguos choices: en un archivo importado se aceptan
+  nombres escritos a mano;
+- los solapamientos se detectan en memoria con una `Agenda` por servicio
+  (intervalos ordenados, búsqueda binaria), con los turnos que ya había en la
+  base en los días del bloque (una consulta por bloque, sólo de los días que
+  todavía no se leyeron);
+- los turnos válidos se enlazan con su `Cliente`
+  (`core.clientes.clientes_por_clave`, que crea los que falten) y se insertan
+  con `bulk_create` y, los confirmados, su `Reserva` enlazada, en una
+  transacción por bloque. No se encola su sincronización: son turnos pasados
+  y no deben mandar correos de confirmación; sólo el recálculo del resumen
+  diario de sus días (`core.analitica`).
+
+Las columnas son las de `export_core turnos`: `servicio`, `inicio` (o `fecha`
+y `hora`), `fin` (opcional; por defecto, la duración del servicio),
+`cliente_nombre`, `cliente_telefono`, `cliente_email` y `confirmado`. Las
+fechas sin zona horaria son hora local. Las filas rechazadas se devuelven con
+el motivo, para escribirlas en el archivo de errores.
+
+Los servicios con recursos se comprueban como los que no tienen: un turno a la
+vez por servicio, sin asignar recurso.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import islice
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .analitica import celda_de, eventos_de_resumen
+from .clientes import clientes_por_clave
+from .disponibilidad import Agenda, margen_entre_turnos
+from .models import Evento, Reserva, Servicio, Turno, duracion_maxima_turno
+from .reservas import TAMANO_LOTE
+
+# Filas por transacción.
+FILAS_POR_BLOQUE = 5000
+
+# Valores del antiguo `Reserva.servicio` (choices) y su nombre de `Servicio`.
+NOMBRES_ANTIGUOS = {
+    'Unas': 'Uñas',
+    'Corte_Pelo': 'Corte de Pelo',
+    'Tintura': 'Tintura',
+}
+
+VERDADEROS = {'1', 'true', 't', 'si', 'sí', 's', 'yes', 'y', 'x'}
+
+
+def nombre_de_servicio(valor):
+    """Nombre canónico para un servicio escrito a mano o con un código antiguo."""
+    valor = ' '.join(str(valor or '').split())
+    if valor in NOMBRES_ANTIGUOS:
+        return NOMBRES_ANTIGUOS[valor]
+    minusculas = valor.lower()
+    if 'uña' in minusculas or minusculas in ('unas', 'uñas'):
+        return 'Uñas'
+    if 'tint' in minusculas:
+        return 'Tintura'
+    if 'corte' in minusculas:
+        return 'Corte de Pelo'
+    return valor
+
+
+class Rechazo(NamedTuple):
+    linea: int
+    fila: dict
+    error: str
+
+
+class Resultado(NamedTuple):
+    importados: int
+    rechazados: list
+
+
+def leer_filas(archivo, formato):
+    """`(número de línea, dict)` de cada fila de `archivo` (abierto en modo texto)."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    else:
+        for numero, linea in enumerate(archivo, start=1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = {'_linea': linea.rstrip('\n')}
+            yield numero, fila if isinstance(fila, dict) else {'_linea': linea.rstrip('\n')}
+
+
+class Importacion:
+    """Estado de una importación: servicios conocidos y agendas por servicio."""
+
+    def __init__(self, crear_servicios=True, using=None):
+        self.using = using or router.db_for_write(Turno)
+        self.crear_servicios = crear_servicios
+        self.margen = margen_entre_turnos()
+        self.servicios = {s.nombre.casefold(): s for s in Servicio.objects.using(self.using)}
+        self.agendas = {}
+        # Días cuyos turnos existentes ya están en `agendas` (ver `_leer_existentes`).
+        self.dias_leidos = set()
+
+    def _agenda(self, servicio_id):
+        return self.agendas.setdefault(servicio_id, Agenda(margen=self.margen))
+
+    def _leer_existentes(self, turnos):
+        """Pone en las agendas los turnos de la base de los días de `turnos` que faltan.
+
+        Una consulta (nada si ya se leyeron todos esos días), acotada por
+        rangos de inicio como `Turno.objects.overlapping()`. Un turno que cae
+        en dos tandas de días se agrega dos veces, sin efecto: `Agenda`
+        fusiona los intervalos.
+        """
+        dias = set()
+        for turno in turnos:
+            dia, ultimo = timezone.localdate(turno.fecha_hora_inicio), timezone.localdate(turno.fecha_hora_fin + self.margen)
+            while dia <= ultimo:
+                dias.add(dia)
+                dia += timedelta(days=1)
+        dias -= self.dias_leidos
+        if not dias:
+            return
+        self.dias_leidos |= dias
+        # Un rango por cada tanda de días seguidos.
+        tandas = []
+        for dia in sorted(dias):
+            if tandas and tandas[-1][1] + timedelta(days=1) == dia:
+                tandas[-1][1] = dia
+            else:
+                tandas.append([dia, dia])
+        rangos = Q()
+        for primero, ultimo in tandas:
+            desde = timezone.make_aware(datetime.combine(primero, time.min)) - self.margen
+            hasta = timezone.make_aware(datetime.combine(ultimo + timedelta(days=1), time.min)) + self.margen
+            rangos |= Q(
+                fecha_hora_inicio__gt=desde - duracion_maxima_turno(),
+                fecha_hora_inicio__lt=hasta,
+                fecha_hora_fin__gt=desde,
+            )
+        existentes = Turno.objects.using(self.using).vigentes().filter(rangos).order_by().values_list(
+            'servicio_id', 'fecha_hora_inicio', 'fecha_hora_fin',
+        )
+        for servicio_id, inicio, fin in existentes.iterator(chunk_size=TAMANO_LOTE * 4):
+            self._agenda(servicio_id).agregar(inicio, fin)
+
+    def _servicio(self, valor):
+        nombre = nombre_de_servicio(valor)
+        if not nombre:
+            raise ValidationError('Falta el servicio.')
+        servicio = self.servicios.get(nombre.casefold())
+        if servicio is None:
+            if not self.crear_servicios:
+                raise ValidationError(f'Servicio desconocido: {nombre}.')
+            servicio = Servicio.objects.using(self.using).create(nombre=nombre)
+            self.servicios[nombre.casefold()] = servicio
+        return servicio
+
+    def _fecha(self, texto, campo):
+        try:
+            valor = parse_datetime(str(texto).strip().replace(' ', 'T', 1))
+        except ValueError:
+            valor = None
+        if valor is None:
+            raise ValidationError(f'`{campo}` no es una fecha y hora válida.')
+        return timezone.make_aware(valor) if timezone.is_naive(valor) else valor
+
+    def turno_de(self, fila):
+        """`Turno` sin guardar de `fila`; lanza `ValidationError` si no es válida."""
+        if '_linea' in fila:
+            raise ValidationError('La línea no es un objeto JSON.')
+        servicio = self._servicio(fila.get('servicio'))
+        if fila.get('inicio'):
+            inicio = self._fecha(fila['inicio'], 'inicio')
+        else:
+            inicio = self._fecha(f"{fila.get('fecha', '')} {fila.get('hora', '')}", 'fecha/hora')
+        fin = self._fecha(fila['fin'], 'fin') if fila.get('fin') else inicio + timedelta(minutes=servicio.duracion_minutos)
+        turno = Turno(
+            servicio=servicio,
+            cliente_nombre=str(fila.get('cliente_nombre') or '').strip(),
+            cliente_telefono=str(fila.get('cliente_telefono') or '').strip(),
+            cliente_email=str(fila.get('cliente_email') or '').strip(),
+            fecha_hora_inicio=inicio,
+            fecha_hora_fin=fin,
+            confirmado=str(fila.get('confirmado', '')).strip().lower() in VERDADEROS,
+        )
+        # Las comprobaciones de `full_clean` que pueden fallar con estos datos,
+        # sin consultas ni el resto de validadores de cada campo.
+        if not turno.cliente_nombre:
+            raise ValidationError('Falta el nombre del cliente.')
+        for campo in ('cliente_nombre', 'cliente_telefono'):
+            if len(getattr(turno, campo)) > Turno._meta.get_field(campo).max_length:
+                raise ValidationError(f'`{campo}` es demasiado largo.')
+        if turno.cliente_email:
+            validate_email(turno.cliente_email)
+        turno.clean()
+        return turno
+
+    def _ocupar(self, turno):
+        """Reserva el horario de `turno` en su agenda; False si se solapa."""
+        agenda = self._agenda(turno.servicio_id)
+        if not agenda.esta_libre(turno.fecha_hora_inicio, turno.fecha_hora_fin):
+            return False
+        agenda.agregar(turno.fecha_hora_inicio, turno.fecha_hora_fin)
+        return True
+
+    def _insertar(self, turnos):
+        with transaction.atomic(using=self.using):
+            claves, nombres = [], {}
+            for turno in turnos:
+                claves.append(turno.datos_de_cliente())
+                nombres.setdefault(claves[-1], turno.cliente_nombre)
+            clientes = clientes_por_clave(nombres, self.using)
+            for turno, clave in zip(turnos, claves):
+                turno.cliente_id = clientes.get(clave)
+            creados = Turno.objects.using(self.using).bulk_create(turnos, batch_size=TAMANO_LOTE)
+            Reserva.objects.using(self.using).bulk_create(
+                [
+                    Reserva(
+                        turno_id=t.pk,
+                        servicio_id=t.servicio_id,
+                        nombre_cliente=t.cliente_nombre,
+                        fecha_hora=t.fecha_hora_inicio,
+                    )
+                    for t in creados
+                    if t.confirmado
+                ],
+                batch_size=TAMANO_LOTE,
+            )
+            Evento.objects.using(self.using).encolar(
+                eventos_de_resumen(celda_de(t.servicio_id, t.fecha_hora_inicio) for t in creados),
+                reiniciar=True,
+                batch_size=TAMANO_LOTE,
+            )
+        return len(creados)
+
+    def importar_bloque(self, numeradas):
+        """Importa las filas `(línea, dict)` de `numeradas` en una transacción."""
+        turnos, rechazados = [], []
+        for linea, fila in numeradas:
+            try:
+                turnos.append((self.turno_de(fila), linea, fila))
+            except ValidationError as exc:
+                rechazados.append(Rechazo(linea, fila, ' '.join(exc.messages)))
+        self._leer_existentes(turno for turno, _, _ in turnos)
+        validos, lineas = [], []
+        for turno, linea, fila in turnos:
+            if not self._ocupar(turno):
+                rechazados.append(Rechazo(linea, fila, 'Se solapa con otro turno del servicio.'))
+                continue
+            validos.append(turno)
+            lineas.append((linea, fila))
+        try:
+            importados = self._insertar(validos)
+        except IntegrityError:
+            # Alguien reservó en la base mientras tanto: fila por fila, cada
+            # una en su propio savepoint, para rechazar sólo las que chocan.
+            importados = 0
+            for turno, (linea, fila) in zip(validos, lineas):
+                turno.pk = None
+                turno._state.adding = True
+                try:
+                    importados += self._insertar([turno])
+                except IntegrityError:
+                    # Su horario no quedó ocupado: las filas siguientes pueden usarlo.
+                    self._agenda(turno.servicio_id).quitar(turno.fecha_hora_inicio, turno.fecha_hora_fin)
+                    rechazados.append(Rechazo(linea, fila, 'Se solapa con otro turno del servicio.'))
+        return Resultado(importados, sorted(rechazados, key=lambda rechazo: rechazo.linea))
+
+    def importar(self, filas, filas_por_bloque=FILAS_POR_BLOQUE):
+        """Importa `filas` (de `leer_filas`) por bloques; genera un `Resultado` por bloque."""
+        filas = iter(filas)
+        while bloque := list(islice(filas, filas_por_bloque)):
+            yield self.importar_bloque(bloque)
@@ -0,0 +1,200 @@
+"""
+core.limites
+------------
+Límite de envíos de los formularios públicos (reserva y contacto) por IP y
+por teléfono o email, para que un bot no llene `Contacto` de spam ni bloquee
+la agenda con turnos falsos.
+
+`RATE_LIMITS` fija, por vista, cuántos POST se aceptan de cada IP (y de cada
+teléfono o email) en una ventana de segundos. El decorador `limitar` cuenta
+cada POST antes de llamar a la vista; uno que supera el límite recibe un 429
+con `Retry-After` sin que la vista toque la base.
+
+Cada límite es una ventana deslizante aproximada con dos contadores en la
+caché: el de la ventana fija actual y el de la anterior, ponderado por la
+parte de ella que sigue dentro de la ventana deslizante. Se comporta como un
+balde de `peticiones` fichas que se rellena a lo largo de `segundos`, pero
+sólo usa `get_many` e `incr`, que son atómicos en una caché compartida:
+O(1) por petición, sin leer y reescribir un estado.
+
+El backend es el de `CACHES['default']`. Con una caché por proceso (locmem)
+cada proceso cuenta por su lado; con varios procesos conviene una compartida
+(Redis o memcached). Detrás de un proxy, `RATE_LIMIT_IP_HEADER` indica la
+cabecera con la IP del cliente (por ejemplo `HTTP_X_REAL_IP`).
+"""
+
+import hashlib
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from .contactos import NO_DIGITOS, normalizar_email, normalizar_telefono
+
+
+def _ip(request):
+    cabecera = getattr(settings, 'RATE_LIMIT_IP_HEADER', None)
+    if cabecera and request.META.get(cabecera):
+        # `X-Forwarded-For` trae la cadena de proxies: la primera es el cliente.
+        return request.META[cabecera].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _telefono(request):
+    texto = request.POST.get('cliente_telefono', '')
+    # Un número que no parece un teléfono se cuenta igual, por sus dígitos.
+    return normalizar_telefono(texto) or NO_DIGITOS.sub('', texto)
+
+
+def _email(request):
+    return normalizar_email(request.POST.get('cliente_email') or request.POST.get('email'))
+
+
+# Por qué se cuenta cada POST: nombre en `RATE_LIMITS` -> valor de la petición.
+CRITERIOS = {'ip': _ip, 'telefono': _telefono, 'email': _email}
+
+
+def limites_de(vista):
+    """`{criterio: (peticiones, segundos)}` de `vista` en `RATE_LIMITS`."""
+    return getattr(settings, 'RATE_LIMITS', {}).get(vista, {})
+
+
+class Contador:
+    """Ventana deslizante de `segundos` para un valor (una IP, un teléfono) de una vista."""
+
+    def __init__(self, vista, criterio, valor, peticiones, segundos, ahora):
+        self.peticiones, self.segundos = peticiones, segundos
+        ventana, transcurrido = divmod(ahora, segundos)
+        self.fraccion = transcurrido / segundos
+        # El valor (un email, un teléfono) va resumido: las claves de memcached
+        # no admiten espacios y así la caché no guarda datos personales.
+        valor = hashlib.md5(valor.encode(), usedforsecurity=False).hexdigest()
+        self.actual = f'limite:{vista}:{criterio}:{valor}:{int(ventana)}'
+        self.anterior = f'limite:{vista}:{criterio}:{valor}:{int(ventana) - 1}'
+
+    def espera(self, contados):
+        """Segundos hasta que se acepte otra petición, o 0 si se acepta ahora."""
+        actual, anterior = contados.get(self.actual, 0), contados.get(self.anterior, 0)
+        if anterior * (1 - self.fraccion) + actual + 1 <= self.peticiones:
+            return 0
+        if self.peticiones < 1:
+            return self.segundos
+        if actual + 1 <= self.peticiones:
+            # La parte de la ventana anterior que todavía cuenta se va achicando.
+            ventanas = 1 - (self.peticiones - actual - 1) / anterior - self.fraccion
+        else:
+            # Lo que queda de esta ventana y, en la siguiente, hasta que la
+            # actual (que pasará a ser la anterior) pese lo suficientemente poco.
+            ventanas = 2 - self.fraccion - (self.peticiones - 1) / actual
+        # Redondeado antes de `ceil`: 0,6 * 60 no da exactamente 36.
+        return max(1, math.ceil(round(ventanas * self.segundos, 6)))
+
+
+def contadores(vista, request, ahora=None):
+    """Un `Contador` por cada criterio de `vista` con valor en `request`."""
+    ahora = time.time() if ahora is None else ahora
+    return [
+        Contador(vista, criterio, valor, peticiones, segundos, ahora)
+        for criterio, (peticiones, segundos) in limites_de(vista).items()
+        if (valor := CRITERIOS[criterio](request))
+    ]
+
+
+def _claves(lista):
+    return [clave for contador in lista for clave in (contador.actual, contador.anterior)]
+
+
+def _rechazo(lista, contados):
+    """Segundos de `Retry-After` si algún contador está lleno, o 0."""
+    return max((contador.espera(contados) for contador in lista), default=0)
+
+
+def _contar(almacen, contador):
+    try:
+        almacen.incr(contador.actual)
+    except ValueError:
+        # Primera de la ventana. Dura dos ventanas: después es la anterior.
+        if not almacen.add(contador.actual, 1, 2 * contador.segundos):
+            almacen.incr(contador.actual)
+
+
+async def _acontar(almacen, contador):
+    try:
+        await almacen.aincr(contador.actual)
+    except ValueError:
+        if not await almacen.aadd(contador.actual, 1, 2 * contador.segundos):
+            await almacen.aincr(contador.actual)
+
+
+def demasiadas(espera):
+    """Respuesta 429 con `Retry-After`."""
+    response = HttpResponse(
+        'Demasiados envíos seguidos. Intenta nuevamente en unos minutos.',
+        status=429, content_type='text/plain; charset=utf-8',
+    )
+    response['Retry-After'] = str(espera)
+    return response
+
+
+def permitir(vista, request):
+    """Cuenta el POST de `request` para `vista`; devuelve la respuesta 429 si supera algún límite, o None."""
+    lista = contadores(vista, request)
+    if not lista:
+        return None
+    # La caché una vez, no por el proxy `cache` en cada operación.
+    almacen = caches['default']
+    espera = _rechazo(lista, almacen.get_many(_claves(lista)))
+    if espera:
+        return demasiadas(espera)
+    for contador in lista:
+        _contar(almacen, contador)
+    return None
+
+
+async def apermitir(vista, request):
+    """Versión asíncrona de `permitir()`."""
+    almacen = caches['default']
+    if isinstance(almacen, LocMemCache):
+        # locmem no hace E/S: sin saltar a un hilo.
+        return permitir(vista, request)
+    lista = contadores(vista, request)
+    if not lista:
+        return None
+    espera = _rechazo(lista, await almacen.aget_many(_claves(lista)))
+    if espera:
+        return demasiadas(espera)
+    for contador in lista:
+        await _acontar(almacen, contador)
+    return None
+
+
+def limitar(vista):
+    """Decorador: aplica a los POST de la vista los límites de `RATE_LIMITS[vista]`.
+
+    Acepta vistas síncronas y asíncronas.
+    """
+    def decorador(funcion):
+        if iscoroutinefunction(funcion):
+            @wraps(funcion)
+            async def envoltura_asincrona(request, *args, **kwargs):
+                if request.method == 'POST':
+                    rechazo = await apermitir(vista, request)
+                    if rechazo is not None:
+                        return rechazo
+                return await funcion(request, *args, **kwargs)
+            return envoltura_asincrona
+
+        @wraps(funcion)
+        def envoltura(request, *args, **kwargs):
+            if request.method == 'POST':
+                rechazo = permitir(vista, request)
+                if rechazo is not None:
+                    return rechazo
+            return funcion(request, *args, **kwargs)
+        return envoltura
+    return decorador
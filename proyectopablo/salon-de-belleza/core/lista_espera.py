@@ -0,0 +1,188 @@
+"""
+core.lista_espera
+-----------------
+Lista de espera: quien no consiguió un horario (`reservar_turno_view`
+respondió que se solapa) puede anotarse para que le avisen si se libera uno
+de ese servicio ese día, en una ventana de
+`RESERVATION_WAITLIST_WINDOW_MINUTES` antes y después de la hora que pidió.
+
+Al borrar un turno futuro (señal `post_delete`, también desde el borrado en
+bloque del admin) se encola un evento `espera` con el hueco
+(`eventos_de_hueco`), en el mismo INSERT que el recálculo de su resumen
+diario (`core.analitica`). Lo mismo al cancelarlo: desconfirmar un turno
+confirmado (`Turno.save()` o la acción "Cancelar turnos" del admin,
+`core.reservas.cancelar_turnos`) lo marca cancelado, deja de ocupar la
+agenda y su horario se ofrece igual. El worker de la bandeja de salida
+(`core.eventos`) procesa los huecos de a lotes con `ofrecer`: una consulta
+por lote trae, por el índice parcial `espera_pendiente_idx`, sólo las
+primeras inscripciones pendientes que le sirven a cada hueco; el resto de la
+lista no se lee. Cada hueco se ofrece al primero en llegar cuya
+ventana incluye su hora de inicio, una inscripción recibe a lo sumo una
+oferta, y el correo sale por la misma bandeja de salida. Un hueco que
+alguien volvió a reservar antes de procesarlo (o un evento reprocesado más
+tarde) ya no se ofrece. La oferta no reserva: el horario es de quien lo
+reserve primero, con las comprobaciones de siempre.
+"""
+
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .disponibilidad import margen_entre_turnos
+from .models import Evento, ListaEspera, Turno, duracion_maxima_turno
+
+
+def ventana_de_espera():
+    """Margen, antes y después de la hora pedida, de las horas que le sirven a quien espera."""
+    return timedelta(minutes=getattr(settings, 'RESERVATION_WAITLIST_WINDOW_MINUTES', 60))
+
+
+def inscripcion(servicio, inicio, **datos):
+    """`ListaEspera` (sin guardar) para quien pidió `inicio`, con la ventana dentro del mismo día.
+
+    `datos` va al constructor (`cliente_nombre`, `cliente_email`, ...).
+    """
+    local = timezone.localtime(inicio)
+    margen = ventana_de_espera()
+    medianoche = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    desde = max(local - margen, medianoche)
+    hasta = min(local + margen, medianoche + timedelta(days=1, minutes=-1))
+    return ListaEspera(servicio=servicio, fecha=local.date(), desde=desde.time(), hasta=hasta.time(), **datos)
+
+
+def _primeros(horas, connection):
+    """`RawSQL` con los pks de los primeros pendientes que le sirven a cada hora de `{(servicio_id, fecha): [hora]}`.
+
+    Por cada hora, tantos como horas tiene ese día el servicio: los demás
+    huecos se llevan a lo sumo uno cada uno, así que alcanzan, y no se leen
+    inscripciones de más aunque la lista del día sea larga. Cada rama es una
+    búsqueda por el índice parcial (un `UNION ALL` de subconsultas con
+    `LIMIT`, que el ORM no arma en SQLite).
+    """
+    qn = connection.ops.quote_name
+    columna = {nombre: qn(ListaEspera._meta.get_field(nombre).column) for nombre in (
+        'id', 'servicio', 'fecha', 'desde', 'hasta', 'creado_en', 'ofrecido_en',
+    )}
+    rama = (
+        f"SELECT * FROM (SELECT {columna['id']} FROM {qn(ListaEspera._meta.db_table)}"
+        f" WHERE {columna['servicio']} = %s AND {columna['fecha']} = %s AND {columna['ofrecido_en']} IS NULL"
+        f" AND {columna['desde']} <= %s AND {columna['hasta']} >= %s"
+        f" ORDER BY {columna['creado_en']}, {columna['id']} LIMIT %s) {qn('primeros')}"
+    )
+    ramas, parametros = [], []
+    for (servicio_id, fecha), del_dia in horas.items():
+        for hora in sorted(set(del_dia)):
+            hora = connection.ops.adapt_timefield_value(hora)
+            ramas.append(rama)
+            parametros += [servicio_id, connection.ops.adapt_datefield_value(fecha), hora, hora, len(del_dia)]
+    return RawSQL(' UNION ALL '.join(ramas), parametros)
+
+
+def _libres(huecos, using):
+    """Los huecos `(servicio_id, recurso_id, inicio, fin)` que ningún turno vigente volvió a ocupar.
+
+    Una consulta: un rango de `overlapping` (o de `overlapping_recursos`, si
+    el hueco es de un recurso) por hueco, ensanchado por el margen entre
+    turnos, como `horario_ocupado` y `buscar_recurso`.
+    """
+    margen = margen_entre_turnos()
+    condicion = Q()
+    for servicio_id, recurso_id, inicio, fin in huecos:
+        condicion |= (Q(recurso=recurso_id) if recurso_id else Q(servicio=servicio_id)) & Q(
+            fecha_hora_inicio__gt=inicio - margen - duracion_maxima_turno(),
+            fecha_hora_inicio__lt=fin + margen,
+            fecha_hora_fin__gt=inicio - margen,
+        )
+    ocupados = {}
+    filas = Turno.objects.using(using).vigentes().filter(condicion).order_by().values_list(
+        'servicio_id', 'recurso_id', 'fecha_hora_inicio', 'fecha_hora_fin',
+    )
+    for servicio_id, recurso_id, inicio, fin in filas:
+        ocupados.setdefault((servicio_id, None), []).append((inicio, fin))
+        if recurso_id:
+            ocupados.setdefault((None, recurso_id), []).append((inicio, fin))
+    return [
+        (servicio_id, recurso_id, inicio, fin) for servicio_id, recurso_id, inicio, fin in huecos
+        if not any(
+            otro_inicio < fin + margen and otro_fin + margen > inicio
+            for otro_inicio, otro_fin in ocupados.get((None, recurso_id) if recurso_id else (servicio_id, None), ())
+        )
+    ]
+
+
+def ofrecer(huecos, using=None):
+    """Elige a quién ofrecer cada hueco `(servicio_id, inicio, fin[, recurso_id])`; devuelve `[(ListaEspera, inicio)]`.
+
+    Una consulta de los huecos que alguien volvió a reservar desde que se
+    liberaron (no se ofrecen), otra de los primeros en la lista para cada
+    hueco (bloqueados en PostgreSQL, saltando los que tenga otro worker) y un
+    UPDATE de los elegidos, que dejan de esperar. Los huecos pasados no se
+    ofrecen. Hay que llamarla dentro de una transacción.
+    """
+    using = using or router.db_for_write(ListaEspera)
+    ahora = timezone.now()
+    huecos = [
+        (servicio_id, recurso[0] if recurso else None, inicio, fin)
+        for servicio_id, inicio, fin, *recurso in huecos if inicio > ahora
+    ]
+    if not huecos:
+        return []
+    huecos = sorted(
+        ((servicio_id, inicio) for servicio_id, _, inicio, _ in _libres(huecos, using)), key=lambda hueco: hueco[1],
+    )
+    if not huecos:
+        return []
+    horas = {}
+    for servicio_id, inicio in huecos:
+        local = timezone.localtime(inicio)
+        horas.setdefault((servicio_id, local.date()), []).append(local.time())
+    candidatos = {}
+    filas = ListaEspera.objects.using(using).filter(pk__in=_primeros(horas, connections[using])).select_related(
+        'servicio',
+    ).select_for_update(skip_locked=True, of=('self',)).order_by('creado_en', 'pk')
+    for espera in filas:
+        candidatos.setdefault((espera.servicio_id, espera.fecha), []).append(espera)
+
+    ofertas = []
+    for servicio_id, inicio in huecos:
+        local = timezone.localtime(inicio)
+        del_dia = candidatos.get((servicio_id, local.date()), [])
+        hora = local.time()
+        for posicion, espera in enumerate(del_dia):
+            if espera.desde <= hora <= espera.hasta:
+                del del_dia[posicion]
+                espera.ofrecido_en, espera.inicio_ofrecido = ahora, inicio
+                ofertas.append((espera, inicio))
+                break
+    if ofertas:
+        ListaEspera.objects.using(using).bulk_update(
+            [espera for espera, _ in ofertas], ['ofrecido_en', 'inicio_ofrecido'],
+        )
+    return ofertas
+
+
+def hueco_de_evento(evento):
+    """`(servicio_id, inicio, fin, recurso_id)` de un evento `espera`."""
+    datos = evento.datos
+    return (
+        datos['servicio'], datetime.fromisoformat(datos['inicio']), datetime.fromisoformat(datos['fin']),
+        datos.get('recurso'),
+    )
+
+
+def eventos_de_hueco(turno):
+    """El `Evento` `espera` (sin guardar) del horario que libera `turno` al borrarse o cancelarse, si es futuro."""
+    return eventos_de_huecos([(turno.servicio_id, turno.recurso_id, turno.fecha_hora_inicio, turno.fecha_hora_fin)])
+
+
+def eventos_de_huecos(huecos):
+    """Los `Evento` `espera` (sin guardar) de los huecos futuros de `[(servicio_id, recurso_id, inicio, fin)]`."""
+    ahora = timezone.now()
+    return [
+        Evento.de_espera(servicio_id, inicio, fin, recurso_id)
+        for servicio_id, recurso_id, inicio, fin in huecos if inicio > ahora
+    ]
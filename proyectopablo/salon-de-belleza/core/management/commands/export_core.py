@@ -0,0 +1,46 @@
+"""
+`python manage.py export_core`: exporta turnos, reservas o contactos a CSV o
+JSONL (ver `core.exportar`).
+
+Escribe en `--salida` (o en la salida estándar) a medida que lee las filas,
+con memoria constante sea cual sea el tamaño de la tabla. `--desde`,
+`--hasta` (fechas locales, inclusive) y `--servicio` (id) se aplican en la
+consulta.
+
+    python manage.py export_core turnos --desde 2026-09-01 --hasta 2026-09-30 --salida turnos.csv
+    python manage.py export_core contactos --formato jsonl > contactos.jsonl
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.exportar import EXPORTACIONES, FORMATOS, TAMANO_BLOQUE, filtrar, serializar
+
+
+class Command(BaseCommand):
+    help = 'Exporta turnos, reservas o contactos a CSV o JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', choices=sorted(EXPORTACIONES))
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Primera fecha (YYYY-MM-DD).')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Última fecha, inclusive (YYYY-MM-DD).')
+        parser.add_argument('--servicio', type=int, help='Id del servicio (turnos y reservas).')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto, la salida estándar).')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE, help='Filas por lectura de la base.')
+
+    def handle(self, *args, **opciones):
+        exportacion = EXPORTACIONES[opciones['modelo']]
+        try:
+            queryset = filtrar(exportacion, desde=opciones['desde'], hasta=opciones['hasta'], servicio=opciones['servicio'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        trozos = serializar(exportacion, queryset, opciones['formato'], opciones['bloque'])
+        if opciones['salida']:
+            with open(opciones['salida'], 'w', encoding='utf-8', newline='') as archivo:
+                for trozo in trozos:
+                    archivo.write(trozo)
+        else:
+            for trozo in trozos:
+                self.stdout.write(trozo, ending='')
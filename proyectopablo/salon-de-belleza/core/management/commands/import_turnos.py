@@ -0,0 +1,83 @@
+"""
+`python manage.py import_turnos`: importa turnos históricos desde CSV o JSONL
+(ver `core.importar`).
+
+Lee el archivo por bloques de `--bloque` filas, cada uno en su transacción, e
+informa las filas por segundo. Las filas rechazadas se escriben, con el
+motivo en la columna (o clave) `error`, en `--errores` (por defecto
+`<archivo>.errores.<formato>`).
+
+    python manage.py import_turnos historico.csv
+    python manage.py import_turnos historico.jsonl --bloque 10000 --no-crear-servicios
+"""
+
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importar import FILAS_POR_BLOQUE, Importacion, leer_filas
+
+
+class Command(BaseCommand):
+    help = 'Importa turnos históricos desde un archivo CSV o JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Por defecto, según la extensión del archivo.')
+        parser.add_argument('--bloque', type=int, default=FILAS_POR_BLOQUE, help='Filas por transacción.')
+        parser.add_argument('--errores', help='Archivo para las filas rechazadas.')
+        parser.add_argument(
+            '--no-crear-servicios', action='store_false', dest='crear_servicios',
+            help='Rechaza las filas de servicios que no existen en lugar de crearlos.',
+        )
+
+    def handle(self, *args, **opciones):
+        ruta = opciones['archivo']
+        formato = opciones['formato'] or ('jsonl' if ruta.endswith(('.jsonl', '.ndjson')) else 'csv')
+        ruta_errores = opciones['errores'] or f'{ruta}.errores.{formato}'
+        try:
+            archivo = open(ruta, encoding='utf-8-sig', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
+
+        importacion = Importacion(crear_servicios=opciones['crear_servicios'])
+        importados = rechazados = 0
+        t0 = time.perf_counter()
+        with archivo, open(ruta_errores, 'w', encoding='utf-8', newline='') as errores:
+            escribir = self._escritor_de_errores(errores, formato)
+            for resultado in importacion.importar(leer_filas(archivo, formato), opciones['bloque']):
+                importados += resultado.importados
+                rechazados += len(resultado.rechazados)
+                for rechazo in resultado.rechazados:
+                    escribir(rechazo)
+                self._informar(importados, rechazados, t0, ending='\r')
+        self._informar(importados, rechazados, t0)
+        if rechazados:
+            self.stdout.write(f'Filas rechazadas en {ruta_errores}.')
+
+    def _informar(self, importados, rechazados, t0, ending='\n'):
+        segundos = time.perf_counter() - t0
+        filas = importados + rechazados
+        self.stdout.write(
+            f'{filas} filas: {importados} importadas, {rechazados} rechazadas '
+            f'en {segundos:.1f}s ({filas / max(segundos, 1e-9):.0f} filas/s)',
+            ending=ending,
+        )
+
+    def _escritor_de_errores(self, archivo, formato):
+        if formato == 'jsonl':
+            def escribir(rechazo):
+                archivo.write(json.dumps({'linea': rechazo.linea, 'error': rechazo.error, **rechazo.fila}, ensure_ascii=False) + '\n')
+            return escribir
+
+        escritor = None
+
+        def escribir(rechazo):
+            nonlocal escritor
+            if escritor is None:
+                escritor = csv.DictWriter(archivo, ['linea', 'error', *rechazo.fila], extrasaction='ignore')
+                escritor.writeheader()
+            escritor.writerow({'linea': rechazo.linea, 'error': rechazo.error, **rechazo.fila})
+        return escribir
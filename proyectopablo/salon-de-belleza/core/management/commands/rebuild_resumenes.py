@@ -0,0 +1,26 @@
+"""
+`python manage.py rebuild_resumenes`: recalcula toda la tabla `ResumenDiario`
+desde los turnos (ver `core.analitica`).
+
+Hace falta una vez después de migrar y, luego, sólo si cambian precios o
+recursos y se quieren ver reflejados en los días pasados: los cambios de
+turnos los mantiene al día `run_outbox`.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.analitica import reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el resumen diario de turnos por servicio para el tablero del admin.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bloque', type=int, default=2000, help='Turnos por lectura de la base.')
+
+    def handle(self, *args, **opciones):
+        t0 = time.perf_counter()
+        celdas = reconstruir(tamano_bloque=opciones['bloque'])
+        self.stdout.write(f'{celdas} resúmenes diarios en {time.perf_counter() - t0:.1f}s')
@@ -0,0 +1,41 @@
+"""
+`python manage.py run_outbox`: worker de la bandeja de salida (`core.eventos`).
+
+Procesa por lotes los eventos pendientes (sincronización de reservas, correos
+de confirmación, avisos de contacto y resúmenes diarios) y, cuando no queda
+nada, espera `--intervalo` segundos antes de volver a mirar. Con `--una-vez`
+procesa lo que esté vencido y termina (útil desde cron o en despliegues).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.eventos import procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Procesa la bandeja de salida: sincroniza reservas y envía correos y avisos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina.')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos de espera cuando no hay eventos.')
+        parser.add_argument('--lote', type=int, default=None, help='Eventos por lote (por defecto OUTBOX_BATCH_SIZE).')
+
+    def handle(self, *args, **opciones):
+        total = 0
+        try:
+            while True:
+                procesados = procesar_pendientes(opciones['lote'])
+                total += procesados
+                if procesados:
+                    continue
+                if opciones['una_vez']:
+                    break
+                time.sleep(opciones['intervalo'])
+                # Como entre peticiones: descarta conexiones caídas o vencidas.
+                close_old_connections()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f'{total} eventos procesados.')
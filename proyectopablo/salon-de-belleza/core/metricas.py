@@ -0,0 +1,311 @@
+"""
+core.metricas
+-------------
+Dónde se va el tiempo de cada petición, en producción.
+
+- `MedicionMiddleware` (primero en `MIDDLEWARE`): en una fracción
+  `PERF_SAMPLE_RATE` de las peticiones mide la latencia total, las consultas
+  a la base (cantidad y tiempo) y el render de plantillas, y las suma a las
+  métricas de su vista (`request.resolver_match.view_name`, también las del
+  admin). Con `PERF_SERVER_TIMING` agrega la cabecera `Server-Timing`
+  (`db`, `tpl` y `total`), que las herramientas del navegador muestran.
+- Las consultas se miden con un `execute_wrapper` que se instala en cada
+  conexión al abrirla (`connection_created`). En toda petición, medida o
+  no, toma el tiempo de cada consulta (dos `perf_counter`): una de más de
+  `PERF_SLOW_QUERY_MS` se registra siempre en el logger `core.metricas` con
+  la vista y el SQL, y se cuenta en `salon_slow_queries_total`. Sólo la
+  cantidad y el tiempo en la base son de la muestra. Fuera de una petición
+  (worker, comandos) sólo lee una `ContextVar`.
+- El render se mide con el backend `DjangoTemplates` de este módulo
+  (`TEMPLATES[0]['BACKEND']`), igual al de Django salvo por eso.
+- `metricas_view` (`/interno/metricas/`): las métricas en el formato de
+  texto de Prometheus, para el personal del admin o con
+  `Authorization: Bearer` y alguno de `PERF_METRICS_TOKENS`.
+
+La medición es por `ContextVar`, así que sigue a la petición también bajo
+ASGI: `sync_to_async` copia el contexto al hilo donde corre el ORM. Las
+métricas son de cada proceso; con varios procesos, Prometheus debe leer cada
+uno (o sumarlas). Salvo las consultas lentas, cuentan sólo las peticiones
+muestreadas: `salon_sample_rate` permite estimar el total.
+"""
+
+import hmac
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates as _DjangoTemplates, Template as _Template
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+# Límites (`le`) de los histogramas.
+SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+# La petición en curso (todas) y su medición (sólo las de la muestra).
+_peticion = ContextVar('peticion', default=None)
+_actual = ContextVar('medicion', default=None)
+
+
+def tasa_de_muestreo():
+    """Fracción de las peticiones que se miden (`PERF_SAMPLE_RATE`)."""
+    return getattr(settings, 'PERF_SAMPLE_RATE', 0.1)
+
+
+def _vista(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    return coincidencia.view_name if coincidencia else 'sin_ruta'
+
+
+class Medicion:
+    """Lo medido de una petición."""
+
+    __slots__ = ('request', 'inicio', 'consultas', 'en_la_base', 'en_plantillas')
+
+    def __init__(self, request):
+        self.request = request
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.en_la_base = self.en_plantillas = 0.0
+
+    def vista(self):
+        return _vista(self.request)
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * len(limites)
+        self.total = 0
+        self.suma = 0.0
+
+    def observar(self, valor):
+        for posicion, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.cuentas[posicion] += 1
+                break
+        self.total += 1
+        self.suma += valor
+
+
+class Serie:
+    """Métricas de una vista."""
+
+    def __init__(self):
+        self.duracion = Histograma(SEGUNDOS)
+        self.consultas = Histograma(CONSULTAS)
+        self.en_la_base = self.en_plantillas = 0.0
+        self.lentas = 0
+
+
+class Registro:
+    """Métricas del proceso, por vista."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.series = {}
+
+    def reiniciar(self):
+        with self._lock:
+            self.series = {}
+
+    def _serie(self, vista):
+        serie = self.series.get(vista)
+        if serie is None:
+            serie = self.series[vista] = Serie()
+        return serie
+
+    def observar(self, medicion, duracion):
+        with self._lock:
+            serie = self._serie(medicion.vista())
+            serie.duracion.observar(duracion)
+            serie.consultas.observar(medicion.consultas)
+            serie.en_la_base += medicion.en_la_base
+            serie.en_plantillas += medicion.en_plantillas
+
+    def contar_lenta(self, vista):
+        with self._lock:
+            self._serie(vista).lentas += 1
+
+    def prometheus(self):
+        """Las métricas en el formato de texto de Prometheus."""
+        with self._lock:
+            series = sorted(self.series.items())
+            lineas = [
+                '# HELP salon_sample_rate Fracción de las peticiones que se miden.',
+                '# TYPE salon_sample_rate gauge',
+                f'salon_sample_rate {tasa_de_muestreo()}',
+            ]
+            for nombre, atributo, descripcion in (
+                ('salon_request_duration_seconds', 'duracion', 'Latencia de las peticiones medidas.'),
+                ('salon_request_queries', 'consultas', 'Consultas a la base por petición medida.'),
+            ):
+                lineas += [f'# HELP {nombre} {descripcion}', f'# TYPE {nombre} histogram']
+                for vista, serie in series:
+                    lineas += _histograma(nombre, _etiqueta(vista), getattr(serie, atributo))
+            for nombre, atributo, descripcion in (
+                ('salon_db_seconds_total', 'en_la_base', 'Tiempo en consultas a la base.'),
+                ('salon_template_seconds_total', 'en_plantillas', 'Tiempo de render de plantillas.'),
+                ('salon_slow_queries_total', 'lentas', 'Consultas de más de PERF_SLOW_QUERY_MS (en todas las peticiones).'),
+            ):
+                lineas += [f'# HELP {nombre} {descripcion}', f'# TYPE {nombre} counter']
+                lineas += [f'{nombre}{{vista="{_etiqueta(vista)}"}} {getattr(serie, atributo)}' for vista, serie in series]
+        return '\n'.join(lineas) + '\n'
+
+
+def _etiqueta(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histograma(nombre, vista, histograma):
+    acumulado = 0
+    lineas = []
+    for limite, cuenta in zip(histograma.limites, histograma.cuentas):
+        acumulado += cuenta
+        lineas.append(f'{nombre}_bucket{{vista="{vista}",le="{limite}"}} {acumulado}')
+    lineas += [
+        f'{nombre}_bucket{{vista="{vista}",le="+Inf"}} {histograma.total}',
+        f'{nombre}_sum{{vista="{vista}"}} {histograma.suma}',
+        f'{nombre}_count{{vista="{vista}"}} {histograma.total}',
+    ]
+    return lineas
+
+
+REGISTRO = Registro()
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    request = _peticion.get()
+    if request is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion = _actual.get()
+        if medicion is not None:
+            medicion.consultas += 1
+            medicion.en_la_base += duracion
+        if duracion * 1000 >= getattr(settings, 'PERF_SLOW_QUERY_MS', 100):
+            vista = _vista(request)
+            REGISTRO.contar_lenta(vista)
+            logger.warning('Consulta lenta (%.1f ms) en %s: %s', duracion * 1000, vista, sql)
+
+
+@receiver(connection_created, dispatch_uid='metricas_medir_consultas')
+def _instalar(sender, connection, **kwargs):
+    # La lista de la conexión sobrevive a las reconexiones.
+    if _medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_medir_consulta)
+
+
+class Template(_Template):
+    def render(self, context=None, request=None):
+        medicion = _actual.get()
+        if medicion is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.en_plantillas += time.perf_counter() - inicio
+
+
+class DjangoTemplates(_DjangoTemplates):
+    """El backend de plantillas de Django, midiendo el render de las peticiones medidas."""
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+def _empezar(request):
+    """Pone la petición (y, si está en la muestra, su medición) en el contexto."""
+    medicion = Medicion(request) if random.random() < tasa_de_muestreo() else None
+    return _peticion.set(request), _actual.set(medicion)
+
+
+def _olvidar(tokens):
+    """Saca del contexto lo que puso `_empezar`; devuelve la medición, si había."""
+    peticion, token = tokens
+    medicion = _actual.get()
+    _actual.reset(token)
+    _peticion.reset(peticion)
+    return medicion
+
+
+def _terminar(tokens, response):
+    medicion = _olvidar(tokens)
+    if medicion is None:
+        return response
+    duracion = time.perf_counter() - medicion.inicio
+    REGISTRO.observar(medicion, duracion)
+    if getattr(settings, 'PERF_SERVER_TIMING', True):
+        response['Server-Timing'] = (
+            f'db;dur={medicion.en_la_base * 1000:.1f};desc="{medicion.consultas} consultas", '
+            f'tpl;dur={medicion.en_plantillas * 1000:.1f}, total;dur={duracion * 1000:.1f}'
+        )
+    return response
+
+
+class MedicionMiddleware:
+    """Mide una muestra de las peticiones (ver el módulo); síncrono y asíncrono."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        tokens = _empezar(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _olvidar(tokens)
+            raise
+        return _terminar(tokens, response)
+
+    async def __acall__(self, request):
+        tokens = _empezar(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _olvidar(tokens)
+            raise
+        return _terminar(tokens, response)
+
+
+def _autorizado(request):
+    esquema, _, token = request.headers.get('Authorization', '').partition(' ')
+    if esquema.lower() == 'bearer' and any(
+        hmac.compare_digest(token.encode(), valido.encode()) for valido in getattr(settings, 'PERF_METRICS_TOKENS', [])
+    ):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+@require_GET
+def metricas_view(request):
+    """Las métricas del proceso en el formato de texto de Prometheus."""
+    if not _autorizado(request):
+        respuesta = HttpResponse('No autorizado.', status=401, content_type='text/plain; charset=utf-8')
+        respuesta['WWW-Authenticate'] = 'Bearer'
+        return respuesta
+    return HttpResponse(REGISTRO.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
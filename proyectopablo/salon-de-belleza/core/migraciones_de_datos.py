@@ -0,0 +1,164 @@
+"""
+core.migraciones_de_datos
+-------------------------
+Utilidades para migraciones de datos de `core` que recorren tablas grandes.
+
+Reciben los modelos como argumento (en una migración, los de
+`apps.get_model`) y trabajan por conjuntos: nada de una consulta ni un
+`save()` por fila. No importan los modelos de `core` (sólo
+`core.contactos`, que tampoco).
+
+Una migración no importa este módulo: copia las funciones que usa tal como
+son al escribirla (la 0005 y la 0012), para que sigan haciendo lo mismo
+aunque el módulo cambie después.
+
+- `servicios_por_nombre`: todos los `Servicio` en un diccionario por nombre
+  (sin distinguir mayúsculas), creando los que falten con un solo
+  `bulk_create`.
+- `reasignar_por_bloques`: pone `destino = valores[origen]` en las filas de
+  un queryset, de a bloques de `tamano_bloque` filas consecutivas por pk, con
+  un UPDATE por valor distinto de `origen` en el bloque, e informa el avance.
+- `actualizar_por_pk`: pone un valor distinto en cada fila (`{pk: valor}`)
+  con un solo UPDATE, tomando los valores de una tabla temporal.
+- `enlazar_clientes`: crea los `Cliente` de los turnos y enlaza cada turno
+  con el suyo, de a bloques (lo que hace la migración 0012).
+
+Ejemplo (lo que hace la migración 0005)::
+
+    reservas = Reserva.objects.using(alias).exclude(servicio='')
+    nombres = {viejo: normalizar(viejo) for viejo in valores_distintos(reservas, 'servicio')}
+    servicios = servicios_por_nombre(Servicio, nombres.values(), using=alias)
+    reasignar_por_bloques(
+        reservas, 'servicio', 'servicio_fk',
+        {viejo: servicios[nombre.casefold()] for viejo, nombre in nombres.items()},
+    )
+"""
+
+import logging
+
+from django.db import connections
+
+from .contactos import clave_de, clientes_por_clave
+
+logger = logging.getLogger(__name__)
+
+# Filas por UPDATE.
+TAMANO_BLOQUE = 5000
+
+# Tabla temporal de `actualizar_por_pk`.
+TABLA_DE_VALORES = 'migracion_valores_por_pk'
+
+
+def valores_distintos(queryset, campo):
+    """Valores distintos (no vacíos) de `campo` en `queryset`, en una consulta."""
+    return {v for v in queryset.order_by().values_list(campo, flat=True).distinct() if v not in (None, '')}
+
+
+def servicios_por_nombre(Servicio, nombres=(), using='default'):
+    """`{nombre.casefold(): servicio}` con todos los servicios y los de `nombres`.
+
+    Los de `nombres` que no existen se crean en un solo `bulk_create`. Si dos
+    servicios se llaman igual salvo mayúsculas, gana el de menor pk.
+    """
+    servicios = {}
+    for servicio in Servicio.objects.using(using).order_by('pk'):
+        servicios.setdefault(servicio.nombre.casefold(), servicio)
+    faltan = {}
+    for nombre in nombres:
+        if nombre and nombre.casefold() not in servicios:
+            faltan.setdefault(nombre.casefold(), nombre)
+    for servicio in Servicio.objects.using(using).bulk_create([Servicio(nombre=n) for n in faltan.values()]):
+        servicios[servicio.nombre.casefold()] = servicio
+    return servicios
+
+
+def _informar_en_log(hechas, total):
+    logger.info('%d/%d filas', hechas, total)
+
+
+def reasignar_por_bloques(queryset, origen, destino, valores, tamano_bloque=TAMANO_BLOQUE, informar=_informar_en_log):
+    """Pone `destino = valores[origen]` en cada fila de `queryset`; devuelve las filas actualizadas.
+
+    Se avanza por rangos de pk de `tamano_bloque` filas: por cada rango, una
+    consulta de sus pks, una de los valores distintos de `origen` y un UPDATE
+    por valor (acotado al rango, por el índice de la pk). Las filas cuyo
+    `origen` no está en `valores` no se tocan. `informar(hechas, total)` se
+    llama después de cada bloque.
+    """
+    total = queryset.count()
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    hechas = actualizadas = 0
+    ultimo = None
+    while bloque := list((pks if ultimo is None else pks.filter(pk__gt=ultimo))[:tamano_bloque]):
+        rango = queryset.filter(pk__gte=bloque[0], pk__lte=bloque[-1])
+        for valor in rango.order_by().values_list(origen, flat=True).distinct():
+            if valor in valores:
+                actualizadas += rango.filter(**{origen: valor}).update(**{destino: valores[valor]})
+        ultimo = bloque[-1]
+        hechas += len(bloque)
+        if informar is not None:
+            informar(hechas, total)
+    return actualizadas
+
+
+def actualizar_por_pk(modelo, campo, valores, using='default'):
+    """Pone `campo = valores[pk]` en cada fila de `modelo`; devuelve las filas actualizadas.
+
+    Los pares se cargan en una tabla temporal (`executemany`) y un solo UPDATE
+    los toma de ahí con una subconsulta por la pk. `bulk_update` arma un
+    `CASE` con un `WHEN` por fila, que la base evalúa entero en cada una.
+    """
+    if not valores:
+        return 0
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    pk = modelo._meta.pk
+    campo = modelo._meta.get_field(campo)
+    tabla, temporal = qn(modelo._meta.db_table), qn(TABLA_DE_VALORES)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {temporal} '
+            f'(pk {pk.rel_db_type(connection)} PRIMARY KEY, valor {campo.db_type(connection)})'
+        )
+        try:
+            cursor.executemany(
+                f'INSERT INTO {temporal} (pk, valor) VALUES (%s, %s)',
+                [(clave, campo.get_db_prep_save(valor, connection)) for clave, valor in valores.items()],
+            )
+            cursor.execute(
+                f'UPDATE {tabla} SET {qn(campo.column)} = '
+                f'(SELECT valor FROM {temporal} WHERE {temporal}.pk = {tabla}.{qn(pk.column)}) '
+                f'WHERE {qn(pk.column)} IN (SELECT pk FROM {temporal})'
+            )
+            return cursor.rowcount
+        finally:
+            cursor.execute(f'DROP TABLE {temporal}')
+
+
+def enlazar_clientes(turnos, Cliente, tamano_bloque=TAMANO_BLOQUE, informar=_informar_en_log):
+    """Pone en cada turno de `turnos` su `Cliente` (ver `core.contactos`); devuelve los enlazados.
+
+    Por rangos de pk de `tamano_bloque` turnos: una consulta de sus datos de
+    contacto, las de `clientes_por_clave` (que crea los clientes que falten)
+    y un `actualizar_por_pk`. El nombre de un cliente nuevo es el de su turno más
+    antiguo. `informar(hechos, total)` se llama después de cada bloque.
+    """
+    using = turnos.db
+    total = turnos.count()
+    filas = turnos.order_by('pk').values_list('pk', 'cliente_nombre', 'cliente_telefono', 'cliente_email')
+    hechos = enlazados = 0
+    ultimo = None
+    while bloque := list((filas if ultimo is None else filas.filter(pk__gt=ultimo))[:tamano_bloque]):
+        claves, nombres = [], {}
+        for pk, nombre, telefono, email in bloque:
+            clave = clave_de(telefono, email)
+            claves.append((pk, clave))
+            nombres.setdefault(clave, nombre)
+        clientes = clientes_por_clave(nombres, Cliente, using)
+        valores = {pk: clientes[clave] for pk, clave in claves if clave in clientes}
+        enlazados += actualizar_por_pk(turnos.model, 'cliente', valores, using)
+        ultimo = bloque[-1][0]
+        hechos += len(bloque)
+        if informar is not None:
+            informar(hechos, total)
+    return enlazados
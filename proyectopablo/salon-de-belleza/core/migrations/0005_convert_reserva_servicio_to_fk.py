@@ -10,8 +10,59 @@ Este migration hace los pasos seguros en SQLite:
 NOTA: Esta migración preserva los datos existentes y deja `turno` como
 campo nullable (se puede enlazar manualmente si se desea).
 """
+import sys
+
 from django.db import migrations, models
 
+# Por conjuntos, como `core.migraciones_de_datos`: estas funciones están
+# copiadas aquí tal como eran al escribir la migración, para que no cambie
+# lo que hace si cambia ese módulo.
+TAMANO_BLOQUE = 5000
+
+
+def valores_distintos(queryset, campo):
+    """Valores distintos (no vacíos) de `campo` en `queryset`, en una consulta."""
+    return {v for v in queryset.order_by().values_list(campo, flat=True).distinct() if v not in (None, '')}
+
+
+def servicios_por_nombre(Servicio, nombres, using):
+    """`{nombre.casefold(): servicio}` con todos los servicios y los de `nombres` (creados de una vez)."""
+    servicios = {}
+    for servicio in Servicio.objects.using(using).order_by('pk'):
+        servicios.setdefault(servicio.nombre.casefold(), servicio)
+    faltan = {}
+    for nombre in nombres:
+        if nombre and nombre.casefold() not in servicios:
+            faltan.setdefault(nombre.casefold(), nombre)
+    for servicio in Servicio.objects.using(using).bulk_create([Servicio(nombre=n) for n in faltan.values()]):
+        servicios[servicio.nombre.casefold()] = servicio
+    return servicios
+
+
+def reasignar_por_bloques(queryset, origen, destino, valores, informar):
+    """Pone `destino = valores[origen]` en cada fila de `queryset`, de a bloques de pks consecutivas."""
+    total = queryset.count()
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    hechas = 0
+    ultimo = None
+    while bloque := list((pks if ultimo is None else pks.filter(pk__gt=ultimo))[:TAMANO_BLOQUE]):
+        rango = queryset.filter(pk__gte=bloque[0], pk__lte=bloque[-1])
+        for valor in rango.order_by().values_list(origen, flat=True).distinct():
+            if valor in valores:
+                rango.filter(**{origen: valor}).update(**{destino: valores[valor]})
+        ultimo = bloque[-1]
+        hechas += len(bloque)
+        informar(hechas, total)
+
+
+def _informar(hechas, total):
+    # Sólo si hay más de un bloque (en una base chica no ensucia la salida de
+    # migrate), en una línea debajo de "Applying ..." que se actualiza.
+    if total > TAMANO_BLOQUE:
+        inicio = '\n' if hechas <= TAMANO_BLOQUE else '\r'
+        sys.stdout.write(f'{inicio}    {hechas}/{total} reservas')
+        sys.stdout.flush()
+
 
 def forwards(apps, schema_editor):
     Reserva = apps.get_model('core', 'Reserva')
@@ -25,19 +76,20 @@ def forwards(apps, schema_editor):
         'Tintura': 'Tintura',
     }
 
-    for reserva in Reserva.objects.using(db_alias).all():
-        old = getattr(reserva, 'servicio', None)
-        if not old:
-            continue
-        label = mapping.get(old, old)
-
-        # Buscar un Servicio existente que coincida por nombre (case-insensitive)
-        servicio_obj = Servicio.objects.using(db_alias).filter(nombre__iexact=label).first()
-        if not servicio_obj:
-            servicio_obj = Servicio.objects.using(db_alias).create(nombre=label)
-
-        reserva.servicio_fk = servicio_obj
-        reserva.save()
+    # Por conjuntos: una consulta para los valores viejos, un `bulk_create`
+    # para los servicios que falten y un UPDATE por valor y bloque, en lugar
+    # de una búsqueda y un `save()` por reserva. Los servicios se comparan
+    # sin distinguir mayúsculas.
+    reservas = Reserva.objects.using(db_alias)
+    labels = {old: mapping.get(old, old) for old in valores_distintos(reservas, 'servicio')}
+    servicios = servicios_por_nombre(Servicio, labels.values(), using=db_alias)
+    reasignar_por_bloques(
+        reservas,
+        'servicio',
+        'servicio_fk',
+        {old: servicios[label.casefold()] for old, label in labels.items()},
+        informar=_informar,
+    )
 
 
 def backwards(apps, schema_editor):
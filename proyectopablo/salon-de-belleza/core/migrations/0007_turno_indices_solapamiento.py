@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_reserva_turno'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['servicio', 'fecha_hora_inicio', 'fecha_hora_fin'], name='turno_serv_ini_fin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['confirmado', 'fecha_hora_inicio'], name='turno_conf_ini_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_turno_indices_solapamiento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['fecha_hora_inicio', 'id'], name='turno_inicio_id_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:11
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_turno_indice_listado_admin'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='turno',
+            unique_together=set(),
+        ),
+        migrations.CreateModel(
+            name='Recurso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('hora_inicio', models.TimeField(default=datetime.time(9, 0))),
+                ('hora_fin', models.TimeField(default=datetime.time(18, 0))),
+                ('activo', models.BooleanField(default=True)),
+                ('servicios', models.ManyToManyField(blank=True, related_name='recursos', to='core.servicio')),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='turno',
+            name='recurso',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='core.recurso'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['recurso', 'fecha_hora_inicio', 'fecha_hora_fin'], name='turno_rec_ini_fin_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='turno',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurso__isnull', True)), fields=('servicio', 'fecha_hora_inicio'), name='turno_servicio_inicio_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='turno',
+            constraint=models.UniqueConstraint(fields=('recurso', 'fecha_hora_inicio'), name='turno_recurso_inicio_unico'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_evento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evento',
+            name='tipo',
+            field=models.CharField(choices=[('turno', 'Turno'), ('contacto', 'Contacto'), ('correo', 'Correo'), ('resumen', 'Resumen')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('turnos', models.PositiveIntegerField(default=0)),
+                ('confirmados', models.PositiveIntegerField(default=0)),
+                ('minutos_reservados', models.PositiveIntegerField(default=0)),
+                ('minutos_disponibles', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes', to='core.servicio')),
+            ],
+            options={
+                'verbose_name': 'resumen diario',
+                'verbose_name_plural': 'resúmenes diarios',
+                'ordering': ['fecha', 'servicio'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'servicio'), name='resumen_fecha_servicio_unico')],
+            },
+        ),
+    ]
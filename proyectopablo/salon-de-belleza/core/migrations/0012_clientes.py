@@ -0,0 +1,184 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:35
+
+import re
+import sys
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import connections, migrations, models
+from django.db.models import Q
+
+# La normalización de `core.contactos` y el enlace por bloques de
+# `core.migraciones_de_datos`, copiados aquí tal como eran al escribir la
+# migración, para que no cambie lo que hace si cambian esos módulos.
+TAMANO_BLOQUE = 5000
+
+# Valores por consulta `IN` y filas por INSERT.
+TAMANO_LOTE = 500
+
+NO_DIGITOS = re.compile(r'[^0-9]')
+
+
+def normalizar_telefono(texto):
+    """El teléfono `texto` en E.164 con `CLIENT_PHONE_COUNTRY_CODE` si no trae código de país, o ''."""
+    texto = (texto or '').strip()
+    digitos = NO_DIGITOS.sub('', texto)
+    if texto.startswith('+'):
+        numero = digitos
+    elif digitos.startswith('00'):
+        numero = digitos[2:]
+    else:
+        numero = getattr(settings, 'CLIENT_PHONE_COUNTRY_CODE', '54') + digitos.lstrip('0')
+    return f'+{numero}' if 8 <= len(numero) <= 15 else ''
+
+
+def clave_de(telefono, email):
+    """`(teléfono E.164, email en minúsculas)`; '' en los que no hay."""
+    return normalizar_telefono(telefono), (email or '').strip().lower()
+
+
+def _existentes(Cliente, telefonos, emails, using):
+    """`({teléfono: pk}, {email: pk})` de los clientes con alguno de esos datos."""
+    telefonos, emails = sorted(telefonos), sorted(emails)
+    por_telefono, por_email = {}, {}
+    for desde in range(0, max(len(telefonos), len(emails)), TAMANO_LOTE):
+        condicion = Q(telefono__in=telefonos[desde:desde + TAMANO_LOTE]) | Q(email__in=emails[desde:desde + TAMANO_LOTE])
+        for pk, telefono, email in Cliente.objects.using(using).filter(condicion).order_by().values_list('pk', 'telefono', 'email'):
+            if telefono:
+                por_telefono[telefono] = pk
+            if email:
+                por_email[email] = pk
+    return por_telefono, por_email
+
+
+def _resolver(clave, por_telefono, por_email):
+    telefono, email = clave
+    return (telefono and por_telefono.get(telefono)) or (email and por_email.get(email)) or None
+
+
+def clientes_por_clave(nombres, Cliente, using):
+    """`{clave: pk del cliente}` de `nombres` (`{clave: nombre}`), creando los que faltan."""
+    nombres = {clave: nombre for clave, nombre in nombres.items() if any(clave)}
+    if not nombres:
+        return {}
+    por_telefono, por_email = _existentes(
+        Cliente, {t for t, _ in nombres if t}, {e for _, e in nombres if e}, using,
+    )
+    nuevos, telefonos, emails = [], set(), set(por_email)
+    for clave, nombre in nombres.items():
+        telefono, email = clave
+        if _resolver(clave, por_telefono, por_email) is not None or telefono in telefonos:
+            continue
+        if email in emails:
+            continue
+        nuevos.append(Cliente(nombre=nombre[:100], telefono=telefono or None, email=email or None))
+        telefonos.update([telefono] if telefono else [])
+        emails.update([email] if email else [])
+    if nuevos:
+        Cliente.objects.using(using).bulk_create(nuevos, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+        creados = _existentes(Cliente, {c.telefono for c in nuevos if c.telefono}, {c.email for c in nuevos if c.email}, using)
+        por_telefono.update(creados[0])
+        por_email.update(creados[1])
+    return {clave: pk for clave in nombres if (pk := _resolver(clave, por_telefono, por_email)) is not None}
+
+
+def actualizar_por_pk(modelo, campo, valores, using):
+    """Pone `campo = valores[pk]` en cada fila de `modelo` con un UPDATE desde una tabla temporal."""
+    if not valores:
+        return
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    pk = modelo._meta.pk
+    campo = modelo._meta.get_field(campo)
+    tabla, temporal = qn(modelo._meta.db_table), qn('migracion_valores_por_pk')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE {temporal} '
+            f'(pk {pk.rel_db_type(connection)} PRIMARY KEY, valor {campo.db_type(connection)})'
+        )
+        try:
+            cursor.executemany(
+                f'INSERT INTO {temporal} (pk, valor) VALUES (%s, %s)',
+                [(clave, campo.get_db_prep_save(valor, connection)) for clave, valor in valores.items()],
+            )
+            cursor.execute(
+                f'UPDATE {tabla} SET {qn(campo.column)} = '
+                f'(SELECT valor FROM {temporal} WHERE {temporal}.pk = {tabla}.{qn(pk.column)}) '
+                f'WHERE {qn(pk.column)} IN (SELECT pk FROM {temporal})'
+            )
+        finally:
+            cursor.execute(f'DROP TABLE {temporal}')
+
+
+def enlazar_clientes(turnos, Cliente, informar):
+    """Pone en cada turno de `turnos` su `Cliente` (creando los que falten), de a bloques de pks."""
+    using = turnos.db
+    total = turnos.count()
+    filas = turnos.order_by('pk').values_list('pk', 'cliente_nombre', 'cliente_telefono', 'cliente_email')
+    hechos = 0
+    ultimo = None
+    while bloque := list((filas if ultimo is None else filas.filter(pk__gt=ultimo))[:TAMANO_BLOQUE]):
+        claves, nombres = [], {}
+        for pk, nombre, telefono, email in bloque:
+            clave = clave_de(telefono, email)
+            claves.append((pk, clave))
+            nombres.setdefault(clave, nombre)
+        clientes = clientes_por_clave(nombres, Cliente, using)
+        actualizar_por_pk(turnos.model, 'cliente', {pk: clientes[clave] for pk, clave in claves if clave in clientes}, using)
+        ultimo = bloque[-1][0]
+        hechos += len(bloque)
+        informar(hechos, total)
+
+
+def _informar(hechos, total):
+    # Como en la 0005: sólo si hay más de un bloque.
+    if total > TAMANO_BLOQUE:
+        inicio = '\n' if hechos <= TAMANO_BLOQUE else '\r'
+        sys.stdout.write(f'{inicio}    {hechos}/{total} turnos')
+        sys.stdout.flush()
+
+
+def crear_clientes(apps, schema_editor):
+    # Los turnos existentes, de a bloques por pk y por conjuntos, antes de
+    # crear el índice (cliente, inicio) para no mantenerlo fila por fila.
+    Turno = apps.get_model('core', 'Turno')
+    Cliente = apps.get_model('core', 'Cliente')
+    enlazar_clientes(Turno.objects.using(schema_editor.connection.alias), Cliente, informar=_informar)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('telefono', models.CharField(blank=True, max_length=16, null=True, unique=True)),
+                ('email', models.EmailField(blank=True, max_length=254, null=True, unique=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='evento',
+            name='tipo',
+            field=models.CharField(choices=[('turno', 'Turno'), ('contacto', 'Contacto'), ('correo', 'Correo'), ('resumen', 'Resumen'), ('cliente', 'Cliente')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='turno',
+            name='cliente',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='turnos', to='core.cliente'),
+        ),
+        migrations.RunPython(crear_clientes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['cliente', 'fecha_hora_inicio'], name='turno_cliente_inicio_idx'),
+        ),
+    ]
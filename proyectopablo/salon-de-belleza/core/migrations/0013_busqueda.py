@@ -0,0 +1,90 @@
+from django.db import migrations
+
+# Índices de texto completo (ver `core.busqueda`): tablas FTS5 con sus
+# triggers en SQLite, índices GIN en PostgreSQL. El SQL está copiado aquí
+# tal como era al escribir la migración, para que no cambie si cambia
+# `core.busqueda`; la reparación de `post_migrate` usa el de `core.busqueda`.
+CONFIGURACION = 'core_busqueda'
+
+INDICES = (
+    ('core_servicio', ('nombre', 'descripcion')),
+    ('core_turno', ('cliente_nombre', 'cliente_telefono', 'cliente_email')),
+    ('core_contacto', ('nombre', 'email', 'mensaje')),
+)
+
+
+def _instalar_sqlite(cursor, qn):
+    cursor.execute("SELECT 1 FROM pragma_compile_options WHERE compile_options = 'ENABLE_FTS5'")
+    if cursor.fetchone() is None:
+        return
+    for tabla, columnas in INDICES:
+        fts = f'{tabla}_fts'
+        nombres = ', '.join(qn(c) for c in columnas)
+        nuevos = ', '.join(f'new.{qn(c)}' for c in columnas)
+        viejos = ', '.join(f'old.{qn(c)}' for c in columnas)
+        insertar = f'INSERT INTO {qn(fts)} (rowid, {nombres}) VALUES (new.id, {nuevos});'
+        borrar = f"INSERT INTO {qn(fts)} ({qn(fts)}, rowid, {nombres}) VALUES ('delete', old.id, {viejos});"
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE {qn(fts)} USING fts5({nombres}, content={qn(tabla)}, content_rowid=id, '
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(f'CREATE TRIGGER {qn(fts + "_ai")} AFTER INSERT ON {qn(tabla)} BEGIN {insertar} END')
+        cursor.execute(f'CREATE TRIGGER {qn(fts + "_ad")} AFTER DELETE ON {qn(tabla)} BEGIN {borrar} END')
+        cursor.execute(
+            f'CREATE TRIGGER {qn(fts + "_au")} AFTER UPDATE OF id, {nombres} ON {qn(tabla)} '
+            f'BEGIN {borrar} {insertar} END'
+        )
+        # Las filas que ya había.
+        cursor.execute(f"INSERT INTO {qn(fts)} ({qn(fts)}) VALUES ('rebuild')")
+
+
+def _instalar_postgresql(cursor, qn):
+    cursor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+    cursor.execute(f'''
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{CONFIGURACION}') THEN
+                CREATE TEXT SEARCH CONFIGURATION {CONFIGURACION} (COPY = simple);
+                ALTER TEXT SEARCH CONFIGURATION {CONFIGURACION}
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple;
+            END IF;
+        END $$
+    ''')
+    for tabla, columnas in INDICES:
+        texto = " || ' ' || ".join(f"coalesce({qn(c)}, '')" for c in columnas)
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {tabla}_busqueda_idx '
+            f"ON {qn(tabla)} USING GIN (to_tsvector('{CONFIGURACION}', {texto}))"
+        )
+
+
+def instalar(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            _instalar_postgresql(cursor, connection.ops.quote_name)
+        elif connection.vendor == 'sqlite':
+            _instalar_sqlite(cursor, connection.ops.quote_name)
+
+
+def desinstalar(apps, schema_editor):
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for tabla, _ in INDICES:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {tabla}_busqueda_idx')
+            elif connection.vendor == 'sqlite':
+                for sufijo in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {qn(f"{tabla}_fts_{sufijo}")}')
+                cursor.execute(f'DROP TABLE IF EXISTS {qn(f"{tabla}_fts")}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_clientes'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
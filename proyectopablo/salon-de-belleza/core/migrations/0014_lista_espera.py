@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_busqueda'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evento',
+            name='tipo',
+            field=models.CharField(choices=[('turno', 'Turno'), ('contacto', 'Contacto'), ('correo', 'Correo'), ('resumen', 'Resumen'), ('cliente', 'Cliente'), ('espera', 'Lista de espera')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('desde', models.TimeField()),
+                ('hasta', models.TimeField()),
+                ('cliente_nombre', models.CharField(max_length=100)),
+                ('cliente_telefono', models.CharField(blank=True, max_length=20)),
+                ('cliente_email', models.EmailField(max_length=254)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('ofrecido_en', models.DateTimeField(blank=True, null=True)),
+                ('inicio_ofrecido', models.DateTimeField(blank=True, null=True)),
+                ('servicio', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='esperas', to='core.servicio')),
+            ],
+            options={
+                'verbose_name': 'inscripción en lista de espera',
+                'verbose_name_plural': 'lista de espera',
+                'ordering': ['fecha', 'creado_en'],
+                'indexes': [models.Index(condition=models.Q(('ofrecido_en__isnull', True)), fields=['servicio', 'fecha', 'creado_en'], name='espera_pendiente_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_lista_espera'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='turno',
+            name='turno_servicio_inicio_unico',
+        ),
+        migrations.RemoveConstraint(
+            model_name='turno',
+            name='turno_recurso_inicio_unico',
+        ),
+        migrations.AddField(
+            model_name='turno',
+            name='cancelado_en',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='turno',
+            constraint=models.UniqueConstraint(condition=models.Q(('cancelado_en__isnull', True), ('recurso__isnull', True)), fields=('servicio', 'fecha_hora_inicio'), name='turno_servicio_inicio_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='turno',
+            constraint=models.UniqueConstraint(condition=models.Q(('cancelado_en__isnull', True)), fields=('recurso', 'fecha_hora_inicio'), name='turno_recurso_inicio_unico'),
+        ),
+    ]
@@ -17,11 +17,38 @@ Lista resumida de los cambios realizados por el asistente:
         cuando corresponde.
     - `delete()` elimina cualquier `Reserva` asociada (por `nombre_cliente` y hora)
         para evitar reservas huérfanas.
+    - `save()` recuerda el estado leído de la base (`from_db`) en lugar de volver
+        a consultarlo, y encola la sincronización de la `Reserva` (un `Evento`)
+        sólo cuando cambia algo que la afecta.
 - Reserva:
     - Se migró de un CharField (`servicio`) con choices a una ForeignKey a `Servicio`.
     - Se añadió un campo `turno` (OneToOne) para poder enlazar una reserva con su
         turno confirmada.
 - Contacto: nuevo modelo para almacenar envíos del formulario de contacto.
+- Evento: bandeja de salida. Los efectos secundarios (sincronizar la `Reserva`
+    de un turno, correos, avisos de contacto) se encolan con un INSERT en la
+    misma transacción que los origina y los procesa `manage.py run_outbox`
+    (ver `core.eventos`).
+- Recurso: personal o sillón con horario propio y los servicios que puede
+    realizar. Un `Turno` de un servicio con recursos queda asignado a uno de
+    ellos (ver `core.reservas.crear_turno`), así el salón atiende tantos
+    turnos simultáneos como recursos libres tenga.
+- Turno: índices compuestos (servicio, inicio, fin) y (confirmado, inicio) y
+    `Turno.objects.overlapping()` como único camino para buscar solapamientos.
+- ResumenDiario: totales precalculados por día y servicio (turnos,
+    confirmados, minutos, ingresos) para el tablero del admin; los mantiene
+    `core.analitica` desde la bandeja de salida.
+- Cliente: una fila por cliente, identificado por su teléfono en formato
+    E.164 o su email en minúsculas (índices únicos). `Turno.cliente` lo
+    enlaza desde la bandeja de salida (ver `core.clientes`) y el historial de
+    un cliente es un rango del índice (cliente, inicio).
+- ListaEspera: quienes no consiguieron un horario y quieren que se les
+    avise si se libera uno ese día en una ventana de horas. Al borrar o
+    cancelar un turno futuro, el worker ofrece el hueco por email al primero
+    que espera (ver `core.lista_espera`).
+- Turno: `cancelado_en`. Desconfirmar un turno confirmado lo cancela: deja
+    de ocupar la agenda (`vigentes()`, restricciones de unicidad) y libera su
+    horario para la lista de espera.
 
 Notas sobre migraciones:
 - Se creó una migración de datos (`0005_convert_reserva_servicio_to_fk`) que:
@@ -33,8 +60,13 @@ Estas decisiones buscan mantener compatibilidad con la base de datos existente
 sin pérdida de datos y facilitar un modelo relacional consistente.
 """
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import models
-from datetime import timedelta
+from django.utils import timezone
+from datetime import time, timedelta
+
+from .contactos import normalizar_email, normalizar_telefono
 
 
 # Modelo que representa un tipo de servicio ofrecido por el salón.
@@ -48,87 +80,291 @@ class Servicio(models.Model):
         return self.nombre
 
 
+# Personal o puesto de trabajo (sillón, camilla) que atiende turnos.
+class Recurso(models.Model):
+    nombre = models.CharField(max_length=100)
+    servicios = models.ManyToManyField(Servicio, related_name='recursos', blank=True)
+    # Horario de trabajo diario (hora local).
+    hora_inicio = models.TimeField(default=time(9))
+    hora_fin = models.TimeField(default=time(18))
+    activo = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['nombre']
+
+    def __str__(self):
+        return self.nombre
+
+
+def duracion_maxima_turno():
+    """Duración máxima de un turno (`RESERVATION_MAX_DURATION_MINUTES`)."""
+    return timedelta(minutes=getattr(settings, 'RESERVATION_MAX_DURATION_MINUTES', 480))
+
+
+class Cliente(models.Model):
+    """Cliente del salón, identificado por su teléfono o su email.
+
+    Ambos se guardan normalizados (`normalizar_telefono`, `normalizar_email`)
+    y son únicos: son los índices por los que se busca a un cliente. Los crea
+    y enlaza con sus turnos `core.clientes`.
+    """
+    nombre = models.CharField(max_length=100)
+    telefono = models.CharField(max_length=16, unique=True, null=True, blank=True)
+    email = models.EmailField(unique=True, null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['nombre']
+
+    def __str__(self):
+        return f"{self.nombre} ({self.telefono or self.email})"
+
+    def clean(self):
+        # Normalizados, como los busca `core.clientes` (también al editarlos en el admin).
+        from django.core.exceptions import ValidationError
+        if self.telefono and not normalizar_telefono(self.telefono):
+            raise ValidationError({'telefono': 'No es un número de teléfono válido.'})
+        self.telefono = normalizar_telefono(self.telefono) or None
+        self.email = normalizar_email(self.email) or None
+        if not (self.telefono or self.email):
+            raise ValidationError('Debes proporcionar un teléfono o un email.')
+
+
+class TurnoQuerySet(models.QuerySet):
+    def vigentes(self):
+        """Turnos que ocupan la agenda: todos menos los cancelados."""
+        return self.filter(cancelado_en__isnull=True)
+
+    def overlapping(self, servicio, start, end):
+        """Turnos de `servicio` que se solapan con el intervalo [start, end).
+
+        Además de la condición de solapamiento (inicio < end y fin > start) se
+        acota el inicio por abajo con la duración máxima de un turno, de modo
+        que la consulta sea un rango sobre el índice
+        (servicio, fecha_hora_inicio, fecha_hora_fin) en lugar de recorrer
+        todos los turnos anteriores del servicio. Los cancelados no cuentan.
+        """
+        return self.vigentes().filter(
+            servicio=servicio,
+            fecha_hora_inicio__gt=start - duracion_maxima_turno(),
+            fecha_hora_inicio__lt=end,
+            fecha_hora_fin__gt=start,
+        )
+
+    def overlapping_recursos(self, recursos, start, end):
+        """Turnos asignados a alguno de `recursos` que se solapan con [start, end).
+
+        Igual que `overlapping`, pero por recurso: un rango sobre el índice
+        (recurso, fecha_hora_inicio, fecha_hora_fin).
+        """
+        return self.vigentes().filter(
+            recurso__in=recursos,
+            fecha_hora_inicio__gt=start - duracion_maxima_turno(),
+            fecha_hora_inicio__lt=end,
+            fecha_hora_fin__gt=start,
+        )
+
+
 class Turno(models.Model):
     servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE)
+    recurso = models.ForeignKey(Recurso, on_delete=models.PROTECT, null=True, blank=True)
+    # Lo asigna `core.clientes` a partir de `cliente_telefono`/`cliente_email`.
+    # Sin índice propio: lo cubre `turno_cliente_inicio_idx`.
+    cliente = models.ForeignKey(
+        Cliente, on_delete=models.SET_NULL, null=True, blank=True, editable=False,
+        related_name='turnos', db_index=False,
+    )
     cliente_nombre = models.CharField(max_length=100)
     cliente_telefono = models.CharField(max_length=20, blank=True)
     cliente_email = models.EmailField(blank=True)
     fecha_hora_inicio = models.DateTimeField()
     fecha_hora_fin = models.DateTimeField(editable=False)
     confirmado = models.BooleanField(default=False)
+    # Lo pone `save()` (o `core.reservas.cancelar_turnos`) al desconfirmar un
+    # turno confirmado. Un turno cancelado no ocupa su horario.
+    cancelado_en = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = TurnoQuerySet.as_manager()
 
     class Meta:
         ordering = ['fecha_hora_inicio']
-        unique_together = ('servicio', 'fecha_hora_inicio')
+        constraints = [
+            # Sin recurso, un servicio atiende un turno a la vez; con recursos,
+            # la unicidad es por recurso. Los cancelados no ocupan el horario.
+            models.UniqueConstraint(
+                fields=['servicio', 'fecha_hora_inicio'],
+                condition=models.Q(recurso__isnull=True, cancelado_en__isnull=True),
+                name='turno_servicio_inicio_unico',
+            ),
+            models.UniqueConstraint(
+                fields=['recurso', 'fecha_hora_inicio'],
+                condition=models.Q(cancelado_en__isnull=True),
+                name='turno_recurso_inicio_unico',
+            ),
+        ]
+        indexes = [
+            # Búsqueda de solapamientos: igualdad por servicio y rango por inicio;
+            # `fecha_hora_fin` se evalúa desde el propio índice.
+            models.Index(fields=['servicio', 'fecha_hora_inicio', 'fecha_hora_fin'], name='turno_serv_ini_fin_idx'),
+            # Listados del admin filtrados por estado y ordenados por fecha.
+            models.Index(fields=['confirmado', 'fecha_hora_inicio'], name='turno_conf_ini_idx'),
+            # Orden del listado del admin y navegación por clave ("desde").
+            models.Index(fields=['fecha_hora_inicio', 'id'], name='turno_inicio_id_idx'),
+            # Búsqueda de solapamientos por recurso.
+            models.Index(fields=['recurso', 'fecha_hora_inicio', 'fecha_hora_fin'], name='turno_rec_ini_fin_idx'),
+            # Historial de un cliente, por fecha.
+            models.Index(fields=['cliente', 'fecha_hora_inicio'], name='turno_cliente_inicio_idx'),
+        ]
 
     def __str__(self):
         return f"Turno para {self.cliente_nombre} - {self.servicio.nombre} el {self.fecha_hora_inicio.strftime('%Y-%m-%d %H:%M')}"
 
+    # Campos cuyo valor leído de la base se recuerda para saber, sin volver a
+    # consultarla, qué cambió al guardar (ver `campos_modificados`).
+    CAMPOS_SEGUIDOS = (
+        'servicio_id', 'cliente_nombre', 'cliente_telefono', 'cliente_email',
+        'fecha_hora_inicio', 'fecha_hora_fin', 'confirmado',
+    )
+    # Campos que se copian a la `Reserva` asociada.
+    CAMPOS_DE_RESERVA = {'servicio_id', 'cliente_nombre', 'fecha_hora_inicio'}
+    # Campos con los que se identifica al `Cliente`.
+    CAMPOS_DE_CLIENTE = {'cliente_telefono', 'cliente_email'}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Un turno creado en memoria no tiene estado guardado: todo es "nuevo".
+        self._estado_guardado = {}
+        # Eventos a encolar al terminar `save()` (sólo mientras se guarda).
+        self._eventos_pendientes = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._recordar_estado()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None:
+            self._recordar_estado()
+        else:
+            # Sólo los recargados (p. ej. un campo diferido al leerlo): los
+            # demás conservan su valor guardado y siguen como modificados.
+            self._recordar_estado({self._meta.get_field(c).attname for c in fields})
+
+    def _recordar_estado(self, campos=None):
+        # Se lee `__dict__` para no disparar la carga de campos diferidos.
+        recordados = {
+            c: self.__dict__[c] for c in self.CAMPOS_SEGUIDOS
+            if c in self.__dict__ and (campos is None or c in campos)
+        }
+        if campos is None:
+            self._estado_guardado = recordados
+        else:
+            self._estado_guardado.update(recordados)
+
+    def campos_modificados(self):
+        """Campos de `CAMPOS_SEGUIDOS` cuyo valor difiere del último leído/guardado.
+
+        Un campo del que no se conoce el valor previo (turno nuevo o campo
+        diferido) se considera modificado.
+        """
+        return {
+            c for c in self.CAMPOS_SEGUIDOS
+            if c in self.__dict__ and self._estado_guardado.get(c, models.DEFERRED) != self.__dict__[c]
+        }
+
     def save(self, *args, **kwargs):
-        # Validación: al menos teléfono o email
-        try:
-            self.full_clean()
-        except Exception:
-            # Dejamos que la excepción suba para que el llamador la maneje
-            raise
-
-        # Calcular hora de fin si no está establecida
+        """Guarda el turno y encola la sincronización de su `Reserva`.
+
+        Con el estado recordado en `from_db` el coste es constante: el
+        UPDATE/INSERT del turno más, sólo si cambió algo que afecta a la
+        reserva, al cliente o al resumen diario, un INSERT de `Evento` (la
+        `Reserva`, el correo de confirmación, el enlace con su `Cliente` y el
+        resumen los hace `manage.py run_outbox`).
+        Los receptores de `post_save` pueden agregar sus eventos a
+        `_eventos_pendientes` para que vayan en ese mismo INSERT.
+
+        Desconfirmar un turno confirmado lo cancela (`cancelado_en`) y encola
+        su horario para la lista de espera; volver a confirmarlo comprueba
+        antes (una consulta) que el horario siga libre.
+        """
+        from django.core.exceptions import ValidationError
+
+        creando = self._state.adding
+        modificados = self.campos_modificados()
+        cancelando = (
+            not creando and not self.confirmado and 'confirmado' in modificados
+            and self._estado_guardado.get('confirmado') is True and self.cancelado_en is None
+        )
+        if cancelando:
+            self.cancelado_en = timezone.now()
+        elif self.confirmado and self.cancelado_en is not None:
+            if self._horario_tomado():
+                raise ValidationError('El horario del turno cancelado ya no está libre.')
+            self.cancelado_en = None
+        if kwargs.get('update_fields') is not None and 'confirmado' in kwargs['update_fields']:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'cancelado_en'}
+
+        # Calcular hora de fin si no está establecida (antes de validar, ya que
+        # `fecha_hora_fin` es obligatorio y `clean()` comprueba la duración).
         if not getattr(self, 'fecha_hora_fin', None) and self.fecha_hora_inicio and self.servicio:
             self.fecha_hora_fin = self.fecha_hora_inicio + timedelta(minutes=self.servicio.duracion_minutos)
 
-        previo = None
-        if self.pk:
-            try:
-                previo = Turno.objects.get(pk=self.pk)
-            except Turno.DoesNotExist:
-                previo = None
+        # Validación: al menos teléfono y duración válida. La existencia del
+        # servicio y del recurso y las restricciones de unicidad las garantiza
+        # la base de datos (los formularios del admin y
+        # `core.reservas.crear_turno` ya las informan), así que no se repiten
+        # aquí con consultas extra.
+        excluidos = [c for c in ('servicio', 'recurso') if getattr(self, f'{c}_id') is not None]
+        self.full_clean(exclude=excluidos or None, validate_unique=False, validate_constraints=False)
 
+        self._eventos_pendientes = eventos = []
         super().save(*args, **kwargs)
+        self._eventos_pendientes = None
 
-        # Si el turno está confirmado (nuevo o existente), crear o actualizar la Reserva
         if self.confirmado:
-            # Obtener o crear la instancia de Servicio relacionada (case-insensitive)
-            servicio_obj = Servicio.objects.filter(nombre__iexact=self.servicio.nombre).first()
-            if not servicio_obj:
-                name = (self.servicio.nombre or '').lower()
-                if 'uña' in name or 'uñas' in name:
-                    label = 'Uñas'
-                elif 'tint' in name:
-                    label = 'Tintura'
-                elif 'corte' in name:
-                    label = 'Corte de Pelo'
-                else:
-                    label = self.servicio.nombre or 'Servicio'
-                servicio_obj, _ = Servicio.objects.get_or_create(nombre=label)
-
-            # Buscar una Reserva existente preferiblemente ya vinculada a este turno
-            reserva = Reserva.objects.filter(turno=self).first()
-            if not reserva:
-                # Si no hay reserva vinculada, intentar encontrar una por nombre+fecha
-                reserva = Reserva.objects.filter(nombre_cliente=self.cliente_nombre, fecha_hora=self.fecha_hora_inicio).first()
-
-            if reserva:
-                # Actualizar y vincular
-                reserva.servicio = servicio_obj
-                reserva.turno = self
-                reserva.nombre_cliente = self.cliente_nombre
-                reserva.fecha_hora = self.fecha_hora_inicio
-                reserva.save()
-            else:
-                # Crear una reserva nueva y vincularla al turno
-                Reserva.objects.create(
-                    servicio=servicio_obj,
-                    turno=self,
-                    nombre_cliente=self.cliente_nombre,
-                    fecha_hora=self.fecha_hora_inicio,
-                )
-
-        # Si antes estaba confirmado y ahora no, eliminar la Reserva asociada (si existe)
-        if previo and previo.confirmado and not self.confirmado:
-            # Primero intentamos borrar por relación directa `turno`.
-            Reserva.objects.filter(turno=self).delete()
-            # Como fallback, eliminamos por nombre+fecha en caso de que existan reservas antiguas.
-            Reserva.objects.filter(nombre_cliente=self.cliente_nombre, fecha_hora=self.fecha_hora_inicio).delete()
+            # Nuevo, recién confirmado o con datos que la reserva copia.
+            if 'confirmado' in modificados or self.CAMPOS_DE_RESERVA & modificados:
+                eventos.append(Evento.de_turno(self.pk))
+        elif 'confirmado' in modificados and not creando:
+            # Antes estaba confirmado (o no se sabe) y ahora no: hay que borrar la Reserva.
+            eventos.append(Evento.de_turno(self.pk))
+        if (creando or self.CAMPOS_DE_CLIENTE & modificados) and (self.cliente_id or any(self.datos_de_cliente())):
+            # Sólo si hay con qué identificarlo (o un cliente que desenlazar).
+            eventos.append(Evento.de_cliente(self.pk))
+        if cancelando:
+            from .lista_espera import eventos_de_hueco
+            eventos += eventos_de_hueco(self)
+        if eventos:
+            Evento.objects.using(self._state.db).encolar(eventos, reiniciar=True)
+
+        self._recordar_estado()
+
+    def _horario_tomado(self):
+        """Si otro turno vigente ocupa el horario de este (margen incluido)."""
+        from .disponibilidad import margen_entre_turnos
+
+        margen = margen_entre_turnos()
+        inicio, fin = self.fecha_hora_inicio - margen, self.fecha_hora_fin + margen
+        turnos = Turno.objects.using(self._state.db)
+        if self.recurso_id is None:
+            solapados = turnos.overlapping(self.servicio_id, inicio, fin)
+        else:
+            solapados = turnos.overlapping_recursos([self.recurso_id], inicio, fin)
+        return solapados.exclude(pk=self.pk).exists()
+
+    def datos_de_cliente(self):
+        """`(teléfono E.164, email en minúsculas)` con los que se busca su `Cliente`; '' si falta."""
+        return normalizar_telefono(self.cliente_telefono), normalizar_email(self.cliente_email)
+
+    def _reservas_asociadas(self):
+        # Por relación directa `turno` y, como fallback para reservas anteriores
+        # a la migración a ForeignKey, por nombre+hora.
+        return Reserva.objects.filter(
+            models.Q(turno=self)
+            | models.Q(nombre_cliente=self.cliente_nombre, fecha_hora=self.fecha_hora_inicio)
+        )
 
     def delete(self, *args, **kwargs):
         """Al borrar un Turno, también eliminamos la Reserva equivalente si existe.
@@ -136,11 +372,7 @@ class Turno(models.Model):
         Esto mantiene la base de datos consistente sin requerir cambios en el
         esquema de `Reserva` (que en las migraciones iniciales es un CharField).
         """
-        # Borramos la reserva asociada por relación directa si existe.
-        Reserva.objects.filter(turno=self).delete()
-        # Fallback: también borramos por nombre+hora para compatibilidad con registros
-        # que pudieran haberse creado antes de la migración a ForeignKey.
-        Reserva.objects.filter(nombre_cliente=self.cliente_nombre, fecha_hora=self.fecha_hora_inicio).delete()
+        self._reservas_asociadas().delete()
         return super().delete(*args, **kwargs)
 
     def clean(self):
@@ -148,6 +380,14 @@ class Turno(models.Model):
         from django.core.exceptions import ValidationError
         if not (self.cliente_telefono and self.cliente_telefono.strip()):
             raise ValidationError('Debes proporcionar un número de teléfono.')
+        # La búsqueda de solapamientos (`overlapping`) asume que ningún turno
+        # dura más que `duracion_maxima_turno()`.
+        if self.fecha_hora_inicio and self.fecha_hora_fin:
+            duracion = self.fecha_hora_fin - self.fecha_hora_inicio
+            if duracion <= timedelta(0):
+                raise ValidationError('La hora de fin debe ser posterior a la de inicio.')
+            if duracion > duracion_maxima_turno():
+                raise ValidationError('La duración del turno supera el máximo permitido.')
 
 
 class Reserva(models.Model):
@@ -172,4 +412,169 @@ class Contacto(models.Model):
     creado_en = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.nombre} <{self.email}> - {self.creado_en.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.nombre} <{self.email}> - {self.creado_en.strftime('%Y-%m-%d %H:%M')}"
+
+
+class EventoQuerySet(models.QuerySet):
+    def encolar(self, eventos, reiniciar=False, batch_size=None):
+        """Inserta `eventos` (sin guardar) en una sola sentencia por lote.
+
+        La `clave` de cada evento es su clave de idempotencia. Si ya existe,
+        con `reiniciar` el evento vuelve a quedar pendiente (para eventos que
+        se calculan desde el estado actual, como la sincronización de un
+        turno); sin `reiniciar` se ignora: ese efecto ya se hizo o está en
+        camino (un correo no se manda dos veces).
+        """
+        if reiniciar:
+            return self.bulk_create(
+                eventos,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['clave'],
+                update_fields=['datos', 'estado', 'intentos', 'disponible_en', 'ultimo_error'],
+            )
+        return self.bulk_create(eventos, batch_size=batch_size, ignore_conflicts=True)
+
+    async def aencolar(self, eventos, reiniciar=False, batch_size=None):
+        return await sync_to_async(self.encolar)(eventos, reiniciar, batch_size)
+
+
+class Evento(models.Model):
+    """Efecto secundario pendiente de la bandeja de salida (ver `core.eventos`)."""
+
+    # Tipos
+    TURNO = 'turno'          # sincronizar la Reserva y avisar la confirmación
+    CONTACTO = 'contacto'    # guardar el mensaje de contacto y avisar al salón
+    CORREO = 'correo'        # enviar un correo ya armado
+    RESUMEN = 'resumen'      # recalcular el `ResumenDiario` de un servicio en un día
+    CLIENTE = 'cliente'      # enlazar un turno con su `Cliente`
+    ESPERA = 'espera'        # ofrecer un horario liberado a la lista de espera
+    TIPOS = [
+        (TURNO, 'Turno'), (CONTACTO, 'Contacto'), (CORREO, 'Correo'), (RESUMEN, 'Resumen'), (CLIENTE, 'Cliente'),
+        (ESPERA, 'Lista de espera'),
+    ]
+
+    # Estados
+    PENDIENTE = 'pendiente'
+    HECHO = 'hecho'
+    FALLIDO = 'fallido'
+    ESTADOS = [(PENDIENTE, 'Pendiente'), (HECHO, 'Hecho'), (FALLIDO, 'Fallido')]
+
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    clave = models.CharField(max_length=200, unique=True)
+    datos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    # Cuándo puede tomarlo el worker: ahora, tras la espera de un reintento o
+    # al vencer el plazo de quien lo tomó.
+    disponible_en = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    objects = EventoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Lo que busca el worker: pendientes vencidos, en orden.
+            models.Index(fields=['estado', 'disponible_en'], name='evento_estado_disp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.clave} ({self.estado})"
+
+    @classmethod
+    def de_turno(cls, turno_id):
+        return cls(tipo=cls.TURNO, clave=f'turno:{turno_id}', datos={'turno': turno_id})
+
+    @classmethod
+    def de_cliente(cls, turno_id):
+        return cls(tipo=cls.CLIENTE, clave=f'cliente:{turno_id}', datos={'turno': turno_id})
+
+    @classmethod
+    def de_resumen(cls, servicio_id, fecha):
+        return cls(
+            tipo=cls.RESUMEN,
+            clave=f'resumen:{servicio_id}:{fecha.isoformat()}',
+            datos={'servicio': servicio_id, 'fecha': fecha.isoformat()},
+        )
+
+    @classmethod
+    def de_espera(cls, servicio_id, inicio, fin, recurso_id=None):
+        # Con recursos, cada uno libera su propio hueco a la misma hora.
+        return cls(
+            tipo=cls.ESPERA,
+            clave=f"espera:{servicio_id}:{recurso_id or '-'}:{inicio.isoformat()}",
+            datos={'servicio': servicio_id, 'inicio': inicio.isoformat(), 'fin': fin.isoformat(), 'recurso': recurso_id},
+        )
+
+
+class ResumenDiario(models.Model):
+    """Totales de los turnos de un servicio en un día (hora local).
+
+    Lo calcula `core.analitica` a partir de los turnos; no se edita a mano.
+    """
+    fecha = models.DateField()
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='resumenes')
+    turnos = models.PositiveIntegerField(default=0)
+    confirmados = models.PositiveIntegerField(default=0)
+    minutos_reservados = models.PositiveIntegerField(default=0)
+    # Horario de atención del día por la cantidad de recursos del servicio.
+    minutos_disponibles = models.PositiveIntegerField(default=0)
+    # `Servicio.precio` por turno confirmado.
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['fecha', 'servicio']
+        verbose_name = 'resumen diario'
+        verbose_name_plural = 'resúmenes diarios'
+        constraints = [
+            # También es el índice de los rangos de fechas del tablero.
+            models.UniqueConstraint(fields=['fecha', 'servicio'], name='resumen_fecha_servicio_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.servicio_id} {self.fecha:%Y-%m-%d}"
+
+
+class ListaEspera(models.Model):
+    """Pedido de aviso si se libera un turno de `servicio` el día `fecha`.
+
+    La ventana [`desde`, `hasta`] son las horas de inicio (locales) que le
+    sirven al cliente. Mientras `ofrecido_en` está vacío, la inscripción
+    espera; `core.lista_espera` la elige por orden de llegada.
+    """
+    # Sin índice propio: las búsquedas van por `espera_pendiente_idx`.
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='esperas', db_index=False)
+    fecha = models.DateField()
+    desde = models.TimeField()
+    hasta = models.TimeField()
+    cliente_nombre = models.CharField(max_length=100)
+    cliente_telefono = models.CharField(max_length=20, blank=True)
+    cliente_email = models.EmailField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+    # Cuándo y qué horario se le ofreció (una sola vez).
+    ofrecido_en = models.DateTimeField(null=True, blank=True)
+    inicio_ofrecido = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['fecha', 'creado_en']
+        verbose_name = 'inscripción en lista de espera'
+        verbose_name_plural = 'lista de espera'
+        indexes = [
+            # Los que esperan un servicio en un día, por orden de llegada. Sólo
+            # los pendientes: los ya avisados no crecen el índice.
+            models.Index(
+                fields=['servicio', 'fecha', 'creado_en'],
+                condition=models.Q(ofrecido_en__isnull=True),
+                name='espera_pendiente_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente_nombre} - {self.servicio_id} el {self.fecha:%Y-%m-%d} ({self.desde:%H:%M}-{self.hasta:%H:%M})"
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        if self.desde and self.hasta and self.hasta < self.desde:
+            raise ValidationError('La ventana debe terminar después de empezar.')
@@ -0,0 +1,61 @@
+"""
+core.paginacion
+---------------
+Paginación para los listados del admin sobre tablas grandes.
+
+`ConteoEstimadoPaginator` evita el `SELECT COUNT(*)` sobre toda la tabla que
+hace el paginador por defecto en cada página del listado:
+
+- sin filtros, usa la cantidad de filas estimada por la base (estadísticas de
+  `ANALYZE` en SQLite o `pg_class.reltuples` en PostgreSQL);
+- con filtros, cuenta como mucho `LIMITE_CONTEO` filas. Si hay más, el listado
+  muestra ese máximo y se navega acotando (filtros o el modo "desde" por fecha
+  del admin de `Turno`).
+"""
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+LIMITE_CONTEO = 10_000
+
+
+def filas_estimadas(model, using):
+    """Cantidad aproximada de filas de la tabla de `model`, o None si no se sabe."""
+    connection = connections[using]
+    tabla = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabla])
+            fila = cursor.fetchone()
+            return fila[0] if fila and fila[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                # El primer número de `stat` es la cantidad de filas del índice
+                # (o de la tabla); el máximo descarta índices parciales.
+                cursor.execute('SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s', [tabla])
+                fila = cursor.fetchone()
+                if fila and fila[0] is not None:
+                    return fila[0]
+            # Sin estadísticas: el mayor id es una cota superior que se obtiene
+            # del final del índice de la clave primaria.
+            cursor.execute(f'SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) FROM {connection.ops.quote_name(tabla)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class ConteoEstimadoPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not hasattr(queryset, 'query'):
+            return super().count
+
+        if not queryset.query.where:
+            estimado = filas_estimadas(queryset.model, queryset.db)
+            if estimado is not None and estimado > LIMITE_CONTEO:
+                return estimado
+
+        # Conteo acotado: SELECT COUNT(*) FROM (... LIMIT n) no recorre más de n filas.
+        return queryset.order_by()[:LIMITE_CONTEO].count()
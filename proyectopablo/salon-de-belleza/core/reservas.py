@@ -0,0 +1,452 @@
+"""
+core.reservas
+-------------
+Servicio de reservas: crea turnos sin carreras entre peticiones concurrentes.
+
+La comprobación de solapamiento y el INSERT del `Turno` se hacen dentro de una
+misma transacción que primero toma un bloqueo sobre la agenda del servicio, de
+modo que dos reservas simultáneas para el mismo horario no pueden pasar ambas
+la comprobación:
+
+- SQLite: la conexión usa `transaction_mode = 'IMMEDIATE'` (ver `DATABASES` en
+  `settings.py`), por lo que `transaction.atomic()` abre la transacción con
+  `BEGIN IMMEDIATE` y toma el lock de escritura antes de leer. Las demás
+  escrituras esperan (hasta `timeout` segundos) en lugar de leer datos viejos.
+- PostgreSQL: `pg_advisory_xact_lock` sobre el id del servicio; el lock se
+  libera solo al terminar la transacción.
+
+Si el servicio tiene recursos (`Recurso`), el bloqueo es sobre la agenda de
+cada recurso y el turno se asigna al primero que esté libre
+(`core.disponibilidad.buscar_recurso`).
+
+Si aun así la base rechaza el INSERT (`IntegrityError`, por ejemplo por las
+restricciones de unicidad de `Turno`), se informa como `HorarioNoDisponible`.
+
+`crear_turnos` hace lo mismo para una lista de turnos (la API en lote): todos
+o ninguno, con una sola consulta de solapamientos para el lote entero.
+
+`crear_serie` reserva de una vez las repeticiones de una `Recurrencia`
+(semanal, quincenal o mensual) y los combos de varios servicios seguidos (un
+corte y a continuación una tintura): arma todos los turnos y los pasa a
+`crear_turnos`, así que una serie de 52 semanas cuesta las mismas consultas
+que un solo turno.
+
+`acrear_turno` y `acrear_serie` son las variantes para vistas asíncronas: la
+transacción no puede repartirse entre `await`s (cada hilo tiene su conexión),
+así que la reserva entera se ejecuta como una sola llamada síncrona en unos
+pocos hilos dedicados (`hilos_de_reservas()`, `RESERVATION_ASYNC_WORKERS`).
+
+También incluye las versiones en bloque de confirmar/cancelar turnos que usa el
+admin: dejan la base en el mismo estado que llamar a `Turno.save()` por cada
+turno, pero con un puñado de sentencias en una sola transacción. Como
+`Turno.save()`, sólo encolan la sincronización de las `Reserva` (y el
+recálculo del resumen diario de sus días, `core.analitica`); la hace
+`sincronizar_reservas`, desde el worker de la bandeja de salida
+(`core.eventos`).
+"""
+
+from calendar import monthrange
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, router, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .analitica import celda_de, eventos_de_resumen
+from .disponibilidad import (
+    Agenda, MapaDeRecursos, buscar_recurso, duracion_de, horario_ocupado, margen_entre_turnos, recursos_de,
+)
+from .lista_espera import eventos_de_huecos
+from .models import Evento, Recurso, Reserva, Turno, duracion_maxima_turno
+
+# Filas por sentencia al crear reservas en bloque.
+TAMANO_LOTE = 500
+
+# Primer argumento de `pg_advisory_xact_lock(int, int)`: separa los locks de
+# agenda de otros locks consultivos que pueda usar la aplicación.
+ESPACIO_BLOQUEO_AGENDA = 0x5A10
+ESPACIO_BLOQUEO_RECURSO = 0x5A11
+
+# Hilos en los que `acrear_turno` y `acrear_serie` hacen las reservas de las
+# vistas asíncronas, por cantidad (`RESERVATION_ASYNC_WORKERS`); se crean al
+# primer uso.
+_HILOS_DE_RESERVAS = {}
+
+
+class HorarioNoDisponible(Exception):
+    """El horario pedido se solapa con otro turno del mismo servicio.
+
+    En `crear_turnos`, `conflictos` son las posiciones de los turnos que no
+    caben.
+    """
+
+    def __init__(self, conflictos=()):
+        super().__init__()
+        self.conflictos = list(conflictos)
+
+
+def bloquear_agenda(servicio, using):
+    """Bloquea la agenda de `servicio` hasta el fin de la transacción en curso."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ESPACIO_BLOQUEO_AGENDA, servicio.pk])
+    # En SQLite el `BEGIN IMMEDIATE` de la transacción ya serializa las escrituras.
+
+
+def bloquear_recursos(recursos, using):
+    """Bloquea la agenda de cada recurso hasta el fin de la transacción en curso."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # Siempre en el mismo orden, para no producir interbloqueos.
+            for pk in sorted(r.pk for r in recursos):
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ESPACIO_BLOQUEO_RECURSO, pk])
+
+
+def crear_turno(servicio, fecha_hora_inicio, fecha_hora_fin, **datos):
+    """Crea y devuelve un `Turno` si el horario está libre.
+
+    `datos` se pasa tal cual al constructor de `Turno` (`cliente_nombre`,
+    `cliente_telefono`, ...). Si el servicio tiene recursos, el turno se asigna
+    al primero libre (o al `recurso` indicado en `datos`). Lanza
+    `HorarioNoDisponible` si el intervalo se solapa con otro turno del servicio
+    o no hay recurso libre (contando el margen entre turnos), y deja subir
+    `ValidationError` para los demás errores de validación del modelo.
+    """
+    using = router.db_for_write(Turno)
+    recursos = [datos['recurso']] if datos.get('recurso') else recursos_de(servicio, using)
+    try:
+        with transaction.atomic(using=using):
+            if recursos:
+                bloquear_recursos(recursos, using)
+                datos['recurso'] = buscar_recurso(recursos, fecha_hora_inicio, fecha_hora_fin, using=using)
+                if datos['recurso'] is None:
+                    raise HorarioNoDisponible()
+            else:
+                bloquear_agenda(servicio, using)
+                if horario_ocupado(servicio, fecha_hora_inicio, fecha_hora_fin, using=using):
+                    raise HorarioNoDisponible()
+            turno = Turno(
+                servicio=servicio,
+                fecha_hora_inicio=fecha_hora_inicio,
+                fecha_hora_fin=fecha_hora_fin,
+                **datos,
+            )
+            turno.save(using=using)
+    except IntegrityError as exc:
+        raise HorarioNoDisponible() from exc
+    return turno
+
+
+def _en_hilo_de_reservas(funcion, *args, **kwargs):
+    # Como en una petición: conexión persistente mientras siga sana y no haya
+    # vencido `CONN_MAX_AGE`.
+    close_old_connections()
+    try:
+        return funcion(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def hilos_de_reservas():
+    """Executor de las reservas asíncronas, o None para hacerlas en el hilo síncrono de Django.
+
+    Tiene `RESERVATION_ASYNC_WORKERS` hilos; con 0, la reserva corre como
+    cualquier `sync_to_async` (`thread_sensitive=True`), en el hilo y la
+    transacción de quien llama (los tests con `TestCase`).
+    """
+    cantidad = getattr(settings, 'RESERVATION_ASYNC_WORKERS', 4)
+    if cantidad <= 0:
+        return None
+    if cantidad not in _HILOS_DE_RESERVAS:
+        _HILOS_DE_RESERVAS[cantidad] = ThreadPoolExecutor(max_workers=cantidad, thread_name_prefix='reservas')
+    return _HILOS_DE_RESERVAS[cantidad]
+
+
+async def _areservar(funcion, *args, **kwargs):
+    hilos = hilos_de_reservas()
+    if hilos is None:
+        return await sync_to_async(funcion, thread_sensitive=True)(*args, **kwargs)
+    return await sync_to_async(_en_hilo_de_reservas, thread_sensitive=False, executor=hilos)(funcion, *args, **kwargs)
+
+
+async def acrear_turno(servicio, fecha_hora_inicio, fecha_hora_fin, **datos):
+    """`crear_turno` para vistas asíncronas.
+
+    La reserva corre en uno de los `hilos_de_reservas()`, cada uno con su
+    propia conexión persistente: bajo ASGI cada petición tiene su hilo
+    síncrono y abriría una conexión nueva por reserva, y cientos de ellas
+    competirían por el bloqueo de escritura de SQLite. Las que chocan las
+    serializa el bloqueo de `crear_turno`.
+    """
+    return await _areservar(crear_turno, servicio, fecha_hora_inicio, fecha_hora_fin, **datos)
+
+
+def crear_turnos(turnos):
+    """Guarda los `Turno` (sin guardar, ya validados) de `turnos` si todos caben.
+
+    Todo o nada, en una transacción: los recursos de los servicios (una
+    consulta), los turnos existentes que rodean a los pedidos (una consulta,
+    un rango del índice por cada pedido), y el INSERT en lotes. Los pedidos
+    también se comprueban entre sí. Un turno de un servicio con recursos se
+    asigna al primero libre (o al `recurso` que ya traiga). Lanza
+    `HorarioNoDisponible` con las posiciones de los que no caben. Como
+    `Turno.save()`, encola la sincronización de los que vengan confirmados, el
+    enlace con su `Cliente` y el recálculo del resumen diario de sus días.
+    """
+    if not turnos:
+        return []
+    using = router.db_for_write(Turno)
+    margen = margen_entre_turnos()
+    servicios = {t.servicio_id: t.servicio for t in turnos}
+    try:
+        with transaction.atomic(using=using):
+            recursos_por_servicio = {}
+            filas = Recurso.objects.using(using).filter(servicios__in=servicios, activo=True).annotate(
+                servicio_pk=F('servicios'),
+            )
+            for recurso in filas:
+                recursos_por_servicio.setdefault(recurso.servicio_pk, []).append(recurso)
+            recursos = {r.pk: r for lista in recursos_por_servicio.values() for r in lista}
+            for turno in turnos:
+                if turno.recurso_id is not None:
+                    recursos.setdefault(turno.recurso_id, turno.recurso)
+            sin_recursos = sorted(pk for pk in servicios if pk not in recursos_por_servicio)
+            for pk in sin_recursos:
+                bloquear_agenda(servicios[pk], using)
+            bloquear_recursos(recursos.values(), using)
+
+            # Un rango de `overlapping`/`overlapping_recursos` por pedido, en
+            # una sola consulta.
+            condicion = Q()
+            for turno in turnos:
+                rango = Q(
+                    fecha_hora_inicio__gt=turno.fecha_hora_inicio - margen - duracion_maxima_turno(),
+                    fecha_hora_inicio__lt=turno.fecha_hora_fin + margen,
+                    fecha_hora_fin__gt=turno.fecha_hora_inicio - margen,
+                )
+                if turno.recurso_id is not None:
+                    condicion |= rango & Q(recurso=turno.recurso_id)
+                elif turno.servicio_id in recursos_por_servicio:
+                    condicion |= rango & Q(recurso__in=[r.pk for r in recursos_por_servicio[turno.servicio_id]])
+                else:
+                    condicion |= rango & Q(servicio=turno.servicio_id)
+            existentes = list(Turno.objects.using(using).vigentes().filter(condicion).order_by().values_list(
+                'servicio_id', 'recurso_id', 'fecha_hora_inicio', 'fecha_hora_fin',
+            ))
+
+            agendas = {
+                servicio: Agenda([(i, f) for s, _, i, f in existentes if s == servicio], margen)
+                for servicio in sin_recursos
+            }
+            mapas = {}
+            if recursos:
+                fechas = {timezone.localdate(t.fecha_hora_inicio) for t in turnos if t.servicio_id not in agendas or t.recurso_id}
+                mapas = {fecha: MapaDeRecursos(fecha, recursos.values(), margen) for fecha in fechas}
+                for _, recurso_id, inicio, fin in existentes:
+                    if recurso_id in recursos:
+                        for fecha in {timezone.localdate(inicio), timezone.localdate(fin + margen)}:
+                            if fecha in mapas:
+                                mapas[fecha].ocupar(recurso_id, inicio, fin)
+
+            conflictos = []
+            for posicion, turno in enumerate(turnos):
+                inicio, fin = turno.fecha_hora_inicio, turno.fecha_hora_fin
+                if turno.recurso_id is None and turno.servicio_id in agendas:
+                    agenda = agendas[turno.servicio_id]
+                    if agenda.esta_libre(inicio, fin):
+                        agenda.agregar(inicio, fin)
+                        continue
+                else:
+                    mapa = mapas[timezone.localdate(inicio)]
+                    candidatos = [recursos[turno.recurso_id]] if turno.recurso_id is not None else recursos_por_servicio[turno.servicio_id]
+                    recurso = mapa.primer_libre(inicio, fin, candidatos)
+                    if recurso is not None:
+                        turno.recurso = recurso
+                        mapa.ocupar(recurso.pk, inicio, fin)
+                        continue
+                conflictos.append(posicion)
+            if conflictos:
+                raise HorarioNoDisponible(conflictos)
+
+            creados = Turno.objects.using(using).bulk_create(turnos, batch_size=TAMANO_LOTE)
+            Evento.objects.using(using).encolar(
+                [Evento.de_turno(t.pk) for t in creados if t.confirmado]
+                + [Evento.de_cliente(t.pk) for t in creados if any(t.datos_de_cliente())]
+                + eventos_de_resumen(celda_de(t.servicio_id, t.fecha_hora_inicio) for t in creados),
+                reiniciar=True,
+                batch_size=TAMANO_LOTE,
+            )
+    except IntegrityError as exc:
+        raise HorarioNoDisponible() from exc
+    for turno in creados:
+        turno._recordar_estado()
+    return creados
+
+
+# --- Series y combos ---
+
+FRECUENCIAS = {
+    'semanal': 'Cada semana',
+    'quincenal': 'Cada dos semanas',
+    'mensual': 'Cada mes',
+}
+
+
+def maximo_de_repeticiones():
+    return getattr(settings, 'RESERVATION_MAX_OCCURRENCES', 52)
+
+
+def maximo_de_servicios():
+    return getattr(settings, 'RESERVATION_MAX_COMBO_SERVICES', 3)
+
+
+class Recurrencia(NamedTuple):
+    """Regla de repetición: `repeticiones` turnos (el primero incluido) cada `frecuencia`."""
+    frecuencia: str
+    repeticiones: int
+
+    def validar(self):
+        """Lanza `ValueError` con el mensaje para el usuario si la regla no es válida."""
+        if self.frecuencia not in FRECUENCIAS:
+            raise ValueError('Frecuencia no válida.')
+        if not 1 <= self.repeticiones <= maximo_de_repeticiones():
+            raise ValueError(f'Se pueden reservar entre 1 y {maximo_de_repeticiones()} repeticiones.')
+
+    def inicios(self, inicio):
+        """El inicio de cada repetición a partir de `inicio`, a la misma hora local.
+
+        La mensual cae el mismo día de cada mes o, si el mes es más corto, el
+        último (31/01, 28/02, 31/03, ...).
+        """
+        local = timezone.localtime(inicio).replace(tzinfo=None)
+        for n in range(self.repeticiones):
+            if self.frecuencia == 'mensual':
+                meses = local.month - 1 + n
+                anio, mes = local.year + meses // 12, meses % 12 + 1
+                fecha = local.replace(year=anio, month=mes, day=min(local.day, monthrange(anio, mes)[1]))
+            else:
+                fecha = local + timedelta(weeks=n * (2 if self.frecuencia == 'quincenal' else 1))
+            yield timezone.make_aware(fecha)
+
+
+def turnos_de_serie(servicios, inicio, recurrencia=None, **datos):
+    """Los `Turno` (sin guardar, validados) de un combo de `servicios` en cada repetición.
+
+    En cada repetición los servicios van seguidos, en orden: cada uno empieza
+    cuando termina el anterior y dura lo que dura su servicio. Sin
+    `recurrencia`, una sola vez. `datos` va al constructor de cada `Turno`.
+    Lanza `ValueError` si la serie no es válida y deja subir el
+    `ValidationError` del modelo.
+    """
+    if not 1 <= len(servicios) <= maximo_de_servicios():
+        raise ValueError(f'Se pueden combinar entre 1 y {maximo_de_servicios()} servicios.')
+    recurrencia = recurrencia or Recurrencia('semanal', 1)
+    recurrencia.validar()
+    turnos = []
+    for comienzo in recurrencia.inicios(inicio):
+        for servicio in servicios:
+            fin = comienzo + duracion_de(servicio)
+            turnos.append(Turno(servicio=servicio, fecha_hora_inicio=comienzo, fecha_hora_fin=fin, **datos))
+            comienzo = fin
+    # Lo que valida `Turno.save()`: los datos del cliente son los mismos en
+    # todos, así que basta con el primero y la duración de cada servicio.
+    turnos[0].full_clean(exclude=['servicio', 'recurso'], validate_unique=False, validate_constraints=False)
+    for turno in turnos[1:len(servicios)]:
+        turno.clean()
+    return turnos
+
+
+def crear_serie(servicios, inicio, recurrencia=None, **datos):
+    """Crea todos los turnos de `turnos_de_serie(...)` o ninguno (`crear_turnos`).
+
+    Las consultas no dependen de la cantidad de repeticiones. Lanza
+    `HorarioNoDisponible` con las posiciones (en el orden de
+    `turnos_de_serie`) de los que no caben.
+    """
+    return crear_turnos(turnos_de_serie(servicios, inicio, recurrencia, **datos))
+
+
+async def acrear_serie(servicios, inicio, recurrencia=None, **datos):
+    """`crear_serie` para vistas asíncronas (en `hilos_de_reservas()`, como `acrear_turno`)."""
+    return await _areservar(crear_serie, servicios, inicio, recurrencia, **datos)
+
+
+def confirmar_turnos(queryset):
+    """Confirma los turnos no confirmados de `queryset` y encola sus `Reserva`.
+
+    Un UPDATE de `confirmado` más un INSERT en lotes de los eventos de
+    sincronización, todo en una transacción. Devuelve la cantidad confirmada.
+    """
+    return _cambiar_confirmacion(queryset, True)
+
+
+def cancelar_turnos(queryset):
+    """Cancela los turnos confirmados de `queryset` y encola el borrado de sus `Reserva`.
+
+    Como `Turno.save()` al desconfirmar: quedan sin confirmar y con
+    `cancelado_en`, dejan de ocupar la agenda y sus horarios futuros se
+    ofrecen a la lista de espera (en el mismo INSERT de eventos). Devuelve la
+    cantidad cancelada.
+    """
+    return _cambiar_confirmacion(queryset, False)
+
+
+def _cambiar_confirmacion(queryset, confirmado):
+    with transaction.atomic(using=queryset.db):
+        # Un turno cancelado se vuelve a confirmar de a uno (`Turno.save()`
+        # comprueba que su horario siga libre).
+        cambiados = queryset.filter(confirmado=not confirmado, cancelado_en__isnull=True)
+        filas = list(cambiados.order_by().values_list(
+            'pk', 'servicio_id', 'recurso_id', 'fecha_hora_inicio', 'fecha_hora_fin',
+        ))
+        if not filas:
+            return 0
+        eventos = [Evento.de_turno(pk) for pk, *_ in filas]
+        eventos += eventos_de_resumen(celda_de(servicio_id, inicio) for _, servicio_id, _, inicio, _ in filas)
+        if confirmado:
+            cambiados.update(confirmado=True)
+        else:
+            cambiados.update(confirmado=False, cancelado_en=timezone.now())
+            eventos += eventos_de_huecos(fila[1:] for fila in filas)
+        Evento.objects.using(queryset.db).encolar(eventos, reiniciar=True, batch_size=TAMANO_LOTE)
+    return len(filas)
+
+
+def sincronizar_reservas(pks, using):
+    """Deja la `Reserva` de cada turno de `pks` de acuerdo con su estado actual.
+
+    Los confirmados tienen su `Reserva` (un upsert en lotes, enlazada por
+    `turno`); los demás no (un DELETE por `turno` o, para reservas anteriores
+    a la migración a ForeignKey, por nombre+hora). Devuelve
+    `(pk, cliente_nombre, cliente_email, servicio, inicio)` de los turnos
+    confirmados.
+    """
+    turnos = Turno.objects.using(using).filter(pk__in=pks)
+    confirmados = list(turnos.filter(confirmado=True).order_by().values_list(
+        'pk', 'servicio_id', 'cliente_nombre', 'fecha_hora_inicio', 'cliente_email', 'servicio__nombre',
+    ))
+    Reserva.objects.using(using).bulk_create(
+        [
+            Reserva(turno_id=pk, servicio_id=servicio_id, nombre_cliente=nombre, fecha_hora=inicio)
+            for pk, servicio_id, nombre, inicio, _, _ in confirmados
+        ],
+        batch_size=TAMANO_LOTE,
+        update_conflicts=True,
+        unique_fields=['turno'],
+        update_fields=['servicio', 'nombre_cliente', 'fecha_hora'],
+    )
+    sin_confirmar = turnos.filter(confirmado=False)
+    Reserva.objects.using(using).filter(
+        Q(turno__in=sin_confirmar.values('pk'))
+        | Exists(sin_confirmar.filter(
+            cliente_nombre=OuterRef('nombre_cliente'),
+            fecha_hora_inicio=OuterRef('fecha_hora'),
+        ))
+    ).delete()
+    return [(pk, nombre, email, servicio, inicio) for pk, _, nombre, inicio, email, servicio in confirmados]
@@ -3,14 +3,2157 @@
 # el código funciona como se espera y para prevenir regresiones (bugs en el futuro).
 # Django tiene un framework de pruebas incorporado.
 
-from django.test import TestCase
-
-# Create your tests here.
-# Ejemplo de una clase de prueba:
-# class ModeloClienteTests(TestCase):
-#     def test_creacion_cliente(self):
-#         """
-#         Prueba que un cliente puede ser creado exitosamente.
-#         """
-#         # Lógica de la prueba
-#         self.assertEqual(1 + 1, 2)
+import asyncio
+import csv
+import gzip
+import importlib
+import io
+import json
+import tempfile
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from time import perf_counter
+from unittest import mock
+
+import brotli
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from salon_de_belleza import routers
+
+from . import (
+    busqueda, cache_publico, clientes, eventos, exportar, importar, limites, lista_espera, metricas, migraciones_de_datos,
+    reservas,
+)
+from .disponibilidad import Agenda, Franja, MapaDeRecursos, franjas_libres, horario_ocupado
+from .forms import TurnoAdminForm
+from .models import Cliente, Contacto, Evento, ListaEspera, Recurso, Reserva, ResumenDiario, Servicio, Turno
+from .paginacion import ConteoEstimadoPaginator
+from .reservas import HorarioNoDisponible, crear_turno
+
+
+def _aware(fecha, hora, minuto=0):
+    return timezone.make_aware(datetime.combine(fecha, time(hora, minuto)))
+
+
+def _procesar_eventos():
+    """Lo que haría `manage.py run_outbox --una-vez`."""
+    while eventos.procesar_pendientes():
+        pass
+
+
+# Las vistas asíncronas reservan en el hilo del test, dentro de la transacción
+# de `TestCase`: en sus propios hilos (`reservas.hilos_de_reservas()`) no
+# verían los datos del test y esperarían su bloqueo de escritura.
+reservas_en_el_hilo_del_test = override_settings(RESERVATION_ASYNC_WORKERS=0)
+
+
+class DisponibilidadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def _turno(self, hora, minuto=0, duracion=60, servicio=None):
+        inicio = _aware(self.dia, hora, minuto)
+        return Turno.objects.create(
+            servicio=servicio or self.servicio,
+            cliente_nombre='Ana',
+            cliente_telefono='1234',
+            fecha_hora_inicio=inicio,
+            fecha_hora_fin=inicio + timedelta(minutes=duracion),
+        )
+
+    def _horas(self, libres):
+        return [timezone.localtime(f.inicio).strftime('%H:%M') for f in libres[self.dia]]
+
+    def test_excluye_horarios_ocupados_y_solapados(self):
+        self._turno(10)
+        self._turno(12, 30)
+        horas = self._horas(franjas_libres(self.servicio, self.dia))
+        self.assertNotIn('10:00', horas)
+        self.assertNotIn('12:00', horas)
+        self.assertNotIn('13:00', horas)
+        self.assertIn('11:00', horas)
+        self.assertIn('14:00', horas)
+        self.assertEqual(horas, sorted(horas))
+
+    def test_otro_servicio_no_ocupa_el_horario(self):
+        otro = Servicio.objects.create(nombre='Tintura', duracion_minutos=120)
+        self._turno(10, servicio=otro)
+        self.assertIn('10:00', self._horas(franjas_libres(self.servicio, self.dia)))
+
+    def test_una_semana_en_dos_consultas(self):
+        self._turno(9)
+        # Recursos del servicio (ninguno) + turnos de toda la semana.
+        with self.assertNumQueries(2):
+            libres = franjas_libres(self.servicio, self.dia, self.dia + timedelta(days=6))
+        self.assertEqual(len(libres), 7)
+        self.assertEqual(list(libres), sorted(libres))
+
+    def test_usa_la_duracion_de_cada_servicio(self):
+        tintura = Servicio.objects.create(nombre='Tintura', duracion_minutos=120)
+        unas = Servicio.objects.create(nombre='Uñas', duracion_minutos=30)
+        self._turno(12, servicio=tintura, duracion=120)
+        self._turno(12, servicio=unas, duracion=30)
+        horas_tintura = self._horas(franjas_libres(tintura, self.dia))
+        # Un turno de 2 horas que empiece a las 11:00 pisaría su segunda hora.
+        self.assertIn('10:00', horas_tintura)
+        self.assertNotIn('10:15', horas_tintura)
+        self.assertIn('14:00', horas_tintura)
+        # Y tiene que terminar antes del cierre.
+        self.assertEqual(horas_tintura[-1], '16:00')
+        horas_unas = self._horas(franjas_libres(unas, self.dia))
+        self.assertIn('11:30', horas_unas)
+        self.assertIn('12:30', horas_unas)
+        self.assertEqual(horas_unas[-1], '17:30')
+
+    def test_empaqueta_los_turnos_dentro_de_cada_hueco(self):
+        self._turno(9, duracion=50)
+        self._turno(14, 30)
+        ventana = Franja(_aware(self.dia, 9), _aware(self.dia, 18))
+        agenda = Agenda([(_aware(self.dia, 9), _aware(self.dia, 9, 50)), (_aware(self.dia, 14, 30), _aware(self.dia, 15, 30))])
+        libres = franjas_libres(self.servicio, self.dia)
+        horas = self._horas(libres)
+        # Se ofrecen todos los inicios que caben...
+        self.assertEqual(horas[:3], ['09:50', '10:00', '10:15'])
+        self.assertEqual(horas[-4:], ['16:15', '16:30', '16:45', '17:00'])
+        # ...y se recomiendan los que empaquetan el hueco: 09:50 queda pegado
+        # al turno anterior; 10:30 deja 3 turnos justos hasta las 14:30. 10:15
+        # dejaría 25 minutos inútiles antes y 15 después.
+        recomendadas = [timezone.localtime(f.inicio).strftime('%H:%M') for f in libres[self.dia] if f.recomendada]
+        self.assertEqual(recomendadas, ['09:50', '10:30', '11:30', '12:30', '13:30', '15:30', '16:00', '16:30', '17:00'])
+        self.assertEqual(agenda.desperdicio(ventana, _aware(self.dia, 10, 15), timedelta(hours=1)), timedelta(minutes=15))
+        respuesta = self.client.get(reverse('disponibilidad'), {'servicio': self.servicio.id, 'desde': self.dia.isoformat()})
+        self.assertEqual(respuesta.json()['dias'][0]['recomendadas'], recomendadas)
+
+    @override_settings(RESERVATION_BUFFER_MINUTES=10)
+    def test_ofrece_los_mismos_inicios_que_acepta_una_reserva(self):
+        self._turno(9, duracion=50)
+        self._turno(11, 5, duracion=45)
+        self._turno(14, 30)
+        horas = self._horas(franjas_libres(self.servicio, self.dia))
+        for inicio in range(9 * 60, 17 * 60 + 1, 15):
+            hora = f'{inicio // 60:02d}:{inicio % 60:02d}'
+            with self.subTest(hora=hora):
+                desde = _aware(self.dia, inicio // 60, inicio % 60)
+                libre = not horario_ocupado(self.servicio, desde, desde + timedelta(hours=1))
+                self.assertEqual(hora in horas, libre)
+
+    @override_settings(RESERVATION_BUFFER_MINUTES=15)
+    def test_respeta_el_margen_entre_turnos(self):
+        self._turno(11)
+        horas = self._horas(franjas_libres(self.servicio, self.dia))
+        self.assertIn('09:45', horas)
+        self.assertNotIn('10:00', horas)
+        self.assertNotIn('12:00', horas)
+        self.assertIn('12:15', horas)
+        with self.assertRaises(HorarioNoDisponible):
+            crear_turno(self.servicio, _aware(self.dia, 12), _aware(self.dia, 13), cliente_nombre='Eva', cliente_telefono='1234')
+
+    def test_endpoint_json(self):
+        self._turno(9)
+        resp = self.client.get(reverse('disponibilidad'), {
+            'servicio': self.servicio.id,
+            'desde': self.dia.isoformat(),
+            'hasta': (self.dia + timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(resp.status_code, 200)
+        dias = resp.json()['dias']
+        self.assertEqual([d['fecha'] for d in dias], [self.dia.isoformat(), (self.dia + timedelta(days=1)).isoformat()])
+        self.assertNotIn('09:00', dias[0]['horas'])
+        self.assertIn('09:00', dias[1]['horas'])
+
+    def test_endpoint_valida_parametros(self):
+        url = reverse('disponibilidad')
+        self.assertEqual(self.client.get(url, {'servicio': 'x', 'desde': '2025-01-01'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'servicio': self.servicio.id, 'desde': 'ayer'}).status_code, 400)
+        resp = self.client.get(url, {'servicio': self.servicio.id, 'desde': '2025-01-01', 'hasta': '2025-06-01'})
+        self.assertEqual(resp.status_code, 400)
+
+
+class AgendaTests(TestCase):
+    def setUp(self):
+        self.dia = timezone.localdate() + timedelta(days=1)
+
+    def _franja(self, hora, minuto, duracion):
+        inicio = _aware(self.dia, hora, minuto)
+        return Franja(inicio, inicio + timedelta(minutes=duracion))
+
+    def test_fusiona_intervalos_y_busca_huecos(self):
+        agenda = Agenda([self._franja(11, 0, 60), self._franja(9, 0, 60), self._franja(9, 30, 60)])
+        self.assertEqual(agenda.ocupados, [self._franja(9, 0, 90), self._franja(11, 0, 60)])
+        self.assertTrue(agenda.esta_libre(*self._franja(10, 30, 30)))
+        self.assertFalse(agenda.esta_libre(*self._franja(10, 30, 45)))
+        self.assertEqual(
+            list(agenda.huecos(_aware(self.dia, 8), _aware(self.dia, 13))),
+            [self._franja(8, 0, 60), self._franja(10, 30, 30), self._franja(12, 0, 60)],
+        )
+
+    def test_agregar_equivale_a_construir_la_agenda(self):
+        franjas = [self._franja(9 + n % 7, 20 * (n % 3), 30 + 15 * (n % 4)) for n in range(25)]
+        margen = timedelta(minutes=10)
+        incremental = Agenda(margen=margen)
+        for franja in franjas:
+            incremental.agregar(*franja)
+        self.assertEqual(incremental.ocupados, Agenda(franjas, margen).ocupados)
+
+
+class OverlappingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Tintura', duracion_minutos=120)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+        cls.turno = Turno.objects.create(
+            servicio=cls.servicio,
+            cliente_nombre='Ana',
+            cliente_telefono='1234',
+            fecha_hora_inicio=_aware(cls.dia, 10),
+        )
+
+    def test_calcula_fin_con_la_duracion_del_servicio(self):
+        self.assertEqual(self.turno.fecha_hora_fin, _aware(self.dia, 12))
+
+    def test_detecta_solapamientos_parciales(self):
+        self.assertTrue(Turno.objects.overlapping(self.servicio, _aware(self.dia, 11), _aware(self.dia, 13)).exists())
+        self.assertTrue(Turno.objects.overlapping(self.servicio, _aware(self.dia, 9), _aware(self.dia, 10, 30)).exists())
+        self.assertFalse(Turno.objects.overlapping(self.servicio, _aware(self.dia, 12), _aware(self.dia, 13)).exists())
+        self.assertFalse(Turno.objects.overlapping(self.servicio, _aware(self.dia, 9), _aware(self.dia, 10)).exists())
+
+    def test_usa_el_indice_compuesto(self):
+        plan = Turno.objects.overlapping(self.servicio, _aware(self.dia, 11), _aware(self.dia, 13)).explain()
+        if 'USING' in plan:  # SQLite
+            self.assertIn('turno_serv_ini_fin_idx', plan)
+
+    def test_rechaza_turnos_mas_largos_que_el_maximo(self):
+        turno = Turno(
+            servicio=self.servicio,
+            cliente_nombre='Eva',
+            cliente_telefono='1234',
+            fecha_hora_inicio=_aware(self.dia, 14),
+            fecha_hora_fin=_aware(self.dia, 14) + timedelta(days=1),
+        )
+        with self.assertRaises(ValidationError):
+            turno.save()
+
+    def test_formulario_admin_rechaza_solapamientos(self):
+        datos = {
+            'servicio': self.servicio.id,
+            'cliente_nombre': 'Eva',
+            'cliente_telefono': '5678',
+            'fecha_hora_inicio': _aware(self.dia, 11),
+        }
+        form = TurnoAdminForm(data=datos)
+        self.assertFalse(form.is_valid())
+        datos['fecha_hora_inicio'] = _aware(self.dia, 12)
+        form = TurnoAdminForm(data=datos)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().fecha_hora_fin, _aware(self.dia, 14))
+
+    def test_formulario_admin_permite_editar_el_mismo_turno(self):
+        form = TurnoAdminForm(instance=self.turno, data={
+            'servicio': self.servicio.id,
+            'cliente_nombre': 'Ana María',
+            'cliente_telefono': '1234',
+            'fecha_hora_inicio': self.turno.fecha_hora_inicio,
+        })
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+class ReservaConcurrenteTests(TransactionTestCase):
+    HILOS = 200
+
+    def test_una_sola_reserva_gana_el_horario(self):
+        servicio = Servicio.objects.create(nombre='Uñas', duracion_minutos=60)
+        dia = timezone.localdate() + timedelta(days=1)
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+
+        def reservar(n):
+            # La mitad pide 10:00 y la otra mitad 10:30: solapamientos parciales
+            # que el `unique_together` de `Turno` no detectaría por sí solo.
+            inicio = _aware(dia, 10, 30 * (n % 2))
+            try:
+                barrera.wait()
+                crear_turno(servicio, inicio, inicio + timedelta(hours=1), cliente_nombre=f'Cliente {n}', cliente_telefono='1234')
+                resultados.append('ok')
+            except HorarioNoDisponible:
+                resultados.append('ocupado')
+            except Exception as exc:  # pragma: no cover - se informa en el assert
+                resultados.append(repr(exc))
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=reservar, args=(n,)) for n in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count('ok'), 1, [r for r in resultados if r not in ('ok', 'ocupado')][:3])
+        self.assertEqual(resultados.count('ocupado'), self.HILOS - 1)
+        self.assertEqual(Turno.objects.count(), 1)
+
+    @override_settings(RESERVATION_ASYNC_WORKERS=2)
+    def test_hilos_de_reservas_segun_la_configuracion(self):
+        self.assertEqual(reservas.hilos_de_reservas()._max_workers, 2)
+        self.assertIs(reservas.hilos_de_reservas(), reservas.hilos_de_reservas())
+        with self.settings(RESERVATION_ASYNC_WORKERS=0):
+            self.assertIsNone(reservas.hilos_de_reservas())
+
+    async def test_reservas_asincronas_en_el_hilo_de_reservas(self):
+        servicio = await Servicio.objects.acreate(nombre='Uñas', duracion_minutos=60)
+        inicio = _aware(timezone.localdate() + timedelta(days=1), 10)
+
+        async def reservar(minutos):
+            comienzo = inicio + timedelta(minutes=minutos)
+            try:
+                turno = await reservas.acrear_turno(
+                    servicio, comienzo, comienzo + timedelta(hours=1), cliente_nombre='Ana', cliente_telefono='1234'
+                )
+            except HorarioNoDisponible:
+                return 'ocupado'
+            return turno.pk
+
+        resultados = await asyncio.gather(*(reservar(30 * (n % 2)) for n in range(50)))
+        self.assertEqual(resultados.count('ocupado'), 49)
+        self.assertEqual(await Turno.objects.acount(), 1)
+
+
+class RecursosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.corte = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.peinado = Servicio.objects.create(nombre='Peinado', duracion_minutos=60)
+        cls.ana = Recurso.objects.create(nombre='Ana')
+        cls.bea = Recurso.objects.create(nombre='Bea', hora_fin=time(12))
+        cls.ana.servicios.set([cls.corte, cls.peinado])
+        cls.bea.servicios.set([cls.corte])
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def _reservar(self, servicio, hora, **datos):
+        inicio = _aware(self.dia, hora)
+        return crear_turno(servicio, inicio, inicio + timedelta(hours=1), cliente_nombre='Eva', cliente_telefono='1234', **datos)
+
+    def test_asigna_el_primer_recurso_libre(self):
+        self.assertEqual(self._reservar(self.corte, 10).recurso, self.ana)
+        self.assertEqual(self._reservar(self.corte, 10).recurso, self.bea)
+        with self.assertRaises(HorarioNoDisponible):
+            self._reservar(self.corte, 10)
+
+    def test_respeta_el_horario_de_cada_recurso(self):
+        self._reservar(self.corte, 13)
+        with self.assertRaises(HorarioNoDisponible):
+            self._reservar(self.corte, 13)
+        horas = [timezone.localtime(f.inicio).strftime('%H:%M') for f in franjas_libres(self.corte, self.dia)[self.dia]]
+        self.assertIn('11:00', horas)
+        self.assertNotIn('13:00', horas)
+        self.assertNotIn('12:30', horas)
+
+    def test_un_recurso_compartido_bloquea_a_los_demas_servicios(self):
+        self._reservar(self.corte, 10, recurso=self.ana)
+        with self.assertRaises(HorarioNoDisponible):
+            self._reservar(self.peinado, 10)
+        self.assertEqual(self._reservar(self.peinado, 11).recurso, self.ana)
+
+    def test_formulario_admin_asigna_o_valida_el_recurso(self):
+        self._reservar(self.corte, 10)
+        datos = {
+            'servicio': self.corte.id,
+            'cliente_nombre': 'Eva',
+            'cliente_telefono': '5678',
+            'fecha_hora_inicio': _aware(self.dia, 10),
+        }
+        self.assertFalse(TurnoAdminForm(data={**datos, 'recurso': self.ana.id}).is_valid())
+        form = TurnoAdminForm(data=datos)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().recurso, self.bea)
+
+    def test_mapa_de_bits(self):
+        mapa = MapaDeRecursos(self.dia, [self.ana, self.bea], margen=timedelta(minutes=10))
+        mapa.ocupar(self.ana.pk, _aware(self.dia, 10), _aware(self.dia, 11))
+        self.assertEqual(mapa.primer_libre(_aware(self.dia, 9), _aware(self.dia, 9, 50)), self.ana)
+        self.assertEqual(mapa.primer_libre(_aware(self.dia, 9), _aware(self.dia, 10)), self.bea)
+        self.assertEqual(mapa.primer_libre(_aware(self.dia, 11), _aware(self.dia, 12)), self.bea)
+        self.assertEqual(mapa.primer_libre(_aware(self.dia, 11, 10), _aware(self.dia, 12, 10)), self.ana)
+        self.assertIsNone(mapa.primer_libre(_aware(self.dia, 17, 30), _aware(self.dia, 18, 30)))
+
+
+@reservas_en_el_hilo_del_test
+class ReservarTurnoViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        # Los contadores de `core.limites` quedan en la caché entre tests.
+        cache.clear()
+
+    def _post(self, hora, servicio=None):
+        return self.client.post(reverse('crear_reserva'), {
+            'servicio': servicio or self.servicio.id,
+            'fecha': self.dia.isoformat(),
+            'hora': hora,
+            'nombre_cliente': 'Ana',
+            'cliente_telefono': '1234',
+        }, follow=True)
+
+    def test_servicio_no_valido(self):
+        for servicio in ('abc', '999'):
+            with self.subTest(servicio=servicio):
+                resp = self._post('10:00', servicio)
+                self.assertRedirects(resp, reverse('crear_reserva'))
+                self.assertIn('Servicio no válido.', [str(m) for m in resp.context['messages']])
+        self.assertFalse(Turno.objects.exists())
+
+    def test_crea_el_turno_y_rechaza_el_solapado_con_un_mensaje(self):
+        self.assertRedirects(self._post('10:00'), reverse('reserva_exitosa'))
+        resp = self._post('10:30')
+        self.assertRedirects(resp, reverse('crear_reserva'))
+        self.assertIn('se solapa', ' '.join(str(m) for m in resp.context['messages']))
+        self.assertEqual(Turno.objects.count(), 1)
+
+    def test_el_turno_dura_lo_que_el_servicio(self):
+        Servicio.objects.filter(pk=self.servicio.pk).update(duracion_minutos=120)
+        self.assertRedirects(self._post('10:00'), reverse('reserva_exitosa'))
+        self.assertEqual(Turno.objects.get().fecha_hora_fin, _aware(self.dia, 12))
+        self.assertRedirects(self._post('11:00'), reverse('crear_reserva'))
+
+    def test_integrity_error_se_informa_como_horario_ocupado(self):
+        with mock.patch.object(Turno, 'save', side_effect=IntegrityError('unique')):
+            resp = self._post('11:00')
+        self.assertRedirects(resp, reverse('crear_reserva'))
+        self.assertIn('se solapa', ' '.join(str(m) for m in resp.context['messages']))
+
+
+@reservas_en_el_hilo_del_test
+class VistasAsincronasTests(TestCase):
+    """Las vistas asíncronas servidas por el manejador ASGI (`AsyncClient`)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def _datos(self, hora):
+        return {
+            'servicio': self.servicio.id,
+            'fecha': self.dia.isoformat(),
+            'hora': hora,
+            'nombre_cliente': 'Ana',
+            'cliente_telefono': '1234',
+        }
+
+    async def test_reserva_por_asgi(self):
+        resp = await self.async_client.post(reverse('crear_reserva'), self._datos('10:00'))
+        self.assertRedirects(resp, reverse('reserva_exitosa'), fetch_redirect_response=False)
+        resp = await self.async_client.post(reverse('crear_reserva'), self._datos('10:30'))
+        self.assertRedirects(resp, reverse('crear_reserva'), fetch_redirect_response=False)
+        self.assertEqual(await Turno.objects.acount(), 1)
+
+    async def test_servicios_y_contacto_por_asgi(self):
+        self.assertContains(await self.async_client.get(reverse('servicios')), 'Corte de Pelo')
+        resp = await self.async_client.post(reverse('contacto'), {'nombre': 'Ana', 'email': 'ana@example.com', 'mensaje': 'Hola'})
+        self.assertRedirects(resp, reverse('contacto'), fetch_redirect_response=False)
+        self.assertTrue(await Evento.objects.filter(tipo=Evento.CONTACTO, datos__nombre='Ana').aexists())
+
+    async def test_el_middleware_no_salta_de_hilo_sin_nada_que_guardar(self):
+        with mock.patch('salon_de_belleza.middleware.sync_to_async', wraps=sync_to_async) as salto:
+            await self.async_client.get(reverse('servicios'))
+            await self.async_client.get(reverse('servicios'))
+            self.assertFalse(salto.called)
+            # El mensaje de éxito sí se guarda (`MessageMiddleware.process_response`).
+            await self.async_client.post(reverse('contacto'), {'nombre': 'Ana', 'email': 'a@b.c', 'mensaje': 'Hola'})
+            self.assertTrue(salto.called)
+
+    @override_settings(MESSAGE_STORAGE='django.contrib.messages.storage.session.SessionStorage')
+    async def test_mensajes_guardados_en_la_sesion(self):
+        await self.async_client.post(reverse('crear_reserva'), {'servicio': self.servicio.id})
+        resp = await self.async_client.get(reverse('crear_reserva'))
+        self.assertContains(resp, 'Por favor completa todos los campos.')
+        self.assertNotIn('ETag', resp)
+
+
+@override_settings(API_TOKENS=['secreto'], API_MAX_BATCH_SIZE=50)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.corte = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.peinado = Servicio.objects.create(nombre='Peinado', duracion_minutos=30)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def _pedido(self, servicio, hora, minuto=0, **datos):
+        return {
+            'servicio': servicio.pk,
+            'inicio': datetime.combine(self.dia, time(hora, minuto)).isoformat(),
+            'cliente_nombre': 'Eva',
+            'cliente_telefono': '1234',
+            **datos,
+        }
+
+    def _post(self, url, cuerpo, token='secreto'):
+        return self.client.post(url, json.dumps(cuerpo), content_type='application/json',
+                                HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_servicios_con_etag(self):
+        url = reverse('api_servicios')
+        respuesta = self.client.get(url)
+        self.assertEqual([s['nombre'] for s in respuesta.json()['servicios']], ['Corte de Pelo', 'Peinado'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+        Servicio.objects.create(nombre='Tintura', duracion_minutos=120)
+        self.assertEqual(len(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).json()['servicios']), 3)
+
+    def test_disponibilidad(self):
+        datos = self.client.get(reverse('api_disponibilidad'), {'servicio': self.corte.pk, 'desde': self.dia}).json()
+        franja = datos['dias'][0]['franjas'][0]
+        self.assertEqual(parse_datetime(franja['inicio']), _aware(self.dia, 9))
+        self.assertEqual(parse_datetime(franja['fin']), _aware(self.dia, 10))
+        self.assertTrue(franja['recomendada'])
+        self.assertFalse(datos['dias'][0]['franjas'][1]['recomendada'])
+        self.assertEqual(self.client.get(reverse('api_disponibilidad'), {'servicio': 'x'}).status_code, 400)
+
+    def test_turnos_exigen_token(self):
+        self.assertEqual(self._post(reverse('api_turnos'), self._pedido(self.corte, 10), token='otro').status_code, 401)
+        self.assertEqual(self.client.get(reverse('api_turnos'), {'desde': self.dia}).status_code, 401)
+        self.assertFalse(Turno.objects.exists())
+
+    def test_crear_turno(self):
+        respuesta = self._post(reverse('api_turnos'), self._pedido(self.corte, 10))
+        self.assertEqual(respuesta.status_code, 201)
+        turno = Turno.objects.get(pk=respuesta.json()['id'])
+        self.assertEqual(turno.fecha_hora_fin, _aware(self.dia, 11))
+        self.assertEqual(self._post(reverse('api_turnos'), self._pedido(self.corte, 10, 30)).status_code, 409)
+        respuesta = self._post(reverse('api_turnos'), self._pedido(self.corte, 12, cliente_telefono=''))
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(respuesta.json()['errores'], ['Debes proporcionar un número de teléfono.'])
+
+    def test_servicio_de_otro_tipo(self):
+        for valor in ([self.corte.pk], {'id': self.corte.pk}, str(self.corte.pk), True, None):
+            respuesta = self._post(reverse('api_turnos'), {**self._pedido(self.corte, 10), 'servicio': valor})
+            self.assertEqual(respuesta.status_code, 400, valor)
+            self.assertEqual(respuesta.json()['errores'], ['Servicio no válido.'])
+        respuesta = self._post(reverse('api_turnos_lote'), {'turnos': [{**self._pedido(self.corte, 9), 'servicio': [1]}]})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Turno.objects.exists())
+
+    def test_lote_todo_o_nada(self):
+        pedidos = [self._pedido(self.corte, 9), self._pedido(self.corte, 10), self._pedido(self.corte, 9, 30)]
+        respuesta = self._post(reverse('api_turnos_lote'), {'turnos': pedidos})
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['conflictos'], [2])
+        Turno.objects.create(servicio=self.corte, cliente_nombre='Ana', cliente_telefono='1',
+                             fecha_hora_inicio=_aware(self.dia, 11))
+        respuesta = self._post(reverse('api_turnos_lote'), {'turnos': [self._pedido(self.corte, 11, 30)]})
+        self.assertEqual(respuesta.json()['conflictos'], [0])
+        respuesta = self._post(reverse('api_turnos_lote'), {'turnos': [self._pedido(self.corte, 9), {'servicio': 999}]})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(list(respuesta.json()['errores']), ['1'])
+        self.assertEqual(Turno.objects.count(), 1)
+        self.assertEqual(self._post(reverse('api_turnos_lote'), {'turnos': [self._pedido(self.corte, 9)] * 51}).status_code, 400)
+
+    def test_lote_consultas_constantes(self):
+        def lote(hora):
+            return {'turnos': [self._pedido(s, h) for s in (self.corte, self.peinado) for h in range(hora, hora + 4)]}
+        self._post(reverse('api_turnos_lote'), lote(9))  # catálogo en caché
+        # SAVEPOINT + recursos + solapamientos + INSERT + eventos del resumen + RELEASE
+        with self.assertNumQueries(6):
+            respuesta = self._post(reverse('api_turnos_lote'), lote(13))
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(len(respuesta.json()['turnos']), 8)
+        self.assertEqual(Turno.objects.count(), 16)
+
+    def test_lote_asigna_recursos(self):
+        ana = Recurso.objects.create(nombre='Ana')
+        bea = Recurso.objects.create(nombre='Bea')
+        ana.servicios.set([self.corte, self.peinado])
+        bea.servicios.set([self.corte])
+        crear_turno(self.peinado, _aware(self.dia, 10), _aware(self.dia, 10, 30),
+                    cliente_nombre='Eva', cliente_telefono='1', recurso=ana)
+        pedidos = [self._pedido(self.corte, 10), self._pedido(self.corte, 11), self._pedido(self.corte, 11)]
+        respuesta = self._post(reverse('api_turnos_lote'), {'turnos': pedidos})
+        self.assertEqual([t['recurso_id'] for t in respuesta.json()['turnos']], [bea.pk, ana.pk, bea.pk])
+        respuesta = self._post(reverse('api_turnos_lote'), {'turnos': [self._pedido(self.peinado, 11, 15)]})
+        self.assertEqual(respuesta.json()['conflictos'], [0])
+
+    def test_listado_por_cursor(self):
+        Turno.objects.bulk_create([
+            Turno(servicio=s, cliente_nombre=f'C{h}', cliente_telefono='1',
+                  fecha_hora_inicio=_aware(self.dia + timedelta(days=d), h),
+                  fecha_hora_fin=_aware(self.dia + timedelta(days=d), h, 30))
+            for d in range(3) for h in range(9, 14) for s in (self.corte, self.peinado)
+        ])
+        vistos, cursor = [], None
+        while True:
+            params = {'desde': self.dia, 'hasta': self.dia + timedelta(days=1), 'limite': 3}
+            if cursor:
+                params['cursor'] = cursor
+            with self.assertNumQueries(1):
+                datos = self.client.get(reverse('api_turnos'), params, HTTP_AUTHORIZATION='Bearer secreto').json()
+            vistos += datos['turnos']
+            cursor = datos['siguiente']
+            if not cursor:
+                break
+        esperados = list(Turno.objects.filter(
+            fecha_hora_inicio__lt=_aware(self.dia + timedelta(days=2), 0),
+        ).order_by('fecha_hora_inicio', 'pk').values_list('pk', flat=True))
+        self.assertEqual([t['id'] for t in vistos], esperados)
+        self.assertEqual(len(vistos), 20)
+        self.assertIsNone(vistos[0]['cancelado_en'])
+        respuesta = self.client.get(reverse('api_turnos'), {'desde': self.dia, 'cursor': 'x'},
+                                    HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_listar_turnos_con_fechas_que_no_existen(self):
+        for params in ({'desde': '2025-02-30'}, {'desde': '2025-01-01', 'hasta': '2025-13-01'}):
+            with self.subTest(**params):
+                respuesta = self.client.get(reverse('api_turnos'), params, HTTP_AUTHORIZATION='Bearer secreto')
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertEqual(respuesta.json(), {'error': 'Rango de fechas no válido.'})
+
+
+class TurnoSaveConsultasTests(TestCase):
+    """Presupuesto de consultas de `Turno.save()`/`delete()` (no debe crecer)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def _nuevo(self, hora=10, **kwargs):
+        return Turno(
+            servicio=self.servicio,
+            cliente_nombre='Ana',
+            cliente_telefono='1234',
+            fecha_hora_inicio=_aware(self.dia, hora),
+            **kwargs,
+        )
+
+    def _guardado(self, **kwargs):
+        turno = self._nuevo(**kwargs)
+        turno.save()
+        _procesar_eventos()
+        return Turno.objects.get(pk=turno.pk)
+
+    def test_crear(self):
+        turno = self._nuevo()
+        # INSERT del turno + INSERT del evento del resumen diario.
+        with self.assertNumQueries(2):
+            turno.save()
+        self.assertEqual(list(Evento.objects.values_list('tipo', flat=True)), [Evento.RESUMEN])
+
+    def test_crear_confirmado(self):
+        turno = self._nuevo(confirmado=True)
+        # La sincronización y el resumen van en el mismo INSERT.
+        with self.assertNumQueries(2):
+            turno.save()
+        _procesar_eventos()
+        self.assertTrue(Reserva.objects.filter(turno=turno, servicio=self.servicio).exists())
+
+    def test_confirmar(self):
+        turno = self._guardado()
+        turno.confirmado = True
+        with self.assertNumQueries(2):
+            turno.save()
+        _procesar_eventos()
+        reserva = Reserva.objects.get(turno=turno)
+        self.assertEqual((reserva.nombre_cliente, reserva.fecha_hora), ('Ana', turno.fecha_hora_inicio))
+
+    def test_guardar_confirmado_sin_cambios(self):
+        turno = self._guardado(confirmado=True)
+        with self.assertNumQueries(1):
+            turno.save()
+        self.assertFalse(Evento.objects.filter(estado=Evento.PENDIENTE).exists())
+        self.assertEqual(Reserva.objects.count(), 1)
+
+    def test_editar_confirmado_actualiza_la_reserva(self):
+        turno = self._guardado(confirmado=True)
+        turno.cliente_nombre = 'Ana María'
+        with self.assertNumQueries(2):
+            turno.save()
+        _procesar_eventos()
+        self.assertEqual(Reserva.objects.get().nombre_cliente, 'Ana María')
+
+    def test_desconfirmar(self):
+        turno = self._guardado(confirmado=True)
+        turno.confirmado = False
+        with self.assertNumQueries(2):
+            turno.save()
+        _procesar_eventos()
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_desconfirmar_borra_reservas_antiguas_por_nombre_y_hora(self):
+        turno = self._guardado(confirmado=True)
+        Reserva.objects.create(servicio=self.servicio, nombre_cliente='Ana', fecha_hora=turno.fecha_hora_inicio)
+        turno.confirmado = False
+        turno.save()
+        _procesar_eventos()
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_borrar(self):
+        turno = self._guardado(confirmado=True)
+        # Reservas, turno y el evento del resumen diario (`post_delete`).
+        with self.assertNumQueries(4):
+            turno.delete()
+        self.assertFalse(Reserva.objects.exists())
+        self.assertFalse(Turno.objects.exists())
+
+    def test_reconfirmar_reutiliza_la_reserva(self):
+        turno = self._guardado(confirmado=True)
+        for confirmado in (False, True, False, True):
+            turno.confirmado = confirmado
+            turno.save()
+            _procesar_eventos()
+        self.assertEqual(Reserva.objects.filter(turno=turno).count(), 1)
+
+    def test_recargar_algunos_campos_no_olvida_los_cambios_de_los_demas(self):
+        guardado = self._guardado(confirmado=True)
+        turno = Turno.objects.defer('cliente_email').get(pk=guardado.pk)
+        turno.cliente_nombre = 'Ana María'
+        # Leer el campo diferido lo recarga con `refresh_from_db(fields=...)`.
+        self.assertEqual(turno.cliente_email, '')
+        turno.refresh_from_db(fields=['servicio'])
+        self.assertEqual(turno.campos_modificados(), {'cliente_nombre'})
+        turno.save()
+        _procesar_eventos()
+        self.assertEqual(Reserva.objects.get().nombre_cliente, 'Ana María')
+
+
+class AccionesEnBloqueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Uñas', duracion_minutos=60)
+        dia = timezone.localdate() + timedelta(days=1)
+        for n in range(40):
+            inicio = _aware(dia + timedelta(days=n // 8), 9 + n % 8)
+            Turno.objects.create(
+                servicio=cls.servicio,
+                cliente_nombre=f'Cliente {n % 7}',
+                cliente_telefono='1234',
+                fecha_hora_inicio=inicio,
+                confirmado=n % 3 == 0,
+            )
+        # Reserva antigua sin enlace a turno (anterior a la migración a ForeignKey).
+        cancelable = Turno.objects.filter(confirmado=True).first()
+        Reserva.objects.create(servicio=cls.servicio, nombre_cliente=cancelable.cliente_nombre, fecha_hora=cancelable.fecha_hora_inicio)
+
+    def _estado(self):
+        _procesar_eventos()
+        turnos = list(Turno.objects.order_by('pk').values_list('pk', 'confirmado'))
+        reservas = sorted(Reserva.objects.values_list('turno_id', 'servicio_id', 'nombre_cliente', 'fecha_hora'), key=str)
+        return turnos, reservas
+
+    def _por_fila(self, queryset, confirmar):
+        # Camino original de las acciones del admin: `Turno.save()` por turno.
+        for turno in queryset:
+            if turno.confirmado != confirmar:
+                turno.confirmado = confirmar
+                turno.save()
+
+    def _comparar(self, queryset, confirmar):
+        with transaction.atomic():
+            self._por_fila(queryset(), confirmar)
+            esperado = self._estado()
+            transaction.set_rollback(True)
+        if confirmar:
+            reservas.confirmar_turnos(queryset())
+        else:
+            reservas.cancelar_turnos(queryset())
+        self.assertEqual(self._estado(), esperado)
+
+    def test_confirmar_en_bloque_equivale_al_camino_por_fila(self):
+        self._comparar(lambda: Turno.objects.filter(fecha_hora_inicio__hour__lt=14), True)
+
+    def test_cancelar_en_bloque_equivale_al_camino_por_fila(self):
+        self._comparar(lambda: Turno.objects.filter(cliente_nombre__in=['Cliente 0', 'Cliente 3']), False)
+
+    def test_consultas_constantes(self):
+        # SAVEPOINT + SELECT + UPDATE + INSERT de eventos ... ON CONFLICT + RELEASE
+        with self.assertNumQueries(5):
+            self.assertEqual(reservas.confirmar_turnos(Turno.objects.all()), 26)
+        with self.assertNumQueries(5):
+            self.assertEqual(reservas.cancelar_turnos(Turno.objects.all()), 40)
+        _procesar_eventos()
+        self.assertFalse(Reserva.objects.exists())
+
+
+class ExportarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        cls.corte = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.peinado = Servicio.objects.create(nombre='Peinado', duracion_minutos=60)
+        cls.dia = date(2030, 3, 1)
+        for n in range(6):
+            Turno.objects.create(
+                servicio=cls.corte if n % 2 else cls.peinado,
+                cliente_nombre=f'Cliente, "{n}"',
+                cliente_telefono='1234',
+                fecha_hora_inicio=_aware(cls.dia + timedelta(days=n // 2), 10),
+            )
+        Contacto.objects.create(nombre='Ana', email='ana@example.com', mensaje='Hola\nchau')
+
+    def _exportar(self, *args):
+        salida = io.StringIO()
+        call_command('export_core', *args, stdout=salida)
+        return salida.getvalue()
+
+    def test_csv_filtrado_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            texto = self._exportar('turnos', '--desde', '2030-03-02', '--hasta', '2030-03-02',
+                                   '--servicio', str(self.corte.pk), '--bloque', '1')
+        filas = list(csv.reader(io.StringIO(texto)))
+        self.assertEqual(filas[0][:3], ['id', 'servicio', 'recurso'])
+        self.assertEqual(len(filas), 2)
+        self.assertEqual(filas[1][1], 'Corte de Pelo')
+        self.assertEqual(filas[1][3], 'Cliente, "3"')
+        self.assertEqual(datetime.fromisoformat(filas[1][6]), _aware(self.dia + timedelta(days=1), 10))
+
+    def test_jsonl(self):
+        lineas = self._exportar('contactos', '--formato', 'jsonl').splitlines()
+        self.assertEqual(len(lineas), 1)
+        self.assertEqual(json.loads(lineas[0])['mensaje'], 'Hola\nchau')
+        with self.assertRaises(CommandError):
+            self._exportar('contactos', '--servicio', '1')
+
+    def test_salida_en_trozos(self):
+        with mock.patch('core.exportar.TAMANO_TROZO', 100):
+            trozos = list(exportar.serializar(exportar.EXPORTACIONES['turnos'], Turno.objects.all(), 'csv'))
+        self.assertGreater(len(trozos), 3)
+        self.assertEqual(len(list(csv.reader(io.StringIO(''.join(trozos))))), 7)
+
+    def test_accion_del_admin_exporta_lo_filtrado(self):
+        self.client.force_login(self.usuario)
+        url = reverse('admin:core_turno_changelist') + f'?servicio__id__exact={self.peinado.pk}'
+        respuesta = self.client.post(url, {
+            'action': 'exportar_jsonl', 'select_across': '1', 'index': '0',
+            '_selected_action': Turno.objects.values_list('pk', flat=True)[:1],
+        })
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('turno.jsonl', respuesta['Content-Disposition'])
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual([f['servicio'] for f in filas], ['Peinado'] * 3)
+
+
+class ImportarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unas = Servicio.objects.create(nombre='Uñas', duracion_minutos=60)
+        cls.dia = date(2020, 5, 4)
+        Turno.objects.create(
+            servicio=cls.unas, cliente_nombre='Existente', cliente_telefono='1',
+            fecha_hora_inicio=_aware(cls.dia, 9),
+        )
+
+    def setUp(self):
+        self.directorio = Path(tempfile.mkdtemp())
+
+    def _importar(self, nombre, contenido, *args):
+        ruta = self.directorio / nombre
+        ruta.write_text(contenido, encoding='utf-8')
+        salida = io.StringIO()
+        call_command('import_turnos', str(ruta), *args, stdout=salida)
+        return ruta, salida.getvalue()
+
+    def test_csv_normaliza_servicios_y_rechaza_solapamientos(self):
+        ruta, salida = self._importar('historico.csv', (
+            'servicio,inicio,cliente_nombre,cliente_telefono,confirmado\n'
+            'Unas,2020-05-04 09:30,Solapa con la base,1,1\n'
+            'Unas,2020-05-04 11:00,Ana,1,1\n'
+            'Uñas de gel,2020-05-04 11:30,Solapa en el archivo,1,0\n'
+            'Corte_Pelo,2020-05-04 11:00,Beto,,0\n'
+            'Corte_Pelo,2020-05-04 11:00,Carla,2,no\n'
+            'Tintura,ayer,Dora,3,0\n'
+        ))
+        self.assertIn('6 filas: 2 importadas, 4 rechazadas', salida)
+        self.assertEqual(
+            sorted(Turno.objects.values_list('servicio__nombre', 'cliente_nombre')),
+            [('Corte de Pelo', 'Carla'), ('Uñas', 'Ana'), ('Uñas', 'Existente')],
+        )
+        ana = Turno.objects.get(cliente_nombre='Ana')
+        self.assertEqual(ana.fecha_hora_fin, _aware(self.dia, 12))
+        self.assertEqual(ana.reserva.servicio, self.unas)
+        self.assertFalse(Reserva.objects.filter(nombre_cliente='Carla').exists())
+        # Nada que sincronizar ni correos para turnos históricos.
+        self.assertFalse(Evento.objects.filter(tipo=Evento.TURNO).exists())
+        self.assertEqual(mail.outbox, [])
+
+        with open(f'{ruta}.errores.csv', encoding='utf-8') as errores:
+            rechazadas = list(csv.DictReader(errores))
+        self.assertEqual([r['linea'] for r in rechazadas], ['2', '4', '5', '7'])
+        self.assertEqual(rechazadas[0]['cliente_nombre'], 'Solapa con la base')
+        self.assertIn('solapa', rechazadas[1]['error'])
+        self.assertIn('teléfono', rechazadas[2]['error'])
+        self.assertIn('fecha', rechazadas[3]['error'])
+
+    def test_jsonl_y_servicios_desconocidos(self):
+        ruta, salida = self._importar('historico.jsonl', (
+            '{"servicio": "Masajes", "inicio": "2020-05-05T10:00", "cliente_nombre": "Eva", "cliente_telefono": "4"}\n'
+            'no es json\n'
+            '\n'
+            '{"servicio": "Uñas", "fecha": "2020-05-05", "hora": "10:00", "cliente_nombre": "Flor", '
+            '"cliente_telefono": "5", "cliente_email": "mal"}\n'
+        ), '--no-crear-servicios')
+        self.assertIn('3 filas: 0 importadas, 3 rechazadas', salida)
+        self.assertFalse(Servicio.objects.filter(nombre='Masajes').exists())
+        with open(f'{ruta}.errores.jsonl', encoding='utf-8') as errores:
+            rechazadas = [json.loads(linea) for linea in errores]
+        self.assertEqual([r['linea'] for r in rechazadas], [1, 2, 4])
+        self.assertIn('Masajes', rechazadas[0]['error'])
+        self.assertEqual(rechazadas[1]['_linea'], 'no es json')
+
+    def test_importa_lo_exportado_con_consultas_por_bloque(self):
+        exportado = io.StringIO()
+        call_command('export_core', 'turnos', stdout=exportado)
+        Turno.objects.all().delete()
+        filas = [
+            {'servicio': 'Uñas', 'inicio': (_aware(self.dia, 10) + timedelta(hours=n)).isoformat(),
+             'cliente_nombre': f'Cliente {n}', 'cliente_telefono': '1', 'confirmado': 'true'}
+            for n in range(20)
+        ]
+        # Un bloque: los turnos existentes de sus días, los turnos, las
+        # reservas, los eventos del resumen y el savepoint, sin importar
+        # cuántas filas tenga.
+        importacion = importar.Importacion()
+        with self.assertNumQueries(6):
+            resultado, = importacion.importar(enumerate(filas), filas_por_bloque=20)
+        self.assertEqual((resultado.importados, resultado.rechazados), (20, []))
+        # El segundo bloque termina al día siguiente: vuelve a leer los
+        # existentes, pero sólo de ese día.
+        with self.assertNumQueries(12):
+            resultados = list(importacion.importar(
+                enumerate(f | {'inicio': f['inicio'].replace('2020', '2021')} for f in filas), filas_por_bloque=10,
+            ))
+        self.assertEqual([r.importados for r in resultados], [10, 10])
+
+        _, salida = self._importar('exportado.csv', exportado.getvalue())
+        self.assertIn('1 filas: 1 importadas, 0 rechazadas', salida)
+        self.assertTrue(Turno.objects.filter(cliente_nombre='Existente', fecha_hora_inicio=_aware(self.dia, 9)).exists())
+        self.assertEqual(Turno.objects.count(), 41)
+
+    def test_lee_solo_los_turnos_existentes_de_los_dias_del_archivo(self):
+        Turno.objects.create(
+            servicio=self.unas, cliente_nombre='Otro mes', cliente_telefono='1',
+            fecha_hora_inicio=_aware(date(2020, 6, 1), 9),
+        )
+        importacion = importar.Importacion()
+        fila = {'servicio': 'Uñas', 'inicio': _aware(self.dia, 11).isoformat(),
+                'cliente_nombre': 'Ana', 'cliente_telefono': '1'}
+        resultado, = importacion.importar(enumerate([fila]))
+        self.assertEqual(resultado.importados, 1)
+        self.assertEqual(
+            [(f.inicio, f.fin) for f in importacion.agendas[self.unas.pk].ocupados],
+            [(_aware(self.dia, 9), _aware(self.dia, 10)), (_aware(self.dia, 11), _aware(self.dia, 12))],
+        )
+
+    def test_las_filas_que_rechaza_la_base_no_quedan_en_la_agenda(self):
+        importacion = importar.Importacion()
+        fila = {'servicio': 'Uñas', 'cliente_nombre': 'Ana', 'cliente_telefono': '1'}
+        primero, = importacion.importar(enumerate([fila | {'inicio': _aware(self.dia, 15).isoformat()}]))
+        self.assertEqual(primero.importados, 1)
+        # Reservado por otro después de leer el día.
+        Turno.objects.create(
+            servicio=self.unas, cliente_nombre='A la vez', cliente_telefono='2',
+            fecha_hora_inicio=_aware(self.dia, 11), fecha_hora_fin=_aware(self.dia, 11, 30),
+        )
+        rechazada, = importacion.importar(enumerate([
+            fila | {'inicio': _aware(self.dia, 11).isoformat()},
+            fila | {'inicio': _aware(self.dia, 13).isoformat()},
+        ]))
+        self.assertEqual((rechazada.importados, [r.linea for r in rechazada.rechazados]), (1, [0]))
+        # La media hora que dejaba libre el turno rechazado se puede usar.
+        resultado, = importacion.importar(enumerate([
+            fila | {'inicio': _aware(self.dia, 11, 30).isoformat(), 'fin': _aware(self.dia, 12).isoformat()},
+        ]))
+        self.assertEqual((resultado.importados, resultado.rechazados), (1, []))
+
+
+class MigracionesDeDatosTests(TestCase):
+    def test_reasignar_por_bloques(self):
+        tintura = Servicio.objects.create(nombre='tintura')
+        fecha = _aware(date(2020, 1, 1), 10)
+        Reserva.objects.bulk_create(
+            Reserva(nombre_cliente=nombre, fecha_hora=fecha)
+            for nombre in ['Unas', 'Tintura', 'Masajes', 'Corte_Pelo', ''] * 2
+        )
+        reservas = Reserva.objects.all()
+        nombres = migraciones_de_datos.valores_distintos(reservas, 'nombre_cliente')
+        servicios = migraciones_de_datos.servicios_por_nombre(Servicio, nombres)
+        avance = []
+        # COUNT; por cada uno de los 3 bloques, sus pks, sus valores distintos
+        # y un UPDATE por valor (8 en total); y la lectura de pks que termina.
+        with self.assertNumQueries(1 + 3 * 2 + 8 + 1):
+            actualizadas = migraciones_de_datos.reasignar_por_bloques(
+                reservas, 'nombre_cliente', 'servicio', {n: servicios[n.casefold()] for n in nombres},
+                tamano_bloque=4, informar=lambda *a: avance.append(a),
+            )
+        self.assertEqual(actualizadas, 8)
+        self.assertEqual(avance, [(4, 10), (8, 10), (10, 10)])
+        self.assertEqual(Servicio.objects.count(), 4)
+        self.assertEqual(Reserva.objects.filter(servicio=tintura).count(), 2)
+        self.assertFalse(Reserva.objects.filter(nombre_cliente='', servicio__isnull=False).exists())
+
+
+class Migracion0005Tests(TransactionTestCase):
+    """La migración 0005 de verdad, sobre el esquema de la 0004 (`MigrationExecutor`)."""
+
+    ANTERIOR = ('core', '0004_contacto')
+    MIGRACION = ('core', '0005_convert_reserva_servicio_to_fk')
+
+    def setUp(self):
+        self.executor = MigrationExecutor(connections['default'])
+        self.executor.migrate([self.ANTERIOR])
+        self.modulo = importlib.import_module(f'core.migrations.{self.MIGRACION[1]}')
+
+    def tearDown(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('DELETE FROM core_reserva')
+        # Al esquema actual, con el `post_migrate` de `core.busqueda`.
+        call_command('migrate', verbosity=0)
+
+    def _sembrar_reservas(self, cantidad, servicios):
+        """`cantidad` reservas con la columna `servicio` de texto rotando entre `servicios`, en un INSERT."""
+        casos = ' '.join(f'WHEN {n} THEN %s' for n in range(len(servicios)))
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                f'''WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                INSERT INTO core_reserva (servicio, nombre_cliente, fecha_hora)
+                SELECT CASE i %% {len(servicios)} {casos} END, 'Cliente ' || i, %s FROM n''',
+                [cantidad - 1, *servicios, _aware(date(2020, 1, 1), 10)],
+            )
+
+    def _servicios_de_reservas(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute(
+                'SELECT DISTINCT s.nombre FROM core_reserva r LEFT JOIN core_servicio s ON s.id = r.servicio_id'
+            )
+            return sorted(fila[0] or '' for fila in cursor.fetchall())
+
+    def test_forwards_reusa_servicios_y_crea_los_que_faltan_de_una_vez(self):
+        estado = self.executor.loader.project_state([self.ANTERIOR])
+        estado.apps.get_model('core', 'Servicio').objects.create(nombre='tintura')
+        self._sembrar_reservas(10, ['Unas', 'Tintura', 'Masajes', 'Corte_Pelo', '', 'Corte y barba', 'Uñas esculpidas'])
+
+        # `forwards` entre el AddField de `servicio_fk` y el RemoveField de
+        # `servicio`, en una transacción como la de `migrate`.
+        agregar = self.modulo.Migration.operations[0]
+        despues = estado.clone()
+        agregar.state_forwards('core', despues)
+        with connections['default'].schema_editor() as editor:
+            agregar.database_forwards('core', editor, estado, despues)
+            try:
+                # Valores distintos, servicios, bulk_create y COUNT; del único
+                # bloque, sus pks, sus valores distintos y un UPDATE por valor
+                # ('' no se toca); y la lectura de pks que termina.
+                with self.assertNumQueries(4 + 2 + 6 + 1):
+                    self.modulo.forwards(despues.apps, editor)
+                Reserva = despues.apps.get_model('core', 'Reserva')
+                # Sólo los valores exactos de los choices cambian de nombre:
+                # los escritos a mano no se juntan con otro servicio.
+                self.assertEqual(
+                    sorted(Reserva.objects.values_list('servicio', 'servicio_fk__nombre').distinct()),
+                    [('', None), ('Corte y barba', 'Corte y barba'), ('Corte_Pelo', 'Corte de Pelo'),
+                     ('Masajes', 'Masajes'), ('Tintura', 'tintura'), ('Unas', 'Uñas'),
+                     ('Uñas esculpidas', 'Uñas esculpidas')],
+                )
+                self.assertEqual(despues.apps.get_model('core', 'Servicio').objects.count(), 6)
+            finally:
+                agregar.database_backwards('core', editor, despues, estado)
+
+    def test_500k_reservas_dentro_del_presupuesto(self):
+        self._sembrar_reservas(500_000, ['Unas', 'Corte_Pelo', 'Tintura', 'Masajes'])
+        t0 = perf_counter()
+        with mock.patch('sys.stdout', io.StringIO()):
+            self.executor.loader.build_graph()
+            self.executor.migrate([self.MIGRACION])
+        # La migración entera (con las dos copias de la tabla de SQLite): ~5 s
+        # en una máquina de desarrollo; fila por fila eran decenas de minutos.
+        self.assertLess(perf_counter() - t0, 30)
+        self.assertEqual(self._servicios_de_reservas(), ['Corte de Pelo', 'Masajes', 'Tintura', 'Uñas'])
+
+
+class ResumenDiarioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        cls.corte = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60, precio=1000)
+        cls.unas = Servicio.objects.create(nombre='Uñas', duracion_minutos=30, precio=500)
+        for nombre in ('Ana', 'Bea'):
+            Recurso.objects.create(nombre=nombre).servicios.add(cls.unas)
+        cls.dia = date(2030, 4, 1)
+
+    def _turno(self, servicio, dia, hora, **kwargs):
+        turno = Turno(
+            servicio=servicio, cliente_nombre='Cliente', cliente_telefono='1',
+            fecha_hora_inicio=_aware(dia, hora), **kwargs,
+        )
+        turno.save()
+        return turno
+
+    def _tabla(self):
+        return {
+            (r.servicio_id, r.fecha): (r.turnos, r.confirmados, r.minutos_reservados, r.minutos_disponibles, r.ingresos)
+            for r in ResumenDiario.objects.all()
+        }
+
+    def _comprobar_contra_reconstruccion(self):
+        _procesar_eventos()
+        incremental = self._tabla()
+        salida = io.StringIO()
+        call_command('rebuild_resumenes', stdout=salida)
+        self.assertIn(f'{len(incremental)} resúmenes diarios', salida.getvalue())
+        self.assertEqual(incremental, self._tabla())
+        return incremental
+
+    def test_cambios_de_turnos_actualizan_sus_dias(self):
+        manana = self.dia + timedelta(days=1)
+        primero = self._turno(self.corte, self.dia, 10, confirmado=True)
+        segundo = self._turno(self.corte, self.dia, 12)
+        self._turno(self.unas, self.dia, 10, recurso=Recurso.objects.get(nombre='Ana'))
+        self.assertEqual(self._comprobar_contra_reconstruccion(), {
+            (self.corte.pk, self.dia): (2, 1, 120, 540, Decimal('1000')),
+            (self.unas.pk, self.dia): (1, 0, 30, 1080, Decimal('0')),
+        })
+
+        # Mover un turno cambia el día de antes y el de después.
+        primero.fecha_hora_inicio = _aware(manana, 10)
+        primero.fecha_hora_fin = _aware(manana, 11)
+        primero.save()
+        reservas.cancelar_turnos(Turno.objects.filter(pk=primero.pk))
+        segundo.delete()
+        # Un turno cancelado no ocupa la agenda: deja de contar en su día.
+        self.assertEqual(self._comprobar_contra_reconstruccion(), {
+            (self.unas.pk, self.dia): (1, 0, 30, 1080, Decimal('0')),
+        })
+
+    def test_caminos_en_bloque(self):
+        nuevos = [
+            Turno(servicio=self.corte, cliente_nombre=f'C{h}', cliente_telefono='1',
+                  fecha_hora_inicio=_aware(self.dia, h), fecha_hora_fin=_aware(self.dia, h + 1))
+            for h in (9, 10, 11)
+        ]
+        reservas.crear_turnos(nuevos)
+        reservas.confirmar_turnos(Turno.objects.filter(pk__in=[t.pk for t in nuevos[:2]]))
+        importacion = importar.Importacion()
+        list(importacion.importar(enumerate([
+            {'servicio': 'Uñas', 'inicio': _aware(self.dia, 15).isoformat(), 'cliente_nombre': 'D',
+             'cliente_telefono': '1', 'confirmado': '1'},
+        ])))
+        # Un evento por celda, aunque haya varios turnos en ella.
+        self.assertEqual(Evento.objects.filter(tipo=Evento.RESUMEN).count(), 2)
+        self.assertEqual(self._comprobar_contra_reconstruccion(), {
+            (self.corte.pk, self.dia): (3, 2, 180, 540, Decimal('2000')),
+            (self.unas.pk, self.dia): (1, 1, 30, 1080, Decimal('500')),
+        })
+
+    def test_tablero_lee_solo_los_agregados(self):
+        hasta = self.dia + timedelta(days=364)
+        ResumenDiario.objects.bulk_create([
+            ResumenDiario(servicio=servicio, fecha=self.dia + timedelta(days=n), turnos=4, confirmados=2,
+                          minutos_reservados=240, minutos_disponibles=540, ingresos=servicio.precio * 2)
+            for n in range(365) for servicio in (self.corte, self.unas)
+        ])
+        self.client.force_login(self.usuario)
+        url = reverse('admin:core_resumendiario_changelist')
+        self.client.get(url)
+        # Sesión y usuario, más dos consultas agregadas sobre `ResumenDiario`.
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(url, {'desde': self.dia.isoformat(), 'hasta': hasta.isoformat()})
+        tablero = respuesta.context['tablero']
+        self.assertEqual(tablero['total']['turnos'], 365 * 8)
+        self.assertEqual(tablero['total']['ingresos'], 365 * 3000)
+        self.assertEqual(len(tablero['por_mes']), 12)
+        self.assertAlmostEqual(tablero['por_servicio'][0]['utilizacion'], 240 / 540)
+        self.assertContains(respuesta, 'Corte de Pelo')
+        self.assertEqual(self.client.get(reverse('admin:core_resumendiario_add')).status_code, 403)
+
+
+class ClientesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def _turno(self, hora, telefono='', email='', nombre='Ana', dia=None):
+        return Turno.objects.create(
+            servicio=self.servicio, cliente_nombre=nombre, cliente_telefono=telefono, cliente_email=email,
+            fecha_hora_inicio=_aware(dia or self.dia, hora),
+        )
+
+    def test_normalizar_telefono(self):
+        for texto in ('011 2233-4455', '(11) 2233 4455', '+54 11 2233-4455', '0054 1122334455'):
+            self.assertEqual(clientes.clave_de(texto, '')[0], '+541122334455')
+        self.assertEqual(clientes.clave_de('1234', ' Ana@Example.COM ')[0:2], ('', 'ana@example.com'))
+        with override_settings(CLIENT_PHONE_COUNTRY_CODE='34'):
+            self.assertEqual(clientes.clave_de('612 345 678', '')[0], '+34612345678')
+
+    def test_turnos_del_mismo_cliente(self):
+        primero = self._turno(9, '011 2233-4455', 'Ana@Example.com')
+        segundo = self._turno(10, '+54 11 2233 4455', nombre='Ana M.')
+        tercero = self._turno(11, '1', 'ana@example.com')
+        self._turno(12, '11 5555 6666', nombre='Beto')
+        self._turno(13, '11 5555 6666', 'ana@example.com', nombre='Beto')
+        self._turno(14, '1')
+        # Sin teléfono válido ni email no hay a quién enlazar: no se encola nada.
+        self.assertEqual(Evento.objects.filter(tipo=Evento.CLIENTE).count(), 5)
+        _procesar_eventos()
+        ana = Cliente.objects.get(telefono='+541122334455')
+        beto = Cliente.objects.get(telefono='+541155556666')
+        self.assertEqual((ana.nombre, ana.email), ('Ana', 'ana@example.com'))
+        self.assertEqual((beto.nombre, beto.email), ('Beto', None))
+        # Primero por teléfono; por email, si el teléfono no es de nadie.
+        self.assertEqual([t.cliente for t in Turno.objects.all()], [ana, ana, ana, beto, beto, None])
+        self.assertEqual(list(clientes.historial(ana)), [tercero, segundo, primero])
+        self.assertEqual(clientes.enlazar_turnos(Turno.objects.values('pk')), 0)
+
+    def test_cambiar_los_datos_reenlaza(self):
+        turno = self._turno(9, '011 2233-4455')
+        _procesar_eventos()
+        turno = Turno.objects.get(pk=turno.pk)
+        turno.cliente_telefono = '011 5555-6666'
+        turno.save()
+        _procesar_eventos()
+        self.assertEqual(Turno.objects.get(pk=turno.pk).cliente.telefono, '+541155556666')
+        turno.cliente_telefono = '1'
+        turno.save()
+        _procesar_eventos()
+        self.assertIsNone(Turno.objects.get(pk=turno.pk).cliente)
+        self.assertEqual(Cliente.objects.count(), 2)
+
+    def test_crear_turnos_encola_el_enlace(self):
+        nuevos = [
+            Turno(servicio=self.servicio, cliente_nombre='Eva', cliente_telefono=telefono,
+                  fecha_hora_inicio=_aware(self.dia, hora), fecha_hora_fin=_aware(self.dia, hora + 1))
+            for hora, telefono in ((9, '011 4444-5555'), (10, '+54 11 4444 5555'), (11, '1'))
+        ]
+        reservas.crear_turnos(nuevos)
+        _procesar_eventos()
+        eva = Cliente.objects.get()
+        self.assertEqual(sorted(eva.turnos.values_list('fecha_hora_inicio__hour', flat=True)), [9, 10])
+
+    @override_settings(API_TOKENS=['secreto'])
+    def test_api_busca_por_telefono_o_email(self):
+        for hora in (9, 10, 11):
+            self._turno(hora, '011 2233-4455', 'ana@example.com')
+        _procesar_eventos()
+        Turno.objects.filter(fecha_hora_inicio=_aware(self.dia, 11)).update(cancelado_en=timezone.now())
+        url = reverse('api_clientes')
+        # El cliente por su índice único y su historial por (cliente, inicio).
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(url, {'telefono': '+54 (11) 2233-4455', 'limite': 2},
+                                        HTTP_AUTHORIZATION='Bearer secreto')
+        datos = respuesta.json()
+        self.assertEqual(datos['cliente']['telefono'], '+541122334455')
+        self.assertEqual([parse_datetime(t['fecha_hora_inicio']).hour for t in datos['turnos']], [11, 10])
+        # El cancelado se distingue de uno sin confirmar.
+        self.assertEqual([t['cancelado_en'] is None for t in datos['turnos']], [False, True])
+        respuesta = self.client.get(url, {'email': 'ANA@example.com'}, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(len(respuesta.json()['turnos']), 3)
+        respuesta = self.client.get(url, {'email': 'otra@example.com'}, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 404)
+        respuesta = self.client.get(url, {'telefono': '12'}, HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.client.get(url, {'telefono': '011 2233-4455'}).status_code, 401)
+
+    def test_admin_busca_por_los_indices(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        self._turno(9, '011 2233-4455', nombre='Ana')
+        self._turno(10, '011 5555-6666', nombre='Beto')
+        _procesar_eventos()
+        respuesta = self.client.get(reverse('admin:core_turno_changelist'), {'q': '+54 11 2233 4455'})
+        self.assertEqual([t.cliente_nombre for t in respuesta.context['cl'].result_list], ['Ana'])
+        respuesta = self.client.get(reverse('admin:core_turno_changelist'), {'q': 'Beto'})
+        self.assertEqual([t.cliente_nombre for t in respuesta.context['cl'].result_list], ['Beto'])
+        ana = Cliente.objects.get(nombre='Ana')
+        respuesta = self.client.get(reverse('admin:core_cliente_changelist'), {'q': '1122334455'})
+        self.assertEqual(list(respuesta.context['cl'].result_list), [ana])
+        ana.turnos.update(cancelado_en=timezone.now())
+        respuesta = self.client.get(reverse('admin:core_cliente_change', args=[ana.pk]))
+        self.assertContains(respuesta, reverse('admin:core_turno_change', args=[ana.turnos.get().pk]))
+        self.assertContains(respuesta, '(cancelado)')
+        respuesta = self.client.get(reverse('admin:core_turno_changelist'), {'cliente__id__exact': ana.pk})
+        self.assertEqual(len(respuesta.context['cl'].result_list), 1)
+
+    def test_importar_enlaza_por_bloque(self):
+        filas = [
+            {'servicio': 'Corte de Pelo', 'inicio': _aware(date(2020, 5, 4), 9 + n).isoformat(),
+             'cliente_nombre': f'Cliente {n % 3}', 'cliente_telefono': f'011 4000-000{n % 3}'}
+            for n in range(6)
+        ]
+        # Los turnos existentes del día, savepoint, los clientes del bloque
+        # (una consulta, el INSERT de los nuevos y otra para leerlos), los
+        # turnos, los eventos del resumen y release (no hay confirmados:
+        # ninguna reserva).
+        importacion = importar.Importacion()
+        with self.assertNumQueries(8):
+            resultado, = importacion.importar(enumerate(filas))
+        self.assertEqual(resultado.importados, 6)
+        self.assertEqual(Cliente.objects.count(), 3)
+        self.assertEqual(Turno.objects.filter(cliente__nombre='Cliente 1').count(), 2)
+
+    def _turnos_sin_cliente(self):
+        Turno.objects.bulk_create([
+            Turno(servicio=self.servicio, cliente_nombre=f'C{n}', cliente_telefono=telefono, cliente_email=email,
+                  fecha_hora_inicio=_aware(self.dia, 9 + n), fecha_hora_fin=_aware(self.dia, 10 + n))
+            for n, (telefono, email) in enumerate([
+                ('011 1111-1111', ''), ('1', 'c@example.com'), ('+54 11 1111 1111', 'C@example.com'),
+                ('1', ''), ('011 2222-2222', 'c@example.com'),
+            ])
+        ])
+
+    def _assert_enlazados(self):
+        self.assertEqual(
+            list(Turno.objects.values_list('cliente__nombre', flat=True)), ['C0', 'C1', 'C0', None, 'C1'],
+        )
+        self.assertEqual(sorted(Cliente.objects.values_list('nombre', 'telefono', 'email')), [
+            ('C0', '+541111111111', None), ('C1', None, 'c@example.com'),
+        ])
+
+    def test_enlazar_los_turnos_existentes(self):
+        self._turnos_sin_cliente()
+        enlazados = migraciones_de_datos.enlazar_clientes(Turno.objects.all(), Cliente, tamano_bloque=2, informar=None)
+        self.assertEqual(enlazados, 4)
+        self._assert_enlazados()
+
+    def test_la_migracion_0012_enlaza_con_su_copia(self):
+        # La 0012 no importa `core.migraciones_de_datos` ni `core.contactos`.
+        migracion = importlib.import_module('core.migrations.0012_clientes')
+        self._turnos_sin_cliente()
+        migracion.enlazar_clientes(Turno.objects.all(), Cliente, informar=lambda *a: None)
+        self._assert_enlazados()
+
+
+class BusquedaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.unas = Servicio.objects.create(nombre='Uñas', descripcion='Esmaltado semipermanente')
+        cls.corte = Servicio.objects.create(nombre='Corte de Pelo', descripcion='Peluquería unisex')
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def _turno(self, hora, nombre, servicio=None, email=''):
+        return Turno.objects.create(
+            servicio=servicio or self.corte, cliente_nombre=nombre, cliente_telefono=f'11 5555 00{hora:02d}',
+            cliente_email=email, fecha_hora_inicio=_aware(self.dia, hora),
+        )
+
+    def test_sin_acentos_y_por_prefijo(self):
+        servicios = Servicio.objects.all()
+        self.assertEqual(list(busqueda.filtrar(servicios, 'unas')), [self.unas])
+        self.assertEqual(list(busqueda.filtrar(servicios, 'PELUQUERIA')), [self.corte])
+        self.assertEqual(list(busqueda.filtrar(servicios, 'semi esmal')), [self.unas])
+        # Todas las palabras en la misma fila.
+        self.assertEqual(list(busqueda.filtrar(servicios, 'unas corte')), [])
+        self.assertEqual(list(busqueda.filtrar(servicios, '"*')), [])
+
+    def test_los_triggers_siguen_los_cambios(self):
+        Contacto.objects.bulk_create([
+            Contacto(nombre='Ana', email='ana@example.com', mensaje='¿Hacen tintura rápida?'),
+            Contacto(nombre='Beto', email='beto@example.com', mensaje='Consulta por depilación'),
+        ])
+        contactos = Contacto.objects.all()
+        self.assertEqual([c.nombre for c in busqueda.filtrar(contactos, 'rapida')], ['Ana'])
+        Contacto.objects.filter(nombre='Ana').update(mensaje='Ya no')
+        self.assertEqual(list(busqueda.filtrar(contactos, 'rapida')), [])
+        Contacto.objects.filter(nombre='Beto').delete()
+        self.assertEqual(list(busqueda.filtrar(contactos, 'depilacion')), [])
+        self.assertEqual([c.nombre for c in busqueda.filtrar(contactos, 'ana example')], ['Ana'])
+
+    def test_reparar_triggers(self):
+        with connections['default'].cursor() as cursor:
+            cursor.execute('DROP TRIGGER core_servicio_fts_ai')
+        Servicio.objects.create(nombre='Tintura')
+        self.assertEqual(list(busqueda.filtrar(Servicio.objects.all(), 'tintura')), [])
+        self.assertEqual(busqueda.instalar(connections['default'], crear=False), ['core_servicio'])
+        self.assertEqual([s.nombre for s in busqueda.filtrar(Servicio.objects.all(), 'tintura')], ['Tintura'])
+        self.assertEqual(busqueda.instalar(connections['default'], crear=False), [])
+
+    def test_busqueda_del_admin(self):
+        self._turno(9, 'Ana Pérez', self.unas)
+        self._turno(10, 'Beto Perez')
+        self._turno(11, 'Carla', email='carla@example.com')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+
+        def nombres(url, q, campo='cliente_nombre'):
+            respuesta = self.client.get(url, {'q': q})
+            return sorted(getattr(fila, campo) for fila in respuesta.context['cl'].result_list)
+
+        turnos = reverse('admin:core_turno_changelist')
+        self.assertEqual(nombres(turnos, 'perez'), ['Ana Pérez', 'Beto Perez'])
+        # Por el nombre del servicio.
+        self.assertEqual(nombres(turnos, 'unas'), ['Ana Pérez'])
+        self.assertEqual(nombres(turnos, 'carla'), ['Carla'])
+        # Un email completo sigue yendo por `Cliente` (enlazado por el worker).
+        self.assertEqual(nombres(turnos, 'carla@example.com'), [])
+        _procesar_eventos()
+        self.assertEqual(nombres(turnos, 'carla@example.com'), ['Carla'])
+        self.assertEqual(nombres(reverse('admin:core_servicio_changelist'), 'unas', 'nombre'), ['Uñas'])
+        self.assertEqual(nombres(reverse('admin:core_contacto_changelist'), 'ana', 'nombre'), [])
+
+    def test_buscar_en_la_pagina_de_servicios(self):
+        respuesta = self.client.get(reverse('servicios'), {'q': 'unas'})
+        self.assertEqual(respuesta.context['servicios'], [self.unas])
+        self.assertContains(respuesta, 'value="unas"')
+        self.assertContains(self.client.get(reverse('servicios'), {'q': 'masajes'}), 'No hay servicios que coincidan')
+        self.assertEqual(len(self.client.get(reverse('servicios')).context['servicios']), 2)
+
+
+@reservas_en_el_hilo_del_test
+class SeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.corte = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.tintura = Servicio.objects.create(nombre='Tintura', duracion_minutos=90)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        # Los contadores de `core.limites` quedan en la caché entre tests.
+        cache.clear()
+
+    def _datos(self):
+        return {'cliente_nombre': 'Ana', 'cliente_telefono': '11 2233 4455'}
+
+    def test_inicios_de_la_recurrencia(self):
+        inicio = timezone.make_aware(datetime(2031, 1, 31, 10))
+        self.assertEqual(
+            [timezone.localtime(i).date() for i in reservas.Recurrencia('mensual', 4).inicios(inicio)],
+            [date(2031, 1, 31), date(2031, 2, 28), date(2031, 3, 31), date(2031, 4, 30)],
+        )
+        self.assertEqual(
+            [timezone.localtime(i).date() for i in reservas.Recurrencia('quincenal', 3).inicios(inicio)],
+            [date(2031, 1, 31), date(2031, 2, 14), date(2031, 2, 28)],
+        )
+        for invalida in (reservas.Recurrencia('diaria', 2), reservas.Recurrencia('semanal', 53)):
+            with self.assertRaises(ValueError):
+                invalida.validar()
+
+    def test_combo_repetido(self):
+        creados = reservas.crear_serie(
+            [self.corte, self.tintura], _aware(self.dia, 10), reservas.Recurrencia('semanal', 3), **self._datos(),
+        )
+        self.assertEqual(
+            [(t.servicio, t.fecha_hora_inicio, t.fecha_hora_fin) for t in creados],
+            [
+                (servicio, _aware(self.dia + timedelta(weeks=n), hora, minuto), _aware(self.dia + timedelta(weeks=n), *fin))
+                for n in range(3)
+                for servicio, hora, minuto, fin in ((self.corte, 10, 0, (11, 0)), (self.tintura, 11, 0, (12, 30)))
+            ],
+        )
+        self.assertEqual(Turno.objects.count(), 6)
+
+    def test_todo_o_nada(self):
+        ocupado = self.dia + timedelta(weeks=2)
+        Turno.objects.create(
+            servicio=self.tintura, cliente_nombre='Beto', cliente_telefono='1',
+            fecha_hora_inicio=_aware(ocupado, 12), fecha_hora_fin=_aware(ocupado, 13),
+        )
+        with self.assertRaises(HorarioNoDisponible) as error:
+            reservas.crear_serie(
+                [self.corte, self.tintura], _aware(self.dia, 10), reservas.Recurrencia('semanal', 4), **self._datos(),
+            )
+        # La tintura de la tercera repetición.
+        self.assertEqual(error.exception.conflictos, [5])
+        self.assertEqual(Turno.objects.count(), 1)
+        with self.assertRaises(ValueError):
+            reservas.crear_serie([self.corte] * 4, _aware(self.dia, 10), **self._datos())
+
+    def test_consultas_constantes(self):
+        def serie(semanas, hora):
+            with CaptureQueriesContext(connections['default']) as consultas:
+                reservas.crear_serie(
+                    [self.corte, self.tintura], _aware(self.dia, hora), reservas.Recurrencia('semanal', semanas),
+                    **self._datos(),
+                )
+            return len(consultas)
+
+        # Las mismas consultas que una serie de dos semanas, salvo los INSERT
+        # que Django parte en SQLite cada 999 parámetros (~100 filas).
+        self.assertEqual(serie(2, 14), 6)
+        self.assertLessEqual(serie(52, 9), 6 + 2)
+        self.assertEqual(Turno.objects.count(), 108)
+
+    def test_desde_el_formulario(self):
+        def reservar(hora, **extra):
+            respuesta = self.client.post(reverse('crear_reserva'), {
+                'servicio': self.corte.id, 'fecha': self.dia.isoformat(), 'hora': hora,
+                'nombre_cliente': 'Ana', 'cliente_telefono': '1234', **extra,
+            }, follow=True)
+            return respuesta, ' '.join(str(m) for m in respuesta.context['messages'])
+
+        respuesta, mensajes = reservar('10:00', servicio_extra=self.tintura.id, frecuencia='quincenal', repeticiones='4')
+        self.assertRedirects(respuesta, reverse('reserva_exitosa'))
+        self.assertIn('8 turnos', mensajes)
+        respuesta, mensajes = reservar('09:30', frecuencia='mensual', repeticiones='2')
+        self.assertRedirects(respuesta, reverse('crear_reserva'))
+        self.assertIn(timezone.localtime(_aware(self.dia, 9, 30)).strftime('%d/%m/%Y %H:%M'), mensajes)
+        self.assertEqual(reservar('15:00', frecuencia='semanal', repeticiones='99')[1], 'Se pueden reservar entre 1 y 52 repeticiones.')
+        self.assertEqual(Turno.objects.count(), 8)
+
+
+@reservas_en_el_hilo_del_test
+class ListaEsperaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        # Los contadores de `core.limites` quedan en la caché entre tests.
+        cache.clear()
+
+    def _turno(self, hora, dia=None):
+        return Turno.objects.create(
+            servicio=self.servicio, cliente_nombre='Ana', cliente_telefono='1',
+            fecha_hora_inicio=_aware(dia or self.dia, hora),
+        )
+
+    def _esperar(self, nombre, desde, hasta, dia=None):
+        return ListaEspera.objects.create(
+            servicio=self.servicio, fecha=dia or self.dia, desde=time(desde), hasta=time(hasta),
+            cliente_nombre=nombre, cliente_email=f'{nombre.lower()}@example.com',
+        )
+
+    def test_ventana_de_la_inscripcion(self):
+        espera = lista_espera.inscripcion(self.servicio, _aware(self.dia, 10, 30), cliente_nombre='Ana')
+        self.assertEqual((espera.fecha, espera.desde, espera.hasta), (self.dia, time(9, 30), time(11, 30)))
+        espera = lista_espera.inscripcion(self.servicio, _aware(self.dia, 0, 15))
+        self.assertEqual((espera.desde, espera.hasta), (time(0), time(1, 15)))
+
+    def test_ofrece_el_hueco_al_primero_que_le_sirve(self):
+        manana, tarde = self._turno(10), self._turno(14)
+        lejos = self._esperar('Carla', 16, 18)
+        primero = self._esperar('Beto', 9, 11)
+        segundo = self._esperar('Dana', 9, 15)
+        manana.delete()
+        tarde.delete()
+        _procesar_eventos()
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['beto@example.com', 'dana@example.com'])
+        correo = next(m for m in mail.outbox if m.to == ['beto@example.com'])
+        self.assertIn(f'{self.dia:%d/%m/%Y} a las 10:00', correo.body)
+        primero.refresh_from_db()
+        segundo.refresh_from_db()
+        self.assertEqual((primero.inicio_ofrecido, segundo.inicio_ofrecido), (_aware(self.dia, 10), _aware(self.dia, 14)))
+        self.assertFalse(ListaEspera.objects.filter(pk=lejos.pk, ofrecido_en__isnull=False).exists())
+        # Un turno pasado no libera nada que ofrecer.
+        pasado = timezone.localdate() - timedelta(days=1)
+        self._turno(10, pasado).delete()
+        self.assertFalse(Evento.objects.filter(tipo=Evento.ESPERA, estado=Evento.PENDIENTE).exists())
+
+    def test_no_ofrece_un_hueco_que_se_volvio_a_reservar(self):
+        self._esperar('Beto', 9, 11)
+        self._esperar('Dana', 13, 15)
+        self._turno(10).delete()
+        self._turno(14).delete()
+        # Alguien reserva la media hora siguiente a las 10 antes de que corra
+        # el worker; el hueco de las 14 sigue libre.
+        crear_turno(self.servicio, _aware(self.dia, 10, 30), _aware(self.dia, 11, 30),
+                    cliente_nombre='Eva', cliente_telefono='3')
+        _procesar_eventos()
+        self.assertEqual([m.to for m in mail.outbox], [['dana@example.com']])
+        self.assertTrue(ListaEspera.objects.filter(cliente_nombre='Beto', ofrecido_en__isnull=True).exists())
+
+    def test_rafaga_de_cancelaciones(self):
+        dias = [self.dia + timedelta(days=n) for n in range(50)]
+        huecos = []
+        for dia in dias:
+            for hora in (9, 12, 15):
+                self._esperar(f'Cliente{dia:%m%d}{hora}', hora, hora + 1, dia)
+                huecos.append((self.servicio.pk, _aware(dia, hora), _aware(dia, hora + 1)))
+        # Inscripciones de otros días, que no se leen.
+        self._esperar('Otro', 9, 18, self.dia + timedelta(days=100))
+        # Los huecos que se volvieron a ocupar, las inscripciones y el UPDATE.
+        with transaction.atomic(), self.assertNumQueries(3):
+            ofertas = lista_espera.ofrecer(huecos)
+        self.assertEqual(len(ofertas), 150)
+        self.assertEqual(ListaEspera.objects.filter(ofrecido_en__isnull=True).count(), 1)
+
+    def test_cancelar_desde_el_admin_ofrece_el_horario(self):
+        turno = self._turno(10)
+        turno.confirmado = True
+        turno.save()
+        self._esperar('Beto', 9, 11)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(admin)
+        respuesta = self.client.post(reverse('admin:core_turno_changelist'), {
+            'action': 'cancelar_turnos', '_selected_action': [turno.pk],
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        _procesar_eventos()
+        self.assertEqual([m.to for m in mail.outbox], [['beto@example.com']])
+        self.assertIn(f'{self.dia:%d/%m/%Y} a las 10:00', mail.outbox[0].body)
+        turno.refresh_from_db()
+        self.assertIsNotNone(turno.cancelado_en)
+        # La acción "Confirmar turnos" no lo reconfirma, y lo dice.
+        respuesta = self.client.post(reverse('admin:core_turno_changelist'), {
+            'action': 'confirmar_turnos', '_selected_action': [turno.pk],
+        }, follow=True)
+        confirmados, cancelados = [str(m) for m in respuesta.context['messages']][-2:]
+        self.assertIn('0 turno(s) confirmados', confirmados)
+        self.assertIn('1 turno(s) cancelados no se reconfirman en bloque', cancelados)
+        # El horario quedó libre: se puede reservar de nuevo.
+        crear_turno(self.servicio, _aware(self.dia, 10), _aware(self.dia, 11), cliente_nombre='Beto', cliente_telefono='2')
+        # Y el cancelado ya no se puede volver a confirmar.
+        turno.confirmado = True
+        with self.assertRaises(ValidationError):
+            turno.save()
+
+    def test_borrar_un_cancelado_no_vuelve_a_ofrecer_el_horario(self):
+        turno = self._turno(10)
+        turno.confirmado = True
+        turno.save()
+        turno.confirmado = False
+        turno.save()
+        _procesar_eventos()
+        self._esperar('Beto', 9, 11)
+        Turno.objects.filter(pk=turno.pk).delete()
+        self.assertFalse(Evento.objects.filter(tipo=Evento.ESPERA, estado=Evento.PENDIENTE).exists())
+
+    def test_desconfirmar_cancela_y_ofrece_el_horario(self):
+        turno = self._turno(10)
+        turno.confirmado = True
+        turno.save()
+        self._esperar('Beto', 9, 11)
+        turno.confirmado = False
+        turno.save()
+        self.assertIsNotNone(turno.cancelado_en)
+        self.assertFalse(horario_ocupado(self.servicio, _aware(self.dia, 10), _aware(self.dia, 11)))
+        _procesar_eventos()
+        self.assertEqual([m.to for m in mail.outbox], [['beto@example.com']])
+        # Con el horario todavía libre, volver a confirmarlo lo reactiva.
+        turno.confirmado = True
+        turno.save()
+        self.assertIsNone(turno.cancelado_en)
+        self.assertTrue(horario_ocupado(self.servicio, _aware(self.dia, 10), _aware(self.dia, 11)))
+        # Un turno pendiente (nunca confirmado) no se cancela al guardarlo.
+        pendiente = self._turno(14)
+        pendiente.save()
+        self.assertIsNone(pendiente.cancelado_en)
+
+    def test_anotarse_desde_el_formulario(self):
+        self._turno(10)
+
+        def reservar(**extra):
+            respuesta = self.client.post(reverse('crear_reserva'), {
+                'servicio': self.servicio.id, 'fecha': self.dia.isoformat(), 'hora': '10:00',
+                'nombre_cliente': 'Beto', 'cliente_telefono': '1234', 'lista_espera': '1', **extra,
+            }, follow=True)
+            return ' '.join(str(m) for m in respuesta.context['messages'])
+
+        self.assertIn('necesitamos un email', reservar())
+        self.assertIn('entre las 09:00 y las 11:00', reservar(cliente_email='beto@example.com'))
+        espera = ListaEspera.objects.get()
+        self.assertEqual((espera.cliente_email, espera.fecha), ('beto@example.com', self.dia))
+
+
+@reservas_en_el_hilo_del_test
+class LimitesTests(TestCase):
+    """`core.limites`: POST de los formularios por IP y por teléfono o email."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        cache.clear()
+
+    def _contactar(self, email='ana@example.com', ip='10.0.0.1'):
+        return self.client.post(
+            reverse('contacto'), {'nombre': 'Ana', 'email': email, 'mensaje': 'Hola'}, REMOTE_ADDR=ip,
+        )
+
+    @override_settings(RATE_LIMITS={'contacto': {'ip': (2, 600)}})
+    def test_por_ip(self):
+        self.assertEqual(self._contactar().status_code, 302)
+        self.assertEqual(self._contactar(email='otra@example.com').status_code, 302)
+        respuesta = self._contactar(email='tercera@example.com')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertGreater(int(respuesta['Retry-After']), 0)
+        # No llegó a la vista: no se encoló nada.
+        self.assertEqual(Evento.objects.filter(tipo=Evento.CONTACTO).count(), 2)
+        # Otra IP sigue pudiendo, y los GET no se cuentan.
+        self.assertEqual(self._contactar(ip='10.0.0.2').status_code, 302)
+        self.assertEqual(self.client.get(reverse('contacto'), REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    @override_settings(RATE_LIMITS={'reservar': {'ip': (10, 600), 'telefono': (2, 3600)}})
+    def test_por_telefono(self):
+        def reservar(hora, telefono, ip):
+            return self.client.post(reverse('crear_reserva'), {
+                'servicio': self.servicio.id, 'fecha': self.dia.isoformat(), 'hora': hora,
+                'nombre_cliente': 'Ana', 'cliente_telefono': telefono,
+            }, REMOTE_ADDR=ip)
+
+        self.assertEqual(reservar('10:00', '011 2233-4455', '10.0.0.1').status_code, 302)
+        self.assertEqual(reservar('11:00', '+54 11 2233 4455', '10.0.0.2').status_code, 302)
+        # El mismo teléfono escrito de otra forma y desde otra IP.
+        self.assertEqual(reservar('12:00', '11-2233-4455', '10.0.0.3').status_code, 429)
+        self.assertEqual(reservar('12:00', '11 5555 6666', '10.0.0.3').status_code, 302)
+        self.assertEqual(Turno.objects.count(), 3)
+
+    def test_ventana_deslizante(self):
+        def espera(anterior, actual, segundo):
+            contador = limites.Contador('reservar', 'ip', '10.0.0.1', 10, 60, 6000 + segundo)
+            return contador.espera({contador.anterior: anterior, contador.actual: actual})
+
+        # A mitad de la ventana, la anterior cuenta la mitad.
+        self.assertEqual(espera(10, 4, 30), 0)
+        self.assertEqual(espera(10, 5, 30), 6)
+        # La actual llena: hasta que pese 9 en la siguiente.
+        self.assertEqual(espera(0, 10, 30), 36)
+        self.assertEqual(espera(10, 0, 6), 0)
+
+    @override_settings(RATE_LIMITS={'contacto': {'ip': (1, 600)}})
+    async def test_asincrono(self):
+        datos = {'nombre': 'Ana', 'email': 'ana@example.com', 'mensaje': 'Hola'}
+        self.assertEqual((await self.async_client.post(reverse('contacto'), datos)).status_code, 302)
+        self.assertEqual((await self.async_client.post(reverse('contacto'), datos)).status_code, 429)
+
+
+@override_settings(PERF_SAMPLE_RATE=1, PUBLIC_PAGE_CACHE_SECONDS=0, PERF_METRICS_TOKENS=['secreto'])
+class MetricasTests(TestCase):
+    """`core.metricas`: medición de peticiones, `Server-Timing` y `/interno/metricas/`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+
+    def setUp(self):
+        metricas.REGISTRO.reiniciar()
+
+    def _metricas(self):
+        respuesta = self.client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.content.decode()
+
+    def test_mide_la_peticion(self):
+        respuesta = self.client.get(reverse('servicios'))
+        self.assertRegex(respuesta['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        texto = self._metricas()
+        self.assertIn('salon_request_duration_seconds_count{vista="servicios"} 1', texto)
+        self.assertIn('salon_request_queries_count{vista="servicios"} 1', texto)
+        self.assertIn('salon_request_duration_seconds_bucket{vista="servicios",le="+Inf"} 1', texto)
+        serie = metricas.REGISTRO.series['servicios']
+        self.assertGreater(serie.consultas.suma, 0)
+        self.assertGreater(serie.en_plantillas, 0)
+
+    @override_settings(PERF_SLOW_QUERY_MS=0)
+    def test_consultas_lentas(self):
+        with self.assertLogs('core.metricas', 'WARNING') as registro:
+            self.client.get(reverse('servicios'))
+        self.assertIn('en servicios: SELECT', registro.output[0])
+        self.assertIn('salon_slow_queries_total{vista="servicios"}', self._metricas())
+
+    @override_settings(PERF_SAMPLE_RATE=0)
+    def test_sin_muestreo(self):
+        respuesta = self.client.get(reverse('servicios'))
+        self.assertNotIn('Server-Timing', respuesta)
+        self.assertEqual(metricas.REGISTRO.series, {})
+
+    @override_settings(PERF_SAMPLE_RATE=0, PERF_SLOW_QUERY_MS=0)
+    def test_consultas_lentas_sin_muestreo(self):
+        # El registro de consultas lentas no depende de la muestra.
+        with self.assertLogs('core.metricas', 'WARNING') as registro:
+            respuesta = self.client.get(reverse('servicios'))
+        self.assertNotIn('Server-Timing', respuesta)
+        self.assertIn('en servicios: SELECT', registro.output[0])
+        serie = metricas.REGISTRO.series['servicios']
+        self.assertEqual((serie.duracion.total, serie.lentas), (0, len(registro.output)))
+
+    async def test_asincrono(self):
+        respuesta = await self.async_client.get(reverse('servicios'))
+        self.assertIn('Server-Timing', respuesta)
+        self.assertGreater(metricas.REGISTRO.series['servicios'].consultas.suma, 0)
+
+    def test_acceso(self):
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 401)
+        self.assertEqual(
+            self.client.get(reverse('metricas'), HTTP_AUTHORIZATION='Bearer otro').status_code, 401,
+        )
+        personal = User.objects.create_user('personal', password='x', is_staff=True)
+        self.client.force_login(personal)
+        self.assertEqual(self.client.get(reverse('metricas')).status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicasTests(TransactionTestCase):
+    """`salon_de_belleza.routers`: lecturas en réplicas y primaria después de escribir.
+
+    `TransactionTestCase` porque dentro de una transacción todo va a la
+    primaria. La réplica elegida se sustituye por `default` (no hay otra base
+    en los tests); que se haya elegido una indica que la lectura fue a réplica.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        elegir = mock.patch('salon_de_belleza.routers.random.choice', return_value='default')
+        self.elegir = elegir.start()
+        self.addCleanup(elegir.stop)
+
+    def test_las_paginas_leen_de_la_replica(self):
+        manana = (timezone.localdate() + timedelta(days=1)).isoformat()
+        respuesta = self.client.get(f"{reverse('disponibilidad')}?servicio={self.servicio.id}&desde={manana}")
+        self.assertEqual(respuesta.status_code, 200)
+        self.elegir.assert_called_with(['replica'])
+
+    @override_settings(DATABASE_REPLICAS=['atrasada'])
+    def test_el_catalogo_en_cache_no_sale_de_una_replica_atrasada(self):
+        # Una réplica de verdad (otra base SQLite en memoria, compartida entre
+        # hilos) que todavía no recibió el servicio nuevo.
+        connections.settings['atrasada'] = {
+            **connections['default'].settings_dict, 'NAME': 'file:atrasada?mode=memory&cache=shared',
+        }
+        self.addCleanup(connections.settings.pop, 'atrasada')
+        self.addCleanup(lambda: connections['atrasada'].close())
+        permitidas = mock.patch.object(type(self), 'databases', {'default', 'atrasada'})
+        permitidas.start()
+        self.addCleanup(permitidas.stop)
+        with connections['atrasada'].schema_editor() as editor:
+            editor.create_model(Servicio)
+        Servicio.objects.using('atrasada').create(pk=self.servicio.pk, nombre=self.servicio.nombre)
+        self.elegir.return_value = 'atrasada'
+        Servicio.objects.create(nombre='Uñas', duracion_minutos=30)
+
+        self.assertContains(self.client.get(reverse('servicios')), 'Uñas')
+        self.assertContains(self.client.get(f"{reverse('servicios')}?q=uñas"), 'Uñas')
+        respuesta = self.client.get(reverse('api_servicios'))
+        self.assertEqual([s['nombre'] for s in respuesta.json()['servicios']], ['Corte de Pelo', 'Uñas'])
+        self.assertEqual(len(cache_publico.catalogo()), 2)
+        # Lo demás sí lee de la réplica.
+        token = routers._en_replica.set(True)
+        try:
+            self.assertEqual(Servicio.objects.count(), 1)
+        finally:
+            routers._en_replica.reset(token)
+
+    def test_quien_escribe_lee_de_la_primaria_un_rato(self):
+        respuesta = self.client.post(reverse('crear_reserva'), {
+            'servicio': self.servicio.id,
+            'fecha': (timezone.localdate() + timedelta(days=1)).isoformat(),
+            'hora': '10:00',
+            'nombre_cliente': 'Ana',
+            'cliente_telefono': '1234',
+        })
+        self.assertRedirects(respuesta, reverse('reserva_exitosa'), fetch_redirect_response=False)
+        self.assertEqual(respuesta.cookies['primaria']['max-age'], 10)
+        self.client.get(reverse('reserva_exitosa'))
+        self.client.get(reverse('servicios'))
+        self.elegir.assert_not_called()
+        self.assertEqual(Turno.objects.count(), 1)
+
+    def test_router(self):
+        router = routers.ReplicaRouter()
+        # Fuera de una petición, o de otra aplicación: la primaria.
+        self.assertIsNone(router.db_for_read(Servicio))
+        token = routers._en_replica.set(True)
+        try:
+            self.assertEqual(router.db_for_read(Servicio), 'default')
+            self.assertIsNone(router.db_for_read(User))
+            with transaction.atomic():
+                self.assertIsNone(router.db_for_read(Servicio))
+        finally:
+            routers._en_replica.reset(token)
+        self.assertEqual(router.db_for_write(Servicio), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertIsNone(router.allow_migrate('default', 'core'))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sin_replicas_no_cambia_nada(self):
+        respuesta = self.client.post(reverse('contacto'), {'nombre': 'Ana', 'email': 'ana@example.com', 'mensaje': 'Hola'})
+        self.assertNotIn('primaria', respuesta.cookies)
+        self.client.get(reverse('servicios'))
+        self.elegir.assert_not_called()
+
+
+class ListadosAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        cls.servicios = [Servicio.objects.create(nombre=f'Servicio {n}', duracion_minutos=60) for n in range(3)]
+        cls.dia = timezone.localdate() + timedelta(days=1)
+        for n in range(30):
+            inicio = _aware(cls.dia + timedelta(days=n // 8), 9 + n % 8)
+            Turno.objects.create(
+                servicio=cls.servicios[n % 3],
+                cliente_nombre=f'Cliente {n}',
+                cliente_telefono='1234',
+                fecha_hora_inicio=inicio,
+                confirmado=True,
+            )
+        _procesar_eventos()
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def _consultas(self, url):
+        consultas = []
+        with connections['default'].execute_wrapper(lambda execute, sql, *a: consultas.append(sql) or execute(sql, *a)):
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta, len(consultas)
+
+    def test_consultas_no_dependen_de_las_filas(self):
+        urls = [reverse('admin:core_turno_changelist'), reverse('admin:core_reserva_changelist')]
+        antes = [self._consultas(url)[1] for url in urls]
+        for n in range(30):
+            Turno.objects.create(
+                servicio=self.servicios[n % 3],
+                cliente_nombre=f'Otro {n}',
+                cliente_telefono='1234',
+                fecha_hora_inicio=_aware(self.dia + timedelta(days=10 + n // 8), 9 + n % 8),
+                confirmado=True,
+            )
+        self.assertEqual([self._consultas(url)[1] for url in urls], antes)
+
+    def test_busca_reservas_por_nombre_del_servicio(self):
+        respuesta, _ = self._consultas(reverse('admin:core_reserva_changelist') + '?q=%22Servicio+2%22')
+        self.assertEqual(
+            {r.servicio for r in respuesta.context['cl'].result_list},
+            {self.servicios[2]},
+        )
+
+    def test_conteo_estimado_acotado(self):
+        with mock.patch('core.paginacion.LIMITE_CONTEO', 10):
+            filtrado = ConteoEstimadoPaginator(Turno.objects.filter(confirmado=True).order_by('pk'), 5)
+            self.assertEqual(filtrado.count, 10)
+            with mock.patch('core.paginacion.filas_estimadas', return_value=1_000_000):
+                completo = ConteoEstimadoPaginator(Turno.objects.order_by('pk'), 5)
+                self.assertEqual(completo.count, 1_000_000)
+        self.assertEqual(ConteoEstimadoPaginator(Turno.objects.order_by('pk'), 5).count, 30)
+
+    def test_navegacion_desde(self):
+        url = reverse('admin:core_turno_changelist')
+        with mock.patch('core.admin.TurnoAdmin.list_per_page', 10):
+            primera, _ = self._consultas(url)
+            vistos = list(primera.context['cl'].result_list)
+            siguiente = primera.context['keyset_siguiente']
+            while siguiente:
+                pagina, _ = self._consultas(url + siguiente)
+                vistos += pagina.context['cl'].result_list
+                siguiente = pagina.context.get('keyset_siguiente')
+        self.assertEqual(vistos, list(Turno.objects.order_by('fecha_hora_inicio', 'pk')))
+
+        manana, _ = self._consultas(url + f'?desde={(self.dia + timedelta(days=1)).isoformat()}')
+        self.assertEqual(len(manana.context['cl'].result_list), 22)
+        self.assertEqual(self.client.get(url + '?desde=ayer').status_code, 302)
+
+
+class BandejaDeSalidaTests(TestCase):
+    """Eventos de `core.eventos`: idempotencia, reintentos y correos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60)
+        cls.dia = timezone.localdate() + timedelta(days=1)
+
+    def setUp(self):
+        # Los contadores de `core.limites` quedan en la caché entre tests.
+        cache.clear()
+
+    def _turno(self, **kwargs):
+        return Turno.objects.create(
+            servicio=self.servicio,
+            cliente_nombre='Ana',
+            cliente_telefono='1234',
+            cliente_email='ana@example.com',
+            fecha_hora_inicio=_aware(self.dia, 10),
+            **kwargs,
+        )
+
+    def test_confirmacion_se_envia_una_vez(self):
+        turno = self._turno(confirmado=True)
+        _procesar_eventos()
+        turno.confirmado = False
+        turno.save()
+        turno.confirmado = True
+        turno.save()
+        _procesar_eventos()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['ana@example.com'])
+        self.assertIn('Corte de Pelo', mail.outbox[0].body)
+        self.assertFalse(Evento.objects.exclude(estado=Evento.HECHO).exists())
+
+    def test_reprogramar_el_turno_vuelve_a_avisar(self):
+        turno = self._turno(confirmado=True)
+        _procesar_eventos()
+        turno.fecha_hora_inicio = _aware(self.dia, 12)
+        turno.fecha_hora_fin = _aware(self.dia, 13)
+        turno.save()
+        _procesar_eventos()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].extra_headers['Message-ID'], eventos._message_id(
+            Evento.objects.filter(tipo=Evento.CORREO).earliest('pk').clave))
+
+    @override_settings(OUTBOX_RETRY_SECONDS=60, OUTBOX_MAX_ATTEMPTS=2)
+    def test_reintentos_con_espera_y_fallido_al_agotarlos(self):
+        self._turno(confirmado=True)
+        eventos.procesar_pendientes()  # sólo el `turno`; encola el correo
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('caído')):
+            antes = timezone.now()
+            self.assertEqual(eventos.procesar_pendientes(), 1)
+            correo = Evento.objects.get(tipo=Evento.CORREO)
+            self.assertEqual((correo.estado, correo.intentos), (Evento.PENDIENTE, 1))
+            self.assertIn('caído', correo.ultimo_error)
+            self.assertGreaterEqual(correo.disponible_en, antes + timedelta(seconds=60))
+            # Todavía no venció la espera.
+            self.assertEqual(eventos.procesar_pendientes(), 0)
+            Evento.objects.update(disponible_en=timezone.now())
+            eventos.procesar_pendientes()
+        correo.refresh_from_db()
+        self.assertEqual((correo.estado, correo.intentos), (Evento.FALLIDO, 2))
+        self.assertEqual(mail.outbox, [])
+
+    def test_espera_de_reintento_exponencial_con_tope(self):
+        with self.settings(OUTBOX_RETRY_SECONDS=30, OUTBOX_MAX_RETRY_SECONDS=100):
+            self.assertEqual(
+                [eventos.espera_de_reintento(n).total_seconds() for n in (1, 2, 3, 4)],
+                [30, 60, 100, 100],
+            )
+
+    def test_evento_reiniciado_mientras_se_procesa_sigue_pendiente(self):
+        turno = self._turno()
+        original = eventos.MANEJADORES[Evento.TURNO]
+
+        def confirmar_a_mitad(grupo, using):
+            original[0](grupo, using)
+            Turno.objects.filter(pk=turno.pk).update(confirmado=True)
+            Evento.objects.encolar([Evento.de_turno(turno.pk)], reiniciar=True)
+
+        Evento.objects.encolar([Evento.de_turno(turno.pk)])
+        with mock.patch.dict(eventos.MANEJADORES, {Evento.TURNO: (confirmar_a_mitad, True)}):
+            eventos.procesar_pendientes()
+        self.assertEqual(Evento.objects.get(tipo=Evento.TURNO).estado, Evento.PENDIENTE)
+        self.assertFalse(Reserva.objects.exists())
+        _procesar_eventos()
+        self.assertTrue(Reserva.objects.filter(turno=turno).exists())
+
+    @override_settings(CONTACT_NOTIFICATION_EMAILS=['salon@example.com'])
+    def test_contacto_repetido_se_guarda_una_vez_y_avisa(self):
+        datos = {'nombre': 'Ana\nBcc: x@example.com', 'email': 'ana@example.com', 'mensaje': 'Hola'}
+        self.client.post(reverse('contacto'), datos)
+        self.client.post(reverse('contacto'), datos)
+        self.assertEqual(Evento.objects.filter(tipo=Evento.CONTACTO).count(), 1)
+        self.assertFalse(Contacto.objects.exists())
+        _procesar_eventos()
+        self.assertEqual(Contacto.objects.get().mensaje, 'Hola')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['salon@example.com'])
+        self.assertEqual(mail.outbox[0].subject, 'Mensaje de contacto de Ana Bcc: x@example.com')
+
+    def test_contacto_invalido_no_se_encola(self):
+        self.client.post(reverse('contacto'), {'nombre': 'Ana', 'email': 'no-es-un-email', 'mensaje': 'Hola'})
+        self.assertFalse(Evento.objects.exists())
+
+    def test_run_outbox_una_vez(self):
+        self._turno(confirmado=True)
+        salida = io.StringIO()
+        call_command('run_outbox', '--una-vez', stdout=salida)
+        # Turno, cliente (tiene email), resumen diario y correo.
+        self.assertIn('4 eventos procesados', salida.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@reservas_en_el_hilo_del_test
+class PaginasEnCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.servicio = Servicio.objects.create(nombre='Corte de Pelo', duracion_minutos=60, precio=1000)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_servicios_sin_consultas_y_con_304(self):
+        url = reverse('servicios')
+        primera = self.client.get(url)
+        self.assertContains(primera, 'Corte de Pelo')
+        with self.assertNumQueries(0):
+            segunda = self.client.get(url)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=primera['Last-Modified']).status_code, 304)
+
+    def test_cambiar_un_servicio_invalida_las_paginas(self):
+        url = reverse('servicios')
+        etag = self.client.get(url)['ETag']
+        Servicio.objects.create(nombre='Tintura', duracion_minutos=120)
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Tintura')
+        Servicio.objects.get(nombre='Tintura').delete()
+        self.assertNotContains(self.client.get(url), 'Tintura')
+
+    def test_paginas_estaticas(self):
+        for nombre in ('index', 'reserva_exitosa'):
+            with self.subTest(nombre=nombre):
+                url = reverse(nombre)
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_no_cachea_paginas_con_mensajes(self):
+        self.client.get(reverse('servicios'))
+        respuesta = self.client.post(reverse('crear_reserva'), {'servicio': self.servicio.id}, follow=True)
+        self.assertRedirects(respuesta, reverse('crear_reserva'))
+        self.assertContains(respuesta, 'Por favor completa todos los campos.')
+        self.assertNotIn('ETag', respuesta)
+
+    def test_formulario_de_reserva_condicional_por_cookie_csrf(self):
+        url = reverse('crear_reserva')
+        self.client.get(url)  # crea la cookie CSRF
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(url)
+        self.assertContains(respuesta, 'Corte de Pelo')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+        otro = self.client_class()
+        otro.get(url)
+        self.assertEqual(otro.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200)
+        self.servicio.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 200)
+
+    def test_cache_en_archivos(self):
+        with tempfile.TemporaryDirectory() as directorio, override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directorio},
+        }):
+            url = reverse('servicios')
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            Servicio.objects.create(nombre='Tintura', duracion_minutos=120)
+            self.assertContains(self.client.get(url, HTTP_IF_NONE_MATCH=etag), 'Tintura')
+
+
+class EstaticosComprimidosTests(SimpleTestCase):
+    def test_collectstatic_deja_versiones_con_hash_y_comprimidas(self):
+        with tempfile.TemporaryDirectory() as directorio, override_settings(
+            STATIC_ROOT=directorio,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'salon_de_belleza.almacenamiento.ManifestComprimido'},
+            },
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            hashed = staticfiles_storage.stored_name('css/style.css')
+            self.assertRegex(hashed, r'^css/style\.[0-9a-f]{12}\.css$')
+            ruta = Path(directorio, hashed)
+            with gzip.open(f'{ruta}.gz') as comprimido:
+                self.assertEqual(comprimido.read(), ruta.read_bytes())
+            self.assertEqual(brotli.decompress(Path(f'{ruta}.br').read_bytes()), ruta.read_bytes())
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, metricas, views
 
 # Rutas específicas de la app 'core'. Se incluyen desde el archivo
 # de URLs principal del proyecto (`salon_de_belleza/urls.py`).
@@ -10,6 +10,9 @@ urlpatterns = [
     # Muestra el formulario y procesa el POST para crear una reserva
     path('reservar/', views.reservar_turno_view, name='crear_reserva'),
 
+    # Horarios libres de un servicio en JSON (lo consume el formulario de reserva)
+    path('reservar/disponibilidad/', views.disponibilidad_view, name='disponibilidad'),
+
     # Página de servicios
     path('servicios/', views.servicios_view, name='servicios'),
 
@@ -18,4 +21,14 @@ urlpatterns = [
 
     # Página de contacto
     path('contacto/', views.contacto_view, name='contacto'),
+
+    # API JSON para integraciones (ver `core/api.py`)
+    path('api/servicios/', api.servicios, name='api_servicios'),
+    path('api/disponibilidad/', api.disponibilidad, name='api_disponibilidad'),
+    path('api/turnos/', api.turnos, name='api_turnos'),
+    path('api/turnos/lote/', api.turnos_en_lote, name='api_turnos_lote'),
+    path('api/clientes/', api.cliente, name='api_clientes'),
+
+    # Métricas de rendimiento en formato Prometheus (ver `core/metricas.py`)
+    path('interno/metricas/', metricas.metricas_view, name='metricas'),
 ]
\ No newline at end of file
@@ -6,27 +6,71 @@ Vistas principales del app `core`.
 Cambios importantes realizados:
 - `reservar_turno_view`: genera franjas horarias dinámicas según
     `RESERVATION_START_HOUR`, `RESERVATION_END_HOUR` y
-    `RESERVATION_SLOT_DURATION_MINUTES` en `settings.py`.
+    `RESERVATION_SLOT_DURATION_MINUTES` (paso de la grilla) en `settings.py`.
     - Valida y parsea `fecha`+`hora` de forma segura y convierte a timezone-aware.
-    - Valida solapamientos entre turnos.
+    - Valida solapamientos entre turnos y crea el `Turno` mediante
+      `core.reservas.crear_turno`, que lo hace de forma atómica.
     - Valida que al menos `cliente_telefono` o `cliente_email` esté presente.
-    - Crea un `Turno` con `fecha_hora_fin` calculada.
-- `contacto_view`: guarda envíos en el nuevo modelo `Contacto`.
+    - Crea un `Turno` con `fecha_hora_fin` calculada con la duración del servicio.
+    - Si el horario está ocupado y se marcó `lista_espera`, anota al cliente
+      en la lista de espera de ese día (ver `core.lista_espera`).
+    - Opcionalmente, servicios "a continuación" (`servicio_extra`, un combo)
+      y una repetición (`frecuencia` + `repeticiones`): todos los turnos se
+      crean juntos, o ninguno, con `core.reservas.crear_serie`.
+- `disponibilidad_view`: endpoint JSON con los horarios libres de un servicio
+    (ver `core.disponibilidad`); el formulario lo usa para listar sólo horas
+    abiertas.
+- `contacto_view`: valida el envío y lo encola en la bandeja de salida; el
+    worker (`manage.py run_outbox`) lo guarda en `Contacto` y avisa al salón
+    (ver `core.eventos`).
+- Los POST de `reservar_turno_view` y `contacto_view` tienen un límite por
+    IP y por teléfono o email (`RATE_LIMITS`); los que lo superan reciben un
+    429 antes de tocar la base (ver `core.limites`).
+- `index`, `servicios_view` y `reserva_exitosa_view` se sirven desde la caché
+    de páginas y el formulario de reserva responde GET condicionales (ver
+    `core.cache_publico`).
+- `reservar_turno_view`, `servicios_view` y `contacto_view` son asíncronas:
+    bajo ASGI (`salon_de_belleza/asgi.py`) atienden la petición en el bucle de
+    eventos y usan el ORM asíncrono; la reserva en sí (`acrear_turno`) es una
+    transacción y corre entera en un hilo síncrono. Bajo WSGI Django las
+    ejecuta igual, con `async_to_sync`.
 
 Se añadieron mensajes `messages` para feedback al usuario.
 """
 
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.shortcuts import render, redirect
+from django.http import JsonResponse
 from django.utils import timezone
-from datetime import datetime, timedelta
-from django.conf import settings
-from .models import Contacto, Servicio, Turno  # Contacto: nuevo modelo
+from datetime import date, datetime
+from . import busqueda
+from .cache_publico import acargar_sesion, acatalogo, condicional_por_catalogo, pagina_en_cache, servicios_de_la_primaria
+from .disponibilidad import duracion_de, formatear_hora, franjas_libres, minutos_de_inicio
+from .limites import limitar
+from .lista_espera import inscripcion
+from .models import Contacto, Evento, Servicio  # Contacto: nuevo modelo
+from .reservas import FRECUENCIAS, HorarioNoDisponible, Recurrencia, acrear_serie, acrear_turno, maximo_de_repeticiones
 from django.contrib import messages
 
+# Máximo de días que puede abarcar una consulta de disponibilidad.
+DISPONIBILIDAD_MAX_DIAS = 31
+
 # Nota: Este archivo contiene las vistas (handlers) que responden a las
 # peticiones HTTP. Aquí añadimos comentarios y una validación básica
 # para parsear la fecha y la hora que vienen desde el formulario.
 
+
+async def _arender(request, plantilla, contexto=None):
+    # La plantilla base muestra los mensajes; si alguno quedó en la sesión hay
+    # que cargarla antes, con su API asíncrona (ver `acargar_sesion`).
+    await acargar_sesion(request)
+    return render(request, plantilla, contexto)
+
+
+@pagina_en_cache()
 def index(request):
     """
     Muestra la página de inicio del salón de belleza.
@@ -34,9 +78,11 @@ def index(request):
     return render(request, 'core/index.html')
 
 
-def reservar_turno_view(request):
-    # Queremos ofrecer franjas horarias separadas por 1 hora (por ejemplo 09:00,10:00,...)
-    # y crear un objeto Turno con duración fija de 1 hora para cada reserva.
+@condicional_por_catalogo
+@limitar('reservar')
+async def reservar_turno_view(request):
+    # Ofrecemos inicios sobre la grilla de `RESERVATION_SLOT_DURATION_MINUTES`
+    # y creamos un Turno que dura lo que dura el servicio elegido.
     if request.method == 'POST':
         # 1. Obtener los datos del formulario
         servicio_id = request.POST.get('servicio')
@@ -52,8 +98,8 @@ def reservar_turno_view(request):
             return redirect('crear_reserva')
 
         try:
-            servicio = Servicio.objects.get(id=servicio_id)
-        except Servicio.DoesNotExist:
+            servicio = await Servicio.objects.aget(id=int(servicio_id))
+        except (ValueError, Servicio.DoesNotExist):
             messages.error(request, 'Servicio no válido.')
             return redirect('crear_reserva')
 
@@ -70,33 +116,43 @@ def reservar_turno_view(request):
             messages.error(request, 'El campo Teléfono es obligatorio.')
             return redirect('crear_reserva')
 
-        # 3. Comprobar solapamientos: buscamos cualquier Turno que se solape
-        #    con el intervalo [fecha_hora_inicio, fecha_hora_inicio + 1h).
-        nueva_fin = fecha_hora_inicio + timedelta(hours=1)
-
-        # Condición para solapamiento: existing.start < new_end and existing.end > new_start
-        solapamiento = Turno.objects.filter(
-            servicio=servicio,
-            fecha_hora_inicio__lt=nueva_fin,
-            fecha_hora_fin__gt=fecha_hora_inicio,
-        ).exists()
+        # Combo (otros servicios a continuación) o serie: todos juntos o ninguno.
+        extras = [pk for pk in request.POST.getlist('servicio_extra') if pk]
+        frecuencia = request.POST.get('frecuencia', '')
+        if extras or frecuencia:
+            return await _reservar_serie(request, servicio, extras, frecuencia, fecha_hora_inicio, {
+                'cliente_nombre': nombre_cliente,
+                'cliente_telefono': cliente_telefono,
+                'cliente_email': cliente_email,
+                'confirmado': False,
+            })
 
-        if solapamiento:
+        # 3. Crear el Turno con la duración del servicio. `crear_turno` comprueba
+        #    solapamientos (margen entre turnos incluido, ver
+        #    `core.disponibilidad.horario_ocupado`) e inserta dentro de una
+        #    transacción con la agenda del servicio bloqueada, así dos reservas
+        #    simultáneas no pueden tomar el mismo horario.
+        nueva_fin = fecha_hora_inicio + duracion_de(servicio)
+        try:
+            await acrear_turno(
+                servicio,
+                fecha_hora_inicio,
+                nueva_fin,
+                cliente_nombre=nombre_cliente,
+                cliente_telefono=cliente_telefono,
+                cliente_email=cliente_email,
+                confirmado=False,
+            )
+        except HorarioNoDisponible:
             messages.error(request, 'Lo siento, ese horario se solapa con otra reserva. Elige otro horario.')
+            if request.POST.get('lista_espera'):
+                await _anotar_en_lista_de_espera(request, servicio, fecha_hora_inicio, {
+                    'cliente_nombre': nombre_cliente,
+                    'cliente_telefono': cliente_telefono,
+                    'cliente_email': cliente_email,
+                })
             return redirect('crear_reserva')
 
-        # 4. Crear el Turno con duración fija de 1 hora
-        turno = Turno(
-            servicio=servicio,
-            cliente_nombre=nombre_cliente,
-            cliente_telefono=cliente_telefono,
-            cliente_email=cliente_email,
-            fecha_hora_inicio=fecha_hora_inicio,
-            fecha_hora_fin=nueva_fin,
-            confirmado=False,
-        )
-        turno.save()
-
         # Nota: ya no creamos automáticamente una entrada en `Reserva` para evitar
         # duplicar la información. `Turno` es ahora la fuente de verdad para reservas.
 
@@ -104,13 +160,7 @@ def reservar_turno_view(request):
         return redirect('reserva_exitosa')
 
     # Si es GET: mostrar el formulario con la lista de servicios y horarios por hora
-    servicios = Servicio.objects.all()
-
-    # Generar opciones horarias usando la configuración en settings y el tamaño
-    # de cada franja en minutos (p. ej. 60 para 1 hora, 30 para medios horarios).
-    start = getattr(settings, 'RESERVATION_START_HOUR', 9)
-    end = getattr(settings, 'RESERVATION_END_HOUR', 18)  # valor exclusivo
-    slot_minutes = getattr(settings, 'RESERVATION_SLOT_DURATION_MINUTES', 60)
+    servicios = await acatalogo()
 
     # Permitir que se preseleccione un servicio mediante query param `?servicio=<id>`
     selected_servicio_id = None
@@ -121,49 +171,177 @@ def reservar_turno_view(request):
     except Exception:
         selected_servicio_id = None
 
-    horas = []
-    # iteramos en minutos desde start*60 hasta end*60 en pasos de slot_minutes
-    for minutes in range(start * 60, end * 60, slot_minutes):
-        h = minutes // 60
-        m = minutes % 60
-        horas.append(f"{h:02d}:{m:02d}")
+    # Generar opciones horarias usando la configuración en settings y el paso de
+    # la grilla en minutos (p. ej. 15 para ofrecer 09:00, 09:15, 09:30...).
+    # El formulario las reemplaza por las horas libres consultando
+    # `disponibilidad_view` en cuanto se eligen servicio y fecha.
+    horas = [formatear_hora(m) for m in minutos_de_inicio()]
+
+    return await _arender(request, 'core/reservar_turno.html', {
+        'servicios': servicios,
+        'horas': horas,
+        'selected_servicio_id': selected_servicio_id,
+        'frecuencias': FRECUENCIAS,
+        'max_repeticiones': maximo_de_repeticiones(),
+    })
+
+
+async def _anotar_en_lista_de_espera(request, servicio, inicio, datos):
+    """Anota a quien no consiguió `inicio` en la lista de espera (ver `core.lista_espera`)."""
+    espera = inscripcion(servicio, inicio, **datos)
+    try:
+        espera.full_clean(exclude=['servicio'])
+    except ValidationError:
+        messages.warning(request, 'Para anotarte en la lista de espera necesitamos un email válido.')
+        return
+    await espera.asave()
+    messages.info(
+        request,
+        f'Te anotamos en la lista de espera: si se libera un turno ese día entre las '
+        f'{espera.desde:%H:%M} y las {espera.hasta:%H:%M}, te avisaremos por email.',
+    )
+
+
+async def _reservar_serie(request, servicio, extras, frecuencia, inicio, datos):
+    """Reserva un combo de servicios seguidos y/o sus repeticiones (`crear_serie`)."""
+    por_pk = {str(s.pk): s async for s in Servicio.objects.filter(pk__in=[pk for pk in extras if pk.isdigit()])}
+    if any(pk not in por_pk for pk in extras):
+        messages.error(request, 'Servicio no válido.')
+        return redirect('crear_reserva')
+    servicios = [servicio] + [por_pk[pk] for pk in extras]
+    try:
+        repeticiones = int(request.POST.get('repeticiones') or 1) if frecuencia else 1
+    except ValueError:
+        repeticiones = 0
+    recurrencia = Recurrencia(frecuencia or 'semanal', repeticiones)
+    try:
+        creados = await acrear_serie(servicios, inicio, recurrencia, **datos)
+    except ValueError as exc:
+        messages.error(request, str(exc))
+        return redirect('crear_reserva')
+    except ValidationError as exc:
+        messages.error(request, ' '.join(exc.messages))
+        return redirect('crear_reserva')
+    except HorarioNoDisponible as exc:
+        # Posiciones en el orden de `turnos_de_serie`: cada repetición, todos sus servicios.
+        inicios = list(recurrencia.inicios(inicio))
+        fechas = sorted({inicios[p // len(servicios)] for p in exc.conflictos})
+        if fechas:
+            detalle = ', '.join(timezone.localtime(f).strftime('%d/%m/%Y %H:%M') for f in fechas)
+            messages.error(request, f'Lo siento, no se reservó ningún turno: se solapan con otras reservas los de {detalle}.')
+        else:
+            messages.error(request, 'Lo siento, ese horario se solapa con otra reserva. Elige otro horario.')
+        return redirect('crear_reserva')
+    messages.success(request, f'Reserva creada correctamente ({len(creados)} turnos).')
+    return redirect('reserva_exitosa')
+
+
+def consulta_de_disponibilidad(params):
+    """`(servicio, desde, hasta)` de una consulta de disponibilidad.
+
+    Lee `servicio` (id), `desde` (YYYY-MM-DD) y opcionalmente `hasta`
+    (YYYY-MM-DD, inclusive; por defecto igual a `desde`) de `params` (el
+    `request.GET`). Lanza `ValueError` con el mensaje para el usuario si no
+    son válidos. La usan `disponibilidad_view` y la API (`core.api`).
+    """
+    try:
+        servicio = Servicio.objects.get(id=int(params.get('servicio', '')))
+    except (ValueError, Servicio.DoesNotExist):
+        raise ValueError('Servicio no válido.')
+
+    try:
+        desde = date.fromisoformat(params.get('desde', ''))
+        hasta = date.fromisoformat(params['hasta']) if params.get('hasta') else desde
+    except ValueError:
+        raise ValueError('Formato de fecha no válido.')
+
+    if hasta < desde or (hasta - desde).days >= DISPONIBILIDAD_MAX_DIAS:
+        raise ValueError(f'El rango debe abarcar entre 1 y {DISPONIBILIDAD_MAX_DIAS} días.')
+    return servicio, desde, hasta
+
+
+def disponibilidad_view(request):
+    """
+    Devuelve en JSON los horarios libres de un servicio.
+
+    Parámetros GET: los de `consulta_de_disponibilidad`. Todo el rango se
+    resuelve con una sola consulta de turnos. Por día, `horas` son todos los
+    inicios libres y `recomendadas` los que no dejan restos inútiles en la
+    agenda (ver `core.disponibilidad.franjas_libres`).
+    """
+    try:
+        servicio, desde, hasta = consulta_de_disponibilidad(request.GET)
+    except ValueError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
 
-    return render(request, 'core/reservar_turno.html', {'servicios': servicios, 'horas': horas, 'selected_servicio_id': selected_servicio_id})
+    libres = franjas_libres(servicio, desde, hasta)
+    return JsonResponse({
+        'servicio': servicio.id,
+        'dias': [
+            {
+                'fecha': dia.isoformat(),
+                'horas': [timezone.localtime(f.inicio).strftime('%H:%M') for f in franjas],
+                'recomendadas': [timezone.localtime(f.inicio).strftime('%H:%M') for f in franjas if f.recomendada],
+            }
+            for dia, franjas in libres.items()
+        ],
+    })
 
 
-def servicios_view(request):
+@pagina_en_cache(muestra_catalogo=True)
+async def servicios_view(request):
     """
     Página que muestra los servicios disponibles.
-    Actualmente renderiza una plantilla estática; en el futuro se podría
-    listar dinámicamente los objetos `Servicio` desde la BD.
+    Lista los `Servicio` del catálogo; la página completa queda en caché hasta
+    que cambie algún servicio. Con `?q=` sólo los que tienen esas palabras en
+    el nombre o la descripción (índice de texto completo, ver
+    `core.busqueda`; cada búsqueda es otra entrada de la caché).
     """
-    servicios = Servicio.objects.all()
-    return render(request, 'core/servicios.html', {'servicios': servicios})
+    texto = request.GET.get('q', '').strip()
+    if not texto:
+        servicios = await acatalogo()
+    else:
+        # La página se guarda con la versión del catálogo: de la primaria.
+        encontrados = await busqueda.afiltrar(servicios_de_la_primaria(), texto)
+        if encontrados is None:
+            encontrados = servicios_de_la_primaria().filter(Q(nombre__icontains=texto) | Q(descripcion__icontains=texto))
+        servicios = [servicio async for servicio in encontrados]
+    return await _arender(request, 'core/servicios.html', {'servicios': servicios, 'q': texto})
 
 
-def contacto_view(request):
+@limitar('contacto')
+async def contacto_view(request):
     """
     Vista para mostrar y procesar el formulario de contacto.
-    En este ejemplo, al enviar el formulario mostramos un mensaje y
-    redirigimos a la misma página (puedes adaptarlo para enviar emails).
+    Al enviar el formulario validamos los datos, los dejamos en la bandeja de
+    salida (un único INSERT) y redirigimos a la misma página; el worker guarda
+    el `Contacto` y manda el aviso por email.
     """
     if request.method == 'POST':
-        nombre = request.POST.get('nombre')
-        email = request.POST.get('email')
-        mensaje = request.POST.get('mensaje')
+        datos = {
+            'nombre': request.POST.get('nombre', ''),
+            'email': request.POST.get('email', ''),
+            'mensaje': request.POST.get('mensaje', ''),
+        }
 
-        # Guardar en la base de datos para revisión por el equipo
+        # El mismo mensaje enviado dos veces desde el mismo navegador (doble
+        # clic, reenvío del formulario) tiene la misma clave y se guarda una vez.
+        clave = hashlib.sha256(
+            '\x00'.join([request.META.get('CSRF_COOKIE', ''), *datos.values()]).encode()
+        ).hexdigest()
         try:
-            Contacto.objects.create(nombre=nombre, email=email, mensaje=mensaje)
+            Contacto(**datos).full_clean()
+            await Evento.objects.aencolar([Evento(tipo=Evento.CONTACTO, clave=f'contacto:{clave}', datos=datos)])
             messages.success(request, 'Gracias, hemos recibido tu mensaje. Te responderemos pronto.')
         except Exception:
             # Si hay un error al guardar, notificamos al usuario de forma genérica
             messages.error(request, 'Ocurrió un error al enviar el mensaje. Intenta nuevamente más tarde.')
         return redirect('contacto')
 
-    return render(request, 'core/contacto.html')
+    return await _arender(request, 'core/contacto.html')
 
 
+@pagina_en_cache()
 def reserva_exitosa_view(request):
     """
     Muestra una página de confirmación de reserva exitosa.
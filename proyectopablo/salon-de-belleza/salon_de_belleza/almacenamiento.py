@@ -0,0 +1,42 @@
+"""
+Almacenamiento de archivos estáticos para producción.
+
+`ManifestComprimido` es el `ManifestStaticFilesStorage` de Django (nombres con
+hash del contenido, para poder cachearlos indefinidamente) que además deja, al
+lado de cada archivo de texto, sus versiones precomprimidas `.gz` y `.br` (con `Brotli`, de
+`requirements.txt`). nginx los sirve con
+`gzip_static on;` / `brotli_static on;`.
+"""
+
+import gzip
+
+import brotli
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+# Extensiones que vale la pena comprimir.
+EXTENSIONES_COMPRIMIBLES = ('.css', '.js', '.svg', '.html', '.txt', '.json', '.map')
+
+
+class ManifestComprimido(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        # El padre puede devolver el mismo archivo en varias pasadas; se
+        # comprime la versión final de cada uno, al terminar.
+        finales = {}
+        for nombre, hashed_name, procesado in super().post_process(paths, dry_run, **options):
+            if not isinstance(procesado, Exception):
+                finales[nombre] = hashed_name
+            yield nombre, hashed_name, procesado
+        if dry_run:
+            return
+        for hashed_name in finales.values():
+            if hashed_name and hashed_name.endswith(EXTENSIONES_COMPRIMIBLES):
+                self._comprimir(hashed_name)
+
+    def _comprimir(self, nombre):
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        with open(f'{ruta}.gz', 'wb') as archivo:
+            archivo.write(gzip.compress(contenido, compresslevel=9, mtime=0))
+        with open(f'{ruta}.br', 'wb') as archivo:
+            archivo.write(brotli.compress(contenido))
@@ -0,0 +1,97 @@
+"""
+Middleware de Django adaptado para ASGI.
+
+En modo asíncrono, `MiddlewareMixin` ejecuta cada `process_request`,
+`process_view` y `process_response` con `sync_to_async`: un salto a otro hilo
+por gancho, por si tocan la base de datos. Con la pila de `MIDDLEWARE` eso son
+una docena de saltos por petición, y bajo carga el servidor ASGI pasa más
+tiempo despachando hilos que atendiendo peticiones.
+
+Las subclases de este módulo ejecutan directamente en el bucle de eventos los
+ganchos que no hacen E/S (cabeceras, redirecciones, CSRF con cookie, ...). La
+sesión y los mensajes sólo saltan de hilo cuando tienen algo que guardar. En
+modo síncrono (WSGI) se comportan exactamente como las originales.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages.middleware import MessageMiddleware as _MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware as _SessionMiddleware
+from django.middleware.clickjacking import XFrameOptionsMiddleware as _XFrameOptionsMiddleware
+from django.middleware.common import CommonMiddleware as _CommonMiddleware
+from django.middleware.csrf import CsrfViewMiddleware as _CsrfViewMiddleware
+from django.middleware.gzip import GZipMiddleware as _GZipMiddleware
+from django.middleware.security import SecurityMiddleware as _SecurityMiddleware
+
+
+class EnElBucleMixin:
+    """Ejecuta en el bucle de eventos los ganchos para los que `en_el_bucle()` es cierto."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if self.async_mode and hasattr(self, 'process_view'):
+            # El manejador adapta `process_view` al cargar el middleware; se
+            # le entrega ya asíncrono para que no lo envuelva en un hilo.
+            self.process_view = self._process_view_asincrono
+
+    def en_el_bucle(self, gancho, request):
+        """Si `gancho` se puede ejecutar sin salir del bucle para esta petición."""
+        return True
+
+    async def _ejecutar(self, gancho, request, *args):
+        metodo = getattr(type(self), gancho).__get__(self)
+        if self.en_el_bucle(gancho, request):
+            return metodo(request, *args)
+        return await sync_to_async(metodo, thread_sensitive=True)(request, *args)
+
+    async def _process_view_asincrono(self, request, view_func, view_args, view_kwargs):
+        return await self._ejecutar('process_view', request, view_func, view_args, view_kwargs)
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, 'process_request'):
+            response = await self._ejecutar('process_request', request)
+        response = response or await self.get_response(request)
+        if hasattr(self, 'process_response'):
+            response = await self._ejecutar('process_response', request, response)
+        return response
+
+
+class SecurityMiddleware(EnElBucleMixin, _SecurityMiddleware):
+    pass
+
+
+class CommonMiddleware(EnElBucleMixin, _CommonMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(EnElBucleMixin, _CsrfViewMiddleware):
+    def en_el_bucle(self, gancho, request):
+        # Con `CSRF_USE_SESSIONS` el secreto se lee y guarda en la sesión.
+        return not settings.CSRF_USE_SESSIONS
+
+
+class SessionMiddleware(EnElBucleMixin, _SessionMiddleware):
+    def en_el_bucle(self, gancho, request):
+        # `process_request` sólo crea el objeto; la sesión se carga al usarla.
+        if gancho == 'process_request':
+            return True
+        sesion = getattr(request, 'session', None)
+        return sesion is None or not (sesion.modified or settings.SESSION_SAVE_EVERY_REQUEST)
+
+
+class MessageMiddleware(EnElBucleMixin, _MessageMiddleware):
+    def en_el_bucle(self, gancho, request):
+        if gancho == 'process_request':
+            return True
+        # Sin mensajes leídos ni nuevos, `update()` no guarda nada.
+        almacen = getattr(request, '_messages', None)
+        return almacen is None or not (almacen.used or almacen.added_new)
+
+
+class XFrameOptionsMiddleware(EnElBucleMixin, _XFrameOptionsMiddleware):
+    pass
+
+
+class GZipMiddleware(EnElBucleMixin, _GZipMiddleware):
+    pass
@@ -0,0 +1,131 @@
+"""
+Lecturas en réplicas.
+
+Con `DATABASE_REPLICAS` (alias de `DATABASES` que copian a `default`), las
+lecturas de los modelos de `core` en peticiones GET/HEAD (disponibilidad,
+reportes, listados del admin) van a una réplica al azar. Quedan en la
+primaria:
+
+- toda escritura, y toda lectura dentro de una transacción (las reservas
+  validan el solapamiento en `transaction.atomic()`, ver `core.reservas`);
+- las peticiones POST, PUT, PATCH y DELETE enteras;
+- las peticiones de quien escribió hace menos de `REPLICA_STICKY_SECONDS`:
+  después de cada petición que escribe, `ReplicaMiddleware` deja la cookie
+  `REPLICA_STICKY_COOKIE`, así quien acaba de reservar ve su turno aunque la
+  réplica venga atrasada;
+- fuera de una petición (worker, comandos, tests): siempre la primaria;
+- los modelos de las demás aplicaciones (sesiones, usuarios, permisos);
+- el catálogo de servicios que se guarda en la caché con su versión
+  (`core.cache_publico.servicios_de_la_primaria`): leído de una réplica
+  atrasada, la versión nueva quedaría con los servicios anteriores.
+
+Las réplicas no se migran: reciben el esquema de la primaria. Para probar en
+local, dos archivos SQLite: `DJANGO_DB_REPLICAS=replica.sqlite3` y una copia
+de `db.sqlite3`; la copia hace de réplica atrasada hasta volver a copiarla.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Aplicaciones cuyos modelos se pueden leer de una réplica.
+APLICACIONES = ('core',)
+
+METODOS_DE_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+_en_replica = ContextVar('lecturas_en_replica', default=False)
+
+
+def replicas():
+    """Alias de las réplicas configuradas (`DATABASE_REPLICAS`)."""
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def segundos_pegado():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+
+def nombre_de_cookie():
+    return getattr(settings, 'REPLICA_STICKY_COOKIE', 'primaria')
+
+
+class ReplicaRouter:
+    """Lee de una réplica cuando la petición actual lo permite (ver el módulo)."""
+
+    def db_for_read(self, model, **hints):
+        if not _en_replica.get() or model._meta.app_label not in APLICACIONES:
+            return None
+        disponibles = replicas()
+        if not disponibles or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return random.choice(disponibles)
+
+    def db_for_write(self, model, **hints):
+        # También para los objetos leídos de una réplica.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        mismos_datos = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in mismos_datos and obj2._state.db in mismos_datos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+def _empezar(request):
+    permitido = bool(
+        replicas()
+        and request.method in METODOS_DE_LECTURA
+        and nombre_de_cookie() not in request.COOKIES
+    )
+    return _en_replica.set(permitido)
+
+
+def _terminar(request, token, response):
+    _en_replica.reset(token)
+    if replicas() and request.method not in METODOS_DE_LECTURA:
+        response.set_cookie(
+            nombre_de_cookie(), '1', max_age=segundos_pegado(), httponly=True,
+            samesite='Lax', secure=request.is_secure(),
+        )
+    return response
+
+
+class ReplicaMiddleware:
+    """Habilita las réplicas para las lecturas de la petición (ver el módulo); síncrono y asíncrono."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        token = _empezar(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            _en_replica.reset(token)
+            raise
+        return _terminar(request, token, response)
+
+    async def __acall__(self, request):
+        token = _empezar(request)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            _en_replica.reset(token)
+            raise
+        return _terminar(request, token, response)
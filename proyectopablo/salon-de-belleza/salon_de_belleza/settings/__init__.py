@@ -0,0 +1,23 @@
+"""
+Configuración de Django para el proyecto salon_de_belleza.
+
+`DJANGO_SETTINGS_MODULE` sigue siendo `salon_de_belleza.settings`; el perfil se
+elige con la variable de entorno `DJANGO_ENV`:
+
+- `dev` (por defecto): `DEBUG = True`, pensado para `runserver` y los tests.
+- `prod`: conexiones persistentes, plantillas en caché, estáticos con hash y
+  comprimidos, GZip y SQLite en modo WAL (ver `prod.py`).
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+PERFIL = os.environ.get('DJANGO_ENV', 'dev')
+
+if PERFIL == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif PERFIL == 'dev':
+    from .dev import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(f"DJANGO_ENV debe ser 'dev' o 'prod', no {PERFIL!r}.")
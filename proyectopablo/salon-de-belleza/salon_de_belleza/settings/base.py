@@ -0,0 +1,331 @@
+"""
+Configuración común de Django para el proyecto salon_de_belleza.
+
+Los perfiles `dev` y `prod` de este paquete parten de aquí; cuál se usa lo
+decide la variable de entorno `DJANGO_ENV` (ver `salon_de_belleza/settings/__init__.py`).
+
+Para más información sobre este archivo, visita:
+https://docs.djangoproject.com/en/stable/topics/settings/
+
+Para la lista completa de configuraciones y sus valores, visita:
+https://docs.djangoproject.com/en/stable/ref/settings/
+"""
+
+from pathlib import Path
+import os
+
+# Construye las rutas dentro del proyecto como: BASE_DIR / 'subdir'.
+# BASE_DIR apunta al directorio raíz del proyecto Django (el que contiene manage.py)
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+
+# --- Configuraciones de Seguridad ---
+
+# ¡ADVERTENCIA DE SEGURIDAD: manten la clave secreta usada en producción en secreto!
+# Esta clave se usa para la firma de datos criptográficos. Es vital que no se exponga.
+# Se lee de `DJANGO_SECRET_KEY`; el perfil `prod` exige que esté definida.
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', 'django-insecure-a_dummy_secret_key_for_development')
+
+# ¡ADVERTENCIA DE SEGURIDAD: no ejecutes con debug activado en producción!
+# DEBUG = True activa los mensajes de error detallados en el navegador, lo cual es útil para desarrollar.
+# En producción, debe ser False para no exponer información sensible de la configuración.
+# El perfil `dev` lo activa.
+DEBUG = False
+
+# ALLOWED_HOSTS define qué nombres de dominio o IPs pueden servir este sitio Django.
+# En desarrollo, a menudo se deja vacío o con ['*'].
+# En producción, debes listar aquí tu dominio o dominios, por ejemplo: ['www.misalon.com'];
+# se leen de `DJANGO_ALLOWED_HOSTS`, separados por comas.
+ALLOWED_HOSTS = [h for h in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if h]
+
+
+# --- Definición de Aplicaciones ---
+
+# INSTALLED_APPS es una lista de todas las aplicaciones que se usan en este proyecto Django.
+# Django viene con varias aplicaciones por defecto que manejan tareas comunes.
+# También aquí se registrarán las aplicaciones que tú crees.
+INSTALLED_APPS = [
+    'django.contrib.admin',         # El sitio de administración.
+    'django.contrib.auth',          # El framework de autenticación.
+    'django.contrib.contenttypes',  # El framework para tipos de contenido.
+    'django.contrib.sessions',      # El framework de sesiones.
+    'django.contrib.messages',      # El framework de mensajería.
+    'django.contrib.staticfiles',   # El framework para manejar archivos estáticos.
+    'core', # Aplicación principal del proyecto
+]
+
+# --- Middleware ---
+
+# MIDDLEWARE es una lista de "ganchos" en el sistema de procesamiento de peticiones/respuestas de Django.
+# Cada clase de middleware tiene una responsabilidad específica. El orden es importante.
+# Las de `salon_de_belleza.middleware` son las de Django, pero bajo ASGI no
+# saltan a un hilo en los ganchos que no tocan la base (ver ese módulo).
+# `MedicionMiddleware` va primero para medir la petición entera (ver
+# `core.metricas`); `ReplicaMiddleware` decide si la petición puede leer de
+# una réplica (ver `salon_de_belleza/routers.py`).
+MIDDLEWARE = [
+    'core.metricas.MedicionMiddleware',
+    'salon_de_belleza.routers.ReplicaMiddleware',
+    'salon_de_belleza.middleware.SecurityMiddleware',
+    'salon_de_belleza.middleware.SessionMiddleware',
+    'salon_de_belleza.middleware.CommonMiddleware',
+    'salon_de_belleza.middleware.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'salon_de_belleza.middleware.MessageMiddleware',
+    'salon_de_belleza.middleware.XFrameOptionsMiddleware',
+]
+
+
+# --- Configuración de URLs ---
+
+# ROOT_URLCONF le dice a Django cuál es el módulo de Python que contiene la configuración de URLs principal.
+# Normalmente, apunta al archivo `urls.py` del directorio de tu proyecto.
+ROOT_URLCONF = 'salon_de_belleza.urls'
+
+
+# --- Plantillas (Templates) ---
+
+# TEMPLATES define cómo Django encontrará y renderizará las plantillas HTML.
+TEMPLATES = [
+    {
+        # El de Django, midiendo el render en las peticiones medidas (`core.metricas`).
+        'BACKEND': 'core.metricas.DjangoTemplates',
+        # DIRS es una lista de directorios donde Django buscará plantillas.
+        # Es común añadir un directorio 'templates' en la raíz del proyecto.
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
+        'APP_DIRS': True, # APP_DIRS=True le dice a Django que busque plantillas dentro de los directorios de las aplicaciones.
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+
+# --- Interfaz de Servidor de Aplicaciones Web (WSGI) ---
+
+# WSGI_APPLICATION especifica la ruta al objeto de la aplicación WSGI que los servidores
+# compatibles con WSGI usan para comunicarse con tu proyecto.
+WSGI_APPLICATION = 'salon_de_belleza.wsgi.application'
+
+
+# --- Base de Datos ---
+# https://docs.djangoproject.com/en/stable/ref/settings/#databases
+
+# DATABASES configura la(s) base(s) de datos que usará tu proyecto.
+# Por defecto, Django usa SQLite, que es una base de datos ligera basada en un solo archivo.
+# Es ideal para desarrollo y proyectos pequeños.
+# En SQLite, `transaction_mode = 'IMMEDIATE'` hace que cada `transaction.atomic()`
+# empiece con BEGIN IMMEDIATE: la transacción toma el lock de escritura al abrirse
+# y las reservas concurrentes esperan su turno (hasta `timeout` segundos) en lugar
+# de validar con datos viejos (ver `core/reservas.py`). Requiere Django 5.1+.
+# Los tests usan una base en archivo (no en memoria) porque el modo "shared
+# cache" de SQLite en memoria bloquea por tabla y no respeta BEGIN IMMEDIATE,
+# lo que invalidaría las pruebas de concurrencia.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Réplicas de lectura (ver `salon_de_belleza/routers.py`): rutas de archivos
+# SQLite separadas por comas en `DJANGO_DB_REPLICAS`, como sustituto local de
+# réplicas reales; con otro motor, se agregan a mano a `DATABASES` y a
+# `DATABASE_REPLICAS`. En los tests son espejos de `default`.
+DATABASE_REPLICAS = []
+for _numero, _ruta in enumerate((r for r in os.environ.get('DJANGO_DB_REPLICAS', '').split(',') if r), 1):
+    DATABASES[f'replica{_numero}'] = {
+        **DATABASES['default'],
+        'NAME': _ruta,
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_numero}')
+DATABASE_ROUTERS = ['salon_de_belleza.routers.ReplicaRouter']
+# Quien escribió lee de la primaria durante estos segundos (cookie
+# `REPLICA_STICKY_COOKIE`), para ver lo suyo aunque la réplica venga atrasada.
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'primaria'
+
+
+# --- Validación de Contraseñas ---
+# https://docs.djangoproject.com/en/stable/ref/settings/#auth-password-validators
+
+# AUTH_PASSWORD_VALIDATORS es una lista de validadores que se usan para comprobar
+# la seguridad de las contraseñas de los usuarios.
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# --- Internacionalización (i18n) y Localización (l10n) ---
+# https://docs.djangoproject.com/en/stable/topics/i18n/
+
+# LANGUAGE_CODE define el código de idioma por defecto para este proyecto.
+LANGUAGE_CODE = 'es-ar' # Español de Argentina
+
+# TIME_ZONE define la zona horaria por defecto.
+TIME_ZONE = 'UTC'
+
+# USE_I18N activa el sistema de traducción de Django.
+USE_I18N = True
+
+# USE_L10N activa el formato de números y fechas según la localización.
+USE_L10N = True
+
+# USE_TZ activa el soporte para zonas horarias. Cuando es True, Django almacena
+# la fecha y hora en UTC en la base de datos.
+USE_TZ = True
+
+
+# --- Archivos Estáticos (CSS, JavaScript, Imágenes) ---
+# https://docs.djangoproject.com/en/stable/howto/static-files/
+
+# STATIC_URL es la URL base desde la cual se servirán los archivos estáticos.
+# Por ejemplo, '/static/css/style.css'.
+STATIC_URL = '/static/'
+
+# STATICFILES_DIRS es una lista de directorios donde Django buscará archivos estáticos,
+# además del directorio 'static/' de cada aplicación.
+# Es común añadir un directorio 'static' en la raíz del proyecto.
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, "static"),
+]
+
+# STATIC_ROOT es el directorio donde `collectstatic` reúne los archivos para servirlos
+# en producción (con nginx u otro servidor web).
+STATIC_ROOT = os.environ.get('DJANGO_STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+
+# --- Campo de Clave Primaria por Defecto ---
+# https://docs.djangoproject.com/en/stable/ref/settings/#default-auto-field
+
+# DEFAULT_AUTO_FIELD define el tipo de campo que se usará para las claves primarias
+# autoincrementales que Django crea por defecto.
+# A partir de Django 3.2, se recomienda usar BigAutoField para evitar posibles problemas
+# de desbordamiento en bases de datos grandes.
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# --- Caché ---
+# Por defecto una caché en memoria por proceso. Para compartirla entre procesos
+# (y que la invalidación del catálogo llegue a todos) se puede usar, p. ej.:
+#   DJANGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   DJANGO_CACHE_LOCATION=redis://127.0.0.1:6379
+# o `django.core.cache.backends.filebased.FileBasedCache` con un directorio.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'salon-de-belleza'),
+    }
+}
+# Segundos que las páginas públicas (inicio, servicios, ...) quedan en caché.
+# 0 desactiva la caché de páginas y los GET condicionales (ver `core.cache_publico`).
+PUBLIC_PAGE_CACHE_SECONDS = 600
+
+# --- Configuración de franjas horarias para reservas ---
+# `RESERVATION_START_HOUR` y `RESERVATION_END_HOUR` definen el rango de horas
+# para mostrar como posibles inicios de turno. `RESERVATION_END_HOUR` es
+# exclusivo en el rango (por ejemplo, 9..18 genera 09:00..17:00).
+RESERVATION_START_HOUR = 9
+RESERVATION_END_HOUR = 18
+# Paso en minutos de la grilla de inicios de turno (09:00, 09:15, ...). La
+# duración de cada turno es la de su servicio (`Servicio.duracion_minutos`).
+RESERVATION_SLOT_DURATION_MINUTES = 15
+# Minutos libres que deben quedar entre dos turnos del mismo servicio
+# (limpieza, preparación del puesto).
+RESERVATION_BUFFER_MINUTES = 0
+# Duración máxima de un turno en minutos. La búsqueda de solapamientos la usa
+# para acotar el rango de inicios a revisar en el índice de `Turno`.
+RESERVATION_MAX_DURATION_MINUTES = 480
+# Repeticiones máximas de una serie (semanal, quincenal o mensual) y servicios
+# máximos de un combo reservado de una vez (ver `core.reservas.crear_serie`).
+RESERVATION_MAX_OCCURRENCES = 52
+RESERVATION_MAX_COMBO_SERVICES = 3
+# Minutos antes y después de la hora pedida que abarca una inscripción en la
+# lista de espera (ver `core.lista_espera`).
+RESERVATION_WAITLIST_WINDOW_MINUTES = 60
+# Hilos en los que las vistas asíncronas hacen las reservas, cada uno con su
+# conexión (ver `core.reservas.acrear_turno`). Las reservas que chocan ya las
+# serializa el bloqueo de la agenda; 0 las hace en el hilo síncrono de Django.
+RESERVATION_ASYNC_WORKERS = int(os.environ.get('DJANGO_RESERVATION_ASYNC_WORKERS', 4))
+
+# --- Clientes (`core.clientes`) ---
+# Código de país que se antepone a los teléfonos escritos sin él al
+# normalizarlos a E.164 (`core.contactos.normalizar_telefono`).
+CLIENT_PHONE_COUNTRY_CODE = os.environ.get('DJANGO_CLIENT_PHONE_COUNTRY_CODE', '54')
+
+# --- Correo ---
+# Backend SMTP por defecto (`EMAIL_HOST`, `EMAIL_PORT`, ...); el perfil `dev`
+# muestra los correos en la consola y los tests usan el backend en memoria.
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', 'turnos@salon-de-belleza.local')
+# Destinatarios del aviso de cada mensaje del formulario de contacto (separados
+# por comas). Vacío: el mensaje se guarda en `Contacto` sin avisar.
+CONTACT_NOTIFICATION_EMAILS = [e for e in os.environ.get('DJANGO_CONTACT_NOTIFICATION_EMAILS', '').split(',') if e]
+
+# --- Bandeja de salida (`core.eventos`, `python manage.py run_outbox`) ---
+# Eventos que el worker toma por lote.
+OUTBOX_BATCH_SIZE = 100
+# Intentos antes de marcar un evento como fallido.
+OUTBOX_MAX_ATTEMPTS = 8
+# Espera antes del primer reintento; se duplica en cada intento hasta
+# `OUTBOX_MAX_RETRY_SECONDS`.
+OUTBOX_RETRY_SECONDS = 30
+OUTBOX_MAX_RETRY_SECONDS = 3600
+
+# --- Límite de envíos de los formularios (`core.limites`) ---
+# Por vista, cuántos POST se aceptan `(peticiones, segundos)` de cada IP y de
+# cada teléfono o email en una ventana deslizante. Los que superan alguno
+# reciben un 429; una vista que no está aquí no tiene límite.
+RATE_LIMITS = {
+    'reservar': {'ip': (10, 600), 'telefono': (5, 3600)},
+    'contacto': {'ip': (5, 600), 'email': (3, 3600)},
+}
+# Cabecera de `request.META` con la IP del cliente detrás de un proxy (por
+# ejemplo `HTTP_X_REAL_IP`). Vacía: se usa `REMOTE_ADDR`.
+RATE_LIMIT_IP_HEADER = os.environ.get('DJANGO_RATE_LIMIT_IP_HEADER', '')
+
+# --- Medición de peticiones (`core.metricas`) ---
+# Fracción de las peticiones que se miden (latencia, consultas, plantillas).
+PERF_SAMPLE_RATE = float(os.environ.get('DJANGO_PERF_SAMPLE_RATE', 0.1))
+# Consultas más lentas que esto (en ms) se registran con su vista en el
+# logger `core.metricas`.
+PERF_SLOW_QUERY_MS = 100
+# Cabecera `Server-Timing` en las peticiones medidas.
+PERF_SERVER_TIMING = True
+# Tokens aceptados en `Authorization: Bearer <token>` por `/interno/metricas/`
+# (separados por comas); el personal del admin entra con su sesión.
+PERF_METRICS_TOKENS = [t for t in os.environ.get('DJANGO_PERF_METRICS_TOKENS', '').split(',') if t]
+
+# --- API JSON (`core/api.py`) ---
+# Tokens aceptados en `Authorization: Bearer <token>` por los endpoints de
+# turnos (separados por comas). Vacío: esos endpoints responden 401.
+API_TOKENS = [t for t in os.environ.get('DJANGO_API_TOKENS', '').split(',') if t]
+# Turnos por petición de `POST /api/turnos/lote/`.
+API_MAX_BATCH_SIZE = 100
+# Turnos por página de `GET /api/turnos/`.
+API_MAX_PAGE_SIZE = 500
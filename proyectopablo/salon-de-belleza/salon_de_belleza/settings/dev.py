@@ -0,0 +1,13 @@
+"""
+Perfil de desarrollo: el de siempre, con errores detallados en el navegador.
+"""
+
+import os
+
+from .base import *  # noqa: F401,F403
+
+DEBUG = True
+
+# Los correos (confirmaciones, avisos de contacto) se imprimen en la consola
+# del worker (`python manage.py run_outbox`).
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
@@ -0,0 +1,61 @@
+"""
+Perfil de producción (`DJANGO_ENV=prod`).
+
+- `DJANGO_SECRET_KEY` y `DJANGO_ALLOWED_HOSTS` son obligatorias.
+- Conexiones a la base persistentes (`DJANGO_CONN_MAX_AGE`, 600 s por defecto).
+- SQLite en modo WAL con `synchronous=NORMAL` y `mmap_size`: las lecturas no
+  esperan a las escrituras y cada COMMIT no fuerza un fsync del archivo
+  principal.
+- Plantillas compiladas una vez por proceso (cargador `cached`).
+- Estáticos con hash en el nombre (`collectstatic` genera también `.gz` y
+  `.br` para que el servidor web los sirva tal cual).
+- `GZipMiddleware` para las respuestas HTML.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import DATABASES, MIDDLEWARE, TEMPLATES
+
+DEBUG = False
+
+if not os.environ.get('DJANGO_SECRET_KEY'):
+    raise ImproperlyConfigured('DJANGO_SECRET_KEY es obligatoria con DJANGO_ENV=prod.')
+if not ALLOWED_HOSTS:  # noqa: F405
+    raise ImproperlyConfigured('DJANGO_ALLOWED_HOSTS es obligatoria con DJANGO_ENV=prod.')
+
+# --- Base de Datos ---
+# La primaria y las réplicas (`DATABASE_REPLICAS`).
+for _base in DATABASES.values():
+    _base['CONN_MAX_AGE'] = int(os.environ.get('DJANGO_CONN_MAX_AGE', 600))
+    _base['CONN_HEALTH_CHECKS'] = True
+    if _base['ENGINE'] == 'django.db.backends.sqlite3':
+        # Se ejecutan al abrir cada conexión (Django 5.1+).
+        _base['OPTIONS']['init_command'] = (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA mmap_size=134217728;'
+            'PRAGMA temp_store=MEMORY;'
+        )
+
+# --- Plantillas ---
+# Con `loaders` explícitos, `APP_DIRS` debe quedar desactivado.
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+# --- Archivos Estáticos ---
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'salon_de_belleza.almacenamiento.ManifestComprimido'},
+}
+
+# --- Middleware ---
+# GZip va primero para comprimir la respuesta ya terminada.
+MIDDLEWARE = ['salon_de_belleza.middleware.GZipMiddleware', *MIDDLEWARE]